@@ -0,0 +1,250 @@
+# app/circuit_breaker.py
+"""
+Circuit breaker and hedged calls for slow/unreliable upstreams (OpenAI Assistants).
+
+The breaker keeps a rolling time window of call outcomes and latencies:
+  - closed:    calls flow through; outcomes are recorded
+  - open:      error rate (or slow-call rate) crossed its threshold -> calls are
+               rejected immediately with CircuitOpenError until `open_s` elapses
+  - half_open: a limited number of trial calls are let through; one success
+               closes the circuit, one failure re-opens it
+
+Callers are expected to catch CircuitOpenError and serve a cached or demo
+response instead of waiting on the upstream timeout.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Optional, Tuple
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when a call is rejected because the circuit is open."""
+
+    def __init__(self, name: str):
+        super().__init__(f"circuit '{name}' is open")
+        self.name = name
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        window_s: float = 60.0,
+        min_calls: int = 5,
+        error_rate_threshold: float = 0.5,
+        slow_call_s: float = 20.0,
+        slow_rate_threshold: float = 0.8,
+        open_s: float = 30.0,
+        half_open_max_calls: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.window_s = window_s
+        self.min_calls = min_calls
+        self.error_rate_threshold = error_rate_threshold
+        self.slow_call_s = slow_call_s
+        self.slow_rate_threshold = slow_rate_threshold
+        self.open_s = open_s
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+        self._lock = threading.Lock()
+        # (timestamp, ok, latency_s)
+        self._calls: Deque[Tuple[float, bool, float]] = deque()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._half_open_inflight = 0
+
+    # ---------- state ----------
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(self._clock())
+
+    def _current_state(self, now: float) -> str:
+        if self._state == OPEN and now - self._opened_at >= self.open_s:
+            self._state = HALF_OPEN
+            self._half_open_inflight = 0
+        return self._state
+
+    def is_open(self) -> bool:
+        """True while calls would be rejected (does not consume a half-open trial)."""
+        return self.state == OPEN
+
+    def allow(self) -> bool:
+        """Reserve a call slot. Every allowed call must be followed by record()."""
+        with self._lock:
+            state = self._current_state(self._clock())
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and self._half_open_inflight < self.half_open_max_calls:
+                self._half_open_inflight += 1
+                return True
+            return False
+
+    def record(self, ok: bool, latency_s: float):
+        with self._lock:
+            now = self._clock()
+            state = self._current_state(now)
+            if state == HALF_OPEN:
+                self._half_open_inflight = max(0, self._half_open_inflight - 1)
+                if ok and latency_s < self.slow_call_s:
+                    self._state = CLOSED
+                    self._calls.clear()
+                else:
+                    self._trip(now)
+                return
+            self._calls.append((now, ok, latency_s))
+            self._prune(now)
+            if state == CLOSED and self._should_trip():
+                self._trip(now)
+
+    def release(self):
+        """Give back a slot reserved by allow() without recording an outcome."""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._half_open_inflight = max(0, self._half_open_inflight - 1)
+
+    def reset(self):
+        with self._lock:
+            self._state = CLOSED
+            self._calls.clear()
+            self._half_open_inflight = 0
+
+    def _trip(self, now: float):
+        self._state = OPEN
+        self._opened_at = now
+        self._half_open_inflight = 0
+
+    def _prune(self, now: float):
+        cutoff = now - self.window_s
+        while self._calls and self._calls[0][0] < cutoff:
+            self._calls.popleft()
+
+    def _should_trip(self) -> bool:
+        total = len(self._calls)
+        if total < self.min_calls:
+            return False
+        errors = sum(1 for _, ok, _ in self._calls if not ok)
+        slow = sum(1 for _, _, lat in self._calls if lat >= self.slow_call_s)
+        return (errors / total) >= self.error_rate_threshold or (slow / total) >= self.slow_rate_threshold
+
+    # ---------- latency window ----------
+
+    def latency_percentile(self, pct: float) -> Optional[float]:
+        """Latency (seconds) at the given percentile (0-100) of successful calls in the window."""
+        with self._lock:
+            self._prune(self._clock())
+            lats = sorted(lat for _, ok, lat in self._calls if ok)
+        if len(lats) < self.min_calls:
+            return None
+        idx = min(len(lats) - 1, int(round(pct / 100.0 * (len(lats) - 1))))
+        return lats[idx]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            now = self._clock()
+            state = self._current_state(now)
+            self._prune(now)
+            total = len(self._calls)
+            errors = sum(1 for _, ok, _ in self._calls if not ok)
+        return {"name": self.name, "state": state, "calls": total, "errors": errors}
+
+    # ---------- call wrappers ----------
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        if not self.allow():
+            raise CircuitOpenError(self.name)
+        start = time.monotonic()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record(False, time.monotonic() - start)
+            raise
+        self.record(True, time.monotonic() - start)
+        return result
+
+    async def acall(self, fn: Callable[[], Awaitable[Any]], timeout_s: Optional[float] = None) -> Any:
+        if not self.allow():
+            raise CircuitOpenError(self.name)
+        start = time.monotonic()
+        try:
+            if timeout_s:
+                result = await asyncio.wait_for(fn(), timeout=timeout_s)
+            else:
+                result = await fn()
+        except asyncio.CancelledError:
+            # cancelled by a hedging sibling or the client: not the upstream's fault
+            self.release()
+            raise
+        except Exception:
+            self.record(False, time.monotonic() - start)
+            raise
+        self.record(True, time.monotonic() - start)
+        return result
+
+
+async def hedged_call(
+    breaker: CircuitBreaker,
+    fn: Callable[[], Awaitable[Any]],
+    hedge_percentile: Optional[float] = None,
+    timeout_s: Optional[float] = None,
+) -> Any:
+    """
+    Run `fn` through the breaker; if it has not finished after the window's
+    `hedge_percentile` latency, fire a second attempt and return whichever
+    succeeds first. Without enough latency history (or with hedging disabled)
+    this is a plain breaker call.
+    """
+    delay = breaker.latency_percentile(hedge_percentile) if hedge_percentile else None
+    if delay is None:
+        return await breaker.acall(fn, timeout_s=timeout_s)
+
+    first = asyncio.ensure_future(breaker.acall(fn, timeout_s=timeout_s))
+    tasks = [first]
+    last_exc: Optional[BaseException] = None
+    try:
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            return first.result()
+
+        tasks.append(asyncio.ensure_future(breaker.acall(fn, timeout_s=timeout_s)))
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                last_exc = task.exception()
+        raise last_exc  # both attempts failed (or the hedge was rejected and the first failed)
+    finally:
+        # also reached when the caller is cancelled mid-wait: never leave an attempt running
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+# Shared breaker for the OpenAI Assistants backend (used by app.openai_client and backend.assistants)
+ASSISTANTS_BREAKER = CircuitBreaker(
+    "openai_assistants",
+    window_s=_env_float("ASSISTANT_CB_WINDOW_S", 60.0),
+    min_calls=int(_env_float("ASSISTANT_CB_MIN_CALLS", 5)),
+    error_rate_threshold=_env_float("ASSISTANT_CB_ERROR_RATE", 0.5),
+    slow_call_s=_env_float("ASSISTANT_CB_SLOW_CALL_S", 20.0),
+    slow_rate_threshold=_env_float("ASSISTANT_CB_SLOW_RATE", 0.8),
+    open_s=_env_float("ASSISTANT_CB_OPEN_S", 30.0),
+)
@@ -0,0 +1,152 @@
+# app/conditional.py
+"""
+Conditional responses (ETag / If-None-Match) for the full-tab endpoints.
+
+Each tenant has a data version per domain ("assets", "tax", "debt", "company",
+"profile"): the mtime/size of the data files the domain reads, plus whatever
+the domain's engine registered with register_version(): journal sizes and
+inodes, SQLite revision counters and the like. The ETag of a full-tab response
+is a digest of that version and the request parameters, so it can be computed
+(and a matching If-None-Match answered with 304) before the engine runs.
+
+Versions are read from state every worker process shares, so a write in one
+worker changes the tag in all of them, and identical data gets the same tag
+whichever worker answers.
+
+The tab endpoints are read-only POSTs, so a matching If-None-Match gets the
+same 304 a GET would.
+"""
+import functools
+import hashlib
+import inspect
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+DEFAULT_CACHE_CONTROL = "private, no-cache"
+
+BASE = Path(__file__).resolve().parents[1]
+
+# files each domain's engine reads; edits on disk change the version too
+DOMAIN_FILES: Dict[str, Tuple[Path, ...]] = {
+    "assets": (BASE / "data" / "demo" / "assets.json",),
+    "tax": (BASE / "data" / "demo" / "tax.json",),
+    "debt": (BASE / "data" / "demo" / "debt.json",),
+    "company": (BASE / "data" / "companies" / "demo" / "profile.json",),
+    "profile": (BASE / "data" / "demo" / "profile.json",),
+}
+
+# domain -> functions of company_id returning a JSON-able token of the domain's shared state
+_VERSION_SOURCES: Dict[str, List[Callable[[str], Any]]] = {}
+
+
+def register_version(domain: str, source: Callable[[str], Any]):
+    """Make `source(company_id)` part of the domain's version; it must change with every write, in any process."""
+    _VERSION_SOURCES.setdefault(domain, []).append(source)
+
+
+def data_version(company_id: str, domains: Iterable[str]) -> str:
+    # engines flag expiring warranties/deadlines relative to today, so the date is part of the version
+    parts = [time.strftime("%Y-%m-%d", time.gmtime())]
+    for domain in sorted(domains):
+        parts.append(f"{domain}:" + json.dumps([source(company_id) for source in _VERSION_SOURCES.get(domain, ())], default=str))
+        for path in DOMAIN_FILES.get(domain, ()):
+            try:
+                st = os.stat(path)
+                parts.append(f"{st.st_mtime_ns}.{st.st_size}")
+            except OSError:
+                parts.append("-")
+    return "|".join(parts)
+
+
+def make_etag(company_id: str, domains: Iterable[str], route: str, params: Any) -> str:
+    key = json.dumps([data_version(company_id, domains), route, params], sort_keys=True, default=str)
+    return '"' + hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest() + '"'
+
+
+_CODING_SUFFIXES = ('-gzip"', '-br"', '-zstd"')
+
+
+def _base_etag(tag: str) -> str:
+    """Strip W/ and the content-coding suffix CompressionMiddleware adds ('"abc-gzip"' -> '"abc"')."""
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    for suffix in _CODING_SUFFIXES:
+        if tag.endswith(suffix):
+            return tag[: -len(suffix)] + '"'
+    return tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison (weak, per RFC 9110 13.1.2), ignoring content-coding suffixes."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    bare = _base_etag(etag)
+    return any(_base_etag(candidate.strip()) == bare for candidate in if_none_match.split(","))
+
+
+def not_modified(etag: str, cache_control: str = DEFAULT_CACHE_CONTROL) -> Response:
+    return Response(status_code=304, headers={"etag": etag, "cache-control": cache_control})
+
+
+def _request_params(args: tuple, kwargs: Dict[str, Any]) -> Tuple[str, Any]:
+    """company_id and the JSON-able request parameters from the endpoint's body argument."""
+    for value in list(args) + list(kwargs.values()):
+        if isinstance(value, BaseModel) and hasattr(value, "company_id"):
+            return value.company_id or "demo", value.model_dump(mode="json")
+        if isinstance(value, dict) and "company_id" in value:
+            return value.get("company_id") or "demo", value
+    return "demo", None
+
+
+def conditional(*domains: str, cache_control: str = DEFAULT_CACHE_CONTROL):
+    """
+    Decorate a full-tab endpoint (below the @router decorator):
+
+        @router.post("/api/ai/assets/full", response_model=AssetsFullResponse)
+        @conditional("assets")
+        async def assets_full(req: AssetsFullRequest): ...
+
+    Adds ETag and Cache-Control to 200 responses and answers a matching
+    If-None-Match with 304 without calling the endpoint.
+    """
+
+    def decorator(fn):
+        route = f"{fn.__module__}.{fn.__qualname__}"
+        sig = inspect.signature(fn)
+        extra = [
+            inspect.Parameter("_conditional_request", inspect.Parameter.KEYWORD_ONLY, annotation=Request),
+            inspect.Parameter("_conditional_response", inspect.Parameter.KEYWORD_ONLY, annotation=Response),
+        ]
+
+        @functools.wraps(fn)
+        async def wrapper(*args, _conditional_request: Request, _conditional_response: Response, **kwargs):
+            company_id, params = _request_params(args, kwargs)
+            etag = make_etag(company_id, domains, route, params)
+            if etag_matches(_conditional_request.headers.get("if-none-match"), etag):
+                return not_modified(etag, cache_control)
+
+            if inspect.iscoroutinefunction(fn):
+                result = await fn(*args, **kwargs)
+            else:
+                result = await run_in_threadpool(fn, *args, **kwargs)
+
+            headers = result.headers if isinstance(result, Response) else _conditional_response.headers
+            if isinstance(result, Response) and result.status_code != 200:
+                return result
+            headers["etag"] = etag
+            headers["cache-control"] = cache_control
+            return result
+
+        wrapper.__signature__ = sig.replace(parameters=list(sig.parameters.values()) + extra)
+        return wrapper
+
+    return decorator
@@ -5,8 +5,9 @@ from pydantic import BaseModel
 from typing import Any, Dict, List, Optional
 
 from .openai_client import call_orchestrator, call_finance_analyst, call_research_scout
+from .circuit_breaker import CircuitOpenError
 from .utils_demo import is_demo, meta
-from .demo_seed import DEMO_FINANCIAL_OVERVIEW
+from .demo_seed import DEMO_FINANCIAL_OVERVIEW, DEMO_FINANCE_AGENT_RESPONSE, DEMO_RESEARCH_AGENT_RESPONSE
 
 router = APIRouter()
 
@@ -212,6 +213,9 @@ async def intent_router(req: IntentRequest):
             try:
                 ai = await call_finance_analyst(company_id=company_id, periods=int(input_data.get("periods", 12)))
                 return {"intent": intent, "company_id": company_id, "result": ai}
+            except CircuitOpenError:
+                # Assistants backend is degraded: answer immediately from the seed instead of waiting
+                return {"intent": intent, "company_id": company_id, "result": meta(dict(DEMO_FINANCE_AGENT_RESPONSE)), "warning": "assistant_circuit_open"}
             except Exception as e:
                 raise HTTPException(status_code=500, detail=f"finance_analyst_error: {e}")
         raise HTTPException(status_code=400, detail="Finance Analyst assistant not configured; use /api/overview")
@@ -224,6 +228,8 @@ async def intent_router(req: IntentRequest):
             try:
                 ai = await call_research_scout(q, company_id=company_id, region=region)
                 return {"intent": intent, "company_id": company_id, "result": ai}
+            except CircuitOpenError:
+                return {"intent": intent, "company_id": company_id, "result": meta(dict(DEMO_RESEARCH_AGENT_RESPONSE)), "warning": "assistant_circuit_open"}
             except Exception as e:
                 raise HTTPException(status_code=500, detail=f"research_scout_error: {e}")
         raise HTTPException(status_code=400, detail="Research Scout assistant not configured")
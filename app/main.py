@@ -23,13 +23,32 @@ from .routers.debt import router as debt_router
 from .routers.ai_agents import router as ai_agents_router
 from .routers.ai_tabs import router as ai_tabs_router
 from .routers.settings import router as settings_router
+from .responses import TenantJSONResponse
 
-app = FastAPI(title="LightSignal API", version="0.2.0")
+app = FastAPI(title="LightSignal API", version="0.2.0", default_response_class=TenantJSONResponse)
 
 # attach auth middleware (enforces tenancy and demo bypass)
-from .middleware.auth import AuthMiddleware
+from .middleware.auth import AuthMiddleware, get_jwks_manager
 app.add_middleware(AuthMiddleware)
 
+
+@app.on_event("startup")
+async def preload_jwks():
+    # warm the JWKS key set so the first authenticated request doesn't wait on it
+    jwks = get_jwks_manager()
+    if jwks is not None:
+        await jwks.start()
+    # build the NAICS typeahead index before the first keystroke hits it
+    from .services import naics_index
+    naics_index.warm()
+
+
+@app.on_event("shutdown")
+async def flush_profile():
+    # write out any debounced profile edits before the worker exits
+    from .services import profile_engine
+    profile_engine.flush()
+
 # CORS configuration from environment
 ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "*")
 origins_list = [origin.strip() for origin in ALLOWED_ORIGINS.split(",")] if ALLOWED_ORIGINS != "*" else ["*"]
@@ -42,6 +61,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# negotiated zstd/br/gzip; outermost so AuthMiddleware still sees plain JSON bodies
+from .middleware.compression import CompressionMiddleware
+app.add_middleware(CompressionMiddleware, minimum_size=int(os.getenv("COMPRESSION_MIN_BYTES", "1024")))
+
 class OverviewQuery(BaseModel):
     company_id: str
     periods: int = 12
@@ -1,86 +1,45 @@
-from fastapi import Request, Response
+from contextvars import ContextVar
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from typing import Callable, Optional
+from starlette.datastructures import Headers, QueryParams
+from starlette.requests import cookie_parser
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Any, Dict, Optional
 import os
-import time
+import re
 import jwt
-import requests
-from cryptography.hazmat.primitives import serialization
-from cryptography.hazmat.primitives.asymmetric import rsa
 import json
+from json.decoder import scanstring
 
-# Simple in-memory rate limiter for auth endpoints (per-IP)
-_RATE_STORE = {}
+from .jwks import JWKSKeyManager
+from .rate_limit import RateLimiter, build_bucket_store
+from .token_cache import VerifiedTokenCache
+
+# Token-bucket rate limits on auth checks: per client IP before the token is
+# verified, per tenant (the token's company_id) once it is.
+# Bucket state is per-process unless RATE_LIMIT_SHARED_PATH / RATE_LIMIT_REDIS_URL is set.
 RATE_LIMIT_WINDOW = 60  # seconds
-RATE_LIMIT_MAX = 20
-
-# JWKS cache
-_JWKS_CACHE = {}
-_JWKS_CACHE_TTL = 300  # 5 minutes
-
-
-def _rate_check(ip: str) -> bool:
-    now = int(time.time())
-    rec = _RATE_STORE.get(ip)
-    if not rec or rec[0] + RATE_LIMIT_WINDOW < now:
-        _RATE_STORE[ip] = (now, 1)
-        return True
-    ts, count = rec
-    if count >= RATE_LIMIT_MAX:
-        return False
-    _RATE_STORE[ip] = (ts, count + 1)
-    return True
-
-
-def _get_jwks_key(jwks_url: str, kid: str) -> Optional[str]:
-    """Fetch and cache JWKS keys, return PEM format for given kid."""
-    now = int(time.time())
-    cache_key = f"{jwks_url}:{kid}"
-    
-    # Check cache
-    if cache_key in _JWKS_CACHE:
-        cached_time, cached_key = _JWKS_CACHE[cache_key]
-        if now - cached_time < _JWKS_CACHE_TTL:
-            return cached_key
-    
-    try:
-        # Fetch JWKS
-        response = requests.get(jwks_url, timeout=10)
-        response.raise_for_status()
-        jwks = response.json()
-        
-        # Find matching key
-        for key in jwks.get("keys", []):
-            if key.get("kid") == kid and key.get("kty") == "RSA":
-                # Convert JWK to PEM
-                n = jwt.utils.base64url_decode(key["n"])
-                e = jwt.utils.base64url_decode(key["e"])
-                
-                # Create RSA public key
-                public_numbers = rsa.RSAPublicNumbers(
-                    int.from_bytes(e, byteorder="big"),
-                    int.from_bytes(n, byteorder="big")
-                )
-                public_key = rsa.RSAPublicKey(public_numbers)
-                pem_key = public_key.public_bytes(
-                    encoding=serialization.Encoding.PEM,
-                    format=serialization.PublicFormat.SubjectPublicKeyInfo
-                ).decode()
-                
-                # Cache and return
-                _JWKS_CACHE[cache_key] = (now, pem_key)
-                return pem_key
-                
-    except Exception as e:
-        print(f"JWKS fetch error: {e}")
-        return None
-    
-    return None
+RATE_LIMIT_MAX = int(os.environ.get("RATE_LIMIT_MAX", "20"))
+RATE_LIMIT_TENANT_MAX = int(os.environ.get("RATE_LIMIT_TENANT_MAX", "600"))
+
+_RATE_STORE = build_bucket_store()
+IP_RATE_LIMITER = RateLimiter(RATE_LIMIT_MAX, RATE_LIMIT_WINDOW, _RATE_STORE, prefix="ip:")
+TENANT_RATE_LIMITER = RateLimiter(RATE_LIMIT_TENANT_MAX, RATE_LIMIT_WINDOW, _RATE_STORE, prefix="tenant:")
+
+# JWKS key set refresh interval
+_JWKS_CACHE_TTL = int(os.environ.get("AUTH_JWKS_TTL", "300"))  # 5 minutes
+
+
+async def _rate_check(ip: str) -> bool:
+    # pre-auth: the request's company_id is unverified, so only the caller's IP is charged
+    return await IP_RATE_LIMITER.aallow(ip)
+
 
+async def _tenant_rate_check(token_company_id: str) -> bool:
+    return await TENANT_RATE_LIMITER.aallow(token_company_id)
 
-class AuthMiddleware(BaseHTTPMiddleware):
-    """Middleware enforcing auth and tenancy per spec.
+
+class AuthMiddleware:
+    """Middleware enforcing auth and tenancy per spec (raw ASGI).
 
     Rules:
     - If company_id == 'demo' -> allow, stamp _meta.demo = True
@@ -89,164 +48,327 @@ class AuthMiddleware(BaseHTTPMiddleware):
       - 401 -> "Login required"
       - 403 -> "Unauthorized for this company" when token.company_id != req.company_id
 
-    Also injects _meta.tenant and _meta.demo into JSON dict responses for /api/*
-    
+    Also injects _meta.tenant and _meta.demo into JSON dict responses for /api/*,
+    and sends them as X-Tenant / X-Demo response headers.
+
+    The JSON request body is read from the socket once (only when company_id is
+    not in the path/query) and replayed to the handler, which does the only
+    full decode; the middleware reads just the top-level company_id from it
+    (see _body_company_id). Tenant meta is merged while the response is
+    rendered (TenantJSONResponse) so the body is never decoded and re-encoded
+    here; other JSON bodies get the meta spliced in, and streaming responses
+    pass through untouched.
+
     Environment variables:
     - AUTH_DISABLED: if "true", bypass all auth checks (dev mode)
     - AUTH_JWKS_URL: JWKS endpoint for RSA key verification (Auth0/GCP/Azure)
+    - AUTH_JWKS_TTL: seconds between background JWKS refreshes (default 300)
     - AUTH_JWT_SECRET: HS256 secret for local verification (fallback)
+    - AUTH_TOKEN_CACHE_SIZE: max verified tokens kept in the LRU (default 10000)
+    - AUTH_TOKEN_NEGATIVE_TTL: seconds a rejected token stays rejected without re-verification (default 10)
+    - RATE_LIMIT_MAX / RATE_LIMIT_TENANT_MAX: auth checks per minute per IP (20) / per tenant (600)
+    - RATE_LIMIT_SHARED_PATH / RATE_LIMIT_REDIS_URL: share rate-limit state across workers
     """
 
-    def __init__(self, app):
-        super().__init__(app)
+    def __init__(self, app: ASGIApp, jwks_manager: Optional[JWKSKeyManager] = None):
+        self.app = app
         self.auth_disabled = os.environ.get("AUTH_DISABLED", "false").lower() == "true"
         self.jwks_url = os.environ.get("AUTH_JWKS_URL")
         self.jwt_secret = os.environ.get("AUTH_JWT_SECRET", "dev-secret")
+        if jwks_manager is None and self.jwks_url:
+            jwks_manager = get_jwks_manager(self.jwks_url)
+        self.jwks = jwks_manager
+        self.token_cache = VerifiedTokenCache(
+            max_entries=int(os.environ.get("AUTH_TOKEN_CACHE_SIZE", "10000")),
+            negative_ttl_s=float(os.environ.get("AUTH_TOKEN_NEGATIVE_TTL", "10")),
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope.get("path", "")
+        state = scope.setdefault("state", {})
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        path = request.url.path
-        
         # Development bypass
         if self.auth_disabled:
-            request.state._meta_demo = True  # treat as demo when disabled
-            request.state.tenant = "demo"
-            resp = await call_next(request)
-            return await _inject_meta(resp, "demo", True)
-        
+            state["_meta_demo"] = True  # treat as demo when disabled
+            state["tenant"] = "demo"
+            await self._call_with_meta(scope, receive, send, "demo", True)
+            return
+
         # Only protect API business endpoints under /api/
         if not path.startswith("/api/"):
-            return await call_next(request)
+            await self.app(scope, receive, send)
+            return
 
-        # Extract company_id from body (if JSON) or from path/query
-        company_id: Optional[str] = None
-
-        # Attempt to get from path params if provided (FastAPI populates scope['path_params'])
-        try:
-            path_params = request.scope.get("path_params", {}) or {}
-            company_id = path_params.get("company_id")
-        except Exception:
-            company_id = None
+        headers = Headers(scope=scope)
 
-        # If still not present, try query params
+        # Extract company_id from path params, query params, then JSON body
+        company_id: Optional[str] = (scope.get("path_params") or {}).get("company_id")
         if not company_id:
-            company_id = request.query_params.get("company_id")
+            company_id = QueryParams(scope.get("query_string", b"")).get("company_id")
 
-        # If still not present, try JSON body
-        body = None
-        if not company_id and request.method in ("POST", "PUT", "PATCH"):
-            try:
-                body = await request.json()
-                if isinstance(body, dict):
-                    company_id = body.get("company_id")
-            except Exception:
-                # not JSON or empty
-                body = None
+        if not company_id and scope.get("method") in ("POST", "PUT", "PATCH") and _is_json(headers):
+            body, receive = await _buffer_body(receive)
+            company_id = _body_company_id(body)
 
         company_id = company_id or "demo"
 
         # Demo bypass
-        is_demo = company_id == "demo"
-        if is_demo:
-            # stamp into scope for handlers
-            request.state._meta_demo = True
-            request.state.tenant = company_id
-            # call handlers normally
-            resp = await call_next(request)
-            return await _inject_meta(resp, company_id, True)
+        if company_id == "demo":
+            state["_meta_demo"] = True
+            state["tenant"] = company_id
+            await self._call_with_meta(scope, receive, send, company_id, True)
+            return
 
         # Non-demo: require token
         # rate limit auth checks per client IP (best-effort)
-        client_ip = request.client.host if request.client else "unknown"
-        if not _rate_check(client_ip):
-            return JSONResponse(status_code=429, content={"detail": "Too many requests"})
+        client = scope.get("client")
+        client_ip = client[0] if client else "unknown"
+        if not await _rate_check(client_ip):
+            await JSONResponse(status_code=429, content={"detail": "Too many requests"})(scope, receive, send)
+            return
 
-        auth_header = request.headers.get("authorization") or request.headers.get("Authorization")
+        auth_header = headers.get("authorization")
         token = None
         if auth_header and auth_header.lower().startswith("bearer "):
             token = auth_header.split(None, 1)[1].strip()
         else:
             # fallback to cookie named 'session'
-            token = request.cookies.get("session")
+            token = cookie_parser(headers.get("cookie", "")).get("session")
 
         if not token:
-            return JSONResponse(status_code=401, content={"detail": "Login required"})
+            await JSONResponse(status_code=401, content={"detail": "Login required"})(scope, receive, send)
+            return
+
+        hit, payload = self.token_cache.lookup(token)
+        if not hit:
+            payload = await self._verify(token)
+            if payload is None:
+                self.token_cache.store_rejection(token)
+            else:
+                self.token_cache.store(token, payload)
+        if payload is None:
+            await JSONResponse(status_code=401, content={"detail": "Login required"})(scope, receive, send)
+            return
+
+        token_cid = payload.get("company_id")
+        # verified tenant: charge its bucket (keyed on the token, never on the request body)
+        if not await _tenant_rate_check(str(token_cid)):
+            await JSONResponse(status_code=429, content={"detail": "Too many requests"})(scope, receive, send)
+            return
+        if token_cid != company_id:
+            await JSONResponse(status_code=403, content={"detail": "Unauthorized for this company"})(scope, receive, send)
+            return
 
-        # Verify token with JWKS or HS256
-        payload = None
-        
-        if self.jwks_url:
+        # stamp user info into request.state and proceed
+        state["user"] = payload
+        state["tenant"] = company_id
+        state["_meta_demo"] = False
+        await self._call_with_meta(scope, receive, send, company_id, False)
+
+    async def _verify(self, token: str) -> Optional[Dict[str, Any]]:
+        """Verify token with JWKS or HS256; None when invalid."""
+        if self.jwks is not None:
             # Try JWKS verification first
             try:
                 # Decode header to get kid
                 header = jwt.get_unverified_header(token)
                 kid = header.get("kid")
-                
+
                 if kid:
-                    public_key = _get_jwks_key(self.jwks_url, kid)
+                    public_key = await self.jwks.get_key(kid)
                     if public_key:
-                        payload = jwt.decode(token, public_key, algorithms=["RS256"])
-                    else:
-                        # Fall back to HS256 if JWKS fails
-                        payload = jwt.decode(token, self.jwt_secret, algorithms=["HS256"])
-                else:
-                    # No kid, try HS256
-                    payload = jwt.decode(token, self.jwt_secret, algorithms=["HS256"])
-                    
+                        return jwt.decode(token, public_key, algorithms=["RS256"])
+                # No kid or JWKS lookup failed: fall back to HS256
+                return jwt.decode(token, self.jwt_secret, algorithms=["HS256"])
             except jwt.exceptions.InvalidTokenError:
                 # Try HS256 as fallback
                 try:
-                    payload = jwt.decode(token, self.jwt_secret, algorithms=["HS256"])
+                    return jwt.decode(token, self.jwt_secret, algorithms=["HS256"])
                 except jwt.exceptions.InvalidTokenError:
-                    return JSONResponse(status_code=401, content={"detail": "Login required"})
-        else:
-            # Only HS256 verification
-            try:
-                payload = jwt.decode(token, self.jwt_secret, algorithms=["HS256"])
-            except jwt.exceptions.InvalidTokenError:
-                return JSONResponse(status_code=401, content={"detail": "Login required"})
+                    return None
+        # Only HS256 verification
+        try:
+            return jwt.decode(token, self.jwt_secret, algorithms=["HS256"])
+        except jwt.exceptions.InvalidTokenError:
+            return None
 
-        token_cid = payload.get("company_id")
-        if token_cid != company_id:
-            return JSONResponse(status_code=403, content={"detail": "Unauthorized for this company"})
+    async def _call_with_meta(self, scope: Scope, receive: Receive, send: Send, company_id: str, is_demo: bool):
+        ctx = {"tenant": company_id, "demo": is_demo, "rendered": False}
+        token = _TENANT_META.set(ctx)
+        try:
+            await self.app(scope, receive, _MetaSender(send, ctx))
+        finally:
+            _TENANT_META.reset(token)
 
-        # stamp user info into request.state and proceed
-        request.state.user = payload
-        request.state.tenant = company_id
-        request.state._meta_demo = False
 
-        resp = await call_next(request)
-        return await _inject_meta(resp, company_id, False)
+_JWKS_MANAGERS: Dict[str, JWKSKeyManager] = {}
 
 
-async def _inject_meta(resp: Response, company_id: str, is_demo: bool) -> Response:
-    """If response is JSON and top-level dict, ensure _meta.tenant and _meta.demo present."""
-    # Only try to mutate JSON responses
-    content_type = resp.headers.get("content-type", "")
-    if "application/json" not in content_type:
-        return resp
+def get_jwks_manager(url: Optional[str] = None) -> Optional[JWKSKeyManager]:
+    """Process-wide key manager per JWKS URL (defaults to AUTH_JWKS_URL)."""
+    url = url or os.environ.get("AUTH_JWKS_URL")
+    if not url:
+        return None
+    if url not in _JWKS_MANAGERS:
+        _JWKS_MANAGERS[url] = JWKSKeyManager(url, ttl_s=_JWKS_CACHE_TTL)
+    return _JWKS_MANAGERS[url]
 
-    # Read body bytes
-    body = b""
-    async for chunk in resp.body_iterator:
-        body += chunk
 
-    # Recreate response if parsing succeeds
+# Tenant meta for the in-flight request; TenantJSONResponse merges it while rendering
+_TENANT_META: ContextVar[Optional[Dict[str, Any]]] = ContextVar("tenant_meta", default=None)
+
+
+def current_tenant_meta() -> Optional[Dict[str, Any]]:
+    return _TENANT_META.get()
+
+
+def _is_json(headers: Headers) -> bool:
+    # a single JSON document; streamed NDJSON bodies are never buffered here
+    ctype = headers.get("content-type", "").split(";")[0].strip().lower()
+    return "json" in ctype and "ndjson" not in ctype
+
+
+_COMPANY_KEY = b'"company_id"'
+_WS = re.compile(r"[ \t\n\r]*")
+_DECODER = json.JSONDecoder()
+
+
+def _body_company_id(body: bytes) -> Any:
+    """
+    Top-level company_id of a JSON object body; None when absent or not JSON.
+
+    When the key appears exactly once in the raw bytes, the top-level members
+    are decoded only up to it, so the usual {"company_id": ..., <payload>} body
+    costs a few bytes of scanning instead of a full decode. Anything that could
+    make that disagree with the handler's json.loads (the key repeated, nested
+    or inside a string, or escapes that might spell it) takes a full parse.
+    """
+    if body.count(_COMPANY_KEY) != 1 or b"\\u" in body:
+        try:
+            parsed = json.loads(body) if body else None
+        except ValueError:
+            return None
+        return parsed.get("company_id") if isinstance(parsed, dict) else None
     try:
-        import json
-
-        data = json.loads(body.decode("utf-8"))
-        if isinstance(data, dict):
-            meta = data.get("_meta") or {}
-            meta.setdefault("tenant", company_id)
-            meta.setdefault("demo", is_demo)
-            data["_meta"] = meta
-            new_body = json.dumps(data).encode("utf-8")
-            # build new response
-            new_resp = Response(content=new_body, status_code=resp.status_code, media_type="application/json")
-            return new_resp
-    except Exception:
-        # if anything goes wrong, return original response
-        pass
-
-    # fallback: return original
-    return resp
+        text = body.decode("utf-8")
+        pos = _WS.match(text).end()
+        if text[pos:pos + 1] != "{":
+            return None
+        pos = _WS.match(text, pos + 1).end()
+        while text[pos:pos + 1] == '"':
+            key, pos = scanstring(text, pos + 1)
+            pos = _WS.match(text, pos).end()
+            if text[pos:pos + 1] != ":":
+                return None
+            value, pos = _DECODER.raw_decode(text, _WS.match(text, pos + 1).end())
+            if key == "company_id":
+                return value
+            pos = _WS.match(text, pos).end()
+            if text[pos:pos + 1] != ",":
+                return None
+            pos = _WS.match(text, pos + 1).end()
+    except ValueError:  # includes UnicodeDecodeError
+        return None
+    return None
+
+
+async def _buffer_body(receive: Receive):
+    """Read the whole request body once; return it plus a receive() that replays it."""
+    chunks = []
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message["type"] != "http.request":
+            # client went away: replay the disconnect to the handler
+            pending = [message]
+
+            async def replay_disconnect() -> Message:
+                return pending.pop() if pending else await receive()
+
+            return b"".join(chunks), replay_disconnect
+        chunks.append(message.get("body", b""))
+        more_body = message.get("more_body", False)
+    body = b"".join(chunks)
+    replayed = False
+
+    async def replay() -> Message:
+        nonlocal replayed
+        if not replayed:
+            replayed = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return body, replay
+
+
+class _MetaSender:
+    """Wraps send(): adds X-Tenant/X-Demo headers and makes sure JSON dict bodies carry _meta."""
+
+    def __init__(self, send: Send, ctx: Dict[str, Any]):
+        self.send = send
+        self.ctx = ctx
+        self.start: Optional[Message] = None
+        self.passthrough = True
+
+    async def __call__(self, message: Message):
+        if message["type"] == "http.response.start":
+            headers = list(message.get("headers", []))
+            headers.append((b"x-tenant", str(self.ctx["tenant"]).encode("latin-1")))
+            headers.append((b"x-demo", b"true" if self.ctx["demo"] else b"false"))
+            message = {**message, "headers": headers}
+            response_headers = Headers(raw=headers)
+            content_type = response_headers.get("content-type", "")
+            encoded = response_headers.get("content-encoding", "identity") != "identity"
+            if "application/json" in content_type and not self.ctx["rendered"] and not encoded:
+                # hold the start until we know whether the body is a single chunk we can patch
+                self.start = message
+                self.passthrough = False
+                return
+            await self.send(message)
+            return
+
+        if message["type"] == "http.response.body" and not self.passthrough:
+            self.passthrough = True
+            start, self.start = self.start, None
+            if not message.get("more_body", False):
+                patched = _splice_meta(message.get("body", b""), self.ctx["tenant"], self.ctx["demo"])
+                if patched is not None:
+                    headers = [(k, v) for k, v in start["headers"] if k.lower() != b"content-length"]
+                    headers.append((b"content-length", str(len(patched)).encode("latin-1")))
+                    start = {**start, "headers": headers}
+                    message = {**message, "body": patched}
+            # streaming (more_body) responses are passed through untouched
+            await self.send(start)
+        await self.send(message)
+
+
+def _splice_meta(body: bytes, company_id: str, is_demo: bool) -> Optional[bytes]:
+    """
+    Insert _meta.tenant/_meta.demo into a JSON object body. When there is no
+    "_meta" key anywhere the field is spliced in after the opening brace;
+    otherwise the body is decoded so existing _meta fields win.
+    Returns None for non-object bodies.
+    """
+    stripped = body.lstrip()
+    if not stripped.startswith(b"{"):
+        return None
+    if b'"_meta"' not in stripped:
+        meta = json.dumps({"tenant": company_id, "demo": is_demo}).encode("utf-8")
+        rest = stripped[1:]
+        sep = b"" if rest.lstrip().startswith(b"}") else b","
+        return b'{"_meta":' + meta + sep + rest
+    try:
+        data = json.loads(stripped)
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    meta = data.get("_meta") or {}
+    meta.setdefault("tenant", company_id)
+    meta.setdefault("demo", is_demo)
+    data["_meta"] = meta
+    return json.dumps(data).encode("utf-8")
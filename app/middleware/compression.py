@@ -0,0 +1,239 @@
+"""Negotiated response compression (zstd / brotli / gzip).
+
+- The coding is picked from Accept-Encoding q-values; ties go to the server's
+  preference (zstd, then br, then gzip). brotli and zstd are used only when the
+  optional `brotli` / `zstandard` packages are installed.
+- Single-chunk bodies under `minimum_size` bytes go out as-is: below roughly
+  one TCP segment compression saves no round trips and only costs CPU.
+- Responses that already carry a Content-Encoding (e.g. PrecomputedJSONResponse
+  serving bytes compressed at startup) pass through untouched.
+- Streaming bodies are compressed incrementally and flushed per chunk, so
+  progress/event streams still reach the client promptly.
+- Strong ETags get a "-<coding>" suffix per RFC 9110 8.8.3;
+  app.conditional.etag_matches accepts both forms.
+
+ops/bench_compression.py measures ratio and CPU per coding and level.
+"""
+import zlib
+from typing import Callable, Dict, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:  # optional codecs
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/", "application/javascript", "application/xml", "image/svg+xml")
+
+
+class _GzipStream:
+    def __init__(self, level: int):
+        self._c = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.compress(data) + self._c.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._c.flush()
+
+
+class _BrotliStream:
+    def __init__(self, quality: int):
+        self._c = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.process(data) + self._c.flush()
+
+    def finish(self) -> bytes:
+        return self._c.finish()
+
+
+class _ZstdStream:
+    def __init__(self, level: int):
+        self._c = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.compress(data) + self._c.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._c.flush()
+
+
+class Codec:
+    """A content-coding with a fast level for on-the-fly use and a max level for precomputed bodies."""
+
+    def __init__(self, name: str, compress: Callable[[bytes, int], bytes], stream: Callable[[int], object], fast_level: int, max_level: int):
+        self.name = name
+        self._compress = compress
+        self._stream = stream
+        self.fast_level = fast_level
+        self.max_level = max_level
+
+    def compress(self, data: bytes, level: Optional[int] = None) -> bytes:
+        return self._compress(data, self.fast_level if level is None else level)
+
+    def stream(self, level: Optional[int] = None):
+        return self._stream(self.fast_level if level is None else level)
+
+
+def _available_codecs() -> Dict[str, Codec]:
+    # server preference order: best ratio per CPU first
+    codecs: Dict[str, Codec] = {}
+    if zstandard is not None:
+        codecs["zstd"] = Codec(
+            "zstd", lambda d, lvl: zstandard.ZstdCompressor(level=lvl).compress(d), _ZstdStream, fast_level=3, max_level=19
+        )
+    if brotli is not None:
+        codecs["br"] = Codec("br", lambda d, lvl: brotli.compress(d, quality=lvl), _BrotliStream, fast_level=4, max_level=11)
+    codecs["gzip"] = Codec("gzip", _gzip, _GzipStream, fast_level=5, max_level=9)
+    return codecs
+
+
+def _gzip(data: bytes, level: int) -> bytes:
+    # zlib's gzip wrapper writes mtime=0, so output (and precomputed ETags) are deterministic
+    c = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return c.compress(data) + c.flush()
+
+
+CODECS = _available_codecs()
+
+
+def negotiate(accept_encoding: str, codecs: Optional[Dict[str, Codec]] = None) -> Optional[str]:
+    """Best coding the client accepts (highest q, then server preference); None for identity."""
+    codecs = CODECS if codecs is None else codecs
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name] = q
+    best: Optional[str] = None
+    best_q = 0.0
+    for name in codecs:  # dict order == server preference
+        q = weights.get(name, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def encoded_etag(etag: str, coding: str) -> str:
+    """ETag of the `coding` representation: '"abc"' -> '"abc-gzip"'."""
+    if etag.endswith('"'):
+        return f'{etag[:-1]}-{coding}"'
+    return etag
+
+
+def _compressible(headers: Headers) -> bool:
+    content_type = headers.get("content-type", "")
+    return any(t in content_type for t in COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, codecs: Optional[Dict[str, Codec]] = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.codecs = CODECS if codecs is None else codecs
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_headers = Headers(scope=scope)
+        coding = negotiate(request_headers.get("accept-encoding", ""), self.codecs)
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+        sender = _CompressingSender(send, self.codecs[coding], self.minimum_size, request_headers.get("if-none-match", ""))
+        await self.app(scope, receive, sender)
+
+
+class _CompressingSender:
+    def __init__(self, send: Send, codec: Codec, minimum_size: int, if_none_match: str):
+        self.send = send
+        self.codec = codec
+        self.minimum_size = minimum_size
+        self.if_none_match = if_none_match
+        self.start: Optional[Message] = None
+        self.passthrough = False
+        self.stream = None
+
+    async def __call__(self, message: Message):
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message.get("headers", []))
+            status = message["status"]
+            if status == 304:
+                self.passthrough = True
+                await self.send(self._not_modified(message, headers))
+                return
+            if (
+                status < 200 or status == 204
+                or "content-encoding" in headers
+                or "no-transform" in headers.get("cache-control", "")
+                or not _compressible(headers)
+            ):
+                self.passthrough = True
+                await self.send(message)
+                return
+            # hold the start until the first body chunk tells us size / streaming
+            self.start = message
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start is not None:
+            start, self.start = self.start, None
+            headers = MutableHeaders(raw=list(start["headers"]))
+            headers.add_vary_header("Accept-Encoding")
+            if not more_body and len(body) < self.minimum_size:
+                self.passthrough = True
+                await self.send({**start, "headers": headers.raw})
+                await self.send(message)
+                return
+            headers["content-encoding"] = self.codec.name
+            if "etag" in headers and not headers["etag"].startswith("W/"):
+                headers["etag"] = encoded_etag(headers["etag"], self.codec.name)
+            if not more_body:
+                compressed = self.codec.compress(body)
+                headers["content-length"] = str(len(compressed))
+                await self.send({**start, "headers": headers.raw})
+                await self.send({"type": "http.response.body", "body": compressed, "more_body": False})
+                return
+            del headers["content-length"]
+            self.stream = self.codec.stream()
+            await self.send({**start, "headers": headers.raw})
+
+        chunk = self.stream.compress(body) if body else b""
+        if not more_body:
+            chunk += self.stream.finish()
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+    def _not_modified(self, message: Message, headers: Headers) -> Message:
+        # echo the encoded tag the client revalidated with, so it keeps matching its cache entry
+        etag = headers.get("etag")
+        if not etag or etag.startswith("W/"):
+            return message
+        tagged = encoded_etag(etag, self.codec.name)
+        if tagged not in self.if_none_match:
+            return message
+        raw: List[Tuple[bytes, bytes]] = [(k, v) for k, v in message["headers"] if k.lower() != b"etag"]
+        raw.append((b"etag", tagged.encode("latin-1")))
+        return {**message, "headers": raw}
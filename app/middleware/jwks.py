@@ -0,0 +1,151 @@
+"""Async JWKS key manager used by AuthMiddleware.
+
+- preloads the whole key set (start() at app startup, or lazily on first use)
+- refreshes it in the background `refresh_margin_s` before the TTL expires
+- single-flights lookups of unknown `kid`s so a burst of requests triggers at
+  most one fetch, and rate-limits those forced refreshes
+- keeps serving the last good key set when a fetch fails
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+from jwt.algorithms import RSAAlgorithm
+
+logger = logging.getLogger(__name__)
+
+Fetcher = Callable[[str], Awaitable[Dict[str, Any]]]
+
+
+async def _http_fetch(url: str, timeout_s: float = 10.0) -> Dict[str, Any]:
+    async with httpx.AsyncClient(timeout=timeout_s) as client:
+        resp = await client.get(url)
+        resp.raise_for_status()
+        return resp.json()
+
+
+def _parse_keys(jwks: Dict[str, Any]) -> Dict[str, Any]:
+    """Map kid -> RSA public key object for every usable RSA key in the set."""
+    keys: Dict[str, Any] = {}
+    for key in jwks.get("keys", []):
+        kid = key.get("kid")
+        if not kid or key.get("kty") != "RSA":
+            continue
+        try:
+            keys[kid] = RSAAlgorithm.from_jwk(json.dumps(key))
+        except Exception as e:
+            logger.warning("JWKS key %s skipped: %s", kid, e)
+    return keys
+
+
+class JWKSKeyManager:
+    def __init__(
+        self,
+        url: str,
+        ttl_s: float = 300.0,
+        refresh_margin_s: float = 60.0,
+        min_refetch_interval_s: float = 30.0,
+        retry_s: float = 15.0,
+        fetch: Optional[Fetcher] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.url = url
+        self.ttl_s = ttl_s
+        self.refresh_margin_s = min(refresh_margin_s, ttl_s / 2)
+        self.min_refetch_interval_s = min_refetch_interval_s
+        self.retry_s = retry_s
+        self._fetch = fetch or _http_fetch
+        self._clock = clock
+        self._keys: Dict[str, Any] = {}
+        self._fetched_at = 0.0       # last successful fetch
+        self._attempted_at = 0.0     # last fetch attempt (success or failure)
+        self._inflight: Optional[asyncio.Future] = None
+        self._refresher: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.fetch_count = 0
+
+    # ---------- lifecycle ----------
+
+    async def start(self):
+        """Preload the key set and start the background refresher (idempotent per event loop)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # new event loop (e.g. a fresh TestClient): tasks/futures from the old one are dead
+            self._loop = loop
+            self._inflight = None
+            self._refresher = None
+        if not self._keys and (
+            self._inflight is not None
+            or self._clock() - self._attempted_at >= self.min_refetch_interval_s
+            or not self._attempted_at
+        ):
+            await self.refresh()
+        if self._refresher is None or self._refresher.done():
+            self._refresher = loop.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._refresher is not None:
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._refresher = None
+
+    async def _refresh_loop(self):
+        while True:
+            if self._attempted_at > self._fetched_at:
+                # last attempt failed: retry retry_s after it, even if the key set is already stale
+                delay = self._attempted_at + self.retry_s - self._clock()
+            elif self._fetched_at:
+                delay = self._fetched_at + self.ttl_s - self.refresh_margin_s - self._clock()
+            else:
+                delay = 0.0
+            await asyncio.sleep(max(delay, 1.0))
+            await self.refresh()
+
+    # ---------- lookups ----------
+
+    async def get_key(self, kid: str) -> Optional[Any]:
+        """Public key for `kid`, or None if the key set (after a refresh) does not have it."""
+        await self.start()
+        key = self._keys.get(kid)
+        if key is not None:
+            return key
+        # unknown kid (key rotation?) -> one shared, rate-limited refresh
+        if self._clock() - self._attempted_at >= self.min_refetch_interval_s or self._inflight is not None:
+            await self.refresh()
+        return self._keys.get(kid)
+
+    async def refresh(self) -> bool:
+        """Fetch the key set; concurrent callers share one fetch. Returns True on success."""
+        if self._inflight is not None:
+            return await asyncio.shield(self._inflight)
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight = fut
+        ok = False
+        try:
+            self._attempted_at = self._clock()
+            self.fetch_count += 1
+            jwks = await self._fetch(self.url)
+            keys = _parse_keys(jwks)
+            if keys:
+                self._keys = keys
+                self._fetched_at = self._clock()
+                ok = True
+            else:
+                logger.warning("JWKS fetch from %s returned no usable keys; keeping last good set", self.url)
+        except Exception as e:
+            # keep serving the last good key set
+            logger.warning("JWKS fetch error from %s: %s", self.url, e)
+        finally:
+            self._inflight = None
+            fut.set_result(ok)
+        return ok
+
+    @property
+    def kids(self):
+        return sorted(self._keys)
@@ -0,0 +1,207 @@
+"""Token-bucket rate limiting for AuthMiddleware.
+
+Each key (e.g. "ip:1.2.3.4", "tenant:acme") owns a bucket of `capacity` tokens
+that refills continuously at capacity/window_s tokens per second; a request
+takes one token or is rejected. A bucket that has been idle long enough to
+refill completely is indistinguishable from a new one, so it is evicted.
+
+Bucket state lives in a pluggable store:
+  - MemoryBucketStore: per-process, bounded LRU (default)
+  - SQLiteBucketStore: a SQLite file shared by every worker on the host; point
+    RATE_LIMIT_SHARED_PATH at tmpfs (e.g. /dev/shm/lightsignal-ratelimit.db)
+  - RedisBucketStore: any Redis-compatible server (RATE_LIMIT_REDIS_URL), via
+    an atomic Lua script; requires the optional `redis` package
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBucketStore:
+    def __init__(self, max_keys: int = 50000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        # key -> (tokens, updated_at), least recently touched first
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, key: str, capacity: float, rate: float, now: float, cost: float = 1.0) -> bool:
+        with self._lock:
+            self._evict_idle(now, capacity / rate)
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            ok = tokens >= cost
+            if ok:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return ok
+
+    def _evict_idle(self, now: float, idle_s: float):
+        # oldest entries sit at the front; anything idle for a full refill is a fresh bucket anyway
+        while self._buckets:
+            key, (_, updated) = next(iter(self._buckets.items()))
+            if now - updated < idle_s:
+                break
+            del self._buckets[key]
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class SQLiteBucketStore:
+    """Buckets in a SQLite file so every worker process on the host shares the same limits."""
+
+    _SWEEP_EVERY = 1000
+    blocking = True  # file I/O: callers on an event loop go through RateLimiter.aallow
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid = 0
+        self._ops = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        # connections must not cross a fork
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS buckets_updated ON buckets(updated)")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def take(self, key: str, capacity: float, rate: float, now: float, cost: float = 1.0) -> bool:
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                tokens, updated = row if row else (capacity, now)
+                tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+                ok = tokens >= cost
+                if ok:
+                    tokens -= cost
+                conn.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)", (key, tokens, now))
+                self._ops += 1
+                if self._ops % self._SWEEP_EVERY == 0:
+                    conn.execute("DELETE FROM buckets WHERE updated < ?", (now - capacity / rate,))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            return ok
+
+    def clear(self):
+        with self._lock:
+            self._connection().execute("DELETE FROM buckets")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM buckets").fetchone()[0]
+
+
+_TOKEN_BUCKET_LUA = """
+local b = redis.call('HMGET', KEYS[1], 't', 'ts')
+local cap, rate, now, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local tokens = tonumber(b[1]) or cap
+local ts = tonumber(b[2]) or now
+tokens = math.min(cap, tokens + math.max(0, now - ts) * rate)
+local ok = 0
+if tokens >= cost then
+  tokens = tokens - cost
+  ok = 1
+end
+redis.call('HSET', KEYS[1], 't', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(cap / rate * 1000))
+return ok
+"""
+
+
+class RedisBucketStore:
+    """Buckets in a Redis-compatible server; idle keys expire server-side."""
+
+    blocking = True
+
+    def __init__(self, url: str, prefix: str = "rl:"):
+        import redis  # optional dependency
+
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, socket_timeout=0.25)
+        self._script = self._client.register_script(_TOKEN_BUCKET_LUA)
+
+    def take(self, key: str, capacity: float, rate: float, now: float, cost: float = 1.0) -> bool:
+        return bool(self._script(keys=[self.prefix + key], args=[capacity, rate, now, cost]))
+
+    def clear(self):
+        for key in self._client.scan_iter(match=self.prefix + "*"):
+            self._client.delete(key)
+
+
+def build_bucket_store():
+    """Pick the shared store configured in the environment, falling back to per-process memory."""
+    redis_url = os.environ.get("RATE_LIMIT_REDIS_URL")
+    if redis_url:
+        try:
+            return RedisBucketStore(redis_url)
+        except Exception as e:
+            logger.warning("Redis rate-limit store unavailable (%s); falling back", e)
+    shared_path = os.environ.get("RATE_LIMIT_SHARED_PATH")
+    if shared_path:
+        return SQLiteBucketStore(shared_path)
+    return MemoryBucketStore(max_keys=int(os.environ.get("RATE_LIMIT_MAX_KEYS", "50000")))
+
+
+class RateLimiter:
+    """`capacity` requests per `window_s` per key, with bursts up to `capacity`."""
+
+    def __init__(
+        self,
+        capacity: int,
+        window_s: float,
+        store=None,
+        prefix: str = "",
+        clock: Callable[[], float] = time.time,
+    ):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / window_s
+        self.store = store if store is not None else MemoryBucketStore()
+        self.prefix = prefix
+        self._clock = clock
+
+    def allow(self, key: str, cost: float = 1.0) -> bool:
+        try:
+            return self.store.take(self.prefix + key, self.capacity, self.rate, self._clock(), cost)
+        except Exception as e:
+            # best-effort: a broken shared store must not take auth down with it
+            logger.warning("rate limit store error: %s", e)
+            return True
+
+    async def aallow(self, key: str, cost: float = 1.0) -> bool:
+        """allow() for async callers; stores that do I/O run in the threadpool, off the event loop."""
+        if getattr(self.store, "blocking", False):
+            return await run_in_threadpool(self.allow, key, cost)
+        return self.allow(key, cost)
+
+    def reset(self):
+        self.store.clear()
+
+    def snapshot(self) -> Dict[str, float]:
+        return {"capacity": self.capacity, "refill_per_s": self.rate}
@@ -0,0 +1,82 @@
+"""Bounded LRU of verified JWT claims used by AuthMiddleware.
+
+Entries are keyed by a SHA-256 digest of the raw token (tokens themselves are
+never kept) and stay valid until the token's `exp` (capped at `max_ttl_s`).
+Recently rejected tokens are remembered for `negative_ttl_s` so retries with a
+bad token skip signature verification too.
+"""
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+_REJECTED = object()
+
+
+class VerifiedTokenCache:
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        max_ttl_s: float = 300.0,
+        negative_ttl_s: float = 10.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_entries = max_entries
+        self.max_ttl_s = max_ttl_s
+        self.negative_ttl_s = negative_ttl_s
+        self._clock = clock
+        # digest -> (expires_at, claims | _REJECTED)
+        self._entries: "OrderedDict[bytes, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def lookup(self, token: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """
+        Returns (hit, claims). A hit with claims=None means the token was
+        recently rejected; a miss means the caller must verify it.
+        """
+        key = self._digest(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return False, None
+        expires_at, value = entry
+        if self._clock() >= expires_at:
+            del self._entries[key]
+            self.misses += 1
+            return False, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        if value is _REJECTED:
+            return True, None
+        return True, dict(value)
+
+    def store(self, token: str, claims: Dict[str, Any]):
+        now = self._clock()
+        expires_at = now + self.max_ttl_s
+        exp = claims.get("exp")
+        if isinstance(exp, (int, float)):
+            expires_at = min(expires_at, float(exp))
+        if expires_at <= now:
+            return
+        self._put(self._digest(token), expires_at, dict(claims))
+
+    def store_rejection(self, token: str):
+        if self.negative_ttl_s > 0:
+            self._put(self._digest(token), self._clock() + self.negative_ttl_s, _REJECTED)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _put(self, key: bytes, expires_at: float, value: Any):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -3,14 +3,27 @@ import os
 import json
 import re
 import asyncio
+import hashlib
+from collections import OrderedDict
 from typing import Any, Dict, Optional, List
 from openai import AsyncOpenAI
 
+from .circuit_breaker import ASSISTANTS_BREAKER, CircuitOpenError, hedged_call
+
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 ASST_ORCHESTRATOR_ID = os.getenv("ASST_ORCHESTRATOR_ID", "")
 ASST_FINANCE_ANALYST_ID = os.getenv("ASST_FINANCE_ANALYST_ID", "")
 ASST_RESEARCH_SCOUT_ID = os.getenv("ASST_RESEARCH_SCOUT_ID", "")
 
+# Hard cap on a single assistant run (queue + poll + read), in seconds
+ASSISTANT_TIMEOUT_S = float(os.getenv("ASSISTANT_TIMEOUT_S", "30"))
+# Fire a second (hedged) run once the first exceeds this latency percentile; empty disables
+ASSISTANT_HEDGE_PERCENTILE = os.getenv("ASSISTANT_HEDGE_PERCENTILE", "")
+
+# Last good result per (assistant, payload), served while the circuit is open
+_RESULT_CACHE: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_RESULT_CACHE_MAX = 256
+
 _client: Optional[AsyncOpenAI] = None
 
 def get_client() -> AsyncOpenAI:
@@ -71,7 +84,46 @@ def _join_text_parts(message_content: List[Any]) -> str:
 
 # ---------- Core assistant runner (Threads/Runs) ----------
 
+def _cache_key(assistant_id: str, payload: Dict[str, Any]) -> str:
+    raw = json.dumps(payload, sort_keys=True, default=str)
+    return assistant_id + ":" + hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _cache_put(key: str, data: Dict[str, Any]):
+    _RESULT_CACHE[key] = data
+    _RESULT_CACHE.move_to_end(key)
+    while len(_RESULT_CACHE) > _RESULT_CACHE_MAX:
+        _RESULT_CACHE.popitem(last=False)
+
+
 async def _run_assistant(assistant_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Runs an assistant through the shared circuit breaker with a hard timeout
+    (and an optional hedged second run). While the circuit is open the last
+    good result for the same payload is returned immediately; without one,
+    CircuitOpenError propagates so callers can fall back to demo data.
+    """
+    key = _cache_key(assistant_id, payload)
+    hedge_pct = float(ASSISTANT_HEDGE_PERCENTILE) if ASSISTANT_HEDGE_PERCENTILE else None
+    try:
+        data = await hedged_call(
+            ASSISTANTS_BREAKER,
+            lambda: _run_assistant_once(assistant_id, payload),
+            hedge_percentile=hedge_pct,
+            timeout_s=ASSISTANT_TIMEOUT_S,
+        )
+    except CircuitOpenError:
+        cached = _RESULT_CACHE.get(key)
+        if cached is None:
+            raise
+        return {**cached, "_meta": {**(cached.get("_meta") or {}), "cached": True, "circuit": "open"}}
+    except asyncio.TimeoutError:
+        raise RuntimeError(f"Assistant run timed out after {ASSISTANT_TIMEOUT_S:.0f}s")
+    _cache_put(key, data)
+    return data
+
+
+async def _run_assistant_once(assistant_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
     """
     Calls a persisted Assistant (Threads/Runs) and returns parsed JSON from the latest message.
     We allow extra prose/code fences and aggressively extract the first JSON object.
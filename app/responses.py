@@ -0,0 +1,146 @@
+# app/responses.py
+"""
+Project-wide response classes.
+
+TenantJSONResponse is the app's default response class: while rendering a dict
+body it fills in _meta.tenant / _meta.demo for the request's tenant (set by
+AuthMiddleware), so the middleware never has to decode and re-encode the body.
+Bodies are encoded with orjson when it is installed (stdlib json otherwise).
+
+PrecomputedJSONResponse serves bytes encoded (and compressed with every
+available coding) once up front, e.g. the demo seeds, with a strong ETag per
+representation; a matching If-None-Match gets a 304.
+
+engine_response() is for routes whose engines already build contract-shaped
+output: with TRUSTED_ENGINE_OUTPUT=true the dict is rendered directly and
+FastAPI's response_model re-validation is skipped. Schema conformance of those
+engines is asserted in the tests instead.
+"""
+import hashlib
+import json
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from .conditional import etag_matches
+from .middleware.auth import current_tenant_meta
+from .middleware.compression import CODECS, encoded_etag, negotiate
+
+try:  # optional fast encoder
+    import orjson
+except ImportError:  # pragma: no cover - exercised only without orjson
+    orjson = None
+
+TRUSTED_ENGINE_OUTPUT = os.environ.get("TRUSTED_ENGINE_OUTPUT", "false").lower() == "true"
+
+
+def _default(obj: Any) -> Any:
+    # pydantic models, Decimal, sets, ... -> plain JSON types
+    return jsonable_encoder(obj)
+
+
+def dumps(content: Any) -> bytes:
+    """Compact UTF-8 JSON, same output shape as JSONResponse.render."""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"), default=_default
+    ).encode("utf-8")
+
+
+def apply_tenant_meta(content: Any) -> Any:
+    """setdefault _meta.tenant/_meta.demo on a dict body for the in-flight request."""
+    ctx = current_tenant_meta()
+    if ctx is None or not isinstance(content, dict):
+        return content
+    meta = content.get("_meta")
+    if not isinstance(meta, dict):
+        meta = {}
+        content["_meta"] = meta
+    meta.setdefault("tenant", ctx["tenant"])
+    meta.setdefault("demo", ctx["demo"])
+    ctx["rendered"] = True
+    return content
+
+
+class TenantJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(apply_tenant_meta(content))
+
+
+def engine_response(content: Any) -> Any:
+    """Engine output for a response_model route; bypasses re-validation in trusted mode."""
+    if TRUSTED_ENGINE_OUTPUT:
+        return TenantJSONResponse(content)
+    return content
+
+
+class PrecomputedBody:
+    """A JSON body encoded once: identity bytes plus every available content-coding, each with its ETag."""
+
+    __slots__ = ("body", "etag", "encoded", "tenant", "demo")
+
+    def __init__(self, body: bytes, tenant: Optional[str] = None, demo: Optional[bool] = None, compress: bool = True):
+        digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+        self.body = body
+        self.etag = f'"{digest}"'
+        # one-off bodies skip this: max-level compression only pays off when reused
+        self.encoded: Dict[str, Tuple[bytes, str]] = {}
+        if compress:
+            for name, codec in CODECS.items():
+                self.encoded[name] = (codec.compress(body, codec.max_level), encoded_etag(self.etag, name))
+        # tenant meta already baked into the body (None: body carries no tenant meta)
+        self.tenant = tenant
+        self.demo = demo
+
+    @classmethod
+    def from_content(cls, content: Any, tenant: Optional[str] = None, demo: Optional[bool] = None) -> "PrecomputedBody":
+        return cls(dumps(content), tenant=tenant, demo=demo)
+
+
+class PrecomputedJSONResponse(Response):
+    media_type = "application/json"
+    # precomputed bodies are identical for every client of the tenant; revalidate after a minute
+    cache_control = "public, max-age=60"
+
+    def __init__(self, precomputed: PrecomputedBody, status_code: int = 200, headers: Optional[dict] = None):
+        self.precomputed = precomputed
+        super().__init__(content=precomputed.body, status_code=status_code, headers=headers)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        pre = self.precomputed
+        ctx = current_tenant_meta()
+        if ctx is not None and pre.tenant is not None:
+            if (ctx["tenant"], ctx["demo"]) != (pre.tenant, pre.demo):
+                # baked meta belongs to another tenant: render dynamically instead
+                content = json.loads(pre.body)
+                if isinstance(content.get("_meta"), dict):
+                    content["_meta"].pop("tenant", None)
+                await TenantJSONResponse(content, status_code=self.status_code)(scope, receive, send)
+                return
+            ctx["rendered"] = True
+
+        request_headers = Headers(scope=scope)
+        body, etag = pre.body, pre.etag
+        coding = negotiate(request_headers.get("accept-encoding", ""), {k: CODECS[k] for k in pre.encoded})
+        if coding:
+            body, etag = pre.encoded[coding]
+        self.headers["etag"] = etag
+        self.headers["vary"] = "Accept-Encoding"
+        self.headers.setdefault("cache-control", self.cache_control)
+        if self.status_code == 200 and etag_matches(request_headers.get("if-none-match"), etag):
+            await Response(status_code=304, headers={k: self.headers[k] for k in ("etag", "vary", "cache-control")})(
+                scope, receive, send
+            )
+            return
+        if coding:
+            self.headers["content-encoding"] = coding
+        self.body = body
+        self.headers["content-length"] = str(len(body))
+        await super().__call__(scope, receive, send)
@@ -8,7 +8,8 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
 
-from ..utils_demo import is_demo, meta
+from ..utils_demo import DemoSeed, is_demo
+from ..circuit_breaker import ASSISTANTS_BREAKER
 from ..demo_seed import (
     DEMO_ORCHESTRATOR_RESPONSE,
     DEMO_FINANCE_AGENT_RESPONSE,
@@ -24,6 +25,12 @@ FINANCE_ASSISTANT_ID = os.getenv("FINANCE_ASSISTANT_ID", "")
 RESEARCH_ASSISTANT_ID = os.getenv("RESEARCH_ASSISTANT_ID", "")
 DEV_NONDEMO_STUB = os.getenv("DEV_NONDEMO_STUB", "false").lower() == "true"
 
+# Demo seeds encoded once at import. Free-text queries vary per request, so they
+# are spliced in front of the pre-encoded seed rather than baked into it.
+DEMO_ORCHESTRATOR_SEED = DemoSeed(DEMO_ORCHESTRATOR_RESPONSE, query=None, company_id="demo")
+DEMO_FINANCE_SEED = DemoSeed(DEMO_FINANCE_AGENT_RESPONSE, company_id="demo", periods=12)
+DEMO_RESEARCH_SEED = DemoSeed(DEMO_RESEARCH_AGENT_RESPONSE, company_id="demo", query=None)
+
 
 # -----------------------------------------------------------------------------
 # Request Models
@@ -59,7 +66,7 @@ def call_openai_assistant(assistant_id: str, messages: list) -> dict:
         raise HTTPException(status_code=500, detail="OPENAI_API_KEY not configured")
     if not assistant_id:
         raise HTTPException(status_code=501, detail="Assistant ID not configured")
-    
+
     # TODO: Implement actual OpenAI Assistants API call
     # from openai import OpenAI
     # client = OpenAI(api_key=OPENAI_API_KEY)
@@ -68,13 +75,30 @@ def call_openai_assistant(assistant_id: str, messages: list) -> dict:
     # ... wait for completion ...
     # response_messages = client.beta.threads.messages.list(thread_id=thread.id)
     # return parse response
-    
+
     raise HTTPException(
         status_code=501,
         detail="OpenAI Assistants integration not yet implemented. Use demo mode or set DEV_NONDEMO_STUB=true for testing."
     )
 
 
+async def run_agent(assistant_id: str, messages: list, seed: dict, **fields) -> dict:
+    """
+    While the shared assistants circuit is open (tripped by openai_client's
+    calls), return the seed response immediately instead of waiting on a
+    degraded upstream. call_openai_assistant is still a stub, so it is not
+    wrapped in ASSISTANTS_BREAKER: its 501 is not an upstream failure.
+    """
+    if ASSISTANTS_BREAKER.is_open():
+        response = dict(seed)
+        response.update(fields)
+        response["_meta"] = {"demo": False, "fallback": "circuit_open"}
+        return response
+    response = call_openai_assistant(assistant_id, messages)
+    response["_meta"] = {"demo": False}
+    return response
+
+
 # -----------------------------------------------------------------------------
 # Endpoints
 # -----------------------------------------------------------------------------
@@ -87,10 +111,7 @@ async def orchestrate(req: OrchestratorRequest):
     """
     if is_demo(req.company_id):
         # Return demo seed
-        response = DEMO_ORCHESTRATOR_RESPONSE.copy()
-        response["query"] = req.query
-        response["company_id"] = req.company_id
-        return meta(response)
+        return DEMO_ORCHESTRATOR_SEED.response(query=req.query, company_id=req.company_id)
     
     # Non-demo mode
     if DEV_NONDEMO_STUB:
@@ -112,9 +133,7 @@ async def orchestrate(req: OrchestratorRequest):
                 "content": f"Query: {req.query}\nContext: {req.context or {}}",
             }
         ]
-        response = call_openai_assistant(ORCHESTRATOR_ASSISTANT_ID, messages)
-        response["_meta"] = {"demo": False}
-        return response
+        return await run_agent(ORCHESTRATOR_ASSISTANT_ID, messages, DEMO_ORCHESTRATOR_RESPONSE, query=req.query, company_id=req.company_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Orchestrator error: {str(e)}")
 
@@ -128,10 +147,7 @@ async def finance_analyst(req: FinanceRequest):
     """
     if is_demo(req.company_id):
         # Return demo seed
-        response = DEMO_FINANCE_AGENT_RESPONSE.copy()
-        response["company_id"] = req.company_id
-        response["periods"] = req.periods
-        return meta(response)
+        return DEMO_FINANCE_SEED.response(company_id=req.company_id, periods=req.periods)
     
     # Non-demo mode
     if DEV_NONDEMO_STUB:
@@ -152,9 +168,7 @@ async def finance_analyst(req: FinanceRequest):
                 "content": f"Analyze financials for company_id={req.company_id}, periods={req.periods}, focus={req.focus}",
             }
         ]
-        response = call_openai_assistant(FINANCE_ASSISTANT_ID, messages)
-        response["_meta"] = {"demo": False}
-        return response
+        return await run_agent(FINANCE_ASSISTANT_ID, messages, DEMO_FINANCE_AGENT_RESPONSE, company_id=req.company_id, periods=req.periods)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Finance analyst error: {str(e)}")
 
@@ -168,10 +182,7 @@ async def research_scout(req: ResearchRequest):
     """
     if is_demo(req.company_id):
         # Return demo seed
-        response = DEMO_RESEARCH_AGENT_RESPONSE.copy()
-        response["company_id"] = req.company_id
-        response["query"] = req.query
-        return meta(response)
+        return DEMO_RESEARCH_SEED.response(company_id=req.company_id, query=req.query)
     
     # Non-demo mode
     if DEV_NONDEMO_STUB:
@@ -193,8 +204,6 @@ async def research_scout(req: ResearchRequest):
                 "content": f"Research query: {req.query}\nRegion: {req.region or 'Not specified'}",
             }
         ]
-        response = call_openai_assistant(RESEARCH_ASSISTANT_ID, messages)
-        response["_meta"] = {"demo": False}
-        return response
+        return await run_agent(RESEARCH_ASSISTANT_ID, messages, DEMO_RESEARCH_AGENT_RESPONSE, company_id=req.company_id, query=req.query)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Research scout error: {str(e)}")
@@ -8,7 +8,7 @@ from fastapi import APIRouter
 from pydantic import BaseModel
 from typing import Optional
 
-from ..utils_demo import is_demo, meta
+from ..utils_demo import DemoSeed, is_demo
 from ..demo_seed import (
     DEMO_SCENARIOS_FULL,
     DEMO_OPPORTUNITIES_FULL,
@@ -25,6 +25,16 @@ router = APIRouter()
 
 DEV_NONDEMO_STUB = os.getenv("DEV_NONDEMO_STUB", "false").lower() == "true"
 
+# Demo seeds encoded once at import; handlers serve the bytes directly
+DEMO_SEEDS = {
+    "DEMO_SCENARIOS_FULL": DemoSeed(DEMO_SCENARIOS_FULL, company_id="demo"),
+    "DEMO_OPPORTUNITIES_FULL": DemoSeed(DEMO_OPPORTUNITIES_FULL, company_id="demo"),
+    "DEMO_DEMAND_FULL": DemoSeed(DEMO_DEMAND_FULL, company_id="demo"),
+    "DEMO_REVIEWS_FULL": DemoSeed(DEMO_REVIEWS_FULL, company_id="demo"),
+    "DEMO_HEALTH_FULL": DemoSeed(DEMO_HEALTH_FULL, company_id="demo"),
+    "DEMO_INVENTORY_FULL": DemoSeed(DEMO_INVENTORY_FULL, company_id="demo"),
+}
+
 
 # -----------------------------------------------------------------------------
 # Request Models
@@ -60,9 +70,7 @@ async def scenarios_full(req: TabRequest):
     Demo: returns seed data. Non-demo: current logic or stub.
     """
     if is_demo(req.company_id):
-        response = DEMO_SCENARIOS_FULL.copy()
-        response["company_id"] = req.company_id
-        return meta(response)
+        return DEMO_SEEDS["DEMO_SCENARIOS_FULL"].response(company_id=req.company_id)
     
     if DEV_NONDEMO_STUB:
         return nondemo_stub("/api/ai/scenarios/full", req.company_id)
@@ -80,9 +88,7 @@ async def opportunities_full(req: TabRequest):
     Demo: returns seed data. Non-demo: current logic or stub.
     """
     if is_demo(req.company_id):
-        response = DEMO_OPPORTUNITIES_FULL.copy()
-        response["company_id"] = req.company_id
-        return meta(response)
+        return DEMO_SEEDS["DEMO_OPPORTUNITIES_FULL"].response(company_id=req.company_id)
     
     if DEV_NONDEMO_STUB:
         return nondemo_stub("/api/ai/opportunities/full", req.company_id)
@@ -98,9 +104,7 @@ async def demand_full(req: TabRequest):
     Demo: returns seed data. Non-demo: current logic or stub.
     """
     if is_demo(req.company_id):
-        response = DEMO_DEMAND_FULL.copy()
-        response["company_id"] = req.company_id
-        return meta(response)
+        return DEMO_SEEDS["DEMO_DEMAND_FULL"].response(company_id=req.company_id)
     
     if DEV_NONDEMO_STUB:
         return nondemo_stub("/api/ai/demand/full", req.company_id)
@@ -116,9 +120,7 @@ async def reviews_full(req: TabRequest):
     Demo: returns seed data. Non-demo: current logic or stub.
     """
     if is_demo(req.company_id):
-        response = DEMO_REVIEWS_FULL.copy()
-        response["company_id"] = req.company_id
-        return meta(response)
+        return DEMO_SEEDS["DEMO_REVIEWS_FULL"].response(company_id=req.company_id)
     
     if DEV_NONDEMO_STUB:
         return nondemo_stub("/api/ai/reviews/full", req.company_id)
@@ -134,9 +136,7 @@ async def health_full(req: TabRequest):
     Demo: returns seed data. Non-demo: current logic or stub.
     """
     if is_demo(req.company_id):
-        response = DEMO_HEALTH_FULL.copy()
-        response["company_id"] = req.company_id
-        return meta(response)
+        return DEMO_SEEDS["DEMO_HEALTH_FULL"].response(company_id=req.company_id)
     
     if DEV_NONDEMO_STUB:
         return nondemo_stub("/api/ai/health/full", req.company_id)
@@ -152,9 +152,7 @@ async def inventory_full(req: TabRequest):
     Demo: returns seed data. Non-demo: current logic or stub.
     """
     if is_demo(req.company_id):
-        response = DEMO_INVENTORY_FULL.copy()
-        response["company_id"] = req.company_id
-        return meta(response)
+        return DEMO_SEEDS["DEMO_INVENTORY_FULL"].response(company_id=req.company_id)
     
     if DEV_NONDEMO_STUB:
         return nondemo_stub("/api/ai/inventory/full", req.company_id)
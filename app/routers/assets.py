@@ -1,19 +1,40 @@
-from fastapi import APIRouter, HTTPException
+import json
+import uuid
+import zipfile
+import zlib
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
 from ..schemas import (
     AssetsFullRequest, AssetsFullResponse, AssetsSearchRequest, AssetsSearchResponse,
     ImportRequest, ImportResponse, ReplaceVsRepairRequest, ReplaceVsRepairResponse,
     WorkOrderCreateRequest, WorkOrderCreateResponse, MaintenanceScheduleRequest,
     MaintenanceScheduleResponse, TelemetryIngestRequest, TelemetryIngestResponse,
-    DocumentExtractRequest, DocumentExtractResponse
+    DocumentExtractRequest, DocumentExtractResponse, FleetReplaceVsRepairRequest, FleetReplaceVsRepairResponse,
+    MaintenanceDueRequest, MaintenanceAlertsRequest, MaintenanceEventsResponse,
+    WorkOrderListRequest, WorkOrderUpdateRequest, WorkOrderBreachesRequest, WorkOrderListResponse,
+    FleetValuationRequest, FleetValuationResponse
 )
-from ..services.assets_engine import full_overview, search_registry, create_work_order, schedule_maintenance, replace_vs_repair_calc, import_rows, ingest_telemetry
+from ..services.assets_engine import full_overview, search_registry, create_work_order, update_work_order, list_work_orders, work_order_breaches, schedule_maintenance, maintenance_due, maintenance_alerts, replace_vs_repair_calc, fleet_replace_vs_repair, fleet_valuation, import_rows, import_assets, ingest_telemetry, ingest_telemetry_batch, meta_top
+from ..services.asset_import import ImportFormatError, read_file
+from ..services import telemetry_ingest, uploads
+from ..services.asset_index import InvalidCursor
+from ..services import workorder_store
 from ..utils_demo import is_demo, meta
+from ..responses import engine_response
+from ..conditional import conditional
 from ..demo_seed import DEMO_ASSETS_FULL
 
 router = APIRouter()
 
 
+# Handlers read and write the sqlite work-order/maintenance stores and
+# the asset journal, and load_dataset may rebuild the dataset after another
+# worker's write: all of it runs on the threadpool, never on the event loop.
 @router.post("/api/ai/assets/full", response_model=AssetsFullResponse)
+@conditional("assets")
 async def assets_full(req: AssetsFullRequest):
     # Demo mode check
     if is_demo(req.company_id):
@@ -21,28 +42,61 @@ async def assets_full(req: AssetsFullRequest):
         return meta(response)
     
     # Non-demo: existing logic
-    res = full_overview(req.model_dump())
-    return res
+    res = await run_in_threadpool(full_overview, req.model_dump())
+    return engine_response(res)
 
 
 @router.post("/api/ai/assets/search", response_model=AssetsSearchResponse)
 async def assets_search(req: AssetsSearchRequest):
-    out = search_registry(req.company_id, req.query, req.filters)
+    try:
+        out = await run_in_threadpool(search_registry, req.company_id, req.query, req.filters, req.limit, req.cursor)
+    except InvalidCursor:
+        raise HTTPException(400, "invalid cursor")
     return out
 
 
 @router.post("/api/ai/assets/workorders/create", response_model=WorkOrderCreateResponse)
 async def assets_create_wo(req: WorkOrderCreateRequest):
-    wo = create_work_order(req.company_id, req.asset_id, req.priority, req.summary, req.sla_hours)
+    wo = await run_in_threadpool(create_work_order, req.company_id, req.asset_id, req.priority, req.summary, req.sla_hours)
     from ..services.assets_engine import meta_top
     return {"wo_id": wo.get("wo_id"), "status": wo.get("status"), "_meta": meta_top()}
 
 
+@router.post("/api/ai/assets/workorders/list", response_model=WorkOrderListResponse)
+async def assets_list_wos(req: WorkOrderListRequest):
+    try:
+        return await run_in_threadpool(list_work_orders, req.company_id, req.asset_id, req.status, req.priority, req.limit, req.cursor)
+    except workorder_store.InvalidCursor:
+        raise HTTPException(400, "invalid cursor")
+
+
+@router.post("/api/ai/assets/workorders/update", response_model=WorkOrderCreateResponse)
+async def assets_update_wo(req: WorkOrderUpdateRequest):
+    wo = await run_in_threadpool(update_work_order, req.company_id, req.wo_id, req.status)
+    if wo is None:
+        raise HTTPException(404, "work order not found")
+    return {"wo_id": wo["wo_id"], "status": wo["status"], "_meta": meta_top()}
+
+
+@router.post("/api/ai/assets/workorders/breaches", response_model=WorkOrderListResponse)
+async def assets_wo_breaches(req: WorkOrderBreachesRequest):
+    return await run_in_threadpool(work_order_breaches, req.company_id)
+
+
 @router.post("/api/ai/assets/maintenance/schedule", response_model=MaintenanceScheduleResponse)
 async def assets_schedule(req: MaintenanceScheduleRequest):
-    ok = schedule_maintenance(req.company_id, req.asset_id, req.plan)
-    from ..services.assets_engine import meta_top
-    return {"ok": ok, "_meta": meta_top()}
+    plan = await run_in_threadpool(schedule_maintenance, req.company_id, req.asset_id, req.plan)
+    return {"ok": True, "plan": plan, "_meta": meta_top()}
+
+
+@router.post("/api/ai/assets/maintenance/due", response_model=MaintenanceEventsResponse)
+async def assets_maintenance_due(req: MaintenanceDueRequest):
+    return await run_in_threadpool(maintenance_due, req.company_id, req.days, req.types, req.limit)
+
+
+@router.post("/api/ai/assets/maintenance/alerts", response_model=MaintenanceEventsResponse)
+async def assets_maintenance_alerts(req: MaintenanceAlertsRequest):
+    return await run_in_threadpool(maintenance_alerts, req.company_id)
 
 
 @router.post("/api/ai/assets/replace-vs-repair", response_model=ReplaceVsRepairResponse)
@@ -51,20 +105,84 @@ async def assets_replace_vs_repair(req: ReplaceVsRepairRequest):
     return data
 
 
+@router.post("/api/ai/assets/replace-vs-repair/fleet", response_model=FleetReplaceVsRepairResponse)
+async def assets_replace_vs_repair_fleet(req: FleetReplaceVsRepairRequest):
+    try:
+        return await run_in_threadpool(fleet_replace_vs_repair, req.model_dump())
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+
+
+@router.post("/api/ai/assets/valuation/fleet", response_model=FleetValuationResponse)
+async def assets_fleet_valuation(req: FleetValuationRequest):
+    try:
+        return await run_in_threadpool(fleet_valuation, req.company_id, req.start, req.end, req.group_by, req.include_assets)
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+
+
 @router.post("/api/ai/assets/import", response_model=ImportResponse)
 async def assets_import(req: ImportRequest):
-    out = import_rows(req.company_id, req.rows)
+    out = await run_in_threadpool(import_rows, req.company_id, req.rows)
     return out
 
 
+@router.post("/api/ai/assets/import/file")
+async def assets_import_file(request: Request, company_id: str = "demo", format: Optional[str] = None):
+    # raw CSV/XLSX body; progress comes back as NDJSON, one event per validated chunk
+    ctype = request.headers.get("content-type", "")
+    fmt = (format or ("xlsx" if "spreadsheetml" in ctype else "csv")).lower()
+    if fmt not in ("csv", "xlsx"):
+        raise HTTPException(415, "format must be csv or xlsx")
+    upload_id = f"import-{uuid.uuid4().hex}"
+    try:
+        await uploads.store_stream(company_id, upload_id, request.stream())
+    except uploads.UploadTooLarge:
+        raise HTTPException(413, "file too large")
+    path = uploads.upload_path(company_id, upload_id)
+    if fmt == "xlsx" and not zipfile.is_zipfile(path):
+        path.unlink()
+        raise HTTPException(415, "not an xlsx file")
+
+    async def events():
+        try:
+            async for event in iterate_in_threadpool(import_assets(company_id, read_file(path, fmt))):
+                yield json.dumps(event) + "\n"
+        except ImportFormatError as e:
+            yield json.dumps({"event": "error", "error": str(e)}) + "\n"
+        finally:
+            path.unlink(missing_ok=True)
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
 @router.post("/api/ai/assets/telemetry/ingest", response_model=TelemetryIngestResponse)
 async def assets_telemetry(req: TelemetryIngestRequest):
-    result = ingest_telemetry(req.company_id, req.asset_id, req.samples)
+    result = await run_in_threadpool(ingest_telemetry, req.company_id, req.asset_id, req.samples)
     return result
 
 
+@router.post("/api/ai/assets/telemetry/bulk")
+async def assets_telemetry_bulk(request: Request, company_id: str = "demo"):
+    # NDJSON body (one sample per line, each with its asset_id), optionally Content-Encoding: gzip.
+    # company_id goes in the query string so the body is streamed, never buffered.
+    encoding = request.headers.get("content-encoding", "identity").strip().lower()
+    if encoding not in ("identity", "gzip"):
+        raise HTTPException(415, "content-encoding must be gzip or identity")
+    try:
+        result = await telemetry_ingest.ingest_ndjson(
+            company_id, request.stream(), ingest_telemetry_batch, gzip=encoding == "gzip"
+        )
+    except telemetry_ingest.IngestBusy as busy:
+        return JSONResponse({**busy.result, "ok": False, "_meta": meta_top()}, status_code=503, headers={"Retry-After": "5"})
+    except zlib.error:
+        raise HTTPException(400, "invalid gzip body")
+    return {**result, "ok": True, "_meta": meta_top()}
+
+
 @router.post("/api/ai/assets/documents/extract-dates", response_model=DocumentExtractResponse)
 async def assets_extract_dates(req: DocumentExtractRequest):
     from ..services.assets_engine import extract_document_dates
-    result = extract_document_dates(req.company_id, req.docs or [])
+    # CPU-bound (and possibly waiting on the process pool): keep it off the event loop
+    result = await run_in_threadpool(extract_document_dates, req.company_id, req.docs or [])
     return result
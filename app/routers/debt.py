@@ -2,6 +2,8 @@ from fastapi import APIRouter, HTTPException
 from ..schemas import DebtFullRequest, DebtFullResponse, DebtScenarioRequest, DebtScenarioResponse, DebtAskRequest, ConnectorRequest, ConnectorResponse, DebtAccount
 from ..services.debt_engine import build_full, simulate_scenario, load_demo
 from ..utils_demo import is_demo, meta
+from ..responses import engine_response
+from ..conditional import conditional
 from ..demo_seed import DEMO_DEBT_FULL
 import json
 
@@ -9,6 +11,7 @@ router = APIRouter()
 
 
 @router.post("/api/ai/debt/full", response_model=DebtFullResponse)
+@conditional("debt")
 async def debt_full(req: DebtFullRequest):
     # Demo mode check
     if is_demo(req.company_id):
@@ -18,7 +21,7 @@ async def debt_full(req: DebtFullRequest):
     # Non-demo: existing logic
     if req.company_id == "demo":
         res = build_full(req.company_id, range=req.range, include_market_rates=req.include_market_rates, include_credit_score=req.include_credit_score)
-        return res
+        return engine_response(res)
     else:
         raise HTTPException(status_code=400, detail="Only demo supported in this implementation")
 
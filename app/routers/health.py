@@ -1,12 +1,15 @@
 from fastapi import APIRouter, HTTPException
 from ..schemas import BusinessHealthRequest, BusinessHealthResponse
 from ..services.health_engine import compute_health
+from ..responses import engine_response
+from ..conditional import conditional
 import json
 
 router = APIRouter()
 
 
 @router.post("/api/ai/health/full", response_model=BusinessHealthResponse)
+@conditional("company")
 async def health_full(req: BusinessHealthRequest):
     company_id = req.company_id
     if company_id == "demo":
@@ -31,14 +34,15 @@ async def health_full(req: BusinessHealthRequest):
     res = compute_health(company_id, profile, series, include_peers=req.include_peers, include_breakdowns=req.include_breakdowns)
 
     # Ensure top-level keys exist per contract
-    return BusinessHealthResponse(
-        kpis=res.get("kpis"),
-        overview=res.get("overview"),
-        categories=res.get("categories"),
-        alerts=res.get("alerts"),
-        heatmap=res.get("heatmap"),
-        recommendations=res.get("recommendations"),
-        coach_examples=res.get("coach_examples"),
-        export=res.get("export"),
-        _meta=res.get("_meta"),
-    )
+    out = {
+        "kpis": res.get("kpis"),
+        "overview": res.get("overview"),
+        "categories": res.get("categories"),
+        "alerts": res.get("alerts"),
+        "heatmap": res.get("heatmap"),
+        "recommendations": res.get("recommendations"),
+        "coach_examples": res.get("coach_examples"),
+        "export": res.get("export"),
+        "_meta": res.get("_meta"),
+    }
+    return engine_response(out)
@@ -1,12 +1,15 @@
 from fastapi import APIRouter, HTTPException
 from ..schemas import BusinessInsightsRequest, BusinessInsightsResponse
 from ..services.insights_engine import compute_insights
+from ..responses import engine_response
+from ..conditional import conditional
 import json
 
 router = APIRouter()
 
 
 @router.post("/api/ai/insights/full", response_model=BusinessInsightsResponse)
+@conditional("company")
 async def insights_full(req: BusinessInsightsRequest):
     # demo mode: load profile and series from data files if company_id == 'demo'
     company_id = req.company_id
@@ -33,15 +36,16 @@ async def insights_full(req: BusinessInsightsRequest):
 
     res = compute_insights(company_id, profile, series, include_peers=req.include_peers)
     # Ensure top-level keys exist per contract
-    return BusinessInsightsResponse(
-        kpis=res.get("kpis"),
-        current_pulse=res.get("current_pulse"),
-        internal_analysis=res.get("internal_analysis"),
-        peers=res.get("peers"),
-        recommendations=res.get("recommendations"),
-        efficiency_roi=res.get("efficiency_roi"),
-        opportunities=res.get("opportunities"),
-        charts=res.get("charts"),
-        export=res.get("export"),
-        _meta=res.get("_meta"),
-    )
+    out = {
+        "kpis": res.get("kpis"),
+        "current_pulse": res.get("current_pulse"),
+        "internal_analysis": res.get("internal_analysis"),
+        "peers": res.get("peers"),
+        "recommendations": res.get("recommendations"),
+        "efficiency_roi": res.get("efficiency_roi"),
+        "opportunities": res.get("opportunities"),
+        "charts": res.get("charts"),
+        "export": res.get("export"),
+        "_meta": res.get("_meta"),
+    }
+    return engine_response(out)
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from typing import Any
 from fastapi import Body
 from ..schemas import (
@@ -14,14 +15,16 @@ from ..schemas import (
     CompletenessRecalcRequest,
     ExportRequest,
 )
-from ..services import profile_engine
+from ..services import profile_engine, uploads
 from ..utils_demo import is_demo, meta
+from ..conditional import conditional
 from ..demo_seed import DEMO_PROFILE_FULL
 
 router = APIRouter()
 
 
 @router.post("/api/ai/profile/full", response_model=ProfileFullResponse)
+@conditional("profile")
 def profile_full(req: ProfileFullRequest):
     # Demo mode check
     if is_demo(req.company_id):
@@ -48,7 +51,7 @@ def save_general(payload: dict = Body(...)):
     if not company_id or not general:
         raise HTTPException(400, "missing")
     profile_engine.save_general(company_id, general)
-    return {"ok": True, "_meta": profile_engine.make_meta()}
+    return {"ok": True, "completeness": profile_engine.completeness(company_id), "_meta": profile_engine.make_meta()}
 
 
 @router.post("/api/ai/profile/industry/save", response_model=SaveOK)
@@ -58,7 +61,7 @@ def save_industry(payload: dict = Body(...)):
     if not company_id or not industry:
         raise HTTPException(400, "missing")
     profile_engine.save_industry(company_id, industry)
-    return {"ok": True, "_meta": profile_engine.make_meta()}
+    return {"ok": True, "completeness": profile_engine.completeness(company_id), "_meta": profile_engine.make_meta()}
 
 
 @router.post("/api/ai/profile/industry/naics/search", response_model=NAICSSearchResponse)
@@ -74,7 +77,7 @@ def operations_save(payload: dict = Body(...)):
     if not company_id or ops is None:
         raise HTTPException(400, "missing")
     profile_engine.save_operations(company_id, ops)
-    return {"ok": True, "_meta": profile_engine.make_meta()}
+    return {"ok": True, "completeness": profile_engine.completeness(company_id), "_meta": profile_engine.make_meta()}
 
 
 @router.post("/api/ai/profile/financial/save", response_model=SaveOK)
@@ -84,7 +87,7 @@ def financial_save(payload: dict = Body(...)):
     if not company_id or fin is None:
         raise HTTPException(400, "missing")
     profile_engine.save_generic(company_id, "financial", fin)
-    return {"ok": True, "_meta": profile_engine.make_meta()}
+    return {"ok": True, "completeness": profile_engine.completeness(company_id), "_meta": profile_engine.make_meta()}
 
 
 @router.post("/api/ai/profile/assets/save", response_model=SaveOK)
@@ -99,7 +102,7 @@ def assets_save(payload: dict = Body(...)):
             profile_engine.upsert_asset(company_id, a)
     else:
         profile_engine.upsert_asset(company_id, assets)
-    return {"ok": True, "_meta": profile_engine.make_meta()}
+    return {"ok": True, "completeness": profile_engine.completeness(company_id), "_meta": profile_engine.make_meta()}
 
 
 @router.post("/api/ai/profile/assets/delete", response_model=SaveOK)
@@ -109,7 +112,7 @@ def assets_delete(payload: dict = Body(...)):
     if not company_id or not asset_id:
         raise HTTPException(400, "missing")
     profile_engine.delete_asset(company_id, asset_id)
-    return {"ok": True, "_meta": profile_engine.make_meta()}
+    return {"ok": True, "completeness": profile_engine.completeness(company_id), "_meta": profile_engine.make_meta()}
 
 
 @router.post("/api/ai/profile/customers/save", response_model=SaveOK)
@@ -119,7 +122,7 @@ def customers_save(payload: dict = Body(...)):
     if not company_id or customers is None:
         raise HTTPException(400, "missing")
     profile_engine.save_generic(company_id, "customers", customers)
-    return {"ok": True, "_meta": profile_engine.make_meta()}
+    return {"ok": True, "completeness": profile_engine.completeness(company_id), "_meta": profile_engine.make_meta()}
 
 
 @router.post("/api/ai/profile/risk/save", response_model=SaveOK)
@@ -129,7 +132,7 @@ def risk_save(payload: dict = Body(...)):
     if not company_id or risk is None:
         raise HTTPException(400, "missing")
     profile_engine.save_generic(company_id, "risk", risk)
-    return {"ok": True, "_meta": profile_engine.make_meta()}
+    return {"ok": True, "completeness": profile_engine.completeness(company_id), "_meta": profile_engine.make_meta()}
 
 
 @router.post("/api/ai/profile/objectives/save", response_model=SaveOK)
@@ -139,7 +142,7 @@ def objectives_save(payload: dict = Body(...)):
     if not company_id or obj is None:
         raise HTTPException(400, "missing")
     profile_engine.save_generic(company_id, "objectives", obj)
-    return {"ok": True, "_meta": profile_engine.make_meta()}
+    return {"ok": True, "completeness": profile_engine.completeness(company_id), "_meta": profile_engine.make_meta()}
 
 
 @router.post("/api/ai/profile/uploads/list")
@@ -151,15 +154,43 @@ def uploads_list(payload: UploadListRequest = Body(...)):
 @router.post("/api/ai/profile/uploads/upload")
 def uploads_upload(payload: UploadUploadRequest = Body(...)):
     item = profile_engine.upload_file(payload.company_id, payload.file_name, payload.category, payload.upload_id)
+    return {"ok": True, "upload": item, "completeness": profile_engine.completeness(payload.company_id), "_meta": profile_engine.make_meta()}
+
+
+@router.put("/api/ai/profile/uploads/{upload_id}/content")
+async def uploads_content(upload_id: str, request: Request, company_id: str = "demo"):
+    # raw request body, streamed to disk chunk by chunk
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > uploads.MAX_UPLOAD_BYTES:
+        raise HTTPException(413, "file too large")
+    try:
+        item = await profile_engine.store_upload_content(company_id, upload_id, request.stream())
+    except KeyError:
+        raise HTTPException(404, "not found")
+    except uploads.UploadTooLarge:
+        raise HTTPException(413, "file too large")
+    except uploads.QueueFull:
+        raise HTTPException(503, "extraction queue full", headers={"Retry-After": "5"})
     return {"ok": True, "upload": item, "_meta": profile_engine.make_meta()}
 
 
+@router.get("/api/ai/profile/uploads/events")
+async def uploads_events(company_id: str = "demo"):
+    return StreamingResponse(
+        uploads.subscribe(company_id),
+        media_type="text/event-stream",
+        headers={"cache-control": "no-cache", "x-accel-buffering": "no"},
+    )
+
+
 @router.post("/api/ai/profile/uploads/extract")
 def uploads_extract(payload: UploadExtractRequest = Body(...)):
     try:
         item = profile_engine.extract_upload(payload.company_id, payload.id)
     except KeyError:
         raise HTTPException(404, "not found")
+    except uploads.QueueFull:
+        raise HTTPException(503, "extraction queue full", headers={"Retry-After": "5"})
     return {"ok": True, "upload": item, "_meta": profile_engine.make_meta()}
 
 
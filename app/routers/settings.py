@@ -6,11 +6,13 @@ from fastapi import APIRouter
 from pydantic import BaseModel
 from typing import Optional
 
-from ..utils_demo import is_demo, meta
+from ..utils_demo import DemoSeed, is_demo
 from ..demo_seed import DEMO_SETTINGS_FULL
 
 router = APIRouter()
 
+DEMO_SETTINGS_SEED = DemoSeed(DEMO_SETTINGS_FULL)
+
 
 class SettingsRequest(BaseModel):
     company_id: Optional[str] = "demo"
@@ -26,8 +28,7 @@ async def settings_full(req: SettingsRequest = None):
     company_id = req.company_id if req else "demo"
     
     if is_demo(company_id):
-        response = DEMO_SETTINGS_FULL.copy()
-        return meta(response)
+        return DEMO_SETTINGS_SEED.response()
     
     # Non-demo stub
     return {
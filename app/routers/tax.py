@@ -8,12 +8,15 @@ from ..services.tax_engine import (
     tax_full, meta_top, compute_opportunities, compute_quarterly_plan, analyze_entity, plan_depreciation, save_priorities
 )
 from ..utils_demo import is_demo, meta
+from ..responses import engine_response
+from ..conditional import conditional
 from ..demo_seed import DEMO_TAX_FULL
 
 router = APIRouter()
 
 
 @router.post("/api/ai/tax/full", response_model=TaxFullResponse)
+@conditional("tax", "assets")
 async def tax_full_endpoint(req: TaxFullRequest):
     # Demo mode check
     if is_demo(req.company_id):
@@ -22,25 +25,11 @@ async def tax_full_endpoint(req: TaxFullRequest):
     
     # Non-demo: existing logic
     res = tax_full(req.company_id, req.year, include_peers=req.include_peers, include_assets=req.include_assets, include_entity_analysis=req.include_entity_analysis, range=req.range)
-    # Attach provenance from services
-    # match schema: quarterly_plan and others expect _meta inside - ensure it's present
-    # map nested meta keys to 'meta' alias expected by Pydantic
-    res_quarterly = res.get("quarterly_plan", {})
-    if "_meta" in res_quarterly:
-        res_quarterly["meta"] = res_quarterly.pop("_meta")
-    res_entity = res.get("entity_analysis", {})
-    if "_meta" in res_entity:
-        res_entity["meta"] = res_entity.pop("_meta")
-    res_dep = res.get("depreciation", {})
-    if "_meta" in res_dep:
-        res_dep["meta"] = res_dep.pop("_meta")
-
-    # top-level meta
+    # Attach provenance from services (nested blocks keep their _meta alias as-is)
     if "_meta" in res:
-        res["meta"] = res.pop("_meta")
-        res["meta"]["provenance"]["notes"].append("Estimates only — confirm with licensed tax advisor.")
+        res["_meta"]["provenance"]["notes"].append("Estimates only — confirm with licensed tax advisor.")
 
-    return res
+    return engine_response(res)
 
 
 @router.post("/api/ai/tax/ask", response_model=TaxAskResponse)
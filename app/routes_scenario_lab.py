@@ -8,6 +8,7 @@ from .schemas import (
 )
 from .services.qbo_adapter import get_financials
 from .services.scenario_planning import compute_scenario_lab_analysis
+from .services.scenario_parser import parse_scenario_question
 
 router = APIRouter()
 
@@ -124,14 +125,28 @@ async def quick_scenario(request: QuickScenarioRequest):
     """
     Quick scenario analysis from natural language question.
     
-    This is a simplified endpoint that maps common questions to scenario parameters.
-    In production, this would use LLM to parse the question and extract parameters.
-    
-    For now, it returns a template response suggesting how to structure the full request.
+    Common phrasings ("raise prices 5%", "hire 2 techs", "buy a $45k truck with a
+    $36k loan at 7.5%") are parsed locally into a ScenarioLabRequest and analyzed
+    right away. Anything the parser does not recognise gets a template response
+    suggesting how to structure the full request.
     """
-    # In production: use OpenAI to parse question into ScenarioLabRequest
-    # For demo: return helpful template
-    
+    parsed = parse_scenario_question(request.question)
+    if parsed:
+        lab_request = parsed.to_request(request.company_id, request.question)
+        try:
+            financials = await get_financials(request.company_id, 12)
+            analysis = compute_scenario_lab_analysis(financials, lab_request)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Scenario analysis failed: {str(e)}")
+        return {
+            'question': request.question,
+            'parsed': True,
+            'suggestion': f"Parsed as '{lab_request.scenario_name}'",
+            'template': lab_request.model_dump(exclude={'company_id'}),
+            'endpoint': '/api/scenario-lab/analyze',
+            'analysis': ScenarioLabResponse(**analysis),
+        }
+
     templates = {
         'hire': {
             'description': 'To analyze hiring, use the /analyze endpoint with headcount_delta',
@@ -182,6 +197,7 @@ async def quick_scenario(request: QuickScenarioRequest):
     
     return {
         'question': request.question,
+        'parsed': False,
         'suggestion': template['description'],
         'template': template['example'],
         'endpoint': '/api/scenario-lab/analyze'
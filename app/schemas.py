@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Literal, Optional, Dict, Any, Union
 
 class Profile(BaseModel):
     company_id: str
@@ -336,14 +336,60 @@ class ReplaceVsRepairResponse(BaseModel):
     model_config = {"populate_by_name": True}
 
 
+class FleetReplaceVsRepairRequest(BaseModel):
+    company_id: str
+    asset_ids: List[str]
+    repair_cost_year: List[float]
+    downtime_cost_year: Optional[List[float]] = None
+    replacement_cost: Optional[List[Optional[float]]] = None
+    replacement_useful_life_months: Optional[List[Optional[int]]] = None
+    expected_productivity_gain_pct: Optional[Union[float, List[float]]] = None
+    discount_rate_pct: float = 8
+    capex_budget: Optional[float] = Field(None, ge=0)
+    max_replacements: Optional[int] = Field(None, ge=0)
+
+
+class FleetReplaceVsRepairResponse(BaseModel):
+    assets: List[Dict[str, Any]]
+    plan: Dict[str, Any]
+    summary: Dict[str, Any]
+    meta: MetaTop = Field(..., alias="_meta")
+
+    model_config = {"populate_by_name": True}
+
+
+class FleetValuationRequest(BaseModel):
+    company_id: str
+    start: Optional[str] = None
+    end: Optional[str] = None
+    group_by: Optional[str] = None
+    include_assets: bool = False
+
+
+class FleetValuationResponse(BaseModel):
+    months: List[str]
+    book_value: List[float]
+    depreciation: List[float]
+    groups: Optional[Dict[str, List[float]]] = None
+    period: Dict[str, Any]
+    undated: List[str] = []
+    meta: MetaTop = Field(..., alias="_meta")
+
+    model_config = {"populate_by_name": True}
+
+
 class AssetsSearchRequest(BaseModel):
     company_id: str
     query: Optional[str] = None
     filters: Optional[Dict[str, Any]] = None
+    limit: Optional[int] = Field(None, ge=1, le=500)
+    cursor: Optional[str] = None
 
 
 class AssetsSearchResponse(BaseModel):
     results: List[Asset]
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
     meta: MetaTop = Field(..., alias="_meta")
 
     model_config = {"populate_by_name": True}
@@ -356,6 +402,8 @@ class ImportRequest(BaseModel):
 
 class ImportResponse(BaseModel):
     imported: int
+    inserted: Optional[int] = None
+    updated: Optional[int] = None
     skipped: int
     warnings: List[str]
     meta: MetaTop = Field(..., alias="_meta")
@@ -395,6 +443,37 @@ class WorkOrderCreateResponse(BaseModel):
     model_config = {"populate_by_name": True}
 
 
+class WorkOrderListRequest(BaseModel):
+    company_id: str
+    asset_id: Optional[str] = None
+    status: Optional[str] = None
+    priority: Optional[str] = None
+    limit: Optional[int] = Field(None, ge=1, le=500)
+    cursor: Optional[str] = None
+
+
+WorkOrderStatus = Literal["open", "in_progress", "on_hold", "closed"]
+
+
+class WorkOrderUpdateRequest(BaseModel):
+    company_id: str
+    wo_id: str
+    status: WorkOrderStatus
+
+
+class WorkOrderBreachesRequest(BaseModel):
+    company_id: str
+
+
+class WorkOrderListResponse(BaseModel):
+    work_orders: List[Dict[str, Any]]
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
+    meta: MetaTop = Field(..., alias="_meta")
+
+    model_config = {"populate_by_name": True}
+
+
 class MaintenanceScheduleRequest(BaseModel):
     company_id: str
     asset_id: str
@@ -403,6 +482,25 @@ class MaintenanceScheduleRequest(BaseModel):
 
 class MaintenanceScheduleResponse(BaseModel):
     ok: bool
+    plan: Optional[Dict[str, Any]] = None
+    meta: MetaTop = Field(..., alias="_meta")
+
+    model_config = {"populate_by_name": True}
+
+
+class MaintenanceDueRequest(BaseModel):
+    company_id: str
+    days: float = 30
+    types: Optional[List[str]] = None
+    limit: Optional[int] = Field(None, ge=1, le=1000)
+
+
+class MaintenanceAlertsRequest(BaseModel):
+    company_id: str
+
+
+class MaintenanceEventsResponse(BaseModel):
+    events: List[Dict[str, Any]]
     meta: MetaTop = Field(..., alias="_meta")
 
     model_config = {"populate_by_name": True}
@@ -744,11 +842,13 @@ class ObjectivesBlock(BaseModel):
 class UploadItem(BaseModel):
     id: str
     file: str
-    category: Optional[str]
-    status: Optional[str]
-    issuer: Optional[str]
-    effective: Optional[str]
-    expiration: Optional[str]
+    category: Optional[str] = None
+    status: Optional[str] = None
+    issuer: Optional[str] = None
+    effective: Optional[str] = None
+    expiration: Optional[str] = None
+    size: Optional[int] = None
+    error: Optional[str] = None
 
 
 class CompletenessBlock(BaseModel):
@@ -787,6 +887,7 @@ class ProfileFullResponse(BaseModel):
 
 class SaveOK(BaseModel):
     ok: bool
+    completeness: Optional[CompletenessBlock] = None
     meta: MetaTop = Field(..., alias="_meta")
 
 
@@ -0,0 +1,278 @@
+# app/services/asset_import.py
+"""
+Streaming asset registry import (CSV or XLSX).
+
+The uploaded file is streamed to disk first (uploads.store_stream), then read
+row by row: CSV through the csv module, XLSX by walking the first worksheet
+with iterparse (stdlib only, the sheet is never loaded as a whole). Rows are
+validated and normalized in chunks of `chunk_rows`:
+
+  - headers are matched case-insensitively, with common aliases
+    ("Unit #", "Location", "Purchase Price", ...) mapped to Asset fields
+  - asset_id is required; numbers may carry "$" and thousands separators;
+    dates may be ISO, m/d/Y or Excel serials and are stored as ISO
+  - rows are merged onto an existing asset with the same ID (empty cells
+    leave the existing value alone), and a later row for an ID wins
+
+Each chunk is upserted as one batch, and one progress event comes back per
+chunk with that chunk's row errors, followed by a final "done" event with
+totals.
+"""
+import csv
+import math
+import re
+import zipfile
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from xml.etree import ElementTree
+
+CHUNK_ROWS = 1000
+MAX_ERRORS_PER_CHUNK = 100
+
+FLOAT_FIELDS = ("odometer", "cost", "salvage")
+INT_FIELDS = ("useful_life_months", "year")
+DATE_FIELDS = ("warranty_expires", "insurance_expires")
+
+HEADER_ALIASES = {
+    "id": "asset_id", "asset": "asset_id", "asset_no": "asset_id", "asset_number": "asset_id",
+    "unit": "asset_id", "unit_no": "asset_id", "unit_number": "asset_id",
+    "asset_name": "name", "description": "name",
+    "type": "category", "asset_type": "category",
+    "location": "site", "yard": "site", "branch": "site",
+    "purchase_price": "cost", "purchase_cost": "cost", "acquisition_cost": "cost",
+    "salvage_value": "salvage", "residual_value": "salvage",
+    "useful_life": "useful_life_months", "life_months": "useful_life_months",
+    "mileage": "odometer", "miles": "odometer",
+    "model_year": "year",
+    "warranty_expiration": "warranty_expires", "warranty_end": "warranty_expires",
+    "insurance_expiration": "insurance_expires", "insurance_end": "insurance_expires",
+}
+
+_HEADER_JUNK = re.compile(r"[^a-z0-9]+")
+_EXCEL_EPOCH = date(1899, 12, 30)
+
+Row = Tuple[int, Dict[str, str]]
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def normalize_header(name: str) -> str:
+    key = _HEADER_JUNK.sub("_", (name or "").strip().lower()).strip("_")
+    return HEADER_ALIASES.get(key, key)
+
+
+# ---------- readers ----------
+
+
+def _rows(header: List[str], records: Iterator[Tuple[int, List[str]]]) -> Iterator[Row]:
+    names = [normalize_header(h) for h in header]
+    for line, values in records:
+        if not any(v.strip() for v in values):
+            continue
+        yield line, {n: v for n, v in zip(names, values) if n}
+
+
+def read_csv(path: Path) -> Iterator[Row]:
+    with open(path, newline="", encoding="utf-8-sig", errors="replace") as f:
+        sample = f.read(64 * 1024)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.reader(f, dialect)
+        try:
+            header = next(reader, None)
+            if not header:
+                return
+            yield from _rows(header, ((reader.line_num, values) for values in reader))
+        except csv.Error as e:
+            raise ImportFormatError(f"malformed csv at line {reader.line_num}: {e}")
+
+
+_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+
+
+def _column(ref: str) -> int:
+    n = 0
+    for ch in ref:
+        if not ch.isalpha():
+            break
+        n = n * 26 + (ord(ch.upper()) - 64)
+    return n - 1
+
+
+def _shared_strings(zf: zipfile.ZipFile) -> List[str]:
+    if "xl/sharedStrings.xml" not in zf.namelist():
+        return []
+    out = []
+    with zf.open("xl/sharedStrings.xml") as f:
+        for _, el in ElementTree.iterparse(f):
+            if el.tag == _NS + "si":
+                out.append("".join(t.text or "" for t in el.iter(_NS + "t")))
+                el.clear()
+    return out
+
+
+def read_xlsx(path: Path) -> Iterator[Row]:
+    try:
+        zf = zipfile.ZipFile(path)
+    except zipfile.BadZipFile:
+        raise ImportFormatError("not an xlsx file")
+    with zf:
+        sheets = sorted(n for n in zf.namelist() if n.startswith("xl/worksheets/sheet") and n.endswith(".xml"))
+        if not sheets:
+            raise ImportFormatError("xlsx has no worksheets")
+        first = "xl/worksheets/sheet1.xml" if "xl/worksheets/sheet1.xml" in sheets else sheets[0]
+
+        def records() -> Iterator[Tuple[int, List[str]]]:
+            line = 0
+            try:
+                strings = _shared_strings(zf)
+                with zf.open(first) as f:
+                    for _, el in ElementTree.iterparse(f):
+                        if el.tag != _NS + "row":
+                            continue
+                        cells: Dict[int, str] = {}
+                        for c in el.iter(_NS + "c"):
+                            kind = c.get("t")
+                            if kind == "inlineStr":
+                                value = "".join(t.text or "" for t in c.iter(_NS + "t"))
+                            else:
+                                v = c.find(_NS + "v")
+                                value = v.text if v is not None and v.text is not None else ""
+                                if kind == "s" and value:
+                                    value = strings[int(value)]
+                            cells[_column(c.get("r", "")) if c.get("r") else len(cells)] = value
+                        line = int(el.get("r") or 0)
+                        el.clear()
+                        width = max(cells) + 1 if cells else 0
+                        yield line, [cells.get(i, "") for i in range(width)]
+            except (ElementTree.ParseError, IndexError, ValueError, KeyError, zipfile.BadZipFile) as e:
+                # truncated XML, a shared-string index out of range, a bad row number or a corrupt member
+                raise ImportFormatError(f"malformed xlsx after row {line}: {e}")
+
+        it = records()
+        header = next(it, None)
+        if header is None:
+            return
+        yield from _rows(header[1], it)
+
+
+def read_file(path: Path, fmt: str) -> Iterator[Row]:
+    if fmt == "csv":
+        return read_csv(path)
+    if fmt == "xlsx":
+        return read_xlsx(path)
+    raise ImportFormatError("format must be csv or xlsx")
+
+
+# ---------- validation ----------
+
+
+def _number(text: str) -> float:
+    value = float(text.replace("$", "").replace(",", "").strip())
+    if not math.isfinite(value) or abs(value) > 1e15:
+        raise ValueError(text)
+    return value
+
+
+def _date(text: str) -> str:
+    text = text.strip()
+    for fmt in ("%Y-%m-%d", "%m/%d/%Y", "%m/%d/%y", "%Y/%m/%d"):
+        try:
+            return datetime.strptime(text[:10] if fmt == "%Y-%m-%d" else text, fmt).date().isoformat()
+        except ValueError:
+            pass
+    serial = float(text)  # Excel stores dates as day numbers; ValueError if not a number either
+    if not 1 <= serial < 100000:
+        raise ValueError(text)
+    return (_EXCEL_EPOCH + timedelta(days=int(serial))).isoformat()
+
+
+def normalize_row(raw: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """(record, None) for a valid row, else (None, reason). Empty cells are dropped."""
+    rec: Dict[str, Any] = {}
+    for key, value in raw.items():
+        if value is None:
+            continue
+        text = str(value).strip()
+        if not text:
+            continue
+        try:
+            if key in FLOAT_FIELDS:
+                rec[key] = _number(text)
+            elif key in INT_FIELDS:
+                rec[key] = int(_number(text))
+            elif key in DATE_FIELDS:
+                rec[key] = _date(text)
+            elif key in ("status", "category"):
+                rec[key] = text.lower()
+            else:
+                rec[key] = text
+        except ValueError:
+            return None, f"invalid {key}: {text[:40]}"
+    asset_id = rec.get("asset_id")
+    if not asset_id:
+        return None, "missing asset_id"
+    if len(asset_id) > 64:
+        return None, "asset_id longer than 64 characters"
+    if "year" in rec and not 1900 <= rec["year"] <= 2100:
+        return None, f"invalid year: {rec['year']}"
+    return rec, None
+
+
+# ---------- pipeline ----------
+
+
+def run_import(
+    rows: Iterator[Row],
+    existing: Dict[str, Dict[str, Any]],
+    upsert: Callable[[List[Dict[str, Any]]], Any],
+    chunk_rows: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Validate, merge and upsert rows chunk by chunk; yields one progress event per chunk, then "done"."""
+    chunk_rows = chunk_rows or CHUNK_ROWS
+    rows = iter(rows)
+    totals = {"rows": 0, "inserted": 0, "updated": 0, "skipped": 0, "duplicates": 0}
+    seen: set = set()
+    chunk = 1
+    while True:
+        batch: Dict[str, Dict[str, Any]] = {}
+        errors: List[Dict[str, Any]] = []
+        skipped = 0
+        n = 0
+        for line, raw in rows:
+            n += 1
+            rec, error = normalize_row(raw)
+            if error:
+                skipped += 1
+                if len(errors) < MAX_ERRORS_PER_CHUNK:
+                    errors.append({"row": line, "error": error})
+            else:
+                asset_id = rec["asset_id"]
+                if asset_id in seen:
+                    totals["duplicates"] += 1
+                seen.add(asset_id)
+                base = batch.get(asset_id) or existing.get(asset_id) or {}
+                batch[asset_id] = {**base, **rec}
+            if n >= chunk_rows:
+                break
+        if not n:
+            break
+        upsert(list(batch.values()))
+        updated = sum(1 for asset_id in batch if asset_id in existing)
+        inserted = len(batch) - updated
+        existing.update(batch)
+        totals["rows"] += n
+        totals["inserted"] += inserted
+        totals["updated"] += updated
+        totals["skipped"] += skipped
+        yield {"event": "progress", "chunk": chunk, **totals, "errors": errors}
+        chunk += 1
+        if n < chunk_rows:
+            break
+    yield {"event": "done", **totals}
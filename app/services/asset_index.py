@@ -0,0 +1,244 @@
+# app/services/asset_index.py
+"""
+Search index over one tenant's asset registry (built once per AssetDataset;
+edited or imported records are re-indexed one at a time with upsert()).
+
+  - full text: name, asset_id, category, make, model, site/location are
+    tokenized into postings. Every query word must match a token, whole or by
+    prefix against a sorted vocabulary (typeahead); whole matches rank higher.
+    Whole asset IDs are indexed too, so "TRK-1" narrows by ID.
+  - exact filters (category, status, site, ...): value -> set of rows
+  - range filters (cost, year, health): sorted (value, row) lists answered by
+    bisect; health is derived per asset and built on first use
+
+Filters are a dict: a scalar means equality (case-insensitive), None means
+"field present", and {"min": ..., "max": ...} is an inclusive range.
+
+Results are ordered by relevance, then asset_id, and paged with an opaque
+keyset cursor (the sort key of the last row returned), so a page never
+repeats or skips rows even when the caller pages slowly.
+"""
+import base64
+import bisect
+import json
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+TEXT_FIELDS = ("name", "asset_id", "category", "make", "model", "site", "location")
+EXACT_FIELDS = ("asset_id", "category", "status", "site", "location", "make", "model")
+RANGE_FIELDS = ("cost", "year", "health")
+
+EXACT, PREFIX = 2.0, 1.0
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _key(value: Any) -> str:
+    return str(value).strip().lower()
+
+
+def _number(value: Any) -> Optional[float]:
+    if isinstance(value, bool) or value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def encode_cursor(score: float, asset_id: str) -> str:
+    raw = json.dumps([score, asset_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    try:
+        score, asset_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return float(score), str(asset_id)
+    except (ValueError, TypeError):
+        raise InvalidCursor("invalid cursor")
+
+
+class AssetSearchIndex:
+    def __init__(self, assets: List[Dict[str, Any]], health: Callable[[str, Dict[str, Any]], Any]):
+        self.assets = list(assets)
+        self._health_fn = health
+        self._ids = [str(a.get("asset_id") or "") for a in self.assets]
+        self._rows = {asset_id: i for i, asset_id in enumerate(self._ids)}
+        self._postings: Dict[str, Set[int]] = {}
+        self._exact: Dict[str, Dict[str, Set[int]]] = {f: {} for f in EXACT_FIELDS}
+        for i, a in enumerate(self.assets):
+            for token in self._tokens(a):
+                self._postings.setdefault(token, set()).add(i)
+            for field, value in self._exact_terms(a):
+                self._exact[field].setdefault(value, set()).add(i)
+        self._vocab = sorted(self._postings)
+        self._ranges: Dict[str, List[Tuple[float, int]]] = {}
+        self._lock = threading.RLock()  # search() holds it while building a range index
+
+    @staticmethod
+    def _tokens(a: Dict[str, Any]) -> Set[str]:
+        out: Set[str] = set()
+        for field in TEXT_FIELDS:
+            value = a.get(field)
+            if value is None:
+                continue
+            text = _key(value)
+            out.update(_WORD.findall(text))
+            if field == "asset_id":
+                out.add(text)
+        return out
+
+    @staticmethod
+    def _exact_terms(a: Dict[str, Any]) -> List[Tuple[str, str]]:
+        return [(field, _key(a[field])) for field in EXACT_FIELDS if a.get(field) is not None]
+
+    # ---------- maintenance ----------
+
+    def invalidate_derived(self):
+        """Derived columns (health) changed; rebuild their range index on next use."""
+        self._ranges.pop("health", None)
+
+    def upsert(self, asset: Dict[str, Any]):
+        """Index a new or edited registry record in place of its previous version."""
+        with self._lock:
+            asset_id = str(asset.get("asset_id") or "")
+            i = self._rows.get(asset_id)
+            if i is None:
+                i = self._rows[asset_id] = len(self.assets)
+                self.assets.append(asset)
+                self._ids.append(asset_id)
+                old_tokens, old_exact = set(), []
+            else:
+                old = self.assets[i]
+                self.assets[i] = asset
+                old_tokens = self._tokens(old)
+                old_exact = self._exact_terms(old)
+            new_tokens = self._tokens(asset)
+            for token in old_tokens - new_tokens:
+                rows = self._postings[token]
+                rows.discard(i)
+                if not rows:
+                    del self._postings[token]
+                    del self._vocab[bisect.bisect_left(self._vocab, token)]
+            for token in new_tokens - old_tokens:
+                if token not in self._postings:
+                    bisect.insort(self._vocab, token)
+                self._postings.setdefault(token, set()).add(i)
+            for field, value in old_exact:
+                self._exact[field][value].discard(i)
+                if not self._exact[field][value]:
+                    del self._exact[field][value]
+            for field, value in self._exact_terms(asset):
+                self._exact[field].setdefault(value, set()).add(i)
+            self._ranges.clear()  # cost/year may have changed too; rebuilt on next use
+
+    def _range_index(self, field: str) -> List[Tuple[float, int]]:
+        idx = self._ranges.get(field)
+        if idx is None:
+            with self._lock:
+                idx = self._ranges.get(field)
+                if idx is None:
+                    pairs = []
+                    for i, a in enumerate(self.assets):
+                        value = self._health_fn(self._ids[i], a) if field == "health" else a.get(field)
+                        value = _number(value)
+                        if value is not None:
+                            pairs.append((value, i))
+                    idx = self._ranges[field] = sorted(pairs)
+        return idx
+
+    # ---------- queries ----------
+
+    def _text(self, query: str) -> Optional[Dict[int, float]]:
+        """row -> relevance for a free-text query; None when the query has no words."""
+        q = query.strip().lower()
+        words = _WORD.findall(q)
+        if not words:
+            return None
+        if "-" in q and " " not in q:
+            by_id = self._match_all([q])  # an asset ID as typed, e.g. "trk-1"
+            if by_id:
+                return by_id
+        return self._match_all(words)
+
+    def _match_all(self, words: List[str]) -> Dict[int, float]:
+        scores: Optional[Dict[int, float]] = None
+        for word in words:
+            matched: Dict[int, float] = {i: EXACT for i in self._postings.get(word, ())}
+            lo = bisect.bisect_left(self._vocab, word)
+            for token in self._vocab[lo:]:
+                if not token.startswith(word):
+                    break
+                for i in self._postings[token]:
+                    matched.setdefault(i, PREFIX)
+            if scores is None:
+                scores = matched
+            else:
+                scores = {i: s + matched[i] for i, s in scores.items() if i in matched}
+            if not scores:
+                return {}
+        return scores or {}
+
+    def _filter(self, rows: Optional[Set[int]], field: str, value: Any) -> Set[int]:
+        if isinstance(value, dict) and field in RANGE_FIELDS:
+            idx = self._range_index(field)
+            lo_v, hi_v = _number(value.get("min")), _number(value.get("max"))
+            lo = 0 if lo_v is None else bisect.bisect_left(idx, (lo_v, -1))
+            hi = len(idx) if hi_v is None else bisect.bisect_right(idx, (hi_v, len(self.assets)))
+            found = {i for _, i in idx[lo:hi]}
+        elif field in self._exact:
+            if value is None:
+                found = set().union(*self._exact[field].values()) if self._exact[field] else set()
+            else:
+                found = set(self._exact[field].get(_key(value), ()))
+        else:
+            # unindexed field: scan what's left
+            candidates = rows if rows is not None else range(len(self.assets))
+            want = None if value is None else _key(value)
+            found = {
+                i for i in candidates
+                if field in self.assets[i] and (want is None or _key(self.assets[i].get(field)) == want)
+            }
+        return found if rows is None else rows & found
+
+    def search(
+        self,
+        query: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """{"results", "total", "next_cursor"} for a query, filters and page."""
+        # upsert() edits postings, vocab and exact sets in place from threadpool callers
+        with self._lock:
+            return self._search(query, filters, limit, cursor)
+
+    def _search(self, query: Optional[str], filters: Optional[Dict[str, Any]], limit: Optional[int], cursor: Optional[str]) -> Dict[str, Any]:
+        scores = self._text(query or "")
+        rows: Optional[Set[int]] = None if scores is None else set(scores)
+        # most selective first: exact filters shrink the set before scans and ranges
+        for field, value in sorted((filters or {}).items(), key=lambda kv: (kv[0] not in self._exact, isinstance(kv[1], dict))):
+            rows = self._filter(rows, field, value)
+            if not rows:
+                break
+        if rows is None:
+            rows = set(range(len(self.assets)))
+        ranked = sorted((-(scores or {}).get(i, 0.0), self._ids[i], i) for i in rows)
+        start = 0
+        if cursor:
+            score, asset_id = decode_cursor(cursor)
+            start = bisect.bisect_right(ranked, (-score, asset_id, len(self.assets)))
+        end = len(ranked) if not limit else min(len(ranked), start + limit)
+        page = ranked[start:end]
+        next_cursor = None
+        if limit and end < len(ranked) and page:
+            neg, asset_id, _ = page[-1]
+            next_cursor = encode_cursor(-neg, asset_id)
+        return {"results": [self.assets[i] for *_, i in page], "total": len(ranked), "next_cursor": next_cursor}
+
@@ -0,0 +1,215 @@
+# app/services/asset_store.py
+"""
+Tenant asset registry records written by imports.
+
+Layout under ASSET_STORE_DIR (default data/assets):
+
+    <tenant>/assets.json      compacted snapshot: list of asset records
+    <tenant>/journal.ndjson   one line per upserted record, appended per batch
+
+upsert_many() appends a whole batch with one write and one fsync, so a
+50k-row import costs a few hundred appends rather than 50k. Records are keyed
+by asset_id, and on load the last record for an ID wins. Once the journal
+holds more records than the snapshot, the live set is rewritten (atomically)
+and the journal replaced by an empty one.
+
+Several worker processes can share a tenant directory. Appends and compactions
+hold an exclusive flock on <tenant>/.lock and first catch up with the journal.
+Every access compares the journal's inode and size with what this process has
+consumed: new bytes are read incrementally, and a new inode (another process
+compacted) reloads the snapshot. Corrupt lines are skipped. A partial last
+line (a torn write, or another worker's append in progress) is left unread,
+and the next writer truncates it away before appending.
+
+These records are overlaid on the tenant's base assets data by
+assets_engine.load_assets(). `generation(tenant)` is derived from the files
+on disk, so it changes with every batch written by any process and is the
+same in every process for the same data; cached datasets compare it to know
+when to rebuild.
+"""
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .profile_store import _atomic_write, _safe_name
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: run a single writer process per data directory
+    fcntl = None
+
+BASE = Path(__file__).resolve().parents[2]
+ASSET_STORE_DIR = Path(os.environ.get("ASSET_STORE_DIR", BASE / "data" / "assets"))
+
+
+class _TenantAssets:
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.records: Dict[str, Dict[str, Any]] = {}
+        self.loaded = False
+        self.journaled = 0                   # records read from the journal since the snapshot
+        self.snapshot_id: Optional[Tuple[int, int, int]] = None  # (st_ino, st_mtime_ns, st_size) of the loaded snapshot
+        self.journal_id: Optional[Tuple[int, int]] = None        # (st_dev, st_ino) of the journal we consumed
+        self.offset = 0                      # bytes of it consumed
+
+
+class AssetStore:
+    SNAPSHOT = "assets.json"
+    JOURNAL = "journal.ndjson"
+    LOCK = ".lock"
+
+    def __init__(self, root: Path, fsync: bool = True):
+        self.root = Path(root)
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._tenants: Dict[str, _TenantAssets] = {}
+
+    def _tenant(self, tenant: str) -> _TenantAssets:
+        with self._lock:
+            t = self._tenants.get(tenant)
+            if t is None:
+                t = self._tenants[tenant] = _TenantAssets(self.root / _safe_name(tenant))
+            return t
+
+    def _refresh(self, t: _TenantAssets):
+        """Apply journal records written since we last looked (by any process)."""
+        journal = t.path / self.JOURNAL
+        try:
+            st = os.stat(journal)
+        except OSError:
+            st = None
+        ident = (st.st_dev, st.st_ino) if st is not None else None
+        if not t.loaded or ident != t.journal_id or (st is not None and st.st_size < t.offset):
+            # first access, or compacted elsewhere: the snapshot holds everything up to the new journal
+            self._load_snapshot(t)
+            t.journal_id, t.offset = ident, 0
+        if st is None or st.st_size == t.offset:
+            return
+        with journal.open("rb") as f:
+            f.seek(t.offset)
+            data = f.read()
+        pos = 0
+        while True:
+            end = data.find(b"\n", pos)
+            if end < 0:
+                break  # partial line: still being written, or torn by a crash
+            try:
+                rec = json.loads(data[pos:end])
+            except ValueError:
+                rec = None  # corrupt line; later records are still good
+            pos = end + 1
+            if isinstance(rec, dict) and "asset_id" in rec:
+                t.records[rec["asset_id"]] = rec
+                t.journaled += 1
+        t.offset += pos
+
+    def _load_snapshot(self, t: _TenantAssets):
+        t.records = {}
+        t.journaled = 0
+        t.snapshot_id = None
+        snapshot = t.path / self.SNAPSHOT
+        try:
+            with snapshot.open() as f:
+                st = os.fstat(f.fileno())
+                records = json.load(f)
+        except FileNotFoundError:
+            records = []
+        else:
+            t.snapshot_id = (st.st_ino, st.st_mtime_ns, st.st_size)
+        for rec in records:
+            t.records[rec["asset_id"]] = rec
+        t.loaded = True
+
+    @contextmanager
+    def _file_lock(self, t: _TenantAssets) -> Iterator[None]:
+        """Exclusive across processes for one tenant's journal; a no-op without fcntl."""
+        if fcntl is None:
+            yield
+            return
+        t.path.mkdir(parents=True, exist_ok=True)
+        with (t.path / self.LOCK).open("a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    # ---------- reads ----------
+
+    def all(self, tenant: str) -> List[Dict[str, Any]]:
+        t = self._tenant(tenant)
+        with t.lock:
+            self._refresh(t)
+            return list(t.records.values())
+
+    def generation(self, tenant: str) -> Tuple[Any, ...]:
+        """Token for the tenant's records on disk: equal across processes for equal data."""
+        t = self._tenant(tenant)
+        with t.lock:
+            self._refresh(t)
+            return t.snapshot_id, t.journal_id, t.offset
+
+    # ---------- writes ----------
+
+    def upsert_many(self, tenant: str, records: Iterable[Dict[str, Any]]) -> Tuple[int, int]:
+        """Insert or replace records by asset_id in one journal append; returns (inserted, updated)."""
+        records = list(records)
+        if not records:
+            return 0, 0
+        t = self._tenant(tenant)
+        data = "".join(json.dumps(r, separators=(",", ":"), default=str) + "\n" for r in records).encode("utf-8")
+        with t.lock, self._file_lock(t):
+            self._refresh(t)
+            t.path.mkdir(parents=True, exist_ok=True)
+            with (t.path / self.JOURNAL).open("ab") as f:
+                # we hold the file lock and have refreshed, so unread bytes can only be a torn line
+                st = os.fstat(f.fileno())
+                if st.st_size > t.offset:
+                    f.truncate(t.offset)
+                f.write(data)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            t.journal_id = (st.st_dev, st.st_ino)
+            t.offset += len(data)
+            inserted = updated = 0
+            for r in records:
+                if r["asset_id"] in t.records:
+                    updated += 1
+                else:
+                    inserted += 1
+                t.records[r["asset_id"]] = r
+            t.journaled += len(records)
+            if t.journaled > max(1024, len(t.records)):
+                self._compact(t)
+        return inserted, updated
+
+    def _compact(self, t: _TenantAssets):
+        # caller holds the file lock and has refreshed: t.records covers every journaled record
+        snapshot = t.path / self.SNAPSHOT
+        _atomic_write(snapshot, json.dumps(list(t.records.values()), default=str))
+        # the snapshot is durable now; a new (empty) journal file tells other processes to reload it
+        journal = t.path / self.JOURNAL
+        _atomic_write(journal, "")
+        st = os.stat(snapshot)
+        t.snapshot_id = (st.st_ino, st.st_mtime_ns, st.st_size)
+        st = os.stat(journal)
+        t.journal_id, t.offset = (st.st_dev, st.st_ino), 0
+        t.journaled = 0
+
+    def compact_all(self):
+        with self._lock:
+            tenants = list(self._tenants.values())
+        for t in tenants:
+            with t.lock, self._file_lock(t):
+                self._refresh(t)
+                if t.journaled:
+                    self._compact(t)
+
+
+def open_asset_store() -> AssetStore:
+    return AssetStore(ASSET_STORE_DIR, fsync=os.environ.get("ASSET_STORE_FSYNC", "1") != "0")
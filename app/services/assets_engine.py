@@ -2,14 +2,39 @@ import json
 import math
 import os
 import re
-from datetime import datetime, timezone
-from typing import Dict, Any, List, Optional
+import threading
+import time
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
 
 from ..schemas import Asset, WorkOrder, MaintenancePlan, TelemetrySample
+from ..conditional import register_version
+from .telemetry_store import open_telemetry_store
+from .asset_index import AssetSearchIndex
+from .asset_import import normalize_header, run_import
+from .asset_store import open_asset_store
+from .doc_dates import extract_batch
+from .replace_repair import evaluate_fleet, plan_replacements
+from .maintenance import MaintenanceScheduler
+from .maintenance_store import open_maintenance_store
+from .valuation import METHODS, Curve, build_curve, fleet_series, month_index, period_summary, projected_usage
+from .workorder_store import open_workorder_store
 
 
 DEMO_PATH = "data/demo/assets.json"
 
+# per-asset columnar telemetry with hourly/daily rollups (see telemetry_store)
+TELEMETRY = open_telemetry_store()
+
+# imported registry records per tenant (see asset_store)
+ASSET_STORE = open_asset_store()
+
+# persistent work orders: ID sequences, SLA deadlines (see workorder_store); tenants start from the demo work orders
+WORK_ORDERS = open_workorder_store(seed=lambda tenant: _load_demo().get("work_orders", []))
+WORK_ORDER_PAGE = 50
+
+# maintenance plans posted through schedule_maintenance and alerts already emitted, shared by all workers
+MAINTENANCE = open_maintenance_store()
+
 
 def _load_demo():
     if os.path.exists(DEMO_PATH):
@@ -34,9 +59,8 @@ def meta_top(latency_ms=5, confidence="medium"):
     return {"source": "lightsignal.orchestrator", "confidence": confidence, "latency_ms": latency_ms, "provenance": provenance_baseline()}
 
 
-def compute_utilization(asset_id: str, data: Dict[str, Any], range: str = "30d"):
+def _utilization_metrics(series: List[Dict[str, Any]], open_work_orders: int):
     # use last period if available
-    series = data.get("utilization", {}).get(asset_id, [])
     if not series:
         return {"utilization_pct": None, "availability_pct": None, "downtime_hours": 0}
     last = series[0]
@@ -44,25 +68,18 @@ def compute_utilization(asset_id: str, data: Dict[str, Any], range: str = "30d")
     avail = last.get("available_hours", 168)
     utilization_pct = active / avail if avail > 0 else None
     # estimate downtime from work orders with open status
-    wos = data.get("work_orders", [])
-    downtime = 0
-    for w in wos:
-        if w.get("asset_id") == asset_id and w.get("status") == "open":
-            downtime += 8
+    downtime = open_work_orders * 8
     availability = (avail - downtime) / avail if avail > 0 else None
     return {"utilization_pct": round(utilization_pct * 100, 2) if utilization_pct is not None else None, "availability_pct": round(availability * 100, 2) if availability is not None else None, "downtime_hours": downtime}
 
 
-def health_score_for_asset(asset: Dict[str, Any], data: Dict[str, Any]):
+def _health_score(asset: Dict[str, Any], util: Dict[str, Any], closed: int, open_: int, total: int):
     # availability 30%, maintenance compliance 25%, faults freq 20%, freshness 15%, utilization balance 10%
-    util = compute_utilization(asset.get("asset_id"), data)
     availability = util.get("availability_pct") or 0
     # maintenance compliance: crude - fraction of closed WOs
-    wos = [w for w in data.get("work_orders", []) if w.get("asset_id") == asset.get("asset_id")]
-    closed = len([w for w in wos if w.get("status") == "closed"])
-    total = len(wos) if wos else 1
+    total = total or 1
     compliance = closed / total if total > 0 else 1.0
-    faults = len([w for w in wos if w.get("status") == "open"])  # treat open as fault proxy
+    faults = open_  # treat open as fault proxy
     faults_score = max(0, 1 - (faults / 5))
     freshness = 1.0 if asset.get("odometer") is not None else 0.5
     utilization_balance = 1.0 if (util.get("utilization_pct") or 0) < 80 else 0.6
@@ -77,268 +94,589 @@ def health_score_for_asset(asset: Dict[str, Any], data: Dict[str, Any]):
     return int(max(0, min(100, round(score))))
 
 
+DEFAULT_AGE_MONTHS = 12  # current-book estimate for assets without an in-service date; never charted
+AVG_MONTH_DAYS = 365.25 / 12
+GROUP_FIELDS = ("category", "site", "status")
+
+
+def _current_month() -> int:
+    t = time.gmtime()
+    return t.tm_year * 12 + t.tm_mon - 1
+
+
+def _depreciation_terms(asset: Dict[str, Any], dep: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    # the depreciation schedule entry wins; registry fields fill the gaps
+    terms = {
+        "cost": asset.get("cost") or 0,
+        "salvage": asset.get("salvage") or 0,
+        "useful_life_months": asset.get("useful_life_months") or 60,
+        "method": asset.get("depreciation_method"),
+        "in_service": asset.get("in_service_date") or asset.get("acquired_at"),
+        "useful_life_units": asset.get("useful_life_units"),
+        "units_basis": asset.get("units_basis"),
+    }
+    terms.update({k: v for k, v in (dep or {}).items() if v is not None})
+    return terms
+
+
+def _in_service_month(asset: Dict[str, Any], dep: Optional[Dict[str, Any]]) -> Optional[int]:
+    return month_index(_depreciation_terms(asset, dep).get("in_service"))
+
+
+def _book_curve(company_id: str, asset_id: str, asset: Dict[str, Any], dep: Optional[Dict[str, Any]], month: int) -> Tuple[int, Curve]:
+    """
+    (in-service month, curve) for one asset; units-of-production usage comes
+    from telemetry meters. An undated asset is placed DEFAULT_AGE_MONTHS before
+    `month`, which only makes sense for a current-book estimate.
+    """
+    terms = _depreciation_terms(asset, dep)
+    start = month_index(terms.get("in_service"))
+    if start is None:
+        start = month - DEFAULT_AGE_MONTHS
+    cost, salvage = float(terms["cost"]), float(terms["salvage"])
+    life = int(terms["useful_life_months"])
+    method = terms.get("method") if terms.get("method") in METHODS else "straight_line"
+    if method == "units_of_production":
+        total = float(terms.get("useful_life_units") or 0)
+        kind = "engine_hours" if terms.get("units_basis") in ("hours", "engine_hours") else "odometer"
+        reading = _meter_readings(company_id, asset_id, asset).get(kind)
+        if total > 0 and reading is not None:
+            used_now = reading[0] - float(terms.get("start_units") or 0)
+            used = projected_usage(month - start, used_now, reading[1] * AVG_MONTH_DAYS, total)
+            return start, build_curve(method, cost, salvage, life, total_units=total, used=used)
+        method = "straight_line"  # no usage basis: depreciate over time instead
+    return start, build_curve(method, cost, salvage, life, factor=float(terms.get("factor") or 2.0))
+
+
+def _range_days(range: Optional[str]) -> int:
+    m = re.fullmatch(r"(\d+)d", (range or "").strip())
+    return int(m.group(1)) if m else 30
+
+
+def _utilization_series(company_id: str, asset_id: str, data: Dict[str, Any], days: int):
+    # telemetry rollups when the asset reports; otherwise the imported utilization periods
+    rolled = TELEMETRY.utilization(company_id, asset_id, days)
+    if rolled is not None:
+        return [rolled]
+    return data.get("utilization", {}).get(asset_id, [])
+
+
+def compute_utilization(asset_id: str, data: Dict[str, Any], range: str = "30d", company_id: str = "demo"):
+    if isinstance(data, AssetDataset):
+        return data.utilization_for(asset_id, _range_days(range))
+    open_wos = sum(1 for w in data.get("work_orders", []) if w.get("asset_id") == asset_id and w.get("status") == "open")
+    return _utilization_metrics(_utilization_series(company_id, asset_id, data, _range_days(range)), open_wos)
+
+
+def health_score_for_asset(asset: Dict[str, Any], data: Dict[str, Any]):
+    if isinstance(data, AssetDataset):
+        return data.health_for(asset.get("asset_id"))
+    return AssetDataset(data).health_for(asset.get("asset_id"), asset)
+
+
+METER_RATE_DAYS = 14
+
+
+def _meter_readings(company_id: str, asset_id: str, asset: Dict[str, Any]) -> Dict[str, Tuple[float, float]]:
+    """kind -> (latest reading, units/day over the last METER_RATE_DAYS) from telemetry rollups."""
+    now = int(time.time())
+    days = TELEMETRY.rollups(company_id, asset_id, "day", (now // 86400 - METER_RATE_DAYS + 1) * 86400, now + 1)
+    out: Dict[str, Tuple[float, float]] = {}
+    for kind in ("odometer", "engine_hours"):
+        lows = [(d["start_ts"], d[f"{kind}_min"]) for d in days if not math.isnan(d[f"{kind}_min"])]
+        highs = [(d["start_ts"], d[f"{kind}_max"]) for d in days if not math.isnan(d[f"{kind}_max"])]
+        if highs:
+            span_days = max(1.0, (highs[-1][0] - lows[0][0]) / 86400 + 1)
+            out[kind] = (highs[-1][1], max(0.0, highs[-1][1] - lows[0][1]) / span_days)
+    if "odometer" not in out and asset.get("odometer") is not None:
+        out["odometer"] = (float(asset["odometer"]), 0.0)
+    return out
+
+
+class AssetDataset:
+    """
+    One load of a tenant's assets data, indexed per asset.
+
+    Work orders are grouped by asset and status once, so per-asset metrics
+    cost O(that asset's work orders) instead of a scan of all of them.
+    Utilization, health and valuation are computed on first use and cached
+    per asset; adding a work order, ingesting telemetry or upserting a
+    registry record drops only that asset's cached metrics.
+    """
+
+    def __init__(self, data: Dict[str, Any], extra_work_orders: Iterable[Dict[str, Any]] = (), company_id: str = "demo"):
+        self.company_id = company_id
+        self.data = data
+        self.assets: List[Dict[str, Any]] = data.get("assets", [])
+        self.by_id: Dict[str, Dict[str, Any]] = {a.get("asset_id"): a for a in self.assets}
+        self._rows: Dict[str, int] = {a.get("asset_id"): i for i, a in enumerate(self.assets)}
+        self.utilization: Dict[str, Any] = data.get("utilization", {})
+        self.depreciation: Dict[str, Any] = data.get("depreciation", {})
+        self.work_orders: List[Dict[str, Any]] = []
+        self._wo_index: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}  # asset_id -> status -> work orders
+        self._metrics: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._search: Optional[AssetSearchIndex] = None
+        self._scheduler: Optional[MaintenanceScheduler] = None
+        for wo in data.get("work_orders", []):
+            self._index(wo)
+        for wo in extra_work_orders:
+            self._index(wo)
+
+    def _index(self, wo: Dict[str, Any]):
+        self.work_orders.append(wo)
+        by_status = self._wo_index.setdefault(wo.get("asset_id"), {})
+        by_status.setdefault(wo.get("status"), []).append(wo)
+
+    def add_work_order(self, wo: Dict[str, Any]):
+        with self._lock:
+            self._index(wo)
+            self._metrics.pop(wo.get("asset_id"), None)
+        if self._search is not None:
+            self._search.invalidate_derived()
+        if self._scheduler is not None:
+            self._scheduler.add_work_order(wo)
+
+    def update_work_order(self, wo: Dict[str, Any]):
+        """Replace the indexed copy of a work order whose status (or other fields) changed."""
+        with self._lock:
+            self.work_orders = [wo if w.get("wo_id") == wo.get("wo_id") else w for w in self.work_orders]
+            by_status = self._wo_index.get(wo.get("asset_id"), {})
+            for status, wos in list(by_status.items()):
+                by_status[status] = [w for w in wos if w.get("wo_id") != wo.get("wo_id")]
+            by_status.setdefault(wo.get("status"), []).append(wo)
+            self._wo_index[wo.get("asset_id")] = by_status
+            self._metrics.pop(wo.get("asset_id"), None)
+        if self._search is not None:
+            self._search.invalidate_derived()
+        if self._scheduler is not None:
+            self._scheduler.add_work_order(wo)
+
+    def invalidate(self, asset_id: str):
+        self._metrics.pop(asset_id, None)
+        if self._search is not None:
+            self._search.invalidate_derived()
+
+    def upsert_assets(self, records: Iterable[Dict[str, Any]]):
+        """New or edited registry records: swap them in and re-derive only those assets."""
+        for rec in records:
+            asset_id = rec.get("asset_id")
+            with self._lock:
+                i = self._rows.get(asset_id)
+                if i is None:
+                    self._rows[asset_id] = len(self.assets)
+                    self.assets.append(rec)
+                else:
+                    self.assets[i] = rec
+                self.by_id[asset_id] = rec
+                self._metrics.pop(asset_id, None)
+            if self._search is not None:
+                self._search.upsert(rec)
+                self._search.invalidate_derived()
+            if self._scheduler is not None:
+                for kind in ("warranty", "insurance"):
+                    self._scheduler.add_expiry(asset_id, kind, rec.get(f"{kind}_expires"))
+                for kind, (reading, rate) in _meter_readings(self.company_id, asset_id, rec).items():
+                    self._scheduler.set_meter(asset_id, kind, reading, rate)
+
+    def refresh_telemetry(self, asset_ids: Iterable[str]):
+        """New telemetry for these assets: drop their cached metrics and re-read their meters."""
+        for asset_id in asset_ids:
+            self.invalidate(asset_id)
+            if self._scheduler is not None:
+                for kind, (reading, rate) in _meter_readings(self.company_id, asset_id, self.by_id.get(asset_id, {})).items():
+                    self._scheduler.set_meter(asset_id, kind, reading, rate)
+
+    def scheduler(self) -> MaintenanceScheduler:
+        """Next-due maintenance events for this tenant, built on first use and kept current incrementally."""
+        if self._scheduler is None:
+            with self._lock:
+                if self._scheduler is None:
+                    self._scheduler = self._build_scheduler()
+        return self._scheduler
+
+    def _build_scheduler(self) -> MaintenanceScheduler:
+        sched = MaintenanceScheduler(claim_alert=lambda key, version: MAINTENANCE.claim_alert(self.company_id, key, version))
+        for a in self.assets:
+            asset_id = a.get("asset_id")
+            for kind in ("warranty", "insurance"):
+                if a.get(f"{kind}_expires"):
+                    sched.add_expiry(asset_id, kind, a[f"{kind}_expires"])
+            for kind, (reading, rate) in _meter_readings(self.company_id, asset_id, a).items():
+                sched.set_meter(asset_id, kind, reading, rate)
+        for plan in list(self.data.get("maintenance_plans", [])) + MAINTENANCE.plans(self.company_id):
+            closed = [w.get("closed_at") for w in self.work_orders_for(plan.get("asset_id"), "closed") if w.get("closed_at")]
+            sched.add_plan(plan, last_done_at=max(closed) if closed else None)
+        for wo in self.work_orders:
+            sched.add_work_order(wo)
+        return sched
+
+    def search_index(self) -> AssetSearchIndex:
+        if self._search is None:
+            with self._lock:
+                if self._search is None:
+                    self._search = AssetSearchIndex(self.assets, lambda asset_id, asset: self.health_for(asset_id, asset))
+        return self._search
+
+    def work_orders_for(self, asset_id: str, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        by_status = self._wo_index.get(asset_id, {})
+        if status is not None:
+            return by_status.get(status, [])
+        return [wo for wos in by_status.values() for wo in wos]
+
+    def _count(self, asset_id: str, status: Optional[str] = None) -> int:
+        by_status = self._wo_index.get(asset_id, {})
+        if status is not None:
+            return len(by_status.get(status, ()))
+        return sum(len(wos) for wos in by_status.values())
+
+    def _cached(self, asset_id: str) -> Dict[str, Any]:
+        m = self._metrics.get(asset_id)
+        if m is None:
+            m = self._metrics[asset_id] = {}
+        return m
+
+    def utilization_for(self, asset_id: str, days: int = 30) -> Dict[str, Any]:
+        m = self._cached(asset_id)
+        key = "utilization" if days == 30 else f"utilization:{days}"
+        if key not in m:
+            series = _utilization_series(self.company_id, asset_id, self.data, days)
+            m[key] = _utilization_metrics(series, self._count(asset_id, "open"))
+        return m[key]
+
+    def health_for(self, asset_id: str, asset: Optional[Dict[str, Any]] = None) -> int:
+        m = self._cached(asset_id)
+        if "health" not in m:
+            asset = asset if asset is not None else self.by_id.get(asset_id, {})
+            m["health"] = _health_score(
+                asset,
+                self.utilization_for(asset_id),
+                closed=self._count(asset_id, "closed"),
+                open_=self._count(asset_id, "open"),
+                total=self._count(asset_id),
+            )
+        return m["health"]
+
+    def book_curve(self, asset_id: str) -> Tuple[int, Curve]:
+        """(in-service month, monthly book/depreciation curve), rebuilt when the asset is invalidated or the month turns."""
+        month = _current_month()
+        m = self._cached(asset_id)
+        cached = m.get("book_curve")
+        if cached is None or cached[0] != month:
+            curve = _book_curve(self.company_id, asset_id, self.by_id.get(asset_id, {}), self.depreciation.get(asset_id), month)
+            cached = m["book_curve"] = (month, curve)
+        return cached[1]
+
+    def valuation_for(self, asset_id: str) -> Dict[str, Any]:
+        start, (book, dep) = self.book_curve(asset_id)
+        age = min(max(0, _current_month() - start), len(book) - 1)
+        return {"book_value_monthly": round(dep[age], 2), "current_book": round(book[age], 2)}
+
+
+def _registry_record(rec: Dict[str, Any]) -> Dict[str, Any]:
+    # imported records carry only the columns the file had
+    return {**dict.fromkeys(Asset.model_fields), **rec}
+
+
 def load_assets(company_id: str = "demo"):
-    # only demo supported for now
+    # demo data is the base for every tenant; imported records are overlaid by asset_id
     data = _load_demo()
+    imported = ASSET_STORE.all(company_id)
+    if imported:
+        by_id = {a.get("asset_id"): i for i, a in enumerate(data.get("assets", []))}
+        assets = list(data.get("assets", []))
+        for rec in map(_registry_record, imported):
+            i = by_id.get(rec["asset_id"])
+            if i is None:
+                by_id[rec["asset_id"]] = len(assets)
+                assets.append(rec)
+            else:
+                assets[i] = rec
+        data = {**data, "assets": assets}
     return data
 
 
-_IN_MEMORY_WOS: List[Dict[str, Any]] = []
-_IN_MEMORY_TELEMETRY: List[Dict[str, Any]] = []
+# tenant -> {"stamp", "assets" (store generation), "work_orders" (revision), "telemetry" (change cursor), "dataset"}
+_DATASETS: Dict[str, Dict[str, Any]] = {}
+_DATASET_LOCK = threading.Lock()
+
+
+def _assets_version(company_id: str):
+    # ETag input (see app.conditional): every store below is shared by all worker processes
+    return [ASSET_STORE.generation(company_id), WORK_ORDERS.version(company_id), MAINTENANCE.revision(company_id), TELEMETRY.version(company_id)]
+
+
+register_version("assets", _assets_version)
+
+
+def _data_stamp():
+    try:
+        st = os.stat(DEMO_PATH)
+        return st.st_mtime_ns, st.st_size
+    except OSError:
+        return None
+
+
+def load_dataset(company_id: str = "demo") -> AssetDataset:
+    """
+    Indexed assets data; rebuilt only when the underlying file, work orders
+    or saved plans change (in any process). Imported records and telemetry
+    written by any process refresh just the assets they touched, and work
+    order writes made through this module are applied in place.
+    """
+    stamp = (_data_stamp(), MAINTENANCE.revision(company_id))
+    work_orders = WORK_ORDERS.revision(company_id)
+    generation = ASSET_STORE.generation(company_id)
+    with _DATASET_LOCK:
+        cached = _DATASETS.get(company_id)
+        if cached is not None and cached["stamp"] == stamp and cached["work_orders"] == work_orders:
+            cursor, touched = TELEMETRY.changes(company_id, cached["telemetry"])
+            if touched is not None:
+                ds = cached["dataset"]
+                if cached["assets"] != generation:
+                    ds.upsert_assets([r for r in map(_registry_record, ASSET_STORE.all(company_id)) if ds.by_id.get(r["asset_id"]) != r])
+                    cached["assets"] = generation
+                ds.refresh_telemetry(touched)
+                cached["telemetry"] = cursor
+                return ds
+        # take the telemetry position first: anything ingested during the build is refreshed next time
+        cursor, _ = TELEMETRY.changes(company_id)
+        data = {**load_assets(company_id), "work_orders": WORK_ORDERS.all(company_id)}
+        cached = _DATASETS[company_id] = {
+            "stamp": stamp,
+            "assets": generation,
+            "work_orders": work_orders,
+            "telemetry": cursor,
+            "dataset": AssetDataset(data, company_id=company_id),
+        }
+        return cached["dataset"]
+
+
+def _wrote_work_order(company_id: str, ds: AssetDataset, before: int):
+    """
+    Our own write (one revision) is already applied to `ds`: move its cached
+    revision past it, unless another process wrote in between, in which case
+    the next load_dataset rebuilds.
+    """
+    after = WORK_ORDERS.revision(company_id)
+    with _DATASET_LOCK:
+        cached = _DATASETS.get(company_id)
+        if after == before + 1 and cached is not None and cached["dataset"] is ds and cached["work_orders"] == before:
+            cached["work_orders"] = after
 
 
 def create_work_order(company_id: str, asset_id: str, priority: str, summary: str, sla_hours: Optional[int] = None):
-    # generate id
-    nid = f"WO-{2200 + len(_IN_MEMORY_WOS) + len(load_assets().get('work_orders', [])) + 1}"
-    wo = {"wo_id": nid, "asset_id": asset_id, "priority": priority, "summary": summary, "status": "open", "created_at": datetime.now(timezone.utc).isoformat(), "closed_at": None}
-    _IN_MEMORY_WOS.append(wo)
+    ds = load_dataset(company_id)
+    before = WORK_ORDERS.revision(company_id)
+    wo = WORK_ORDERS.create(company_id, asset_id, priority, summary, sla_hours)
+    ds.add_work_order(wo)
+    _wrote_work_order(company_id, ds, before)
     return wo
 
 
+def update_work_order(company_id: str, wo_id: str, status: str):
+    """Change a work order's status; None if the tenant has no such work order."""
+    ds = load_dataset(company_id)
+    before = WORK_ORDERS.revision(company_id)
+    wo = WORK_ORDERS.set_status(company_id, wo_id, status)
+    if wo is not None:
+        ds.update_work_order(wo)
+        _wrote_work_order(company_id, ds, before)
+    return wo
+
+
+def list_work_orders(company_id: str, asset_id: Optional[str] = None, status: Optional[str] = None, priority: Optional[str] = None, limit: Optional[int] = None, cursor: Optional[str] = None):
+    """A page of work orders, newest first; pass the previous page's next_cursor to continue (raises InvalidCursor)."""
+    page = WORK_ORDERS.list(company_id, asset_id, status, priority, limit or WORK_ORDER_PAGE, cursor)
+    return {**page, "_meta": meta_top()}
+
+
+def work_order_breaches(company_id: str):
+    """Open work orders past their SLA deadline; "new" marks the ones first flagged by this call."""
+    return {"work_orders": WORK_ORDERS.open_breaches(company_id), "_meta": meta_top()}
+
+
 def schedule_maintenance(company_id: str, asset_id: str, plan: Dict[str, Any]):
-    # accept and pretend to persist
-    plan_rec = {"plan_id": f"MP-{int(math.fsum([ord(c) for c in asset_id])%1000)}", "asset_id": asset_id}
-    plan_rec.update(plan)
-    # not persisting to disk for demo
-    return True
+    """Track a maintenance plan for an asset; returns its next-due event."""
+    plan_rec = MAINTENANCE.save_plan(company_id, asset_id, plan)
+    # the new plan revision makes load_dataset rebuild, and the rebuilt scheduler includes the plan
+    return load_dataset(company_id).scheduler().plan(plan_rec["plan_id"])
+
+
+def maintenance_due(company_id: str, days: float = 30, types: Optional[List[str]] = None, limit: Optional[int] = None):
+    events = load_dataset(company_id).scheduler().due_within(days, types, limit)
+    return {"events": events, "_meta": meta_top()}
+
+
+def maintenance_alerts(company_id: str):
+    """Maintenance alerts that became due since the previous call."""
+    return {"events": load_dataset(company_id).scheduler().poll_alerts(), "_meta": meta_top()}
 
 
 def replace_vs_repair_calc(req: Dict[str, Any], data: Dict[str, Any]):
-    # Inputs - req is already a dict from model_dump()
-    repair_cost_year = float(req.get("repair_cost_year", 0))
-    downtime_cost_year = float(req.get("downtime_cost_year", 0))
+    # Inputs - req is already a dict from model_dump(); a fleet of one (see replace_repair)
     replacement_cost = float(req.get("replacement_cost", 0))
-    life_months = int(req.get("replacement_useful_life_months", 60))
-    discount = float(req.get("discount_rate_pct", 8)) / 100.0
-    prod_gain = float(req.get("expected_productivity_gain_pct", 0)) / 100.0
-
-    # 3-year TCO for repair = sum of (repair_cost + downtime_cost) * years(3)
-    annual_repair = repair_cost_year + downtime_cost_year
-    tco_repair_3 = annual_repair * 3
-
-    # replacement: amortize replacement cost over life, consider productivity gain as negative cost
-    amort_annual = replacement_cost / (life_months / 12.0)
-    prod_savings_annual = amort_annual * prod_gain
-    tco_replace_3 = (amort_annual - prod_savings_annual) * 3
-
-    # NPV comparison over 3 years, simple discounting
-    def npv_annuity(annual):
-        npv = 0.0
-        for y in range(1, 4):
-            npv += annual / ((1 + discount) ** y)
-        return npv
-
-    npv_repair = npv_annuity(annual_repair)
-    npv_replace = npv_annuity(amort_annual - prod_savings_annual) + 0  # purchase treated via amort annual
-
-    npv_savings = round(npv_repair - npv_replace, 2)
-
-    # payback months = replacement_cost / annual_savings if positive
-    annual_savings = annual_repair - (amort_annual - prod_savings_annual)
-    payback_months = None
-    if annual_savings > 0:
-        payback_months = int(round((replacement_cost) / annual_savings * 12))
-
-    # heuristic recommendation
-    recommendation = "repair"
-    if (annual_repair) > 0.6 * (replacement_cost / (life_months / 12.0)):
-        recommendation = "replace"
-    elif abs(npv_savings) < 1000:
-        recommendation = "borderline"
-
+    out = evaluate_fleet(
+        [float(req.get("repair_cost_year", 0))],
+        [float(req.get("downtime_cost_year", 0))],
+        [replacement_cost],
+        [int(req.get("replacement_useful_life_months", 60))],
+        [float(req.get("expected_productivity_gain_pct", 0)) / 100.0],
+        float(req.get("discount_rate_pct", 8)) / 100.0,
+    )
     assumptions = {"mtbf_hours": 520, "mttr_hours": 2.1}
+    return {**{k: v[0] for k, v in out.items()}, "assumptions": assumptions, "_meta": meta_top()}
+
+
+def fleet_replace_vs_repair(req: Dict[str, Any]):
+    """Replace-vs-repair for many assets at once plus a ranked plan under the capex budget.
+
+    Columns are parallel lists keyed like the single-asset request. replacement_cost
+    and replacement_useful_life_months default to each asset's registry cost and
+    useful life; productivity gain may be one number for the whole fleet.
+    """
+    ids = list(req["asset_ids"])
+    n = len(ids)
+    by_id = load_dataset(req.get("company_id", "demo")).by_id
+
+    def column(key: str, default):
+        values = req.get(key)
+        if values is None or isinstance(values, (int, float)):
+            return [default(a) if values is None else values for a in ids]
+        if len(values) != n:
+            raise ValueError(f"{key} must have one value per asset")
+        return [default(a) if v is None else v for v, a in zip(values, ids)]
+
+    replacement_cost = [float(v) for v in column("replacement_cost", lambda a: by_id.get(a, {}).get("cost") or 0.0)]
+    # no quote and no registry cost (e.g. an unknown asset_id) would read as a free replacement
+    unpriced = [a for a, c in zip(ids, replacement_cost) if c <= 0]
+    if unpriced:
+        shown = ", ".join(unpriced[:10]) + (f" and {len(unpriced) - 10} more" if len(unpriced) > 10 else "")
+        raise ValueError(f"no replacement cost for: {shown} (unknown asset_id or missing cost)")
+    out = evaluate_fleet(
+        [float(v) for v in column("repair_cost_year", lambda a: 0.0)],
+        [float(v) for v in column("downtime_cost_year", lambda a: 0.0)],
+        replacement_cost,
+        [float(v) for v in column("replacement_useful_life_months", lambda a: by_id.get(a, {}).get("useful_life_months") or 60)],
+        [float(v) / 100.0 for v in column("expected_productivity_gain_pct", lambda a: 0.0)],
+        float(req.get("discount_rate_pct", 8)) / 100.0,
+    )
+    results = [{"asset_id": a, **{k: v[i] for k, v in out.items()}} for i, a in enumerate(ids)]
+    plan = plan_replacements(ids, replacement_cost, out, req.get("capex_budget"), req.get("max_replacements"))
+    counts = {rec: out["recommendation"].count(rec) for rec in ("replace", "repair", "borderline")}
+    return {"assets": results, "plan": plan, "summary": {"assets": n, **counts}, "_meta": meta_top()}
 
-    return {
-        "tco_3yr_repair": round(tco_repair_3, 2),
-        "tco_3yr_replace": round(tco_replace_3, 2),
-        "npv_savings": npv_savings,
-        "payback_months": payback_months,
-        "recommendation": recommendation,
-        "assumptions": assumptions,
-        "_meta": meta_top()
-    }
+
+def import_assets(company_id: str, rows: Iterable[Tuple[int, Dict[str, Any]]]) -> Iterator[Dict[str, Any]]:
+    """Validate and upsert (line, row) pairs chunk by chunk; yields asset_import progress events."""
+    existing = dict(load_dataset(company_id).by_id)
+    yield from run_import(rows, existing, lambda batch: ASSET_STORE.upsert_many(company_id, batch))
 
 
 def import_rows(company_id: str, rows: List[Dict[str, Any]]):
-    imported = 0
-    skipped = 0
-    warnings = []
-    for r in rows:
-        if not r.get("asset_id"):
-            skipped += 1
-            warnings.append("missing asset_id")
-            continue
-        imported += 1
-    return {"imported": imported, "skipped": skipped, "warnings": warnings, "_meta": meta_top()}
+    numbered = ((n, {normalize_header(k): v for k, v in r.items()}) for n, r in enumerate(rows, start=1))
+    warnings: List[str] = []
+    done: Dict[str, Any] = {}
+    for event in import_assets(company_id, numbered):
+        warnings.extend(f"row {e['row']}: {e['error']}" for e in event.get("errors", ()))
+        done = event
+    return {
+        "imported": done["inserted"] + done["updated"],
+        "inserted": done["inserted"],
+        "updated": done["updated"],
+        "skipped": done["skipped"],
+        "warnings": warnings,
+        "_meta": meta_top(),
+    }
 
 
 def extract_document_dates(company_id: str, docs: List[Dict[str, Any]]):
-    """Enhanced demo document date extraction with regex patterns"""
-    hints = []
-    
-    # Common date patterns for expiration dates
-    date_patterns = [
-        r'expir(?:es?|ation)\s*:?\s*(\d{4}-\d{2}-\d{2})',  # expires: 2025-12-01
-        r'expir(?:es?|ation)\s*:?\s*(\w+\s+\d{1,2},?\s+\d{4})',  # expires January 1, 2025
-        r'valid\s+until\s+(\w+\s+\d{4})',  # valid until March 2026
-        r'due\s*:?\s*(\d{4}-\d{2}-\d{2})',  # due: 2025-11-15
-        r'(\d{1,2}/\d{1,2}/\d{4})\s*expir',  # 12/01/2025 expir
-    ]
-    
-    for doc in docs:
-        doc_id = doc.get("doc_id")
-        text = (doc.get("text") or "").lower()
-        found_hints = []
-        
-        for pattern in date_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            for match in matches:
-                # Try to normalize date format
-                try:
-                    if '-' in match:  # ISO format
-                        parsed_date = datetime.strptime(match, "%Y-%m-%d")
-                    elif '/' in match:  # MM/DD/YYYY
-                        parsed_date = datetime.strptime(match, "%m/%d/%Y")
-                    else:  # Natural language
-                        # Simple parsing for demo - could use dateutil.parser in real implementation
-                        parsed_date = datetime.strptime("2025-12-01", "%Y-%m-%d")  # fallback
-                    
-                    # Determine field type based on document type and keywords
-                    field = "expiration_date"
-                    if "warranty" in text:
-                        field = "warranty_expires"
-                    elif "insurance" in text:
-                        field = "insurance_expires"
-                    elif "registration" in text:
-                        field = "registration_expires"
-                    elif "certification" in text or "cert" in text:
-                        field = "certification_expires"
-                    
-                    found_hints.append({
-                        "field": field,
-                        "value": parsed_date.strftime("%Y-%m-%d"),
-                        "original_text": match,
-                        "confidence": "medium" if '-' in match else "low"
-                    })
-                    
-                except Exception:
-                    # Fallback hint for unparseable dates
-                    found_hints.append({
-                        "field": "expiration_date", 
-                        "value": "2025-12-01",
-                        "original_text": match,
-                        "confidence": "low"
-                    })
-        
-        # If no specific patterns found but contains expiration keywords
-        if not found_hints and any(word in text for word in ["expire", "expiration", "due", "valid until"]):
-            found_hints.append({
-                "field": "expiration_date",
-                "value": "2025-12-01",
-                "original_text": "contains expiration keywords",
-                "confidence": "low"
-            })
-        
-        hints.append({
-            "doc_id": doc_id,
-            "hints": found_hints,
-            "confidence": "medium" if found_hints else "low"
-        })
-    
-    return {"documents": hints, "_meta": meta_top()}
+    """Expiration-date hints per document (see doc_dates); big batches use the process pool."""
+    return {"documents": extract_batch(docs), "_meta": meta_top()}
 
 
 def ingest_telemetry(company_id: str, asset_id: str, samples: List[Dict[str, Any]]):
-    for s in samples:
-        rec = {"company_id": company_id, "asset_id": asset_id, "sample": s}
-        _IN_MEMORY_TELEMETRY.append(rec)
+    # logged as a change to this asset; cached datasets refresh its metrics and meters on next use
+    TELEMETRY.ingest(company_id, asset_id, samples)
     return {"ok": True, "_meta": meta_top()}
 
 
-def search_registry(company_id: str, query: Optional[str], filters: Optional[Dict[str, Any]]):
-    data = load_assets(company_id)
-    items = data.get("assets", [])
-    res = []
-    q = (query or "").lower()
-    for it in items:
-        ok = True
-        if q:
-            ok = q in (it.get("name") or "").lower() or q in (it.get("asset_id") or "").lower() or q in (it.get("category") or "").lower()
-        if not ok:
-            continue
-        if filters:
-            for k, v in filters.items():
-                if k not in it or (v is not None and str(it.get(k)).lower() != str(v).lower()):
-                    ok = False
-                    break
-        if ok:
-            res.append(it)
-    return {"results": res, "_meta": meta_top()}
-    data = load_assets(company_id)
-    items = data.get("assets", [])
-    res = []
-    q = (query or "").lower()
-    for it in items:
-        ok = True
-        if q:
-            ok = q in (it.get("name") or "").lower() or q in (it.get("asset_id") or "").lower() or q in (it.get("category") or "").lower()
-        if not ok:
-            continue
-        if filters:
-            for k, v in filters.items():
-                if k not in it or (v is not None and str(it.get(k)).lower() != str(v).lower()):
-                    ok = False
-                    break
-        if ok:
-            res.append(it)
-    return {"results": res, "_meta": meta_top()}
+def ingest_telemetry_batch(company_id: str, rows: List[Tuple[str, Dict[str, Any]]]) -> int:
+    """Write one validated bulk batch of (asset_id, sample) rows; returns samples accepted."""
+    by_asset: Dict[str, List[Dict[str, Any]]] = {}
+    for asset_id, sample in rows:
+        by_asset.setdefault(asset_id, []).append(sample)
+    accepted = 0
+    for asset_id, samples in by_asset.items():
+        accepted += TELEMETRY.ingest(company_id, asset_id, samples)
+    return accepted
+
+
+def fleet_valuation(company_id: str, start: Optional[str] = None, end: Optional[str] = None, group_by: Optional[str] = None, include_assets: bool = False):
+    """
+    Fleet book value and depreciation at each month-end from start to end
+    ("YYYY-MM"; default the trailing 12 months), plus the period roll-forward
+    (opening, additions, depreciation, closing). Assets without an in-service
+    date have no place on a calendar, so they are left out of the series and
+    listed under "undated". Raises ValueError on bad input.
+    """
+    ds = load_dataset(company_id)
+    last = month_index(end) if end else _current_month()
+    first = month_index(start) if start else (last - 11 if last is not None else None)
+    if first is None or last is None:
+        raise ValueError("start and end must be YYYY-MM months")
+    if group_by is not None and group_by not in GROUP_FIELDS:
+        raise ValueError(f"group_by must be one of {', '.join(GROUP_FIELDS)}")
+    dated, undated = [], []
+    for a in ds.assets:
+        asset_id = a.get("asset_id")
+        (dated if _in_service_month(a, ds.depreciation.get(asset_id)) is not None else undated).append(a)
+    entries = [(a.get("asset_id"), *ds.book_curve(a.get("asset_id"))) for a in dated]
+    groups = {a.get("asset_id"): a.get(group_by) for a in dated} if group_by else None
+    out = fleet_series(entries, first, last, groups)
+    period = period_summary(entries, first, last)
+    if not include_assets:
+        period.pop("assets")
+    return {**out, "period": period, "undated": sorted(a.get("asset_id") for a in undated), "_meta": meta_top()}
+
+
+def search_registry(company_id: str, query: Optional[str], filters: Optional[Dict[str, Any]], limit: Optional[int] = None, cursor: Optional[str] = None):
+    """Indexed registry search; pass the previous page's next_cursor to continue (raises InvalidCursor)."""
+    page = load_dataset(company_id).search_index().search(query, filters, limit, cursor)
+    return {**page, "_meta": meta_top()}
 
 
 def full_overview(req: Dict[str, Any]):
     # req is already a dict from model_dump()
     company_id = req.get("company_id", "demo")
-    data = load_assets(company_id)
+    ds = load_dataset(company_id)
+    data = ds.data
     # Build top-level response keys
-    assets = data.get("assets", [])
+    assets = ds.assets
     registry = assets if req.get("include_registry", True) else []
-    work_orders = data.get("work_orders", []) + _IN_MEMORY_WOS
+    # newest page only; the full history is paged through list_work_orders
+    work_orders = WORK_ORDERS.list(company_id, limit=WORK_ORDER_PAGE)["work_orders"]
     # KPIs: counts and utilization averages
     kpis = {"total_assets": len(assets), "active_assets": len([a for a in assets if a.get("status") == "active"]), "avg_utilization_pct": None}
     util_vals = []
     for a in assets:
-        u = compute_utilization(a.get("asset_id"), data)
+        u = ds.utilization_for(a.get("asset_id"))
         if u.get("utilization_pct") is not None:
             util_vals.append(u.get("utilization_pct"))
     if util_vals:
         kpis["avg_utilization_pct"] = round(sum(util_vals) / len(util_vals), 2)
 
-    # Valuation (simple straight-line monthly depreciation current book value approximation)
-    valuation = {}
-    for a in assets:
-        dep = data.get("depreciation", {}).get(a.get("asset_id")) or {"cost": a.get("cost") or 0, "salvage": a.get("salvage") or 0, "useful_life_months": a.get("useful_life_months") or 60}
-        monthly = (dep["cost"] - dep["salvage"]) / max(1, dep["useful_life_months"])
-        valuation[a.get("asset_id")] = {"book_value_monthly": round(monthly, 2), "current_book": round(max(0, dep["cost"] - monthly * 12), 2)}
+    # Valuation: this month's depreciation and book value from each asset's cached curve
+    valuation = {a.get("asset_id"): ds.valuation_for(a.get("asset_id")) for a in assets}
 
     # utilization series
-    utilization = data.get("utilization", {})
+    utilization = ds.utilization
 
-    # alerts: warranties expiring in next 60 days
-    alerts = []
-    now = datetime.now()
-    for a in assets:
-        for fld, label in (("warranty_expires", "warranty"), ("insurance_expires", "insurance")):
-            v = a.get(fld)
-            if v:
-                try:
-                    d = datetime.fromisoformat(v)
-                except Exception:
-                    try:
-                        d = datetime.strptime(v, "%Y-%m-%d")
-                    except Exception:
-                        continue
-                delta = (d - now).days
-                if delta <= 60:
-                    alerts.append({"asset_id": a.get("asset_id"), "type": label, "expires_in_days": delta})
+    # alerts: warranties / insurance expiring in the next 60 days (or already expired)
+    alerts = [
+        {"asset_id": e["asset_id"], "type": e["type"], "expires_in_days": e["due_in_days"]}
+        for e in ds.scheduler().due_within(60, types=("warranty", "insurance"))
+    ]
 
     # quick actions and export placeholders
     quick_actions = {"create_work_order": True, "schedule_maintenance": True}
@@ -348,7 +686,7 @@ def full_overview(req: Dict[str, Any]):
     registry_with_health = []
     for a in assets:
         ah = dict(a)
-        ah["health_score"] = health_score_for_asset(a, data)
+        ah["health_score"] = ds.health_for(a.get("asset_id"), a)
         registry_with_health.append(ah)
 
     return {
@@ -0,0 +1,205 @@
+# app/services/doc_dates.py
+"""
+Expiration-date hints from fleet document text (warranty, insurance,
+registration, certification).
+
+One precompiled pattern covers every token the extractor cares about: cue
+phrases ("expires", "valid until", "due", "renew by", ...), field keywords
+("warranty", "policy", "registration", ...) and dates in ISO, US numeric,
+"January 5, 2026", "5 Jan 2026" and "March 2026" forms. Each document is
+scanned once with finditer, keeping the position of the last cue and the last
+field keyword:
+
+  - a date is a hint when a cue precedes it within CUE_WINDOW characters (a
+    cue claims only the first such date), or when a cue follows it after
+    nothing but whitespace ("12/01/2025 expiration")
+  - its field is the nearest preceding field keyword within FIELD_WINDOW,
+    else the first field keyword in the document, else "expiration_date"
+  - "March 2026" means the end of that month; impossible dates (02/30) are
+    dropped rather than guessed
+
+extract_batch() fans large batches out over a process pool (the work is pure
+CPU in the regex engine, so threads would serialize on the GIL). The pool is
+created lazily inside a server that already runs threads, so its workers come
+from a forkserver (spawn where that is unavailable), never a plain fork that
+could inherit a lock held by another thread.
+"""
+import atexit
+import calendar
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+CUE_WINDOW = 40
+FIELD_WINDOW = 120
+
+WORKERS = int(os.environ.get("DOC_EXTRACT_WORKERS", str(min(8, os.cpu_count() or 1))))
+PARALLEL_MIN_DOCS = int(os.environ.get("DOC_EXTRACT_PARALLEL_MIN_DOCS", "256"))
+
+_MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+_MONTH = r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\.?"
+
+_FIELDS = {
+    "warranty": "warranty_expires",
+    "insurance": "insurance_expires",
+    "registration": "registration_expires",
+    "certification": "certification_expires",
+}
+_FIELD_WORDS = {
+    "warranty": "warranty", "warranties": "warranty",
+    "insurance": "insurance", "insured": "insurance", "policy": "insurance", "coverage": "insurance",
+    "registration": "registration", "registered": "registration", "tags": "registration", "plates": "registration",
+    "certification": "certification", "certificate": "certification", "cert": "certification", "inspection": "certification",
+}
+
+_TOKENS = re.compile(
+    r"(?P<cue>\bexpir(?:es|ed|y|ation|ing)?\b|\bvalid\s+(?:until|through|thru|to)\b|\bgood\s+(?:until|through|thru)\b"
+    r"|\brenew(?:al)?\s+(?:by|due|date)\b|\bdue\b|\bends?\b|\bterminates?\b)"
+    r"|(?P<field>\b(?:" + "|".join(_FIELD_WORDS) + r")\b)"
+    r"|(?P<iso>\b(?P<iy>\d{4})-(?P<im>\d{1,2})-(?P<id>\d{1,2})\b)"
+    r"|(?P<us>\b(?P<um>\d{1,2})/(?P<ud>\d{1,2})/(?P<uy>\d{4}|\d{2})\b)"
+    r"|(?P<mdy>\b(?P<mm>" + _MONTH + r")\s+(?P<md>\d{1,2})(?:st|nd|rd|th)?,?\s+(?P<my>\d{4})\b)"
+    r"|(?P<dmy>\b(?P<dd>\d{1,2})(?:st|nd|rd|th)?\s+(?:of\s+)?(?P<dm>" + _MONTH + r"),?\s+(?P<dy>\d{4})\b)"
+    r"|(?P<ym>\b(?P<ymm>" + _MONTH + r"),?\s+(?P<ymy>\d{4})\b)",
+    re.I,
+)
+
+
+def _month(name: str) -> int:
+    return _MONTHS[name[:3].lower()]
+
+
+def _year(text: str) -> int:
+    y = int(text)
+    return 2000 + y if y < 100 else y
+
+
+def parse_match(m: "re.Match") -> Optional[Tuple[date, bool]]:
+    """(date, exact) for a date token; exact is False for month-year forms. None if impossible."""
+    try:
+        if m.group("iso"):
+            return date(int(m.group("iy")), int(m.group("im")), int(m.group("id"))), True
+        if m.group("us"):
+            return date(_year(m.group("uy")), int(m.group("um")), int(m.group("ud"))), True
+        if m.group("mdy"):
+            return date(int(m.group("my")), _month(m.group("mm")), int(m.group("md"))), True
+        if m.group("dmy"):
+            return date(int(m.group("dy")), _month(m.group("dm")), int(m.group("dd"))), True
+        if m.group("ym"):
+            y, mo = int(m.group("ymy")), _month(m.group("ymm"))
+            return date(y, mo, calendar.monthrange(y, mo)[1]), False
+    except ValueError:
+        return None
+    return None
+
+
+def extract_text(text: str) -> List[Dict[str, Any]]:
+    """Date hints for one document, in order of appearance, deduplicated by (field, value)."""
+    hints: List[Dict[str, Any]] = []
+    seen = set()
+    last_cue = last_field_pos = -10**9
+    last_field: Optional[str] = None
+    first_field: Optional[str] = None
+    waiting: Optional[Dict[str, Any]] = None  # a date that a directly following cue may claim
+    waiting_end = 0
+
+    def emit(hint: Dict[str, Any]):
+        key = (hint["field"], hint["value"])
+        if key not in seen:
+            seen.add(key)
+            hints.append(hint)
+
+    for m in _TOKENS.finditer(text):
+        if m.group("cue"):
+            last_cue = m.end()
+            if waiting is not None and not text[waiting_end:m.start()].strip():
+                emit(waiting)
+            waiting = None
+            continue
+        if m.group("field"):
+            last_field = _FIELD_WORDS[m.group("field").lower()]
+            last_field_pos = m.start()
+            first_field = first_field or last_field
+            continue
+        parsed = parse_match(m)
+        if parsed is None:
+            continue
+        value, exact = parsed
+        near_field = last_field if m.start() - last_field_pos <= FIELD_WINDOW else None
+        hint = {
+            "field": near_field,
+            "value": value.isoformat(),
+            "original_text": m.group(0),
+            "confidence": "high" if exact and near_field else "medium" if exact else "low",
+        }
+        if m.start() - last_cue <= CUE_WINDOW:
+            emit(hint)
+            last_cue = -10**9  # a cue governs one date
+            waiting = None
+        else:
+            waiting, waiting_end = hint, m.end()
+
+    fallback = _FIELDS.get(first_field or "", "expiration_date")
+    for hint in hints:
+        if hint["field"] is None:
+            hint["field"] = fallback
+            if hint["confidence"] == "high":
+                hint["confidence"] = "medium"
+        else:
+            hint["field"] = _FIELDS[hint["field"]]
+    return hints
+
+
+def _document(doc: Tuple[Any, str]) -> Dict[str, Any]:
+    doc_id, text = doc
+    hints = extract_text(text)
+    best = "high" if any(h["confidence"] == "high" for h in hints) else "medium" if hints else "low"
+    return {"doc_id": doc_id, "hints": hints, "confidence": best}
+
+
+def _chunk(docs: List[Tuple[Any, str]]) -> List[Dict[str, Any]]:
+    return [_document(d) for d in docs]
+
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+
+def _pool() -> ProcessPoolExecutor:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _POOL = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context(method))
+            atexit.register(_POOL.shutdown, wait=False, cancel_futures=True)
+        return _POOL
+
+
+def _reset_pool():
+    global _POOL
+    with _POOL_LOCK:
+        _POOL = None
+
+
+def extract_batch(docs: Iterable[Dict[str, Any]], parallel: Optional[bool] = None) -> List[Dict[str, Any]]:
+    """Hints for each {"doc_id", "text"} in order; large batches run on the process pool."""
+    items = [(d.get("doc_id"), d.get("text") or "") for d in docs]
+    if parallel is None:
+        parallel = len(items) >= PARALLEL_MIN_DOCS and WORKERS > 1
+    if not parallel:
+        return _chunk(items)
+    size = max(16, len(items) // (WORKERS * 4) + 1)
+    chunks = [items[i:i + size] for i in range(0, len(items), size)]
+    try:
+        return [doc for part in _pool().map(_chunk, chunks) for doc in part]
+    except BrokenProcessPool:
+        _reset_pool()  # a worker died (OOM kill, ...); finish this batch inline
+        return _chunk(items)
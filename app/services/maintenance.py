@@ -0,0 +1,273 @@
+# app/services/maintenance.py
+"""
+Next-due maintenance events for one tenant's fleet, kept in heaps.
+
+Event sources (each has a stable key, so a newer schedule replaces an older one):
+
+  ("plan", plan_id)        calendar plans: last service + interval days;
+                           meter plans ("meter"/"odometer", "hours"): the due
+                           reading is last service reading + interval, and the
+                           due time is projected from the asset's current
+                           reading and usage rate (units/day) from telemetry
+  ("work_order", wo_id)    open work orders: created_at + sla_hours (or the
+                           priority's default SLA)
+  ("warranty", asset_id)   registry warranty / insurance expiry dates
+  ("insurance", asset_id)
+
+Two min-heaps hold (time, seq, key) entries: `_due` ordered by due time, and
+`_alerts` ordered by when the event should raise an alert (due time minus the
+source's lead time). Rescheduling pushes a new entry and bumps the key's
+sequence number; stale entries are skipped and discarded when they surface
+(lazy deletion), so every update is O(log n). An update that leaves the due
+time unchanged pushes nothing. Once stale entries outnumber live ones, the
+heaps are filtered and re-heapified, so a stream of meter updates cannot grow
+them without bound. An overdue meter plan keeps the due time at which it
+first became overdue until it is serviced.
+
+due_within(days) pops entries in due order until the horizon and pushes them
+back, O(k log n) for k results. poll_alerts() pops the alert heap up to now.
+Each event version alerts once. A version is the due time, except for meter
+plans, where it is the due meter reading: their projected (or, once overdue,
+first-seen) due time depends on when the scheduler was built, while the
+reading that is due only changes when the plan is serviced. `alerted`
+remembers the versions this scheduler has seen, and the optional
+`claim_alert(key, version)` callback decides whether it is the first to see
+one (it returns False when a previous scheduler or another process already
+alerted it). Marks for events that are gone or have been rescheduled are
+trimmed once the set outgrows the live events.
+"""
+import heapq
+import itertools
+import math
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+DAY = 86400
+
+SLA_HOURS = {"critical": 4, "high": 24, "medium": 72, "low": 168}
+LEAD_DAYS = {"plan": 7, "work_order": 0, "warranty": 60, "insurance": 60}
+METER_KINDS = {"meter": "odometer", "odometer": "odometer", "miles": "odometer", "hours": "engine_hours", "engine_hours": "engine_hours"}
+
+Key = Tuple[str, str]
+
+
+def parse_time(value: Any) -> Optional[float]:
+    """Epoch seconds from an epoch number, ISO datetime or ISO date; None if unparseable."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    text = str(value).strip()
+    if text.endswith("Z"):
+        text = text[:-1] + "+00:00"
+    try:
+        dt = datetime.fromisoformat(text)
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+class MaintenanceScheduler:
+    def __init__(
+        self,
+        clock: Callable[[], float] = time.time,
+        alerted: Optional[Set[Tuple[Key, float]]] = None,
+        claim_alert: Optional[Callable[[Key, float], bool]] = None,
+    ):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._events: Dict[Key, Dict[str, Any]] = {}
+        self._version: Dict[Key, int] = {}
+        self._due: List[Tuple[float, int, Key]] = []
+        self._alerts: List[Tuple[float, int, Key]] = []
+        self._plans: Dict[str, Dict[str, Any]] = {}
+        self._plans_by_asset: Dict[str, List[str]] = {}
+        self._meters: Dict[str, Dict[str, Tuple[float, float]]] = {}  # asset -> kind -> (reading, units/day)
+        self._alerted = alerted if alerted is not None else set()
+        self._claim_alert = claim_alert
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    # ---------- heap maintenance ----------
+
+    def _put(self, key: Key, event: Optional[Dict[str, Any]]):
+        """Replace (or with None, remove) the event for `key`."""
+        if event is None:
+            self._events.pop(key, None)
+            self._version.pop(key, None)
+            return
+        prev = self._events.get(key)
+        if prev is not None and prev["due_ts"] == event["due_ts"]:
+            self._events[key] = event  # same slot in both heaps: refresh the details only
+            return
+        seq = next(self._seq)
+        self._version[key] = seq
+        self._events[key] = event
+        due = event["due_ts"]
+        heapq.heappush(self._due, (due, seq, key))
+        lead = LEAD_DAYS.get(key[0], 0) * DAY
+        heapq.heappush(self._alerts, (due - lead, seq, key))
+        if len(self._due) > 2 * len(self._events) + 64:
+            self._compact()
+
+    def _live(self, seq: int, key: Key) -> bool:
+        return self._version.get(key) == seq and key in self._events
+
+    def _compact(self):
+        """Drop stale heap entries (including never-due ones at +inf that would never surface)."""
+        self._due = [e for e in self._due if self._live(e[1], e[2])]
+        heapq.heapify(self._due)
+        self._alerts = [e for e in self._alerts if self._live(e[1], e[2])]
+        heapq.heapify(self._alerts)
+
+    @staticmethod
+    def _alert_version(event: Dict[str, Any]) -> float:
+        due_meter = event.get("due_meter")
+        return event["due_ts"] if due_meter is None else due_meter
+
+    def _trim_alerted(self):
+        live = {(key, self._alert_version(event)) for key, event in self._events.items()}
+        self._alerted.intersection_update(live)
+
+    # ---------- sources ----------
+
+    def set_meter(self, asset_id: str, kind: str, reading: float, rate_per_day: Optional[float] = None):
+        """Latest meter reading; reschedules the asset's meter plans."""
+        with self._lock:
+            prev = self._meters.setdefault(asset_id, {}).get(kind)
+            rate = rate_per_day if rate_per_day is not None else (prev[1] if prev else 0.0)
+            self._meters[asset_id][kind] = (float(reading), float(rate))
+            for plan_id in self._plans_by_asset.get(asset_id, ()):
+                plan = self._plans[plan_id]
+                if METER_KINDS.get(plan.get("type")) == kind:
+                    self._schedule_plan(plan)
+
+    def add_plan(self, plan: Dict[str, Any], last_done_at: Optional[float] = None) -> Dict[str, Any]:
+        """Track a maintenance plan; returns its next-due event."""
+        with self._lock:
+            plan = dict(plan)
+            if last_done_at is not None and plan.get("last_done_at") is None:
+                plan["last_done_at"] = last_done_at
+            plan_id = plan["plan_id"]
+            if plan_id not in self._plans:
+                self._plans_by_asset.setdefault(plan["asset_id"], []).append(plan_id)
+            self._plans[plan_id] = plan
+            return self._schedule_plan(plan)
+
+    def _schedule_plan(self, plan: Dict[str, Any]) -> Dict[str, Any]:
+        now = self._clock()
+        interval = float(plan.get("interval") or 0)
+        kind = METER_KINDS.get(plan.get("type"))
+        event = {"type": "plan", "plan_id": plan["plan_id"], "asset_id": plan["asset_id"], "task": plan.get("task")}
+        if kind is None:
+            last = parse_time(plan.get("last_done_at"))
+            due = (last if last is not None else now) + interval * DAY
+            event["basis"] = "calendar"
+        else:
+            reading, rate = self._meters.get(plan["asset_id"], {}).get(kind, (None, 0.0))
+            last_meter = plan.get("last_done_meter")
+            if last_meter is None and reading is not None and interval > 0:
+                last_meter = math.floor(reading / interval) * interval  # assume the last multiple was serviced
+            due_meter = (last_meter or 0.0) + interval
+            remaining = due_meter - (reading or 0.0)
+            prev = self._events.get(("plan", plan["plan_id"]))
+            if remaining <= 0 and prev is not None and prev.get("due_meter") == due_meter and prev["due_ts"] <= now:
+                due = prev["due_ts"]  # already overdue: keep the original due time until serviced
+            elif remaining <= 0:
+                due = now
+            elif rate > 0:
+                due = now + remaining / rate * DAY
+            else:
+                due = math.inf  # no usage: not projected to come due
+            event.update(basis=kind, due_meter=due_meter, current_meter=reading)
+        event["due_ts"] = due
+        self._put(("plan", plan["plan_id"]), event)
+        return event
+
+    def add_work_order(self, wo: Dict[str, Any]):
+        with self._lock:
+            key = ("work_order", str(wo.get("wo_id")))
+            if wo.get("status") != "open":
+                self._put(key, None)
+                return
+            created = parse_time(wo.get("created_at"))
+            created = created if created is not None else self._clock()
+            hours = wo.get("sla_hours") or SLA_HOURS.get(str(wo.get("priority") or "").lower(), SLA_HOURS["medium"])
+            self._put(key, {
+                "type": "work_order", "wo_id": wo.get("wo_id"), "asset_id": wo.get("asset_id"),
+                "task": wo.get("summary"), "priority": wo.get("priority"), "basis": "sla",
+                "due_ts": created + hours * 3600,
+            })
+
+    def add_expiry(self, asset_id: str, kind: str, expires: Any):
+        with self._lock:
+            ts = parse_time(expires)
+            self._put((kind, asset_id), None if ts is None else {
+                "type": kind, "asset_id": asset_id, "basis": "expiry", "due_ts": ts,
+            })
+
+    # ---------- queries ----------
+
+    def _view(self, event: Dict[str, Any], now: float) -> Dict[str, Any]:
+        out = {k: v for k, v in event.items() if k != "due_ts"}
+        due = event["due_ts"]
+        out["due_at"] = None if math.isinf(due) else _iso(due)
+        out["due_in_days"] = None if math.isinf(due) else math.floor((due - now) / DAY)
+        return out
+
+    def due_within(self, days: float, types: Optional[Iterable[str]] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Events due before now + days (overdue included), soonest first."""
+        wanted = set(types) if types else None
+        with self._lock:
+            now = self._clock()
+            horizon = now + days * DAY
+            popped, out = [], []
+            while self._due and self._due[0][0] <= horizon and (limit is None or len(out) < limit):
+                entry = heapq.heappop(self._due)
+                if not self._live(entry[1], entry[2]):
+                    continue  # stale: drop for good
+                popped.append(entry)
+                event = self._events[entry[2]]
+                if wanted is None or event["type"] in wanted:
+                    out.append(self._view(event, now))
+            for entry in popped:
+                heapq.heappush(self._due, entry)
+            return out
+
+    def poll_alerts(self) -> List[Dict[str, Any]]:
+        """Events whose alert time has passed since the last poll (each version once)."""
+        with self._lock:
+            now = self._clock()
+            out = []
+            while self._alerts and self._alerts[0][0] <= now:
+                _, seq, key = heapq.heappop(self._alerts)
+                if not self._live(seq, key):
+                    continue
+                event = self._events[key]
+                mark = (key, self._alert_version(event))
+                if mark in self._alerted:
+                    continue
+                self._alerted.add(mark)
+                if self._claim_alert is not None and not self._claim_alert(*mark):
+                    continue
+                view = self._view(event, now)
+                view["alert"] = "overdue" if event["due_ts"] <= now else "due_soon"
+                out.append(view)
+            if len(self._alerted) > 2 * len(self._events) + 1024:
+                self._trim_alerted()
+            return out
+
+    def plan(self, plan_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            event = self._events.get(("plan", plan_id))
+            return None if event is None else self._view(event, self._clock())
@@ -0,0 +1,136 @@
+# app/services/maintenance_store.py
+"""
+Maintenance plans and emitted alert marks, in the work-order SQLite database
+(WORKORDER_DB), so every worker process sees the same schedule and alerts.
+
+    maintenance_plans(tenant, plan_id, asset_id, plan, rev)
+    maintenance_alerts(tenant, event_key, due_ts, alerted_at)
+
+A plan is keyed by plan_id: posting the same plan_id again replaces it. Each
+save stamps the plan with the tenant's next revision number, so
+`revision(tenant)` (the highest one) changes whenever any process saves a
+plan and cached schedulers know to rebuild.
+
+An alert mark is keyed by (event key, version), i.e. one version of one event:
+its due time, or its due meter reading for meter plans (see maintenance). The
+version is kept in the due_ts column.
+claim_alert() inserts the mark and reports whether this call inserted it, so
+of several workers polling the same alert exactly one emits it. Claiming a new
+version of an event drops the marks of its older versions, so the table holds
+at most one mark per event.
+"""
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+from .workorder_store import WORKORDER_DB
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS maintenance_plans (
+    tenant TEXT NOT NULL,
+    plan_id TEXT NOT NULL,
+    asset_id TEXT,
+    plan TEXT NOT NULL,
+    rev INTEGER NOT NULL,
+    PRIMARY KEY (tenant, plan_id)
+);
+CREATE INDEX IF NOT EXISTS mp_rev ON maintenance_plans (tenant, rev);
+CREATE TABLE IF NOT EXISTS maintenance_alerts (
+    tenant TEXT NOT NULL,
+    event_key TEXT NOT NULL,
+    due_ts REAL NOT NULL,
+    alerted_at TEXT,
+    PRIMARY KEY (tenant, event_key, due_ts)
+);
+"""
+
+
+def _event_key(key: Tuple[str, str]) -> str:
+    return f"{key[0]}:{key[1]}"
+
+
+class MaintenanceStore:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.RLock()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    @contextmanager
+    def _tx(self) -> Iterator[None]:
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    # ---------- plans ----------
+
+    def save_plan(self, tenant: str, asset_id: str, plan: Dict[str, Any]) -> Dict[str, Any]:
+        """Insert or replace a plan by plan_id (assigned when missing); returns the stored plan."""
+        with self._lock, self._tx():
+            (rev,) = self._db.execute(
+                "SELECT COALESCE(MAX(rev), 0) + 1 FROM maintenance_plans WHERE tenant = ?", (tenant,)
+            ).fetchone()
+            plan_id = plan.get("plan_id")
+            if not plan_id:
+                (count,) = self._db.execute(
+                    "SELECT COUNT(*) FROM maintenance_plans WHERE tenant = ? AND asset_id = ?", (tenant, asset_id)
+                ).fetchone()
+                plan_id = f"MP-{asset_id}-{count + 1}"
+            rec = {**plan, "plan_id": plan_id, "asset_id": asset_id}
+            self._db.execute(
+                "INSERT INTO maintenance_plans (tenant, plan_id, asset_id, plan, rev) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (tenant, plan_id) DO UPDATE SET asset_id = excluded.asset_id, plan = excluded.plan, rev = excluded.rev",
+                (tenant, plan_id, asset_id, json.dumps(rec, default=str), rev),
+            )
+        return rec
+
+    def plans(self, tenant: str) -> List[Dict[str, Any]]:
+        """The tenant's saved plans, in the order they were first saved."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT plan FROM maintenance_plans WHERE tenant = ? ORDER BY rowid", (tenant,)
+            ).fetchall()
+        return [json.loads(plan) for (plan,) in rows]
+
+    def revision(self, tenant: str) -> int:
+        with self._lock:
+            (rev,) = self._db.execute(
+                "SELECT COALESCE(MAX(rev), 0) FROM maintenance_plans WHERE tenant = ?", (tenant,)
+            ).fetchone()
+        return rev
+
+    # ---------- alerts ----------
+
+    def claim_alert(self, tenant: str, key: Tuple[str, str], version: float) -> bool:
+        """Mark one version of an event as alerted; False if some process already did."""
+        event_key = _event_key(key)
+        with self._lock, self._tx():
+            claimed = self._db.execute(
+                "INSERT OR IGNORE INTO maintenance_alerts (tenant, event_key, due_ts, alerted_at) VALUES (?, ?, ?, ?)",
+                (tenant, event_key, version, datetime.now(timezone.utc).isoformat()),
+            ).rowcount
+            if claimed:
+                self._db.execute(
+                    "DELETE FROM maintenance_alerts WHERE tenant = ? AND event_key = ? AND due_ts != ?",
+                    (tenant, event_key, version),
+                )
+        return bool(claimed)
+
+
+def open_maintenance_store() -> MaintenanceStore:
+    return MaintenanceStore(WORKORDER_DB)
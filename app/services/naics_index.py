@@ -0,0 +1,227 @@
+# app/services/naics_index.py
+"""
+In-memory NAICS 2022 search index for the profile wizard's typeahead.
+
+The code table is data/naics/naics_2022.csv (NAICS_PATH): a header row, then
+code,title per line for all 2,125 codes of the Census "2-6 digit 2022 Codes"
+file. ops/build_naics.py regenerates it from that file; sector ranges like
+"31-33" are indexed under each of their two-digit prefixes.
+
+data/naics/naics_aliases.csv (NAICS_ALIASES_PATH) maps everyday trade terms
+that never appear in official titles ("HVAC", "roofer", "CPA") to codes, in the
+spirit of the Census NAICS index file. Alias words are indexed as extra words
+of the row they point to; aliases for codes missing from the table are skipped.
+
+Built once (warm() at startup) into:
+  - a sorted list of codes, answered by bisect for numeric (prefix) queries
+  - token -> posting list of rows, plus a sorted vocabulary so the last,
+    still-being-typed word of a query can match by prefix
+  - trigram -> tokens, for fuzzy matches on misspelled words
+
+Ranking: every query word must match (exact > prefix > fuzzy); rows with more
+of the query in the front of the title, and 6-digit industries, rank first.
+Results are memoised per (query, limit), since typeahead repeats prefixes.
+"""
+import bisect
+import csv
+import os
+import re
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+BASE = Path(__file__).resolve().parents[2]
+NAICS_PATH = Path(os.environ.get("NAICS_PATH", BASE / "data" / "naics" / "naics_2022.csv"))
+NAICS_ALIASES_PATH = Path(os.environ.get("NAICS_ALIASES_PATH", BASE / "data" / "naics" / "naics_aliases.csv"))
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {"and", "of", "the", "except", "for", "other", "all", "in", "with", "or", "than", "to"}
+_FUZZY_MIN = 0.6  # Dice similarity on trigrams
+
+EXACT, PREFIX = 3.0, 2.0
+
+
+def _stem(word: str) -> str:
+    # plural folding is enough for industry titles ("restaurants" ~ "restaurant", "bakeries" ~ "bakery")
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def _words(text: str) -> List[str]:
+    return [_stem(w) for w in _WORD.findall(text.lower()) if w not in _STOPWORDS]
+
+
+def _trigrams(word: str) -> Set[str]:
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _code_keys(code: str) -> List[str]:
+    # "31-33" is found by 31, 32 and 33
+    lo, _, hi = code.partition("-")
+    if hi and lo.isdigit() and hi.isdigit():
+        return [str(n) for n in range(int(lo), int(hi) + 1)]
+    return [code]
+
+
+def _read_pairs(path: Path) -> List[Tuple[str, str]]:
+    """(code, text) from the first two CSV columns, skipping the header and note rows."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        rows = []
+        for rec in csv.reader(f):
+            if len(rec) < 2:
+                continue
+            code, text = rec[0].strip(), rec[1].strip()
+            if not code[:1].isdigit():
+                continue  # header / notes
+            rows.append((code, text))
+    return rows
+
+
+class NAICSIndex:
+    def __init__(self, rows: Iterable[Tuple[str, str]], aliases: Iterable[Tuple[str, str]] = ()):
+        self.codes: List[str] = []
+        self.titles: List[str] = []
+        postings: Dict[str, Set[int]] = {}
+        code_keys: List[Tuple[str, int]] = []
+        for code, title in rows:
+            i = len(self.codes)
+            self.codes.append(code)
+            self.titles.append(title)
+            code_keys.extend((key, i) for key in _code_keys(code))
+            for word in _words(title):
+                postings.setdefault(word, set()).add(i)
+        row_of = {code: i for i, code in enumerate(self.codes)}
+        for code, term in aliases:
+            i = row_of.get(code)
+            if i is not None:
+                for word in _words(term):
+                    postings.setdefault(word, set()).add(i)
+        code_keys.sort()
+        self._code_keys = [k for k, _ in code_keys]
+        self._code_rows = [i for _, i in code_keys]
+        self._postings = {w: frozenset(rows) for w, rows in postings.items()}
+        self._vocab = sorted(self._postings)
+        self._grams: Dict[str, List[str]] = {}
+        for word in self._vocab:
+            for g in _trigrams(word):
+                self._grams.setdefault(g, []).append(word)
+        self._title_lower = [t.lower() for t in self.titles]
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @classmethod
+    def load(cls, path: Path = NAICS_PATH, aliases_path: Optional[Path] = NAICS_ALIASES_PATH) -> "NAICSIndex":
+        aliases = _read_pairs(aliases_path) if aliases_path is not None and Path(aliases_path).exists() else []
+        return cls(_read_pairs(path), aliases)
+
+    # ---------- queries ----------
+
+    def search(self, q: str, limit: int = 8) -> List[Dict[str, str]]:
+        # a trailing space means the last word is finished: match it exactly, not as a prefix
+        partial_last = bool(q) and not q[-1].isspace()
+        q = q.strip()
+        if not q or limit <= 0:
+            return []
+        if q.replace("-", "").isdigit():
+            rows = self._by_code_prefix(q)
+        else:
+            rows = self._by_title(q, partial_last)
+        return [{"code": self.codes[i], "title": self.titles[i]} for i in rows[:limit]]
+
+    def _by_code_prefix(self, prefix: str) -> List[int]:
+        lo = bisect.bisect_left(self._code_keys, prefix)
+        hi = bisect.bisect_left(self._code_keys, prefix + "\x7f")
+        rows = dict.fromkeys(self._code_rows[lo:hi])  # dedupe range sectors, keep order
+        # broadest first: typing "23" shows the sector, then its subsectors, then industries
+        return sorted(rows, key=lambda i: (len(self.codes[i].partition("-")[0]), self.codes[i]))
+
+    def _matches(self, word: str, partial: bool) -> Dict[int, float]:
+        """row -> score for one query word."""
+        scores: Dict[int, float] = {}
+        for i in self._postings.get(word, ()):
+            scores[i] = EXACT
+        if partial or not scores:
+            lo = bisect.bisect_left(self._vocab, word)
+            for token in self._vocab[lo:]:
+                if not token.startswith(word):
+                    break
+                for i in self._postings[token]:
+                    scores.setdefault(i, PREFIX)
+        if not scores and len(word) >= 3:
+            for token, sim in self._similar(word):
+                for i in self._postings[token]:
+                    scores[i] = max(scores.get(i, 0.0), PREFIX * sim)
+        return scores
+
+    def _similar(self, word: str) -> List[Tuple[str, float]]:
+        grams = _trigrams(word)
+        shared: Dict[str, int] = {}
+        for g in grams:
+            for token in self._grams.get(g, ()):
+                shared[token] = shared.get(token, 0) + 1
+        out = []
+        for token, n in shared.items():
+            sim = 2.0 * n / (len(grams) + len(_trigrams(token)))
+            if sim >= _FUZZY_MIN:
+                out.append((token, sim))
+        return out
+
+    def _by_title(self, q: str, partial_last: bool = True) -> List[int]:
+        words = _words(q)
+        if not words:
+            return []
+        per_word = [self._matches(w, partial_last and n == len(words) - 1) for n, w in enumerate(words)]
+        rows = set(per_word[0])
+        for m in per_word[1:]:
+            rows &= set(m)
+        if not rows:
+            return []
+        ql = q.lower()
+        ranked = []
+        for i in rows:
+            score = sum(m[i] for m in per_word)
+            title = self._title_lower[i]
+            if title.startswith(ql):
+                score += 2.0
+            elif ql in title:
+                score += 1.0
+            if len(self.codes[i]) == 6:
+                score += 0.5
+            ranked.append((-score, len(title), self.codes[i], i))
+        ranked.sort()
+        return [i for *_, i in ranked]
+
+
+_INDEX: Optional[NAICSIndex] = None
+_LOCK = threading.Lock()
+
+
+def get_index() -> NAICSIndex:
+    global _INDEX
+    if _INDEX is None:
+        with _LOCK:
+            if _INDEX is None:
+                _INDEX = NAICSIndex.load()
+    return _INDEX
+
+
+def warm():
+    get_index()
+
+
+@lru_cache(maxsize=4096)
+def _search_cached(q: str, limit: int) -> Tuple[Tuple[str, str], ...]:
+    return tuple((r["code"], r["title"]) for r in get_index().search(q, limit))
+
+
+def search(q: str, limit: int = 8) -> List[Dict[str, str]]:
+    # keep one trailing space (it marks the last word as complete), drop the rest of the padding
+    q = q.lower().lstrip()
+    key = q.rstrip() + (" " if q[-1:].isspace() else "")
+    return [{"code": code, "title": title} for code, title in _search_cached(key, limit)]
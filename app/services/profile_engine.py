@@ -1,47 +1,215 @@
-import json
+import os
 import threading
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, Any, List, Optional
 
+from starlette.concurrency import run_in_threadpool
+
+from ..conditional import register_version
+from ..utils_demo import is_demo
+from . import naics_index, uploads
+from .profile_store import open_store, open_tenant_store
+
 BASE = Path(__file__).resolve().parents[2]
 DEMO_PATH = BASE / "data" / "demo" / "profile.json"
-LOCK = threading.Lock()
+
+
+def _default_profile() -> Dict[str, Any]:
+    # minimal structure for a fresh profile
+    return {
+        "general": {},
+        "industry": {},
+        "operations": {},
+        "financial": {},
+        "assets": [],
+        "customers": {},
+        "risk": {},
+        "objectives": {},
+        "uploads": [],
+        "completeness": {"percent": 0.0, "missing": []},
+        "connectors": {
+            "accounting": {"connected": False, "last_sync": None},
+            "banking": {"connected": False, "last_sync": None},
+            "crm": {"connected": False, "last_sync": None},
+            "payroll": {"connected": False, "last_sync": None},
+            "inventory": {"connected": False, "last_sync": None},
+            "storage": {"connected": False, "last_sync": None},
+        },
+    }
+
+
+# demo profile: parsed once; edits are written back in debounced batches (see profile_store)
+STORE = open_store(DEMO_PATH, _default_profile)
+# every other tenant: per-section files plus an append-only journal
+TENANTS = open_tenant_store(Path(os.environ.get("PROFILE_DATA_DIR", BASE / "data" / "profiles")), _default_profile)
 
 
 def _load_demo() -> Dict[str, Any]:
-    if not DEMO_PATH.exists():
-        # create a minimal structure
-        DEMO_PATH.parent.mkdir(parents=True, exist_ok=True)
-        demo = {
-            "general": {},
-            "industry": {},
-            "operations": {},
-            "financial": {},
-            "assets": [],
-            "customers": {},
-            "risk": {},
-            "objectives": {},
-            "uploads": [],
-            "completeness": {"percent": 0.0, "missing": []},
-            "connectors": {
-                "accounting": {"connected": False, "last_sync": None},
-                "banking": {"connected": False, "last_sync": None},
-                "crm": {"connected": False, "last_sync": None},
-                "payroll": {"connected": False, "last_sync": None},
-                "inventory": {"connected": False, "last_sync": None},
-                "storage": {"connected": False, "last_sync": None},
-            },
-        }
-        DEMO_PATH.write_text(json.dumps(demo, indent=2))
-        return demo
-    with DEMO_PATH.open() as f:
-        return json.load(f)
+    """Mutable copy of the profile document."""
+    return STORE.snapshot()
+
+
+# tags minted while demo edits are waiting for the debounced flush exist only in this process
+_PENDING_TAG = os.urandom(6).hex()
+
+
+def _profile_version(company_id: str):
+    # ETag input (see app.conditional); the demo file's mtime/size is already part of it
+    pending = f"{_PENDING_TAG}.{STORE.generation}" if STORE.dirty else None
+    return [pending, None if is_demo(company_id) else TENANTS.version(company_id)]
+
+
+register_version("profile", _profile_version)
 
 
 def _save_demo(data: Dict[str, Any]):
-    with LOCK:
-        DEMO_PATH.write_text(json.dumps(data, indent=2, default=str))
+    STORE.replace(data)
+
+
+@contextmanager
+def _edit():
+    with STORE.edit() as data:
+        yield data
+
+
+def flush():
+    """Persist pending profile edits immediately (shutdown, tests)."""
+    STORE.flush()
+    TENANTS.compact_all()
+
+
+def _read(company_id: str, sections: List[str]) -> Dict[str, Any]:
+    """Only the named sections of a tenant's profile (shared values, read-only)."""
+    if is_demo(company_id):
+        data = STORE.read()
+        return {name: data[name] for name in sections if name in data}
+    return TENANTS.read(company_id, sections)
+
+
+def _save(company_id: str, section: str, value: Any):
+    if is_demo(company_id):
+        with _edit() as data:
+            data[section] = value
+    else:
+        TENANTS.save(company_id, section, value)
+    _note_write(company_id, section, value)
+
+
+def _update(company_id: str, section: str, fn) -> Any:
+    """Replace a section with fn(current) atomically; fn builds a new value instead of mutating."""
+    if is_demo(company_id):
+        with _edit() as data:
+            data[section] = value = fn(data.get(section))
+    else:
+        value = TENANTS.update(company_id, section, fn)
+    _note_write(company_id, section, value)
+    return value
+
+
+# ---------- completeness / sync confidence ----------
+#
+# Both scores derive from a per-tenant cache of each required section's fill
+# ratio plus the connectors block. A save re-scores only the section it wrote
+# and adjusts the weighted total by the difference. The cache is tagged with
+# the store generation it reflects: if anything else changed the profile
+# (a reload from disk, _save_demo, a concurrent writer), the tag no longer
+# lines up and the next read rebuilds it from the profile.
+
+# required fields per section (simple demo mapping)
+COMPLETENESS_REQUIRED = {
+    "general": ["name", "ein", "locations"],
+    "industry": ["naics"],
+    "operations": ["employees"],
+    "financial": ["last_year_revenue"],
+    "assets": ["assets"],
+    "customers": ["annual_customers"],
+    "risk": ["assessments"],
+    "objectives": ["items"],
+    "uploads": ["uploads"],
+}
+COMPLETENESS_WEIGHTS = {"general": 15, "industry": 15, "operations": 10, "financial": 15, "assets": 10, "customers": 10, "risk": 10, "objectives": 10, "uploads": 5}
+_TOTAL_WEIGHT = sum(COMPLETENESS_WEIGHTS.values())
+
+_SCORES: Dict[str, Dict[str, Any]] = {}
+_SCORES_LOCK = threading.Lock()
+
+
+def _score_key(company_id: str) -> str:
+    return "demo" if is_demo(company_id) else company_id
+
+
+def _generation(company_id: str) -> int:
+    if is_demo(company_id):
+        return STORE.generation
+    return TENANTS.generation(company_id)
+
+
+def _section_score(section: str, block: Any) -> float:
+    reqs = COMPLETENESS_REQUIRED[section]
+    filled = 0
+    for r in reqs:
+        v = None
+        if isinstance(block, dict):
+            v = block.get(r)
+        elif isinstance(block, list):
+            v = block
+        if v:
+            filled += 1
+    return (filled / len(reqs)) if reqs else 0
+
+
+def _set_section(state: Dict[str, Any], section: str, block: Any):
+    new = _section_score(section, block)
+    old = state["sections"].get(section, 0.0)
+    state["sections"][section] = new
+    state["score"] += (new - old) * COMPLETENESS_WEIGHTS.get(section, 0) / _TOTAL_WEIGHT
+
+
+def _score_state(company_id: str) -> Dict[str, Any]:
+    key = _score_key(company_id)
+    with _SCORES_LOCK:
+        state = _SCORES.get(key)
+        generation = _generation(company_id)
+        if state is not None and state["generation"] == generation:
+            return state
+        data = _read(company_id, list(COMPLETENESS_REQUIRED) + ["connectors"])
+        state = {"generation": generation, "sections": {}, "score": 0.0, "connectors": data.get("connectors") or {}}
+        for section in COMPLETENESS_REQUIRED:
+            _set_section(state, section, data.get(section))
+        _SCORES[key] = state
+        return state
+
+
+def _note_write(company_id: str, section: str, value: Any):
+    """Fold one section write into the cached scores (or drop them if they missed a write)."""
+    key = _score_key(company_id)
+    with _SCORES_LOCK:
+        state = _SCORES.get(key)
+        if state is None:
+            return
+        generation = _generation(company_id)
+        if state["generation"] + 1 != generation:
+            del _SCORES[key]
+            return
+        state["generation"] = generation
+        if section in COMPLETENESS_REQUIRED:
+            _set_section(state, section, value)
+        elif section == "connectors":
+            state["connectors"] = value or {}
+
+
+def completeness(company_id: str) -> Dict[str, Any]:
+    """Current completeness ({percent, missing}) from the cached section scores."""
+    state = _score_state(company_id)
+    sections = state["sections"]
+    missing = [
+        {"section": section.capitalize(), "item": "; ".join(reqs)}
+        for section, reqs in COMPLETENESS_REQUIRED.items()
+        if sections.get(section, 0.0) < 1.0
+    ]
+    return {"percent": round(min(1.0, max(0.0, state["score"])), 2), "missing": missing}
 
 
 def make_meta() -> Dict[str, Any]:
@@ -66,10 +234,16 @@ def make_meta() -> Dict[str, Any]:
 
 
 def get_full(company_id: str, include_financial_summary=False, include_assets=False, include_benchmarks=False, include_uploads=False, include_integrations=False) -> Dict[str, Any]:
-    data = _load_demo()
+    sections = ["general", "industry", "operations", "financial", "customers", "risk", "objectives"]
+    if include_assets:
+        sections.append("assets")
+    if include_uploads:
+        sections.append("uploads")
+    data = _read(company_id, sections)
+    comp = completeness(company_id)
     # deterministic KPI list for demo
     kpis = [
-        {"label": "overview_completed_pct", "value": data.get("completeness", {}).get("percent", 0.0)},
+        {"label": "overview_completed_pct", "value": comp["percent"]},
     ]
     
     # Mask EIN in general block for PII safety
@@ -84,22 +258,20 @@ def get_full(company_id: str, include_financial_summary=False, include_assets=Fa
         "industry": data.get("industry", {}),
         "operations": data.get("operations", {}),
         "financial": data.get("financial", {}),
-        "assets": data.get("assets", []),
+        "assets": data.get("assets") or [],
         "customers": data.get("customers", {}),
         "risk": data.get("risk", {}),
         "objectives": data.get("objectives", {}),
-        "uploads": data.get("uploads", []) if include_uploads else [],
-        "completeness": data.get("completeness", {}),
+        "uploads": data.get("uploads") or [],
+        "completeness": comp,
         "_meta": make_meta(),
     }
     return result
 
 
 def save_general(company_id: str, block: Dict[str, Any]) -> Dict[str, Any]:
-    data = _load_demo()
     # store full EIN but keep as provided
-    data["general"] = block
-    _save_demo(data)
+    _save(company_id, "general", block)
     # return masked EIN
     masked = dict(block)
     ein = masked.get("ein")
@@ -109,150 +281,144 @@ def save_general(company_id: str, block: Dict[str, Any]) -> Dict[str, Any]:
 
 
 def save_industry(company_id: str, block: Dict[str, Any]) -> Dict[str, Any]:
-    data = _load_demo()
-    data["industry"] = block
     # If NAICS provided, set benchmark_set deterministically
     naics = block.get("naics")
     if naics and isinstance(naics, dict):
         block.setdefault("benchmark_set", f"bench-{naics.get('code')[:3]}")
-    data["industry"] = block
-    _save_demo(data)
+    _save(company_id, "industry", block)
     return block
 
 
 def naics_search(q: str, limit: int = 8) -> List[Dict[str, str]]:
-    # small deterministic mapping for demo
-    samples = [
-        ("238220", "Plumbing, Heating, and Air-Conditioning Contractors"),
-        ("236115", "New Single-Family Housing Construction"),
-        ("541511", "Custom Computer Programming Services"),
-        ("722511", "Full-Service Restaurants"),
-        ("523930", "Investment Advice"),
-        ("621111", "Offices of Physicians (except Mental Health Specialists)"),
-    ]
-    ql = q.lower()
-    results = [
-        {"code": code, "title": title}
-        for code, title in samples
-        if ql in title.lower() or ql in code
-    ]
-    if not results:
-        results = [{"code": samples[0][0], "title": samples[0][1]}]
-    return results[:limit]
+    return naics_index.search(q, limit or 8)
 
 
 def save_operations(company_id: str, block: Dict[str, Any]) -> Dict[str, Any]:
-    data = _load_demo()
-    data["operations"] = block
-    _save_demo(data)
+    _save(company_id, "operations", block)
     return block
 
 
 def save_generic(company_id: str, section: str, block: Any):
-    data = _load_demo()
-    data[section] = block
-    _save_demo(data)
+    _save(company_id, section, block)
     return block
 
 
 def upsert_asset(company_id: str, asset: Dict[str, Any]):
-    data = _load_demo()
-    assets = data.get("assets", [])
-    # upsert by id
-    idx = next((i for i, a in enumerate(assets) if a.get("id") == asset.get("id")), None)
-    if idx is None:
-        assets.append(asset)
-    else:
-        assets[idx].update(asset)
-    data["assets"] = assets
-    _save_demo(data)
+    def upsert(current):
+        assets = list(current or [])
+        # upsert by id
+        idx = next((i for i, a in enumerate(assets) if a.get("id") == asset.get("id")), None)
+        if idx is None:
+            assets.append(asset)
+        else:
+            assets[idx] = {**assets[idx], **asset}
+        return assets
+
+    _update(company_id, "assets", upsert)
     return asset
 
 
 def delete_asset(company_id: str, asset_id: str):
-    data = _load_demo()
-    assets = data.get("assets", [])
-    for a in assets:
-        if a.get("id") == asset_id:
-            a["status"] = "deleted"
-    _save_demo(data)
+    _update(company_id, "assets", lambda current: [
+        {**a, "status": "deleted"} if a.get("id") == asset_id else a
+        for a in current or []
+    ])
     return True
 
 
 def list_uploads(company_id: str) -> List[Dict[str, Any]]:
-    data = _load_demo()
-    return data.get("uploads", [])
+    return _read(company_id, ["uploads"]).get("uploads") or []
 
 
 def upload_file(company_id: str, file_name: str, category: str, upload_id: Optional[str] = None) -> Dict[str, Any]:
-    data = _load_demo()
     uid = upload_id or f"doc-{int(datetime.utcnow().timestamp())}"
     item = {"id": uid, "file": file_name, "category": category, "status": "processing"}
-    data.setdefault("uploads", []).append(item)
-    _save_demo(data)
+    _update(company_id, "uploads", lambda current: list(current or []) + [item])
     return item
 
 
-def extract_upload(company_id: str, id: str) -> Dict[str, Any]:
-    data = _load_demo()
-    for u in data.get("uploads", []):
-        if u.get("id") == id:
-            # simulate extraction
-            u.update({
-                "type": u.get("category"),
-                "issuer": "IRS" if "EIN" in u.get("file", "") or u.get("category") == "EIN" else "Unknown",
-                "effective": "2018-04-01",
-                "expiration": None,
-                "status": "verified",
-            })
-            _save_demo(data)
+def update_upload(company_id: str, upload_id: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge `fields` into an uploads entry and push the new state to subscribers."""
+    updated = {}
+
+    def apply(current):
+        items = list(current or [])
+        for i, u in enumerate(items):
+            if u.get("id") == upload_id:
+                items[i] = updated["item"] = {**u, **fields}
+                return items
+        raise KeyError("upload not found")
+
+    _update(company_id, "uploads", apply)
+    uploads.publish(company_id, updated["item"])
+    return updated["item"]
+
+
+def _find_upload(company_id: str, upload_id: str) -> Dict[str, Any]:
+    for u in list_uploads(company_id):
+        if u.get("id") == upload_id:
             return u
     raise KeyError("upload not found")
 
 
+async def store_upload_content(company_id: str, upload_id: str, chunks) -> Dict[str, Any]:
+    """Stream a registered upload's bytes to disk, then queue it for extraction."""
+    _find_upload(company_id, upload_id)
+    info = await uploads.store_stream(company_id, upload_id, chunks)
+    await run_in_threadpool(update_upload, company_id, upload_id, {"status": "uploaded", **info})
+    return await run_in_threadpool(queue_extraction, company_id, upload_id)
+
+
+def queue_extraction(company_id: str, upload_id: str) -> Dict[str, Any]:
+    item = update_upload(company_id, upload_id, {"status": "queued"})
+    try:
+        EXTRACTION_POOL.submit(company_id, upload_id)
+    except uploads.QueueFull:
+        update_upload(company_id, upload_id, {"status": "uploaded"})
+        raise
+    return item
+
+
+def _run_extraction(company_id: str, upload_id: str):
+    # runs on an extraction worker thread
+    item = update_upload(company_id, upload_id, {"status": "extracting"})
+    try:
+        text = uploads.read_text(uploads.upload_path(company_id, upload_id))
+        fields = uploads.extract_fields(text, item.get("file", ""), item.get("category"))
+    except Exception as e:
+        update_upload(company_id, upload_id, {"status": "failed", "error": str(e)[:200]})
+        raise
+    update_upload(company_id, upload_id, {**fields, "status": "verified"})
+
+
+EXTRACTION_POOL = uploads.ExtractionPool(
+    _run_extraction,
+    workers=int(os.environ.get("UPLOAD_EXTRACT_WORKERS", "2")),
+    max_queue=int(os.environ.get("UPLOAD_EXTRACT_QUEUE", "64")),
+)
+
+
+def extract_upload(company_id: str, id: str) -> Dict[str, Any]:
+    """(Re)run extraction: queued in the background when the file's bytes were uploaded."""
+    if uploads.upload_path(company_id, id).exists():
+        return queue_extraction(company_id, id)
+    # metadata-only upload: classify from the file name and category alone
+    u = _find_upload(company_id, id)
+    fields = uploads.extract_fields("", u.get("file", ""), u.get("category"))
+    return update_upload(company_id, id, {**fields, "status": "verified"})
+
+
 def recalc_completeness(company_id: str) -> Dict[str, Any]:
-    data = _load_demo()
-    # required fields per section (simple demo mapping)
-    required = {
-        "general": ["name", "ein", "locations"],
-        "industry": ["naics"],
-        "operations": ["employees"],
-        "financial": ["last_year_revenue"],
-        "assets": ["assets"],
-        "customers": ["annual_customers"],
-        "risk": ["assessments"],
-        "objectives": ["items"],
-        "uploads": ["uploads"],
-    }
-    weights = {"general": 15, "industry": 15, "operations": 10, "financial": 15, "assets": 10, "customers": 10, "risk": 10, "objectives": 10, "uploads": 5}
-    total_weight = sum(weights.values())
-    score = 0.0
-    missing = []
-    for section, reqs in required.items():
-        block = data.get(section)
-        filled = 0
-        total = len(reqs)
-        for r in reqs:
-            v = None
-            if isinstance(block, dict):
-                v = block.get(r)
-            elif isinstance(block, list):
-                v = block
-            if v:
-                filled += 1
-        section_score = (filled / total) if total > 0 else 0
-        score += section_score * (weights.get(section, 0) / total_weight)
-        if section_score < 1.0:
-            missing.append({"section": section.capitalize(), "item": "; ".join([r for r in reqs])})
-    percent = round(score, 2)
-    data["completeness"] = {"percent": percent, "missing": missing}
-    _save_demo(data)
-    return data["completeness"]
+    """Full rescore from the stored profile; the result is also saved as the `completeness` section."""
+    with _SCORES_LOCK:
+        _SCORES.pop(_score_key(company_id), None)
+    comp = completeness(company_id)
+    _save(company_id, "completeness", comp)
+    return comp
 
 
 def calc_sync_confidence(company_id: str) -> float:
-    data = _load_demo()
-    conns = data.get("connectors", {})
+    conns = _score_state(company_id)["connectors"]
     total = len(conns)
     connected = sum(1 for v in conns.values() if v.get("connected"))
     # recency weights
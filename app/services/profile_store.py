@@ -0,0 +1,420 @@
+# app/services/profile_store.py
+"""
+Write-through in-memory cache for the profile JSON document.
+
+- The document is parsed once and served from memory afterwards.
+- Writers go through edit(), which hands out a shallow copy of the top-level
+  dict. Sections are replaced rather than mutated in place (copy-on-write), so
+  a reader that took a reference via read() never sees a half-applied edit.
+- Edits mark the store dirty and schedule one flush `flush_delay_s` later, so
+  a burst of autosaves turns into a single write. The write goes to a temp
+  file, is fsynced, and is then os.replace()d over the original.
+- If the file changes on disk while nothing is pending, the next read reloads it.
+
+SectionJournalStore holds tenant profiles, one directory per tenant:
+
+    <root>/<tenant>/<section>.json   compacted value of each section
+    <root>/<tenant>/journal.ndjson   {"section": ..., "value": ...} per save
+
+A save appends one record (the new value of that one section) to the journal,
+so a write costs the size of the edit rather than the whole profile. Opening a
+tenant replays its journal; section files are only parsed when a section is
+first read. Once the journal holds `compact_after` records the latest values
+are written to their section files and the journal is replaced by an empty
+one. Replaying a record whose section file is already current is harmless, so
+a crash during compaction loses nothing.
+
+Several worker processes can share a tenant directory. Appends and compactions
+hold an exclusive flock on <tenant>/.lock and first catch up with the journal.
+Every access compares the journal's inode and size with what this process has
+consumed: new bytes are read incrementally, and a new inode (another process
+compacted) drops the cached sections so they are re-read from the section
+files. A line that is not valid JSON is skipped. A partial last line (a torn
+write) is left unread, and the next writer truncates it away before appending.
+"""
+import atexit
+import copy
+import json
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: run a single writer process per data directory
+    fcntl = None
+
+
+class ProfileStore:
+    def __init__(self, path: Path, default_factory: Callable[[], Dict[str, Any]], flush_delay_s: float = 0.5):
+        self.path = Path(path)
+        self.default_factory = default_factory
+        self.flush_delay_s = flush_delay_s
+        self._lock = threading.RLock()       # guards the in-memory state
+        self._flush_lock = threading.Lock()  # one writer to disk at a time
+        self._doc: Optional[Dict[str, Any]] = None
+        self._stat: Optional[Tuple[int, int]] = None  # (mtime_ns, size) of the file we last read/wrote
+        self._version = 0          # bumped on every edit
+        self._flushed_version = 0  # version last written to disk
+        self._timer: Optional[threading.Timer] = None
+        self.flush_count = 0
+        self.generation = 0  # changes whenever the in-memory document does (edits, replace, reload)
+
+    # ---------- reads ----------
+
+    def read(self) -> Dict[str, Any]:
+        """Current document. Treat as read-only: writers replace sections, never mutate them."""
+        with self._lock:
+            return self._current()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Deep copy of the current document, safe to mutate."""
+        with self._lock:
+            return copy.deepcopy(self._current())
+
+    def _current(self) -> Dict[str, Any]:
+        if self._doc is None or (not self.dirty and self._file_stat() != self._stat):
+            self._load()
+        return self._doc
+
+    def _file_stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _load(self):
+        if self.path.exists():
+            with self.path.open() as f:
+                self._doc = json.load(f)
+            self._stat = self._file_stat()
+            self.generation += 1
+        else:
+            self._doc = self.default_factory()
+            self._version += 1
+            self.generation += 1
+            self._write(self._doc, self._version)
+
+    # ---------- writes ----------
+
+    @property
+    def dirty(self) -> bool:
+        return self._version != self._flushed_version
+
+    @contextmanager
+    def edit(self) -> Iterator[Dict[str, Any]]:
+        """Yield a shallow copy of the document; it replaces the document when the block exits cleanly."""
+        with self._lock:
+            draft = dict(self._current())
+            yield draft
+            self._doc = draft
+            self._version += 1
+            self.generation += 1
+            self._schedule_flush()
+        self._flush_if_immediate()
+
+    def replace(self, doc: Dict[str, Any]):
+        with self._lock:
+            self._doc = copy.deepcopy(doc)
+            self._version += 1
+            self.generation += 1
+            self._schedule_flush()
+        self._flush_if_immediate()
+
+    def _flush_if_immediate(self):
+        # lock order is _flush_lock -> _lock, so synchronous flushes happen after _lock is released
+        if self.flush_delay_s <= 0:
+            self.flush()
+
+    def _schedule_flush(self):
+        if self.flush_delay_s > 0 and self._timer is None:
+            self._timer = threading.Timer(self.flush_delay_s, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Write pending edits now (no-op when clean)."""
+        with self._flush_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                if not self.dirty or self._doc is None:
+                    return
+                doc, version = self._doc, self._version
+            # copy-on-write: `doc` can't change under us, so encode and write without blocking readers
+            self._write(doc, version)
+
+    def _write(self, doc: Dict[str, Any], version: int):
+        _atomic_write(self.path, json.dumps(doc, indent=2, default=str))
+        with self._lock:
+            self._stat = self._file_stat()
+            self._flushed_version = max(self._flushed_version, version)
+            self.flush_count += 1
+            if self.dirty:
+                # edits landed while we were writing
+                self._schedule_flush()
+
+
+def _atomic_write(path: Path, data: str):
+    """Write to a temp file in the same directory, fsync, then os.replace() over `path`."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+_SAFE_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+
+
+def _safe_name(name: str) -> str:
+    """Filesystem-safe directory/file name; anything unusual is replaced by a digest."""
+    if _SAFE_NAME.match(name) and ".." not in name:
+        return name
+    return "h-" + hashlib.sha256(name.encode("utf-8")).hexdigest()[:32]
+
+
+_MISSING = object()
+
+
+class _TenantProfile:
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.RLock()
+        self.sections: Dict[str, Any] = {}  # parsed sections (from files or the journal)
+        self.journaled: set = set()          # sections whose latest value is only in the journal
+        self.records = 0                     # lines in the journal
+        self.generation = 0                  # bumped on every save (ours or another process's)
+        self.journal_id: Optional[Tuple[int, int]] = None  # (st_dev, st_ino) of the journal we consumed
+        self.offset = 0                      # bytes of it consumed
+
+
+class SectionJournalStore:
+    JOURNAL = "journal.ndjson"
+    LOCK = ".lock"
+
+    def __init__(
+        self,
+        root: Path,
+        default_factory: Callable[[], Dict[str, Any]],
+        compact_after: int = 256,
+        fsync: bool = True,
+    ):
+        self.root = Path(root)
+        self.default_factory = default_factory
+        self.compact_after = compact_after
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._tenants: Dict[str, _TenantProfile] = {}
+        self.compactions = 0
+
+    # ---------- reads ----------
+
+    def read(self, tenant: str, sections: Iterable[str]) -> Dict[str, Any]:
+        """The requested sections (defaults filled in). Values are shared: treat as read-only."""
+        t = self._tenant(tenant)
+        with t.lock:
+            self._refresh(t)
+            return {name: self._section(t, name) for name in sections}
+
+    def generation(self, tenant: str) -> int:
+        t = self._tenant(tenant)
+        with t.lock:
+            self._refresh(t)
+            return t.generation
+
+    def version(self, tenant: str) -> Optional[Tuple[int, int, int]]:
+        """(inode, size, mtime_ns) of the tenant's journal: the same in every process, and
+        changed by every save (an append) and every compaction (a new file)."""
+        try:
+            st = os.stat(self.root / _safe_name(tenant) / self.JOURNAL)
+        except OSError:
+            return None
+        return st.st_ino, st.st_size, st.st_mtime_ns
+
+    def get(self, tenant: str, section: str) -> Any:
+        t = self._tenant(tenant)
+        with t.lock:
+            self._refresh(t)
+            return self._section(t, section)
+
+    def _section(self, t: _TenantProfile, name: str) -> Any:
+        value = t.sections.get(name, _MISSING)
+        if value is _MISSING:
+            path = t.path / f"{_safe_name(name)}.json"
+            if path.exists():
+                with path.open() as f:
+                    value = json.load(f)
+            else:
+                value = copy.deepcopy(self.default_factory().get(name))
+            t.sections[name] = value
+        return value
+
+    def _tenant(self, tenant: str) -> _TenantProfile:
+        with self._lock:
+            t = self._tenants.get(tenant)
+            if t is None:
+                t = _TenantProfile(self.root / _safe_name(tenant))
+                self._refresh(t)
+                self._tenants[tenant] = t
+            return t
+
+    def _refresh(self, t: _TenantProfile):
+        """Apply journal records written since we last looked (by any process)."""
+        journal = t.path / self.JOURNAL
+        try:
+            st = os.stat(journal)
+        except OSError:
+            st = None
+        ident = (st.st_dev, st.st_ino) if st is not None else None
+        if ident != t.journal_id or (st is not None and st.st_size < t.offset):
+            if t.journal_id is not None or t.sections:
+                # compacted elsewhere: section files are newer than anything cached
+                t.sections.clear()
+                t.journaled.clear()
+                t.records = 0
+                t.generation += 1
+            t.journal_id, t.offset = ident, 0
+        if st is None or st.st_size == t.offset:
+            return
+        with journal.open("rb") as f:
+            f.seek(t.offset)
+            data = f.read()
+        pos = applied = 0
+        while True:
+            end = data.find(b"\n", pos)
+            if end < 0:
+                break  # partial line: still being written, or torn by a crash
+            try:
+                record = json.loads(data[pos:end])
+            except ValueError:
+                record = None  # corrupt line: skip it, later records are still good
+            pos = end + 1
+            if isinstance(record, dict) and "section" in record:
+                t.sections[record["section"]] = record.get("value")
+                t.journaled.add(record["section"])
+                t.records += 1
+                applied += 1
+        t.offset += pos
+        if applied:
+            t.generation += 1
+
+    @contextmanager
+    def _file_lock(self, t: _TenantProfile) -> Iterator[None]:
+        """Exclusive across processes for one tenant's journal; a no-op without fcntl."""
+        if fcntl is None:
+            yield
+            return
+        t.path.mkdir(parents=True, exist_ok=True)
+        with (t.path / self.LOCK).open("a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    # ---------- writes ----------
+
+    def save(self, tenant: str, section: str, value: Any):
+        """Replace one section. `value` must not be mutated by the caller afterwards."""
+        t = self._tenant(tenant)
+        with t.lock, self._file_lock(t):
+            self._refresh(t)
+            self._append(t, section, value)
+
+    def update(self, tenant: str, section: str, fn: Callable[[Any], Any]) -> Any:
+        """Atomically replace a section with fn(current); fn must return a new value, not mutate."""
+        t = self._tenant(tenant)
+        with t.lock, self._file_lock(t):
+            self._refresh(t)
+            value = fn(self._section(t, section))
+            self._append(t, section, value)
+            return value
+
+    def _append(self, t: _TenantProfile, section: str, value: Any):
+        # caller holds the file lock and has refreshed, so unread bytes can only be a torn line
+        line = (json.dumps({"section": section, "value": value}, separators=(",", ":"), default=str) + "\n").encode("utf-8")
+        t.path.mkdir(parents=True, exist_ok=True)
+        with (t.path / self.JOURNAL).open("ab") as f:
+            st = os.fstat(f.fileno())
+            if st.st_size > t.offset:
+                f.truncate(t.offset)
+            f.write(line)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        t.journal_id = (st.st_dev, st.st_ino)
+        t.offset += len(line)
+        t.sections[section] = value
+        t.journaled.add(section)
+        t.records += 1
+        t.generation += 1
+        if t.records >= self.compact_after:
+            self._compact(t)
+
+    def compact(self, tenant: str):
+        t = self._tenant(tenant)
+        with t.lock, self._file_lock(t):
+            self._refresh(t)
+            self._compact(t)
+
+    def _compact(self, t: _TenantProfile):
+        # caller holds the file lock and has refreshed: t.sections covers every journaled record
+        if not t.records:
+            return
+        for name in sorted(t.journaled):
+            _atomic_write(t.path / f"{_safe_name(name)}.json", json.dumps(t.sections[name], default=str))
+        # section files are durable now; a new (empty) journal file tells other processes to reload
+        journal = t.path / self.JOURNAL
+        _atomic_write(journal, "")
+        st = os.stat(journal)
+        t.journal_id, t.offset = (st.st_dev, st.st_ino), 0
+        t.journaled.clear()
+        t.records = 0
+        self.compactions += 1
+
+    def compact_all(self):
+        with self._lock:
+            tenants = list(self._tenants.values())
+        for t in tenants:
+            with t.lock, self._file_lock(t):
+                self._refresh(t)
+                self._compact(t)
+
+    def evict(self, tenant: str):
+        """Drop a tenant's parsed sections from memory; the next access replays from disk."""
+        with self._lock:
+            self._tenants.pop(tenant, None)
+
+
+def open_store(path: Path, default_factory: Callable[[], Dict[str, Any]]) -> ProfileStore:
+    store = ProfileStore(path, default_factory, flush_delay_s=float(os.environ.get("PROFILE_FLUSH_DELAY_S", "0.5")))
+    atexit.register(store.flush)
+    return store
+
+
+def open_tenant_store(root: Path, default_factory: Callable[[], Dict[str, Any]]) -> SectionJournalStore:
+    store = SectionJournalStore(
+        root,
+        default_factory,
+        compact_after=int(os.environ.get("PROFILE_JOURNAL_COMPACT_AFTER", "256")),
+        fsync=os.environ.get("PROFILE_JOURNAL_FSYNC", "1") != "0",
+    )
+    atexit.register(store.compact_all)
+    return store
@@ -0,0 +1,107 @@
+# app/services/replace_repair.py
+"""
+Replace-vs-repair economics, evaluated column-wise for a whole fleet.
+
+Inputs are parallel columns (one entry per asset), and every output column is
+produced by one comprehension over the zipped inputs. Discounting uses the
+closed-form annuity factor, computed once for the fleet, instead of a loop
+per asset. A single-asset request is just a fleet of one, so
+the per-asset endpoint and the fleet endpoint always agree.
+
+Model (3-year horizon, same as the original single-asset calculator):
+  annual repair  = repair cost + downtime cost
+  annual replace = replacement cost / useful life (years) * (1 - productivity gain)
+  NPV savings    = (annual repair - annual replace) * annuity factor
+  payback        = replacement cost / annual savings, in months (savings > 0)
+  recommendation = replace when repair spend exceeds 60% of the replacement's
+                   annual amortization, borderline when |NPV savings| < 1000
+
+plan_replacements() turns fleet results into a ranked capex plan: replace
+candidates with positive NPV savings and a positive replacement cost, ordered
+by NPV savings per capex dollar, taken greedily while they fit the budget.
+"""
+from typing import Any, Dict, List, Optional, Sequence
+
+HORIZON_YEARS = 3
+REPLACE_THRESHOLD = 0.6
+BORDERLINE_NPV = 1000.0
+
+
+def annuity_factor(rate: float, years: int = HORIZON_YEARS) -> float:
+    """Present value of 1/year for `years` years at `rate`."""
+    if rate == 0:
+        return float(years)
+    return (1 - (1 + rate) ** -years) / rate
+
+
+def evaluate_fleet(
+    repair_cost_year: Sequence[float],
+    downtime_cost_year: Sequence[float],
+    replacement_cost: Sequence[float],
+    useful_life_months: Sequence[float],
+    productivity_gain: Sequence[float],
+    discount_rate: float,
+) -> Dict[str, List[Any]]:
+    """Output columns (tco_3yr_repair, tco_3yr_replace, npv_savings, payback_months, recommendation)."""
+    n = len(repair_cost_year)
+    if not (len(downtime_cost_year) == len(replacement_cost) == len(useful_life_months) == len(productivity_gain) == n):
+        raise ValueError("input columns must have the same length")
+    if any(life <= 0 for life in useful_life_months):
+        raise ValueError("useful life must be positive")
+    af = annuity_factor(discount_rate)
+
+    annual_repair = [r + d for r, d in zip(repair_cost_year, downtime_cost_year)]
+    amortized = [c * 12.0 / life for c, life in zip(replacement_cost, useful_life_months)]
+    annual_replace = [a * (1 - g) for a, g in zip(amortized, productivity_gain)]
+    annual_savings = [r - p for r, p in zip(annual_repair, annual_replace)]
+    npv_savings = [round(s * af, 2) for s in annual_savings]
+    return {
+        "tco_3yr_repair": [round(r * HORIZON_YEARS, 2) for r in annual_repair],
+        "tco_3yr_replace": [round(p * HORIZON_YEARS, 2) for p in annual_replace],
+        "npv_savings": npv_savings,
+        "payback_months": [int(round(c / s * 12)) if s > 0 else None for c, s in zip(replacement_cost, annual_savings)],
+        "recommendation": [
+            "replace" if r > REPLACE_THRESHOLD * a else "borderline" if abs(v) < BORDERLINE_NPV else "repair"
+            for r, a, v in zip(annual_repair, amortized, npv_savings)
+        ],
+    }
+
+
+def plan_replacements(
+    asset_ids: Sequence[str],
+    replacement_cost: Sequence[float],
+    results: Dict[str, List[Any]],
+    budget: Optional[float] = None,
+    max_count: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Ranked replacements that fit `budget` (and `max_count`); None means unlimited."""
+    candidates = [
+        i for i, (rec, npv) in enumerate(zip(results["recommendation"], results["npv_savings"]))
+        if rec == "replace" and npv > 0 and replacement_cost[i] > 0  # an unpriced replacement is not a plan
+    ]
+    # best return on capex first
+    candidates.sort(key=lambda i: (-(results["npv_savings"][i] / replacement_cost[i]), asset_ids[i]))
+    selected: List[Dict[str, Any]] = []
+    deferred: List[str] = []
+    spent = 0.0
+    for i in candidates:
+        cost = replacement_cost[i]
+        if (max_count is not None and len(selected) >= max_count) or (budget is not None and spent + cost > budget):
+            deferred.append(asset_ids[i])
+            continue
+        spent += cost
+        selected.append({
+            "rank": len(selected) + 1,
+            "asset_id": asset_ids[i],
+            "replacement_cost": round(cost, 2),
+            "npv_savings": results["npv_savings"][i],
+            "payback_months": results["payback_months"][i],
+        })
+    return {
+        "budget": budget,
+        "capex": round(spent, 2),
+        "remaining_budget": None if budget is None else round(budget - spent, 2),
+        "npv_savings": round(sum(s["npv_savings"] for s in selected), 2),
+        "selected": selected,
+        "deferred": deferred,
+    }
@@ -0,0 +1,219 @@
+# app/services/scenario_parser.py
+"""
+Deterministic parser for common scenario questions.
+
+Handles the phrasing we see most in Scenario Lab / scenario chat so they can be
+answered locally instead of through multi-second assistant runs:
+  - "raise prices 5%", "cut prices by 3 percent", "what if prices go up 10%?"
+  - "hire 2 techs", "add one technician", "lay off 3 people"
+  - "buy a $45k truck with a $36k loan at 7.5%", "purchase $120,000 of equipment"
+
+parse_scenario_question() returns None when nothing is recognised, or when an
+amount or percentage in the question was not used by any lever (a partial
+parse would silently drop it); callers then fall back to the LLM / template
+path.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..schemas import ScenarioInputs, ScenarioLabRequest
+
+_NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10, "a couple of": 2, "a couple": 2,
+}
+_COUNT = r"(\d+|a couple of|a couple|an|a|one|two|three|four|five|six|seven|eight|nine|ten)"
+_PCT = r"(\d+(?:\.\d+)?)\s*(?:%|percent\b|pct\b)"
+# an amount counts as money only with a "$", a k/m/thousand/million unit or a currency word,
+# so "buy 2 trucks" is not a $2 purchase
+_MONEY = (
+    r"(?=\$|\d[\d,]*(?:\.\d+)?\s*(?:k|m|mm|thousand|million|dollars?|usd|bucks)\b)"
+    r"\$?\s*(\d[\d,]*(?:\.\d+)?)\s*(k|m|mm|thousand|million)?\b(?:\s*(?:dollars?|usd|bucks)\b)?"
+)
+_MAX_COUNT = 100  # larger head counts are more likely years or typos: leave them to the assistant
+_ROLE = (
+    r"(?:new\s+|more\s+|additional\s+|full[- ]time\s+|part[- ]time\s+)*"
+    r"(?:techs?|technicians?|employees?|people|persons?|staff|workers?|hires?|installers?|"
+    r"plumbers?|electricians?|drivers?|reps?|salespeople|salesperson|engineers?|crew members?|helpers?|apprentices?)"
+)
+
+_PRICE_UP_WORDS = r"raise|raising|increase|increasing|bump|bumping|hike|hiking|lift|lifting"
+_PRICE_DOWN_WORDS = r"lower|lowering|cut|cutting|reduce|reducing|drop|dropping|decrease|decreasing|discount|discounting"
+
+_PRICE_VERB_RE = re.compile(
+    rf"\b({_PRICE_UP_WORDS}|{_PRICE_DOWN_WORDS})\s+(?:our\s+|my\s+|the\s+|all\s+|service\s+)*(?:prices?|pricing|rates)\s+(?:by\s+)?(?:about\s+|around\s+)?{_PCT}"
+)
+_PRICE_DIRECTION_RE = re.compile(
+    rf"\b(?:prices?|pricing|rates)\s+(?:go\s+|goes\s+|went\s+|are\s+|were\s+)?(up|down)\s+(?:by\s+)?{_PCT}"
+)
+_PRICE_NOUN_RE = re.compile(
+    rf"{_PCT}\s+(?:price|pricing|rate)\s+(increase|hike|bump|rise|cut|decrease|reduction|drop)"
+)
+_HIRE_RE = re.compile(rf"\b(hire|hiring|add|adding|bring on|bringing on|onboard|onboarding)\s+{_COUNT}\s+{_ROLE}")
+_FIRE_RE = re.compile(rf"\b(lay off|laying off|let go|letting go of|let go of|cut|cutting|fire|firing)\s+{_COUNT}\s+{_ROLE}")
+_PURCHASE_RE = re.compile(
+    rf"\b(buy|buying|purchase|purchasing|get|getting|acquire|acquiring|afford)\s+(?:a|an|the|another|new|some)?\s*(?:new\s+)?{_MONEY}\s*(?:worth\s+of\s+|of\s+)?([a-z][a-z\- ]*?)?(?=\s+(?:with|for|using|financed|at|and|on)\b|[?.,!]|$)"
+)
+_LOAN_RE = re.compile(rf"{_MONEY}\s*(?:loan|note|financing|credit line|line of credit)")
+_LOAN_OF_RE = re.compile(rf"\b(?:loan|financing|borrow|borrowing|finance|financing)\s+(?:of\s+|for\s+)?{_MONEY}")
+_RATE_RE = re.compile(rf"\bat\s+(?:an?\s+)?(?:interest\s+rate\s+of\s+|rate\s+of\s+)?{_PCT}|{_PCT}\s*(?:apr|interest|rate)")
+_MONEY_ANY_RE = re.compile(_MONEY)
+_PCT_ANY_RE = re.compile(_PCT)
+_HORIZON_RE = re.compile(r"\b(?:over|for|in|next)\s+(?:the\s+)?(?:next\s+)?(\d+)\s*(months?|years?|days?)\b")
+
+
+def _count(token: str) -> Optional[int]:
+    """Head count for a number or number word; None when it is 0 or above _MAX_COUNT."""
+    token = token.strip()
+    n = int(token) if token.isdigit() else _NUMBER_WORDS.get(token, 1)
+    return n if 0 < n <= _MAX_COUNT else None
+
+
+def _money(amount: str, unit: Optional[str]) -> float:
+    value = float(amount.replace(",", ""))
+    unit = (unit or "").lower()
+    if unit in ("k", "thousand"):
+        value *= 1_000
+    elif unit in ("m", "mm", "million"):
+        value *= 1_000_000
+    return value
+
+
+@dataclass
+class ParsedScenario:
+    """Scenario levers extracted from a natural-language question."""
+    price_change_pct: float = 0.0
+    headcount_delta: int = 0
+    capex_amount: float = 0.0
+    loan_amount: float = 0.0
+    interest_rate: float = 0.0
+    asset: Optional[str] = None
+    horizon_months: int = 12
+    matched: List[str] = field(default_factory=list)
+
+    @property
+    def scenario_name(self) -> str:
+        parts = []
+        if self.price_change_pct:
+            verb = "Raise" if self.price_change_pct > 0 else "Cut"
+            parts.append(f"{verb} Prices {abs(self.price_change_pct):g}%")
+        if self.headcount_delta:
+            verb = "Hire" if self.headcount_delta > 0 else "Reduce Headcount by"
+            parts.append(f"{verb} {abs(self.headcount_delta)}")
+        if self.capex_amount:
+            label = f"Purchase {(self.asset or 'Equipment').title()} (${self.capex_amount:,.0f})"
+            if self.loan_amount:
+                label += f" financed ${self.loan_amount:,.0f}"
+                if self.interest_rate:
+                    label += f" @ {self.interest_rate:g}%"
+            parts.append(label)
+        elif self.loan_amount:
+            parts.append(f"Take ${self.loan_amount:,.0f} Loan" + (f" @ {self.interest_rate:g}%" if self.interest_rate else ""))
+        return " + ".join(parts)
+
+    def to_inputs(self) -> ScenarioInputs:
+        return ScenarioInputs(
+            price_change_pct=self.price_change_pct,
+            headcount_delta=self.headcount_delta,
+            loan_amount=self.loan_amount,
+            interest_rate=self.interest_rate,
+            capex_amount=self.capex_amount,
+        )
+
+    def to_request(self, company_id: str, question: Optional[str] = None) -> ScenarioLabRequest:
+        return ScenarioLabRequest(
+            company_id=company_id,
+            scenario_name=self.scenario_name,
+            description=question,
+            inputs=self.to_inputs(),
+            horizon_months=self.horizon_months,
+        )
+
+    def to_deltas(self) -> List[Dict[str, Any]]:
+        """Deltas in the shape create_simple_projection() expects."""
+        deltas: List[Dict[str, Any]] = []
+        if self.price_change_pct:
+            deltas.append({"lever": "price", "delta_pct": self.price_change_pct})
+        if self.headcount_delta:
+            deltas.append({"lever": "headcount", "delta_abs": self.headcount_delta})
+        if self.capex_amount:
+            deltas.append({"lever": "capex", "delta_abs": self.capex_amount})
+        if self.loan_amount:
+            deltas.append({"lever": "loan", "delta_abs": self.loan_amount, "rate_pct": self.interest_rate})
+        return deltas
+
+
+def _within(pos: int, spans: List[Tuple[int, int]]) -> bool:
+    return any(start <= pos < end for start, end in spans)
+
+
+def parse_scenario_question(question: str) -> Optional[ParsedScenario]:
+    """Parse a scenario question into levers; None if no lever is recognised or a figure is left over."""
+    q = " ".join((question or "").lower().replace("’", "'").split())
+    if not q:
+        return None
+    parsed = ParsedScenario()
+    used: List[Tuple[int, int]] = []  # spans of the question consumed by a lever
+
+    m = _PRICE_VERB_RE.search(q)
+    if m:
+        sign = -1 if re.fullmatch(_PRICE_DOWN_WORDS, m.group(1)) else 1
+        parsed.price_change_pct = sign * float(m.group(2))
+        parsed.matched.append("price")
+        used.append(m.span())
+    else:
+        m = _PRICE_DIRECTION_RE.search(q) or _PRICE_NOUN_RE.search(q)
+        if m:
+            if m.re is _PRICE_DIRECTION_RE:
+                sign = 1 if m.group(1) == "up" else -1
+                pct = float(m.group(2))
+            else:
+                sign = -1 if m.group(2) in ("cut", "decrease", "reduction", "drop") else 1
+                pct = float(m.group(1))
+            parsed.price_change_pct = sign * pct
+            parsed.matched.append("price")
+            used.append(m.span())
+
+    m = _HIRE_RE.search(q)
+    sign = 1
+    if not m:
+        m, sign = _FIRE_RE.search(q), -1
+    count = _count(m.group(2)) if m else None
+    if count is not None:
+        parsed.headcount_delta = sign * count
+        parsed.matched.append("headcount")
+        used.append(m.span())
+
+    purchase = _PURCHASE_RE.search(q)
+    if purchase:
+        parsed.capex_amount = _money(purchase.group(2), purchase.group(3))
+        asset = (purchase.group(4) or "").strip()
+        parsed.asset = asset or None
+        parsed.matched.append("capex")
+        used.append(purchase.span())
+
+    # the loan and its rate may come before or after the purchase, but never reuse its amount
+    # ("finance $36k at 7.5% to buy a $45k truck", "buy a $45k truck at 7.5% with a $36k loan")
+    loans = [l for rx in (_LOAN_RE, _LOAN_OF_RE) for l in rx.finditer(q) if not _within(l.start(1), used)]
+    if loans:
+        m = loans[0]
+        parsed.loan_amount = _money(m.group(1), m.group(2))
+        parsed.matched.append("loan")
+        used.append(m.span())
+        rate = next((r for r in _RATE_RE.finditer(q) if not _within(r.start(), used)), None)
+        if rate:
+            parsed.interest_rate = float(rate.group(1) or rate.group(2))
+            used.append(rate.span())
+
+    m = _HORIZON_RE.search(q)
+    if m:
+        n, unit = int(m.group(1)), m.group(2)
+        months = n * 12 if unit.startswith("year") else (max(1, round(n / 30)) if unit.startswith("day") else n)
+        parsed.horizon_months = max(1, min(months, 60))
+
+    if not parsed.matched:
+        return None
+    # an amount or percentage no lever took means the question was only partly understood
+    leftover = [f for rx in (_MONEY_ANY_RE, _PCT_ANY_RE) for f in rx.finditer(q) if not _within(f.start(), used)]
+    return None if leftover else parsed
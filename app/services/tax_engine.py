@@ -2,8 +2,12 @@ import json
 from datetime import datetime, date, timedelta
 from typing import Dict, Any, List, Optional
 
+from ..conditional import register_version
+
 # In-memory priorities store for demo
 _PRIORITIES_STORE: Dict[str, List[Dict[str, Any]]] = {}
+# the store is per process, so the ETag version is its content: workers holding different priorities never share a tag
+register_version("tax", lambda company_id: _PRIORITIES_STORE.get(company_id, []))
 
 
 def meta_top(baseline_source: str = "quickbooks_demo", sources: Optional[List[str]] = None, notes: Optional[List[str]] = None, confidence: str = "low", latency_ms: int = 20, used_priors: bool = True, prior_weight: float = 0.4):
@@ -252,9 +256,9 @@ def tax_full(company_id: str, year: int, include_peers: bool = True, include_ass
         "opportunities": opportunities,
         "benchmarks": benchmarks,
         "deduction_finder": deduction_finder,
-        "quarterly_plan": {k: v for k, v in quarterly_plan.items() if k != "_meta"},
-        "entity_analysis": {k: v for k, v in entity_analysis.items() if k != "_meta"},
-        "depreciation": {k: v for k, v in depreciation.items() if k != "_meta"},
+        "quarterly_plan": quarterly_plan,
+        "entity_analysis": entity_analysis,
+        "depreciation": depreciation,
         "priority_actions": priorities,
         "coach_examples": coach_examples,
         "export": export,
@@ -0,0 +1,228 @@
+# app/services/telemetry_ingest.py
+"""
+Streaming bulk telemetry ingest (NDJSON, optionally gzip-compressed).
+
+The request body is consumed chunk by chunk: decompressed incrementally, split
+into lines, and each line parsed and validated on its own, so memory per
+request is one batch, not the upload. Valid samples are grouped into batches
+of `batch_lines` and handed to a writer on the threadpool. Parsing of the next
+batch overlaps the write of the current one, and every batch is acknowledged
+once it is committed.
+
+Backpressure: all requests share a bounded number of in-flight batch writes
+(`max_inflight`). When they are all busy, a request stops reading its body,
+which in turn pushes back on the client's TCP window. If no slot frees up
+within `busy_timeout_s`, the request ends with IngestBusy. The acks for the
+batches that were already committed let the device resume from the right line.
+
+Line format: {"asset_id": "...", "ts": "...", "odometer": ..., "engine_hours": ...,
+"fuel": ..., "dtc": [...]}; unknown keys are ignored.
+"""
+import asyncio
+import json
+import math
+import os
+import weakref
+import zlib
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from .telemetry_store import parse_ts
+
+BATCH_LINES = int(os.environ.get("TELEMETRY_BULK_BATCH_LINES", "2000"))
+MAX_INFLIGHT = int(os.environ.get("TELEMETRY_BULK_MAX_INFLIGHT", "4"))
+BUSY_TIMEOUT_S = float(os.environ.get("TELEMETRY_BULK_BUSY_TIMEOUT_S", "10"))
+MAX_LINE_BYTES = 64 * 1024
+INFLATE_CHUNK_BYTES = 64 * 1024  # most decompressed bytes produced per step, so a gzip bomb can't balloon memory
+MAX_ERRORS_PER_BATCH = 20
+
+_NUMERIC = ("odometer", "engine_hours", "fuel")
+
+Row = Tuple[str, Dict[str, Any]]
+
+
+class IngestBusy(Exception):
+    def __init__(self, result: Dict[str, Any]):
+        super().__init__("telemetry write queue is full")
+        self.result = result
+
+
+def validate_line(line: bytes) -> Tuple[Optional[Row], Optional[str]]:
+    """(asset_id, sample) for a valid line, else (None, reason)."""
+    try:
+        obj = json.loads(line)
+    except ValueError:
+        return None, "invalid json"
+    if not isinstance(obj, dict):
+        return None, "not an object"
+    asset_id = obj.get("asset_id")
+    if not isinstance(asset_id, str) or not asset_id:
+        return None, "missing asset_id"
+    if parse_ts(obj.get("ts")) is None:
+        return None, "missing or invalid ts"
+    for key in _NUMERIC:
+        v = obj.get(key)
+        if v is not None and (isinstance(v, bool) or not isinstance(v, (int, float)) or not math.isfinite(v)):
+            return None, f"{key} must be a number"
+    dtc = obj.get("dtc")
+    if dtc is not None and (not isinstance(dtc, list) or not all(isinstance(c, str) for c in dtc)):
+        return None, "dtc must be a list of strings"
+    return (asset_id, obj), None
+
+
+async def _inflated(chunks: AsyncIterator[bytes], gzip: bool) -> AsyncIterator[bytes]:
+    """The body as-is, or gunzipped in pieces of at most INFLATE_CHUNK_BYTES.
+
+    A gzip body may hold several members back to back (concatenated .gz files,
+    devices that compress each flush); each one after the first is inflated in
+    turn. Bytes after a member that are not another member, or a body that
+    ends mid-member, raise zlib.error.
+    """
+    if not gzip:
+        async for chunk in chunks:
+            yield chunk
+        return
+    inflate = zlib.decompressobj(zlib.MAX_WBITS | 32)
+    async for chunk in chunks:
+        while chunk:
+            if inflate.eof:
+                inflate = zlib.decompressobj(zlib.MAX_WBITS | 32)  # next member
+            yield inflate.decompress(chunk, INFLATE_CHUNK_BYTES)
+            chunk = inflate.unconsumed_tail or inflate.unused_data
+    yield inflate.flush()
+    if not inflate.eof:
+        raise zlib.error("truncated gzip stream")
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], gzip: bool = False) -> AsyncIterator[Optional[bytes]]:
+    """Lines of a (possibly gzip) byte stream; an overlong line comes out as None."""
+    buf = b""
+    skipping = False
+    async for chunk in _inflated(chunks, gzip):
+        buf += chunk
+        start = 0
+        while True:
+            nl = buf.find(b"\n", start)
+            if nl < 0:
+                break
+            if skipping:
+                skipping = False
+            else:
+                yield buf[start:nl]
+            start = nl + 1
+        buf = buf[start:]
+        if len(buf) > MAX_LINE_BYTES:
+            if not skipping:
+                yield None  # reported as an error, rest of the line dropped
+            skipping = True
+            buf = b""
+    if buf and not skipping:
+        yield buf
+
+
+# keyed by the loop itself: an id() can be recycled by a later loop
+_SLOTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+def _slots(max_inflight: int) -> asyncio.Semaphore:
+    # shared by every request on this event loop (one per worker process)
+    loop = asyncio.get_running_loop()
+    sem = _SLOTS.get(loop)
+    if sem is None:
+        # a semaphore that ever had waiters holds its loop, so weak keys alone don't drop closed loops
+        for old in [l for l in list(_SLOTS.keys()) if l.is_closed()]:
+            _SLOTS.pop(old, None)
+        sem = _SLOTS[loop] = asyncio.Semaphore(max_inflight)
+    return sem
+
+
+async def ingest_ndjson(
+    company_id: str,
+    chunks: AsyncIterator[bytes],
+    write: Callable[[str, List[Row]], int],
+    gzip: bool = False,
+    batch_lines: Optional[int] = None,
+    busy_timeout_s: Optional[float] = None,
+) -> Dict[str, Any]:
+    """Parse, validate and write an NDJSON telemetry stream; returns totals and per-batch acks."""
+    batch_lines = batch_lines or BATCH_LINES
+    busy_timeout_s = BUSY_TIMEOUT_S if busy_timeout_s is None else busy_timeout_s
+    sem = _slots(MAX_INFLIGHT)
+    acks: List[Dict[str, Any]] = []
+    totals = {"lines": 0, "accepted": 0, "rejected": 0}
+    pending: Optional[Tuple[asyncio.Task, Dict[str, Any]]] = None
+
+    async def settle():
+        nonlocal pending
+        if pending is None:
+            return
+        task, ack = pending
+        pending = None
+        ack["accepted"] = await task
+        ack["committed"] = True
+        totals["accepted"] += ack["accepted"]
+        acks.append(ack)
+
+    async def flush(rows: List[Row], ack: Dict[str, Any]):
+        nonlocal pending
+        await settle()  # acks stay in order; at most one write per request in flight
+        try:
+            await asyncio.wait_for(sem.acquire(), busy_timeout_s)
+        except asyncio.TimeoutError:
+            raise IngestBusy(_result(acks, totals, busy=True))
+
+        async def run():
+            try:
+                return await run_in_threadpool(write, company_id, rows) if rows else 0
+            finally:
+                sem.release()
+
+        pending = (asyncio.ensure_future(run()), ack)
+
+    rows: List[Row] = []
+    ack = _new_ack(1, 1)
+    lineno = 0
+    async for line in iter_lines(chunks, gzip=gzip):
+        lineno += 1
+        if line is not None and not line.strip():
+            ack["last_line"] = lineno  # blank lines are allowed and not counted
+            continue
+        row, error = validate_line(line) if line is not None else (None, "line too long")
+        if error:
+            _reject(ack, totals, lineno, error)
+        else:
+            rows.append(row)
+        ack["last_line"] = lineno
+        ack["lines"] += 1
+        if ack["lines"] >= batch_lines:
+            totals["lines"] += ack["lines"]
+            await flush(rows, ack)
+            rows, ack = [], _new_ack(ack["batch"] + 1, lineno + 1)
+    if ack["lines"] or rows:
+        totals["lines"] += ack["lines"]
+        await flush(rows, ack)
+    await settle()
+    return _result(acks, totals)
+
+
+def _new_ack(batch: int, first_line: int) -> Dict[str, Any]:
+    return {"batch": batch, "first_line": first_line, "last_line": first_line - 1, "lines": 0, "accepted": 0, "rejected": 0, "errors": [], "committed": False}
+
+
+def _reject(ack: Dict[str, Any], totals: Dict[str, int], lineno: int, reason: str):
+    ack["rejected"] += 1
+    totals["rejected"] += 1
+    if len(ack["errors"]) < MAX_ERRORS_PER_BATCH:
+        ack["errors"].append({"line": lineno, "error": reason})
+
+
+def _result(acks: List[Dict[str, Any]], totals: Dict[str, int], busy: bool = False) -> Dict[str, Any]:
+    return {
+        "lines": totals["lines"],
+        "accepted": totals["accepted"],
+        "rejected": totals["rejected"],
+        "committed_through_line": acks[-1]["last_line"] if acks else 0,
+        "batches": acks,
+        "busy": busy,
+    }
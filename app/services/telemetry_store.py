@@ -0,0 +1,624 @@
+# app/services/telemetry_store.py
+"""
+Per-asset telemetry in append-only, memory-mapped columnar segments.
+
+Layout under TELEMETRY_DIR (default data/telemetry):
+
+    <tenant>/<asset>/seg-<first_ts>-<seq>.col            fixed-capacity segment, one block per column
+    <tenant>/<asset>/seg-<first_ts>-<seq>.faults.ndjson  the segment's samples that carried fault codes (sparse)
+    <tenant>/<asset>/rollups.bin                         hourly and daily rollup rings
+    <tenant>/.version                                    8-byte count of ingests into any of the tenant's assets
+    <tenant>/.changes                                    change log: one [version, asset_id] JSON line per ingest
+
+A segment file is a 64-byte header (row count, min/max timestamp, sorted flag)
+followed by one contiguous block per column: ts (int64 epoch seconds),
+odometer, engine_hours, fuel (float64, NaN when missing), and dtc_count
+(uint16). Rows are appended in place through the mmap. The segment with the
+highest <seq> is the active one; when it fills up a new one is started, and
+segments older than `retention_days` are deleted together with their fault
+files. Range queries (faults included) skip segments by their min/max and
+bisect the ts column of sorted segments (late samples mark a segment
+unsorted; those are scanned).
+
+Rollups are updated at ingest time in two fixed rings of 80-byte records:
+hourly buckets for `hourly_days` and daily buckets for `daily_days`. Each
+bucket holds sample/fault counts, first/last ts, odometer and engine-hour
+min/max, last fuel and the active seconds. An hour is active for its
+engine-hour delta or, without engine hours, for the span over which the
+odometer moved. Daily active time is the sum of its hours, so utilization
+over N days reads at most N records.
+
+Only a bounded LRU of per-asset handles (`max_open`) keeps files mapped;
+everything else lives on disk and in the OS page cache.
+
+Several worker processes can write the same asset. Writes hold an exclusive
+flock on <asset>/.lock and reads a shared one. Under the lock a handle
+re-lists the segments and re-reads the active segment's header, so rows and
+segments added by another process (or before an evicted handle was reopened)
+are picked up before anything is appended. After each ingest the tenant's
+.version counter is incremented under its own flock, and the new version and
+the asset are appended to the tenant's .changes log. `version(tenant)` reads
+the counter, so callers can tell that telemetry changed in any process;
+`changes(tenant, cursor)` reads the log from where the caller left off and
+says which assets changed, so cached per-asset data can be refreshed asset by
+asset. The log is cut back to its newer half once it outgrows
+`changes_max_bytes` (replaced atomically; the cursor recognises the file by
+its first line); a cursor older than what is left gets None and must treat
+every asset as changed.
+
+Timestamps are epoch seconds; numbers too large for that are taken as epoch
+milliseconds. Anything outside MIN_TS..MAX_TS is rejected.
+"""
+import bisect
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .profile_store import _safe_name
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: run a single writer process per data directory
+    fcntl = None
+
+BASE = Path(__file__).resolve().parents[2]
+TELEMETRY_DIR = Path(os.environ.get("TELEMETRY_DIR", BASE / "data" / "telemetry"))
+
+NAN = float("nan")
+HOUR, DAY = 3600, 86400
+
+COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("ts", "q"),
+    ("odometer", "d"),
+    ("engine_hours", "d"),
+    ("fuel", "d"),
+    ("dtc_count", "H"),
+)
+_HEADER = struct.Struct("<4sHHIIqqB")  # magic, version, reserved, capacity, count, min_ts, max_ts, sorted
+_HEADER_SIZE = 64
+_MAGIC = b"LSTS"
+_VERSION = struct.Struct("<Q")
+
+MIN_TS = 946684800    # 2000-01-01
+MAX_TS = 4102444800   # 2100-01-01
+_MS_THRESHOLD = 10 ** 11  # larger epoch numbers are milliseconds (10**11 s is the year 5138)
+
+
+def parse_ts(value: Any) -> Optional[int]:
+    """Epoch seconds from an ISO-8601 string or a number (seconds or milliseconds); None if unusable."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        if not math.isfinite(value):
+            return None
+        ts = int(value // 1000) if abs(value) >= _MS_THRESHOLD else int(value)
+    elif isinstance(value, str) and value:
+        try:
+            ts = int(datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp())
+        except (ValueError, OverflowError, OSError):
+            return None
+    else:
+        return None
+    return ts if MIN_TS <= ts < MAX_TS else None
+
+
+def _seq(path: Path) -> int:
+    digits = path.name[:-len(".col")].rpartition("-")[2]
+    return int(digits) if digits.isdigit() else -1
+
+
+def _segment_order(path: Path) -> Tuple[int, str]:
+    # creation order: the last one is the active segment, even when backfill started it with an older ts
+    return _seq(path), path.name
+
+
+def _faults_path(segment: Path) -> Path:
+    return segment.with_suffix(".faults.ndjson")
+
+
+def _num(value: Any) -> float:
+    try:
+        return float(value) if value is not None else NAN
+    except (TypeError, ValueError):
+        return NAN
+
+
+class Segment:
+    """A fixed-capacity columnar segment file, mapped into memory."""
+
+    def __init__(self, path: Path, capacity: int = 0, create: bool = False):
+        self.path = path
+        if create:
+            size = _HEADER_SIZE + sum(capacity * struct.calcsize(fmt) for _, fmt in COLUMNS)
+            with open(path, "wb") as f:
+                f.truncate(size)
+                f.write(_HEADER.pack(_MAGIC, 1, 0, capacity, 0, 0, 0, 1))
+        self._file = open(path, "r+b")
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+        magic, _, _, self.capacity, self.count, self.min_ts, self.max_ts, is_sorted = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC:
+            self.close()
+            raise ValueError(f"not a telemetry segment: {path}")
+        self.sorted = bool(is_sorted)
+        self.cols: Dict[str, memoryview] = {}
+        offset = _HEADER_SIZE
+        for name, fmt in COLUMNS:
+            width = struct.calcsize(fmt) * self.capacity
+            self.cols[name] = memoryview(self._mm)[offset:offset + width].cast(fmt)
+            offset += width
+
+    def refresh(self):
+        """Re-read the header: another process may have appended rows."""
+        _, _, _, _, self.count, self.min_ts, self.max_ts, is_sorted = _HEADER.unpack_from(self._mm, 0)
+        self.sorted = bool(is_sorted)
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.capacity
+
+    def append(self, ts: int, odometer: float, engine_hours: float, fuel: float, dtc_count: int):
+        i = self.count
+        if i and ts < self.max_ts:
+            self.sorted = False
+        cols = self.cols
+        cols["ts"][i] = ts
+        cols["odometer"][i] = odometer
+        cols["engine_hours"][i] = engine_hours
+        cols["fuel"][i] = fuel
+        cols["dtc_count"][i] = min(dtc_count, 0xFFFF)
+        self.count = i + 1
+        self.min_ts = ts if i == 0 else min(self.min_ts, ts)
+        self.max_ts = ts if i == 0 else max(self.max_ts, ts)
+        _HEADER.pack_into(self._mm, 0, _MAGIC, 1, 0, self.capacity, self.count, self.min_ts, self.max_ts, int(self.sorted))
+
+    def rows(self, start: int, end: int) -> Iterable[int]:
+        """Row indexes with start <= ts < end."""
+        ts = self.cols["ts"]
+        if self.sorted:
+            lo = bisect.bisect_left(ts, start, 0, self.count)
+            hi = bisect.bisect_left(ts, end, lo, self.count)
+            return range(lo, hi)
+        return [i for i in range(self.count) if start <= ts[i] < end]
+
+    def close(self):
+        for view in getattr(self, "cols", {}).values():
+            view.release()
+        self.cols = {}
+        self._mm.flush()
+        self._mm.close()
+        self._file.close()
+
+
+# bucket, samples, faults, first_ts, last_ts, odo_min, odo_max, hours_min, hours_max, fuel_last, active_s
+_ROLLUP = struct.Struct("<qIIqqdddddd")
+ROLLUP_FIELDS = ("bucket", "samples", "faults", "first_ts", "last_ts", "odometer_min", "odometer_max", "engine_hours_min", "engine_hours_max", "fuel_last", "active_s")
+
+
+def _empty_rollup(bucket: int) -> list:
+    return [bucket, 0, 0, 0, 0, NAN, NAN, NAN, NAN, NAN, 0.0]
+
+
+def _nan_min(a: float, b: float) -> float:
+    return b if math.isnan(a) else (a if math.isnan(b) else min(a, b))
+
+
+def _nan_max(a: float, b: float) -> float:
+    return b if math.isnan(a) else (a if math.isnan(b) else max(a, b))
+
+
+def _active_seconds(rec: list, cap: float) -> float:
+    hours_min, hours_max = rec[7], rec[8]
+    if not math.isnan(hours_min) and hours_max > hours_min:
+        return min(cap, (hours_max - hours_min) * HOUR)
+    odo_min, odo_max = rec[5], rec[6]
+    if not math.isnan(odo_min) and odo_max > odo_min:
+        return float(min(cap, rec[4] - rec[3]))
+    return 0.0
+
+
+class Rollups:
+    """Hourly and daily rollup rings in one mapped file."""
+
+    def __init__(self, path: Path, hourly_slots: int, daily_slots: int):
+        self.hourly_slots = hourly_slots
+        self.daily_slots = daily_slots
+        size = _ROLLUP.size * (hourly_slots + daily_slots)
+        # never truncate a file another process may be using; only a ring of another size is reset
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        current = os.fstat(fd).st_size
+        if current != size:
+            if current:
+                os.ftruncate(fd, 0)
+            os.ftruncate(fd, size)
+        self._file = os.fdopen(fd, "r+b")
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+
+    def _offset(self, granularity: str, bucket: int) -> int:
+        if granularity == "hour":
+            return _ROLLUP.size * (bucket % self.hourly_slots)
+        return _ROLLUP.size * (self.hourly_slots + bucket % self.daily_slots)
+
+    def get(self, granularity: str, bucket: int) -> Optional[list]:
+        rec = list(_ROLLUP.unpack_from(self._mm, self._offset(granularity, bucket)))
+        return rec if rec[0] == bucket and rec[1] else None
+
+    def add(self, ts: int, odometer: float, engine_hours: float, fuel: float, dtc_count: int):
+        hour, day = ts // HOUR, ts // DAY
+        delta = None
+        hourly = self._load("hour", hour)
+        if hourly is not None:
+            before = _active_seconds(hourly, HOUR) if hourly[1] else 0.0
+            self._fold(hourly, ts, odometer, engine_hours, fuel, dtc_count)
+            hourly[10] = _active_seconds(hourly, HOUR)
+            self._store("hour", hourly)
+            delta = hourly[10] - before
+        daily = self._load("day", day)
+        if daily is None:
+            return  # older than the daily ring too; the raw segment still has it
+        self._fold(daily, ts, odometer, engine_hours, fuel, dtc_count)
+        if delta is not None:
+            daily[10] = max(0.0, daily[10] + delta)
+        else:
+            # backfill older than the hourly ring: estimate from the day's own readings
+            daily[10] = max(daily[10], _active_seconds(daily, DAY))
+        self._store("day", daily)
+
+    def _load(self, granularity: str, bucket: int) -> Optional[list]:
+        rec = list(_ROLLUP.unpack_from(self._mm, self._offset(granularity, bucket)))
+        if rec[0] == bucket and rec[1]:
+            return rec
+        if rec[1] and rec[0] > bucket:
+            return None  # slot already holds a newer bucket
+        return _empty_rollup(bucket)
+
+    def _store(self, granularity: str, rec: list):
+        _ROLLUP.pack_into(self._mm, self._offset(granularity, rec[0]), *rec)
+
+    @staticmethod
+    def _fold(rec: list, ts: int, odometer: float, engine_hours: float, fuel: float, dtc_count: int):
+        if rec[1] == 0:
+            rec[3] = rec[4] = ts
+        rec[1] += 1
+        rec[2] += 1 if dtc_count else 0
+        rec[3] = min(rec[3], ts)
+        if ts >= rec[4]:
+            rec[4] = ts
+            if not math.isnan(fuel):
+                rec[9] = fuel
+        rec[5] = _nan_min(rec[5], odometer)
+        rec[6] = _nan_max(rec[6], odometer)
+        rec[7] = _nan_min(rec[7], engine_hours)
+        rec[8] = _nan_max(rec[8], engine_hours)
+
+    def close(self):
+        self._mm.flush()
+        self._mm.close()
+        self._file.close()
+
+
+class _AssetHandle:
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.segments: List[Path] = []
+        self.active: Optional[Segment] = None
+        self.rollups: Optional[Rollups] = None
+
+    def close(self):
+        if self.active is not None:
+            self.active.close()
+            self.active = None
+        if self.rollups is not None:
+            self.rollups.close()
+            self.rollups = None
+
+
+class TelemetryStore:
+    def __init__(
+        self,
+        root: Path = TELEMETRY_DIR,
+        segment_rows: int = 16384,
+        retention_days: int = 90,
+        hourly_days: int = 14,
+        daily_days: int = 400,
+        max_open: int = 256,
+        changes_max_bytes: int = 1 << 20,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.root = Path(root)
+        self.segment_rows = segment_rows
+        self.retention_days = retention_days
+        self.hourly_slots = hourly_days * 24
+        self.daily_slots = daily_days
+        self.max_open = max_open
+        self.changes_max_bytes = changes_max_bytes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._handles: "OrderedDict[Tuple[str, str], _AssetHandle]" = OrderedDict()
+
+    def _handle(self, company_id: str, asset_id: str, create: bool = False) -> Optional[_AssetHandle]:
+        key = (company_id, asset_id)
+        with self._lock:
+            h = self._handles.get(key)
+            if h is None:
+                path = self.root / _safe_name(company_id) / _safe_name(asset_id)
+                if not create and not path.is_dir():
+                    return None  # reads never create files
+                path.mkdir(parents=True, exist_ok=True)
+                h = self._handles[key] = _AssetHandle(path)
+            self._handles.move_to_end(key)
+            while len(self._handles) > self.max_open:
+                _, old = self._handles.popitem(last=False)
+                with old.lock:
+                    old.close()
+            return h
+
+    @contextmanager
+    def _file_lock(self, h: _AssetHandle, shared: bool = False) -> Iterator[None]:
+        """Across processes for one asset's files (exclusive for writes); a no-op without fcntl."""
+        if fcntl is None:
+            yield
+            return
+        with (h.path / ".lock").open("a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    @contextmanager
+    def _locked(self, h: _AssetHandle, shared: bool = False) -> Iterator[None]:
+        with h.lock, self._file_lock(h, shared):
+            self._sync(h)
+            yield
+
+    def _sync(self, h: _AssetHandle):
+        """Catch up with segments and rows written by other processes (caller holds the file lock)."""
+        h.segments = sorted(h.path.glob("seg-*.col"), key=_segment_order)
+        if h.active is not None:
+            if h.segments and h.active.path == h.segments[-1]:
+                h.active.refresh()
+            else:
+                h.active.close()  # another process rolled over (or expired) it
+                h.active = None
+
+    def _rollups(self, h: _AssetHandle) -> Rollups:
+        if h.rollups is None:
+            h.rollups = Rollups(h.path / "rollups.bin", self.hourly_slots, self.daily_slots)
+        return h.rollups
+
+    def _active(self, h: _AssetHandle, ts: int) -> Segment:
+        if h.active is None and h.segments:
+            h.active = Segment(h.segments[-1])
+        if h.active is None or h.active.full:
+            if h.active is not None:
+                h.active.close()
+            seq = _seq(h.segments[-1]) + 1 if h.segments else 0
+            path = h.path / f"seg-{ts:012d}-{seq:06d}.col"
+            h.active = Segment(path, self.segment_rows, create=True)
+            h.segments.append(path)
+            self._expire(h)
+        return h.active
+
+    def _expire(self, h: _AssetHandle):
+        cutoff = int(self._clock()) - self.retention_days * DAY
+        keep = []
+        for path in h.segments:
+            if h.active is not None and path == h.active.path:
+                keep.append(path)
+                continue
+            seg = Segment(path)
+            expired = seg.count == 0 or seg.max_ts < cutoff
+            seg.close()
+            if expired:
+                _faults_path(path).unlink(missing_ok=True)
+                path.unlink(missing_ok=True)
+            else:
+                keep.append(path)
+        h.segments = keep
+
+    # ---------- writes ----------
+
+    def ingest(self, company_id: str, asset_id: str, samples: Iterable[Dict[str, Any]]) -> int:
+        """Append samples; returns how many were accepted (samples need a parseable ts)."""
+        h = self._handle(company_id, asset_id, create=True)
+        accepted = 0
+        faults: Dict[Path, List[str]] = {}
+        with self._locked(h):
+            rollups = self._rollups(h)
+            for s in samples:
+                ts = parse_ts(s.get("ts"))
+                if ts is None:
+                    continue
+                odometer, hours, fuel = _num(s.get("odometer")), _num(s.get("engine_hours")), _num(s.get("fuel"))
+                dtc = s.get("dtc") or []
+                seg = self._active(h, ts)
+                seg.append(ts, odometer, hours, fuel, len(dtc))
+                rollups.add(ts, odometer, hours, fuel, len(dtc))
+                if dtc:
+                    faults.setdefault(seg.path, []).append(json.dumps({"ts": ts, "dtc": list(dtc)}) + "\n")
+                accepted += 1
+            for path, lines in faults.items():
+                with open(_faults_path(path), "a") as f:
+                    f.writelines(lines)
+        if accepted:
+            self._bump_version(h.path.parent, asset_id)
+        return accepted
+
+    def _bump_version(self, tenant_dir: Path, asset_id: str):
+        fd = os.open(tenant_dir / ".version", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            raw = os.pread(fd, _VERSION.size, 0)
+            count = _VERSION.unpack(raw)[0] + 1 if len(raw) == _VERSION.size else 1
+            self._log_change(tenant_dir / ".changes", count, asset_id)
+            os.pwrite(fd, _VERSION.pack(count), 0)
+        finally:
+            os.close(fd)  # releases the flock
+
+    def _log_change(self, path: Path, version: int, asset_id: str):
+        # caller holds the .version flock, so this process is the only writer
+        with open(path, "ab") as f:
+            f.write(json.dumps([version, asset_id]).encode() + b"\n")
+            size = f.tell()
+        if size > self.changes_max_bytes:
+            with open(path, "rb") as f:
+                lines = f.read().splitlines(keepends=True)
+            tmp = path.with_name(path.name + ".tmp")
+            with open(tmp, "wb") as f:
+                f.writelines(lines[len(lines) // 2:])
+            os.replace(tmp, path)  # readers holding the old file see a new inode
+
+    # ---------- reads ----------
+
+    def version(self, company_id: str) -> int:
+        """Ingests into any of the tenant's assets so far, by any process."""
+        try:
+            with open(self.root / _safe_name(company_id) / ".version", "rb") as f:
+                raw = f.read(_VERSION.size)
+        except FileNotFoundError:
+            return 0
+        return _VERSION.unpack(raw)[0] if len(raw) == _VERSION.size else 0
+
+    def changes(self, company_id: str, cursor: Optional[Tuple] = None) -> Tuple[Tuple, Optional[Set[str]]]:
+        """
+        (next cursor, assets ingested into since `cursor`, by any process).
+        Without a cursor: the current position and an empty set. The set is
+        None when the change log was cut back past the cursor.
+        """
+        if cursor is None:
+            return (self.version(company_id), None, 0), set()
+        version, head, offset = cursor
+        if self.version(company_id) == version:
+            return cursor, set()
+        try:
+            f = open(self.root / _safe_name(company_id) / ".changes", "rb")
+        except FileNotFoundError:
+            return (self.version(company_id), None, 0), None
+        with f:
+            # the first line (a unique version) identifies the file across cut-backs
+            first_line = f.readline()
+            fresh = first_line != head
+            f.seek(0 if fresh else offset)
+            data = f.read()
+        if fresh:
+            offset = 0
+        end = data.rfind(b"\n") + 1  # a trailing partial line is still being written
+        touched: Set[str] = set()
+        for line in data[:end].splitlines():
+            seen, asset_id = json.loads(line)
+            if seen > version:
+                touched.add(asset_id)
+                version = seen
+        if fresh and end and json.loads(first_line)[0] > cursor[0] + 1:
+            return (version, first_line, end), None  # entries after the cursor were cut
+        return (version, first_line if end else head, offset + end), touched
+
+    def query(self, company_id: str, asset_id: str, start_ts: int, end_ts: int, columns: Optional[List[str]] = None) -> Dict[str, List[Any]]:
+        """Raw samples with start_ts <= ts < end_ts, as columns ordered by ts."""
+        names = ["ts"] + [c for c in (columns or [n for n, _ in COLUMNS]) if c != "ts"]
+        out: List[Tuple] = []
+        h = self._handle(company_id, asset_id)
+        if h is None:
+            return {name: [] for name in names}
+        with self._locked(h, shared=True):
+            for seg in self._overlapping(h, start_ts, end_ts):
+                cols = [seg.cols[n] for n in names]
+                out.extend(tuple(col[i] for col in cols) for i in seg.rows(start_ts, end_ts))
+        out.sort(key=lambda row: row[0])
+        return {name: [row[k] for row in out] for k, name in enumerate(names)}
+
+    def rollups(self, company_id: str, asset_id: str, granularity: str, start_ts: int, end_ts: int) -> List[Dict[str, Any]]:
+        """Rollup buckets ("hour" or "day") whose start falls in [start_ts, end_ts)."""
+        width = HOUR if granularity == "hour" else DAY
+        h = self._handle(company_id, asset_id)
+        out = []
+        if h is None:
+            return out
+        with self._locked(h, shared=True):
+            r = self._rollups(h)
+            for bucket in range(start_ts // width, (end_ts - 1) // width + 1):
+                rec = r.get(granularity, bucket)
+                if rec is not None:
+                    row = dict(zip(ROLLUP_FIELDS, rec))
+                    row["start_ts"] = bucket * width
+                    out.append(row)
+        return out
+
+    def utilization(self, company_id: str, asset_id: str, days: int = 30) -> Optional[Dict[str, float]]:
+        """Active vs available hours over the last `days` days with data; None without telemetry."""
+        now = int(self._clock())
+        days = max(1, min(days, self.daily_slots))
+        buckets = self.rollups(company_id, asset_id, "day", (now // DAY - days + 1) * DAY, now + 1)
+        if not buckets:
+            return None
+        active = sum(b["active_s"] for b in buckets) / HOUR
+        return {"active_hours": round(active, 2), "available_hours": 24 * len(buckets), "days_with_data": len(buckets)}
+
+    def faults(self, company_id: str, asset_id: str, start_ts: int, end_ts: int) -> List[Dict[str, Any]]:
+        """Fault events with start_ts <= ts < end_ts, read only from the segments covering the range."""
+        h = self._handle(company_id, asset_id)
+        out: List[Dict[str, Any]] = []
+        if h is None:
+            return out
+        with self._locked(h, shared=True):
+            for seg in self._overlapping(h, start_ts, end_ts):
+                try:
+                    with open(_faults_path(seg.path), "rb") as f:
+                        lines = f.read().split(b"\n")[:-1]  # a trailing partial line is still being written
+                except FileNotFoundError:
+                    continue
+                for line in lines:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        continue
+                    if start_ts <= event["ts"] < end_ts:
+                        out.append(event)
+        out.sort(key=lambda e: e["ts"])
+        return out
+
+    def _overlapping(self, h: _AssetHandle, start_ts: int, end_ts: int) -> Iterator[Segment]:
+        """Segments holding rows in [start_ts, end_ts); caller holds the handle's locks."""
+        for path in list(h.segments):
+            active = h.active is not None and h.active.path == path
+            if active:
+                seg = h.active
+            else:
+                try:
+                    seg = Segment(path)
+                except (OSError, ValueError):
+                    continue  # expired meanwhile
+            try:
+                if seg.count and seg.max_ts >= start_ts and seg.min_ts < end_ts:
+                    yield seg
+            finally:
+                if not active:
+                    seg.close()
+
+    def close(self):
+        with self._lock:
+            while self._handles:
+                _, h = self._handles.popitem()
+                with h.lock:
+                    h.close()
+
+
+def open_telemetry_store() -> TelemetryStore:
+    return TelemetryStore(
+        TELEMETRY_DIR,
+        segment_rows=int(os.environ.get("TELEMETRY_SEGMENT_ROWS", "16384")),
+        retention_days=int(os.environ.get("TELEMETRY_RETENTION_DAYS", "90")),
+        hourly_days=int(os.environ.get("TELEMETRY_HOURLY_DAYS", "14")),
+        daily_days=int(os.environ.get("TELEMETRY_DAILY_DAYS", "400")),
+        max_open=int(os.environ.get("TELEMETRY_MAX_OPEN", "256")),
+        changes_max_bytes=int(os.environ.get("TELEMETRY_CHANGES_MAX_BYTES", str(1 << 20))),
+    )
@@ -0,0 +1,368 @@
+# app/services/uploads.py
+"""
+Document upload pipeline for the business profile.
+
+1. POST /api/ai/profile/uploads/upload registers the document ("processing").
+2. PUT  /api/ai/profile/uploads/{id}/content streams the raw body to
+   UPLOAD_DIR/<tenant>/<id>. Chunks are written as they arrive, in buffered
+   batches on the threadpool, so the body is never held in memory and the
+   event loop never blocks on disk. The write goes to a ".part" file that is
+   renamed into place once complete.
+3. The stored file is queued for extraction on a bounded pool of worker
+   threads. If the queue is full the upload stays "uploaded" and the caller
+   gets a 503 to retry. Workers move the entry through
+   queued -> extracting -> verified | failed.
+4. Every status change is published to the tenant's subscribers
+   (GET /api/ai/profile/uploads/events, server-sent events).
+
+Extraction runs in whichever worker process received the upload, while a
+subscriber may be connected to any other, so events go through a per-tenant
+log shared by all workers: UPLOAD_DIR/<tenant>/.events holds one
+[seq, event] JSON line per status change, appended under the flock of
+.events.seq (an 8-byte counter). Subscribers tail the log from where they
+joined: a publish in the same process wakes them at once, changes from other
+processes are picked up within EVENTS_POLL_S. The log is cut back to its newer
+half once it outgrows EVENTS_MAX_BYTES (replaced atomically; the reader's
+cursor recognises the file by its first line and skips seqs it has seen). A
+subscriber that falls further behind than that misses events and can re-list
+uploads.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import queue
+import re
+import struct
+import threading
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from .profile_store import _safe_name
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: run a single worker process per data directory
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+BASE = Path(__file__).resolve().parents[2]
+UPLOAD_DIR = Path(os.environ.get("UPLOAD_DIR", BASE / "data" / "uploads"))
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+WRITE_BATCH_BYTES = 1024 * 1024
+TEXT_SCAN_BYTES = 8 * 1024 * 1024  # extraction looks at the first 8 MiB
+PDF_TEXT_BYTES = 8 * 1024 * 1024  # most stream bytes (after inflating) scanned per PDF, so a deflate bomb can't balloon memory
+EVENTS_MAX_BYTES = int(os.environ.get("UPLOAD_EVENTS_MAX_BYTES", str(256 * 1024)))
+EVENTS_POLL_S = float(os.environ.get("UPLOAD_EVENTS_POLL_S", "0.5"))
+_SEQ = struct.Struct("<Q")
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class QueueFull(Exception):
+    pass
+
+
+def upload_path(company_id: str, upload_id: str) -> Path:
+    return UPLOAD_DIR / _safe_name(company_id) / _safe_name(upload_id)
+
+
+async def store_stream(company_id: str, upload_id: str, chunks: AsyncIterator[bytes], max_bytes: int = MAX_UPLOAD_BYTES) -> Dict[str, Any]:
+    """Write an async byte stream to the upload's file; returns {size, sha256}."""
+    path = upload_path(company_id, upload_id)
+    part = path.with_name(path.name + ".part")
+    await run_in_threadpool(path.parent.mkdir, parents=True, exist_ok=True)
+    f = await run_in_threadpool(open, part, "wb")
+    digest = hashlib.sha256()
+    size = 0
+    pending = bytearray()
+    try:
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(f"upload exceeds {max_bytes} bytes")
+            digest.update(chunk)
+            pending += chunk
+            if len(pending) >= WRITE_BATCH_BYTES:
+                await run_in_threadpool(f.write, bytes(pending))
+                pending.clear()
+        if pending:
+            await run_in_threadpool(f.write, bytes(pending))
+        await run_in_threadpool(f.close)
+        await run_in_threadpool(os.replace, part, path)
+    except BaseException:
+        f.close()
+        try:
+            part.unlink()
+        except OSError:
+            pass
+        raise
+    return {"size": size, "sha256": digest.hexdigest()}
+
+
+# ---------- extraction ----------
+
+_STREAM_RE = re.compile(rb"stream\r?\n(.*?)\r?\nendstream", re.S)
+_PDF_STRING_RE = re.compile(rb"\(((?:[^()\\]|\\.)*)\)")
+
+_ISSUERS: List[Tuple[str, str]] = [
+    ("internal revenue service", "IRS"),
+    ("department of the treasury", "IRS"),
+    ("secretary of state", "Secretary of State"),
+    ("department of revenue", "Department of Revenue"),
+    ("department of labor", "Department of Labor"),
+    ("small business administration", "SBA"),
+    ("licensing board", "Licensing Board"),
+]
+
+_MONTHS = "jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|jun(?:e)?|jul(?:y)?|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?"
+_DATE_RE = re.compile(
+    rf"(?P<iso>\d{{4}}-\d{{2}}-\d{{2}})|(?P<us>\d{{1,2}}/\d{{1,2}}/\d{{4}})|(?P<long>(?:{_MONTHS})\.?\s+\d{{1,2}},?\s+\d{{4}})",
+    re.I,
+)
+_EXPIRY_WORDS = ("expir", "valid until", "valid through", "renew by")
+_EFFECTIVE_WORDS = ("effective", "issued", "date of issue", "dated")
+
+
+def _pdf_text(raw: bytes, budget: int = PDF_TEXT_BYTES) -> str:
+    # enough of PDF for issuer/date hints: literal strings in (possibly deflated) content streams
+    parts = []
+    for m in _STREAM_RE.finditer(raw):
+        if budget <= 0:
+            break
+        data = m.group(1)
+        try:
+            data = zlib.decompressobj().decompress(data, budget)
+        except zlib.error:
+            data = data[:budget]
+        budget -= len(data)
+        parts.extend(s.decode("latin-1") for s in _PDF_STRING_RE.findall(data))
+    return " ".join(parts)
+
+
+def read_text(path: Path, limit: int = TEXT_SCAN_BYTES) -> str:
+    with open(path, "rb") as f:
+        raw = f.read(limit)
+    if raw.startswith(b"%PDF"):
+        return _pdf_text(raw)
+    return raw.decode("utf-8", errors="replace")
+
+
+def _parse_date(m: "re.Match") -> Optional[str]:
+    text = m.group(0)
+    try:
+        if m.group("iso"):
+            return datetime.strptime(text, "%Y-%m-%d").date().isoformat()
+        if m.group("us"):
+            return datetime.strptime(text, "%m/%d/%Y").date().isoformat()
+        cleaned = re.sub(r"[.,]", "", text).split()
+        month = cleaned[0][:3].title()
+        return datetime.strptime(f"{month} {cleaned[1]} {cleaned[2]}", "%b %d %Y").date().isoformat()
+    except ValueError:
+        return None
+
+
+def extract_fields(text: str, file_name: str, category: Optional[str]) -> Dict[str, Any]:
+    """Issuer and effective/expiration dates from document text."""
+    lower = text.lower()
+    issuer = next((name for needle, name in _ISSUERS if needle in lower), None)
+    if issuer is None:
+        issuer = "IRS" if "EIN" in file_name or category == "EIN" else "Unknown"
+
+    effective = expiration = None
+    first = None
+    for m in _DATE_RE.finditer(text):
+        value = _parse_date(m)
+        if value is None:
+            continue
+        first = first or value
+        context = lower[max(0, m.start() - 40):m.start()]
+        if expiration is None and any(w in context for w in _EXPIRY_WORDS):
+            expiration = value
+        elif effective is None and any(w in context for w in _EFFECTIVE_WORDS):
+            effective = value
+        if effective and expiration:
+            break
+    return {
+        "type": category,
+        "issuer": issuer,
+        "effective": effective or (first if first != expiration else None),
+        "expiration": expiration,
+    }
+
+
+# ---------- completion events ----------
+
+# local subscribers, woken when this process publishes; other processes' events are polled
+_SUBSCRIBERS: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]]] = {}
+_SUB_LOCK = threading.Lock()
+
+
+def _append_event(company_id: str, event: Dict[str, Any]):
+    tenant_dir = UPLOAD_DIR / _safe_name(company_id)
+    tenant_dir.mkdir(parents=True, exist_ok=True)
+    fd = os.open(tenant_dir / ".events.seq", os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        raw = os.pread(fd, _SEQ.size, 0)
+        seq = _SEQ.unpack(raw)[0] + 1 if len(raw) == _SEQ.size else 1
+        path = tenant_dir / ".events"
+        with open(path, "ab") as f:
+            f.write(json.dumps([seq, event], default=str).encode() + b"\n")
+            size = f.tell()
+        if size > EVENTS_MAX_BYTES:
+            with open(path, "rb") as f:
+                lines = f.read().splitlines(keepends=True)
+            tmp = path.with_name(path.name + ".tmp")
+            with open(tmp, "wb") as f:
+                f.writelines(lines[len(lines) // 2:])
+            os.replace(tmp, path)
+        os.pwrite(fd, _SEQ.pack(seq), 0)
+    finally:
+        os.close(fd)  # releases the flock
+
+
+def read_events(company_id: str, cursor: Optional[Tuple] = None) -> Tuple[Tuple, List[Dict[str, Any]]]:
+    """
+    (next cursor, events published since `cursor` by any process). Without a
+    cursor: the current end of the log and no events.
+    """
+    tenant_dir = UPLOAD_DIR / _safe_name(company_id)
+    try:
+        with open(tenant_dir / ".events.seq", "rb") as f:
+            raw = f.read(_SEQ.size)
+        latest = _SEQ.unpack(raw)[0] if len(raw) == _SEQ.size else 0
+    except FileNotFoundError:
+        latest = 0
+    seq, head, offset = cursor if cursor is not None else (latest, None, None)
+    if latest == seq and cursor is not None:
+        return cursor, []
+    try:
+        f = open(tenant_dir / ".events", "rb")
+    except FileNotFoundError:
+        return (latest, None, 0), []
+    with f:
+        # the first line (a unique seq) identifies the file across cut-backs
+        first_line = f.readline()
+        if offset is None:
+            offset = f.seek(0, os.SEEK_END)
+        elif first_line != head:
+            offset = 0
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b"\n") + 1  # a trailing partial line is still being written
+    events = []
+    for line in data[:end].splitlines():
+        n, event = json.loads(line)
+        if n > seq:
+            events.append(event)
+            seq = n
+    return (seq, first_line, offset + end), events
+
+
+def publish(company_id: str, event: Dict[str, Any]):
+    """Deliver an event to the tenant's subscribers in every worker process (callable from any thread)."""
+    try:
+        _append_event(company_id, event)
+    except OSError:
+        logger.exception("could not log upload event for %s", company_id)
+        return
+    with _SUB_LOCK:
+        subs = list(_SUBSCRIBERS.get(company_id, ()))
+    for loop, wake in subs:
+        try:
+            loop.call_soon_threadsafe(wake.set)
+        except RuntimeError:
+            pass  # subscriber's loop is gone
+
+
+async def subscribe(company_id: str, heartbeat_s: float = 15.0, poll_s: Optional[float] = None) -> AsyncIterator[str]:
+    """Server-sent event stream of upload status changes for a tenant, from any worker."""
+    loop = asyncio.get_running_loop()
+    wake = asyncio.Event()
+    entry = (loop, wake)
+    with _SUB_LOCK:
+        _SUBSCRIBERS.setdefault(company_id, []).append(entry)
+    try:
+        cursor, _ = await run_in_threadpool(read_events, company_id)
+        yield ": connected\n\n"
+        sent = loop.time()
+        while True:
+            try:
+                await asyncio.wait_for(wake.wait(), EVENTS_POLL_S if poll_s is None else poll_s)
+            except asyncio.TimeoutError:
+                pass
+            wake.clear()  # before reading, so a publish during the read wakes the next round
+            cursor, events = await run_in_threadpool(read_events, company_id, cursor)
+            for event in events:
+                yield f"event: upload\ndata: {json.dumps(event, default=str)}\n\n"
+            if events:
+                sent = loop.time()
+            elif loop.time() - sent >= heartbeat_s:
+                yield ": keepalive\n\n"
+                sent = loop.time()
+    finally:
+        with _SUB_LOCK:
+            subs = _SUBSCRIBERS.get(company_id, [])
+            if entry in subs:
+                subs.remove(entry)
+            if not subs:
+                _SUBSCRIBERS.pop(company_id, None)
+
+
+# ---------- worker pool ----------
+
+
+class ExtractionPool:
+    """Fixed worker threads behind a bounded queue; submit() never blocks."""
+
+    def __init__(self, handler: Callable[[str, str], None], workers: int = 2, max_queue: int = 64):
+        self.handler = handler
+        self.workers = workers
+        self._queue: "queue.Queue[Tuple[str, str]]" = queue.Queue(maxsize=max_queue)
+        self._threads: List[threading.Thread] = []
+        self._start_lock = threading.Lock()
+
+    def submit(self, company_id: str, upload_id: str):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((company_id, upload_id))
+        except queue.Full:
+            raise QueueFull("extraction queue is full")
+
+    def _ensure_started(self):
+        if len(self._threads) >= self.workers:
+            return
+        with self._start_lock:
+            while len(self._threads) < self.workers:
+                t = threading.Thread(target=self._run, name=f"upload-extract-{len(self._threads)}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def _run(self):
+        while True:
+            company_id, upload_id = self._queue.get()
+            try:
+                self.handler(company_id, upload_id)
+            except Exception:
+                logger.exception("extraction failed for %s/%s", company_id, upload_id)
+            finally:
+                self._queue.task_done()
+
+    def join(self):
+        """Wait until every queued job has finished (tests, shutdown)."""
+        self._queue.join()
+
+    def pending(self) -> int:
+        return self._queue.qsize()
@@ -0,0 +1,190 @@
+# app/services/valuation.py
+"""
+Monthly book-value curves for fleet assets, and fleet totals over a window.
+
+A curve is an array('d') of book values at the end of each month of an
+asset's age (index 0 = the month it was placed in service). Each method
+uses a closed form, so a curve is built with one comprehension and never
+by stepping balances month by month:
+
+  straight_line        cost - (cost - salvage) / life * age, floored at salvage
+  declining_balance    cost * (1 - factor / life) ** age, floored at salvage;
+                       the remainder above salvage is written off in the last
+                       month of life
+  units_of_production  cost - (cost - salvage) * min(1, used / total_units),
+                       where `used` is the cumulative usage per month (the
+                       caller derives it from telemetry meter readings)
+
+Months are integers (year * 12 + month - 1), so "age at month-end T" is
+T - in-service month. An asset contributes 0 before it is in service and
+its last curve value (salvage) after the curve ends.
+
+fleet_series() slices every asset's curve to the requested window (array
+slices, padded before service and after the end of the curve) and adds the
+rows column-wise with zip/sum. That costs one slice per asset plus one sum
+per month instead of a Python step per asset per month. period_summary()
+reads only the two boundary months, so it costs O(assets).
+"""
+import calendar
+import math
+from array import array
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+METHODS = ("straight_line", "declining_balance", "units_of_production")
+MAX_MONTHS = 600  # longest curve / series window (50 years)
+
+Curve = Tuple[array, array]  # (book value, depreciation) per month of age
+
+
+def month_index(value: Any) -> Optional[int]:
+    """Month number for "YYYY-MM", an ISO date/datetime or a date; None if unparseable."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (date, datetime)):
+        return value.year * 12 + value.month - 1
+    text = str(value).strip()
+    try:
+        year, month = int(text[0:4]), int(text[5:7])
+    except ValueError:
+        return None
+    if text[4:5] != "-" or not 1 <= month <= 12:
+        return None
+    return year * 12 + month - 1
+
+
+def month_end(index: int) -> str:
+    """ISO date of the last day of month `index`."""
+    year, month = divmod(index, 12)
+    return date(year, month + 1, calendar.monthrange(year, month + 1)[1]).isoformat()
+
+
+def _with_depreciation(book: array) -> Curve:
+    dep = array("d", [0.0])
+    dep.extend(prev - cur for prev, cur in zip(book, book[1:]))
+    return book, dep
+
+
+def straight_line(cost: float, salvage: float, life_months: int) -> Curve:
+    life = max(1, int(life_months))
+    monthly = (cost - salvage) / life
+    book = array("d", (max(salvage, cost - monthly * age) for age in range(life + 1)))
+    return _with_depreciation(book)
+
+
+def declining_balance(cost: float, salvage: float, life_months: int, factor: float = 2.0) -> Curve:
+    life = max(1, int(life_months))
+    keep = max(0.0, 1 - factor / life)
+    book = array("d", (max(salvage, cost * keep ** age) for age in range(life + 1)))
+    if cost > salvage:
+        book[-1] = salvage
+    return _with_depreciation(book)
+
+
+def units_of_production(cost: float, salvage: float, total_units: float, used: Sequence[float]) -> Curve:
+    """`used[age]` is the cumulative usage at the end of each month of age."""
+    if total_units <= 0:
+        raise ValueError("total units must be positive")
+    base = cost - salvage
+    book = array("d", (cost - base * min(1.0, max(0.0, u) / total_units) for u in used))
+    return _with_depreciation(book)
+
+
+def projected_usage(age_now: int, used_now: float, rate_per_month: float, total_units: float) -> List[float]:
+    """
+    Cumulative usage per month of age: spread linearly up to the current
+    reading, then projected at the current rate until `total_units`.
+    """
+    age_now = max(0, age_now)
+    past = [used_now * age / age_now for age in range(age_now)] if age_now else []
+    if rate_per_month > 0 and used_now < total_units:
+        ahead = min(MAX_MONTHS, math.ceil((total_units - used_now) / rate_per_month))
+    else:
+        ahead = 0
+    return past + [used_now + rate_per_month * k for k in range(ahead + 1)]
+
+
+def build_curve(
+    method: str,
+    cost: float,
+    salvage: float,
+    life_months: int,
+    factor: float = 2.0,
+    total_units: Optional[float] = None,
+    used: Optional[Sequence[float]] = None,
+) -> Curve:
+    if method == "declining_balance":
+        return declining_balance(cost, salvage, life_months, factor)
+    if method == "units_of_production":
+        if not total_units or used is None:
+            raise ValueError("units_of_production needs total units and usage")
+        return units_of_production(cost, salvage, total_units, used)
+    if method == "straight_line":
+        return straight_line(cost, salvage, life_months)
+    raise ValueError(f"unknown depreciation method: {method}")
+
+
+def _window(values: array, start: int, first: int, last: int, before: float, after: float) -> List[float]:
+    """values[age] for every month first..last, padded before service and past the curve's end."""
+    lo, hi = first - start, last - start + 1
+    pre = min(max(0, -lo), hi - lo)
+    post = min(max(0, hi - len(values)), hi - lo)
+    row = [before] * pre
+    row.extend(values[max(0, lo):max(0, min(hi, len(values)))])
+    row.extend([after] * post)
+    return row
+
+
+def fleet_series(
+    entries: Sequence[Tuple[str, int, Curve]],
+    first: int,
+    last: int,
+    groups: Optional[Dict[str, str]] = None,
+) -> Dict[str, Any]:
+    """
+    Book value and depreciation per month-end for (asset_id, in-service
+    month, curve) entries; `groups` maps asset_id -> group for subtotals.
+    """
+    if last < first:
+        raise ValueError("end month is before start month")
+    if last - first + 1 > MAX_MONTHS:
+        raise ValueError(f"window is longer than {MAX_MONTHS} months")
+    book_rows, dep_rows = [], []
+    for _, start, (book, dep) in entries:
+        book_rows.append(_window(book, start, first, last, 0.0, book[-1]))
+        dep_rows.append(_window(dep, start, first, last, 0.0, 0.0))
+    width = last - first + 1
+    out: Dict[str, Any] = {
+        "months": [month_end(m) for m in range(first, last + 1)],
+        "book_value": [round(sum(col), 2) for col in zip(*book_rows)] if book_rows else [0.0] * width,
+        "depreciation": [round(sum(col), 2) for col in zip(*dep_rows)] if dep_rows else [0.0] * width,
+    }
+    if groups is not None:
+        members: Dict[str, List[int]] = {}
+        for i, (asset_id, _, _) in enumerate(entries):
+            members.setdefault(groups.get(asset_id) or "unassigned", []).append(i)
+        out["groups"] = {
+            name: [round(sum(col), 2) for col in zip(*(book_rows[i] for i in idx))]
+            for name, idx in sorted(members.items())
+        }
+    return out
+
+
+def period_summary(entries: Sequence[Tuple[str, int, Curve]], first: int, last: int) -> Dict[str, Any]:
+    """Opening book, additions, depreciation and closing book per asset for months first..last."""
+    if last < first:
+        raise ValueError("end month is before start month")
+    rows = []
+    for asset_id, start, (book, dep) in entries:
+        opening = 0.0 if first - 1 < start else book[min(first - 1 - start, len(book) - 1)]
+        closing = 0.0 if last < start else book[min(last - start, len(book) - 1)]
+        additions = book[0] if first <= start <= last else 0.0
+        rows.append({
+            "asset_id": asset_id,
+            "opening_book": round(opening, 2),
+            "additions": round(additions, 2),
+            "depreciation": round(opening + additions - closing, 2),
+            "closing_book": round(closing, 2),
+        })
+    totals = {k: round(sum(r[k] for r in rows), 2) for k in ("opening_book", "additions", "depreciation", "closing_book")}
+    return {"start": month_end(first), "end": month_end(last), "totals": totals, "assets": rows}
@@ -0,0 +1,325 @@
+# app/services/workorder_store.py
+"""
+Persistent work orders in SQLite (WORKORDER_DB, default data/workorders.sqlite3).
+
+    work_orders(tenant, wo_id, asset_id, priority, summary, status,
+                created_at, closed_at, sla_hours, due_ts, breached_at)
+    sequences(tenant, next)
+    revisions(tenant, rev)
+    breach_stamps(tenant, rev)
+
+IDs come from a per-tenant sequence row bumped with UPDATE ... RETURNING inside
+the insert's transaction, so allocation is O(1) and never hands out the same
+number twice. Indexes on (tenant, asset_id, status), (tenant, status, due_ts)
+and (tenant, priority) serve per-asset lookups, filtered listings and SLA
+scans. Listings are
+newest first (rowid order, which SQLite appends to every index) and paged by
+a keyset cursor on rowid.
+
+A tenant is seeded on first use with its base work orders (the demo data),
+and its sequence continues after the highest seeded number. Whichever
+process inserts the tenant's sequence row seeds it, in the same transaction;
+the others find the row already there and skip seeding.
+
+Every create and status change also increments the tenant's revision in the
+same transaction. `revision(tenant)` is therefore a version of the tenant's
+work orders that all processes agree on (seeding does not count: it only
+reproduces the base data). Breach stamps only change breached_at, which cached
+datasets do not use, so they count in a separate breach_stamps row instead;
+`version(tenant)` combines both for ETags.
+
+SLA: open work orders have a deadline (created_at + sla_hours, defaulting by
+priority). breaches() finds open, unflagged orders whose deadline has passed
+with one indexed UPDATE ... RETURNING that stamps breached_at, so each breach
+is reported exactly once even when several processes share the database, and
+orders created or reopened by any of them are covered; that is for alerting.
+open_breaches() is the read side: it stamps what is due the same way, then
+returns every open breached order, with "new" on the ones this call stamped,
+so a second dashboard or a retried request still sees them all.
+"""
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .maintenance import SLA_HOURS, parse_time
+
+BASE = Path(__file__).resolve().parents[2]
+WORKORDER_DB = Path(os.environ.get("WORKORDER_DB", BASE / "data" / "workorders.sqlite3"))
+
+FIRST_NUMBER = 2200
+COLUMNS = ("wo_id", "asset_id", "priority", "summary", "status", "created_at", "closed_at", "sla_hours", "due_ts", "breached_at")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS work_orders (
+    tenant TEXT NOT NULL,
+    wo_id TEXT NOT NULL,
+    asset_id TEXT,
+    priority TEXT,
+    summary TEXT,
+    status TEXT NOT NULL,
+    created_at TEXT,
+    closed_at TEXT,
+    sla_hours REAL,
+    due_ts REAL,
+    breached_at TEXT,
+    PRIMARY KEY (tenant, wo_id)
+);
+CREATE INDEX IF NOT EXISTS wo_asset ON work_orders (tenant, asset_id, status);
+DROP INDEX IF EXISTS wo_status;
+CREATE INDEX IF NOT EXISTS wo_status_due ON work_orders (tenant, status, due_ts);
+CREATE INDEX IF NOT EXISTS wo_priority ON work_orders (tenant, priority);
+CREATE TABLE IF NOT EXISTS sequences (
+    tenant TEXT PRIMARY KEY,
+    next INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS revisions (
+    tenant TEXT PRIMARY KEY,
+    rev INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS breach_stamps (
+    tenant TEXT PRIMARY KEY,
+    rev INTEGER NOT NULL
+);
+"""
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _now_iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
+
+
+def _sla_hours(priority: Optional[str], sla_hours: Optional[float]) -> float:
+    if sla_hours is not None:
+        return float(sla_hours)
+    return float(SLA_HOURS.get(str(priority or "").lower(), SLA_HOURS["medium"]))
+
+
+def _number(wo_id: str) -> Optional[int]:
+    digits = str(wo_id).rpartition("-")[2]
+    return int(digits) if digits.isdigit() else None
+
+
+def _row(r: Tuple) -> Dict[str, Any]:
+    return dict(zip(COLUMNS, r))
+
+
+class WorkOrderStore:
+    def __init__(self, path: Path, seed: Optional[Callable[[str], Iterable[Dict[str, Any]]]] = None, clock: Callable[[], float] = time.time):
+        self.path = Path(path)
+        self.seed = seed
+        self._clock = clock
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.RLock()
+        self._ready: set = set()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # ---------- tenants ----------
+
+    def _tenant(self, tenant: str):
+        if tenant in self._ready:
+            return
+        with self._lock:
+            if tenant in self._ready:
+                return
+            if self._db.execute("SELECT 1 FROM sequences WHERE tenant = ?", (tenant,)).fetchone() is None:
+                self._seed(tenant)
+            self._ready.add(tenant)
+
+    def _seed(self, tenant: str):
+        base = list(self.seed(tenant)) if self.seed else []
+        top = max([n for n in (_number(w.get("wo_id")) for w in base) if n is not None] or [FIRST_NUMBER])
+        with self._tx():
+            claimed = self._db.execute("INSERT OR IGNORE INTO sequences (tenant, next) VALUES (?, ?)", (tenant, top)).rowcount
+            if claimed:  # otherwise another process seeded the tenant first
+                for wo in base:
+                    self._insert(tenant, wo)
+
+    @contextmanager
+    def _tx(self) -> Iterator[None]:
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    def _bump(self, tenant: str, table: str = "revisions"):
+        # caller is inside a transaction
+        self._db.execute(
+            f"INSERT INTO {table} (tenant, rev) VALUES (?, 1) ON CONFLICT (tenant) DO UPDATE SET rev = rev + 1", (tenant,)
+        )
+
+    def _insert(self, tenant: str, wo: Dict[str, Any]):
+        created = parse_time(wo.get("created_at"))
+        hours = _sla_hours(wo.get("priority"), wo.get("sla_hours"))
+        due = created + hours * 3600 if created is not None and wo.get("status") == "open" else None
+        self._db.execute(
+            "INSERT OR REPLACE INTO work_orders (tenant, wo_id, asset_id, priority, summary, status, created_at, closed_at, sla_hours, due_ts, breached_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (tenant, wo["wo_id"], wo.get("asset_id"), wo.get("priority"), wo.get("summary"), wo.get("status") or "open",
+             wo.get("created_at"), wo.get("closed_at"), hours, due, wo.get("breached_at")),
+        )
+
+    # ---------- writes ----------
+
+    def create(self, tenant: str, asset_id: str, priority: Optional[str], summary: Optional[str], sla_hours: Optional[float] = None) -> Dict[str, Any]:
+        self._tenant(tenant)
+        now = self._clock()
+        with self._lock:
+            with self._tx():
+                (number,) = self._db.execute(
+                    "UPDATE sequences SET next = next + 1 WHERE tenant = ? RETURNING next", (tenant,)
+                ).fetchone()
+                wo = {
+                    "wo_id": f"WO-{number}", "asset_id": asset_id, "priority": priority, "summary": summary,
+                    "status": "open", "created_at": _now_iso(now), "closed_at": None, "sla_hours": sla_hours,
+                }
+                self._insert(tenant, wo)
+                self._bump(tenant)
+        return self.get(tenant, wo["wo_id"])
+
+    def set_status(self, tenant: str, wo_id: str, status: str) -> Optional[Dict[str, Any]]:
+        """Move a work order to `status`; closing stamps closed_at, reopening restarts the SLA clock."""
+        self._tenant(tenant)
+        now = self._clock()
+        with self._lock:
+            current = self.get(tenant, wo_id)
+            if current is None:
+                return None
+            if status == "open" and current["status"] != "open":
+                due = now + _sla_hours(current["priority"], current["sla_hours"]) * 3600
+                with self._tx():
+                    self._db.execute(
+                        "UPDATE work_orders SET status = 'open', closed_at = NULL, due_ts = ?, breached_at = NULL WHERE tenant = ? AND wo_id = ?",
+                        (due, tenant, wo_id),
+                    )
+                    self._bump(tenant)
+            elif status != "open":
+                closed_at = _now_iso(now) if status == "closed" else current["closed_at"]
+                with self._tx():
+                    self._db.execute(
+                        "UPDATE work_orders SET status = ?, closed_at = ?, due_ts = NULL WHERE tenant = ? AND wo_id = ?",
+                        (status, closed_at, tenant, wo_id),
+                    )
+                    self._bump(tenant)
+        return self.get(tenant, wo_id)
+
+    # ---------- reads ----------
+
+    def revision(self, tenant: str) -> int:
+        """Number of creates and status changes to the tenant's work orders, as seen by every process."""
+        with self._lock:
+            row = self._db.execute("SELECT rev FROM revisions WHERE tenant = ?", (tenant,)).fetchone()
+        return row[0] if row else 0
+
+    def version(self, tenant: str) -> Tuple[int, int]:
+        """(revision, breach stamps): changes with everything a work-order listing shows."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT (SELECT rev FROM revisions WHERE tenant = ?), (SELECT rev FROM breach_stamps WHERE tenant = ?)", (tenant, tenant)
+            ).fetchone()
+        return row[0] or 0, row[1] or 0
+
+    def get(self, tenant: str, wo_id: str) -> Optional[Dict[str, Any]]:
+        self._tenant(tenant)
+        with self._lock:
+            r = self._db.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM work_orders WHERE tenant = ? AND wo_id = ?", (tenant, wo_id)
+            ).fetchone()
+        return None if r is None else _row(r)
+
+    def all(self, tenant: str) -> List[Dict[str, Any]]:
+        """Every work order of the tenant, oldest first (dataset builds)."""
+        self._tenant(tenant)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM work_orders WHERE tenant = ? ORDER BY rowid", (tenant,)
+            ).fetchall()
+        return [_row(r) for r in rows]
+
+    def list(
+        self,
+        tenant: str,
+        asset_id: Optional[str] = None,
+        status: Optional[str] = None,
+        priority: Optional[str] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """A page of work orders, newest first: {"work_orders", "total", "next_cursor"}."""
+        self._tenant(tenant)
+        where, args = ["tenant = ?"], [tenant]
+        for column, value in (("asset_id", asset_id), ("status", status), ("priority", priority)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                args.append(value)
+        cond = " AND ".join(where)
+        page_cond, page_args = cond, list(args)
+        if cursor:
+            try:
+                before = int(cursor)
+            except ValueError:
+                raise InvalidCursor("invalid cursor")
+            page_cond += " AND rowid < ?"
+            page_args.append(before)
+        with self._lock:
+            (total,) = self._db.execute(f"SELECT COUNT(*) FROM work_orders WHERE {cond}", args).fetchone()
+            rows = self._db.execute(
+                f"SELECT {', '.join(COLUMNS)}, rowid FROM work_orders WHERE {page_cond} ORDER BY rowid DESC LIMIT ?",
+                page_args + [limit + 1],
+            ).fetchall()
+        more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            "work_orders": [_row(r[:-1]) for r in rows],
+            "total": total,
+            "next_cursor": str(rows[-1][-1]) if more and rows else None,
+        }
+
+    # ---------- SLA ----------
+
+    def breaches(self, tenant: str) -> List[Dict[str, Any]]:
+        """Open work orders whose SLA deadline passed since the last call (by any process)."""
+        self._tenant(tenant)
+        now = self._clock()
+        with self._lock, self._tx():
+            rows = self._db.execute(
+                "UPDATE work_orders SET breached_at = ?"
+                " WHERE tenant = ? AND status = 'open' AND breached_at IS NULL AND due_ts <= ?"
+                f" RETURNING {', '.join(COLUMNS)}",
+                (_now_iso(now), tenant, now),
+            ).fetchall()
+            if rows:
+                self._bump(tenant, "breach_stamps")
+        return sorted((_row(r) for r in rows), key=lambda w: (w["due_ts"], w["wo_id"]))
+
+    def open_breaches(self, tenant: str) -> List[Dict[str, Any]]:
+        """Every open work order past its SLA deadline; "new" marks the ones first stamped by this call."""
+        new = {w["wo_id"] for w in self.breaches(tenant)}
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM work_orders"
+                " WHERE tenant = ? AND status = 'open' AND breached_at IS NOT NULL ORDER BY due_ts, wo_id",
+                (tenant,),
+            ).fetchall()
+        return [{**w, "new": w["wo_id"] in new} for w in map(_row, rows)]
+
+
+def open_workorder_store(seed: Optional[Callable[[str], Iterable[Dict[str, Any]]]] = None) -> WorkOrderStore:
+    return WorkOrderStore(WORKORDER_DB, seed=seed)
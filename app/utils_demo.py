@@ -4,6 +4,8 @@ Demo-mode utilities for deterministic response short-circuits.
 """
 from typing import Optional
 
+from .responses import PrecomputedBody, PrecomputedJSONResponse, dumps
+
 
 def is_demo(company_id: Optional[str]) -> bool:
     """
@@ -21,3 +23,34 @@ def meta(payload: dict) -> dict:
         payload["_meta"] = {}
     payload["_meta"]["demo"] = True
     return payload
+
+
+
+class DemoSeed:
+    """
+    A demo seed pre-encoded once (with _meta.demo/_meta.tenant baked in) and
+    served as bytes. Per-request fields (company_id, query, ...) that match the
+    baked defaults hit the fully precomputed body; other values are spliced in
+    front of the pre-encoded remainder, so the seed is never copied or re-encoded.
+    """
+
+    def __init__(self, seed: dict, **defaults):
+        payload = dict(seed)
+        payload.update(defaults)
+        seed_meta = dict(payload.get("_meta") or {})
+        seed_meta["demo"] = True
+        seed_meta.setdefault("tenant", "demo")
+        payload["_meta"] = seed_meta
+        self.defaults = defaults
+        self.precomputed = PrecomputedBody.from_content(payload, tenant="demo", demo=True)
+        # encoded object minus the per-request fields and the opening brace: b'"kpis":...}'
+        self._tail = dumps({k: v for k, v in payload.items() if k not in defaults})[1:]
+
+    def response(self, **fields) -> PrecomputedJSONResponse:
+        values = {**self.defaults, **fields}
+        if values == self.defaults:
+            return PrecomputedJSONResponse(self.precomputed)
+        head = dumps(values)[:-1]  # b'{"company_id":...' without the closing brace
+        sep = b"," if self._tail != b"}" else b""
+        body = PrecomputedBody(head + sep + self._tail, tenant="demo", demo=True, compress=False)
+        return PrecomputedJSONResponse(body)
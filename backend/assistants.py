@@ -5,6 +5,8 @@ import os
 import time
 from openai import OpenAI
 
+from app.circuit_breaker import ASSISTANTS_BREAKER
+
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 def run_assistant(assistant_id: str, user_text: str, timeout: int = 30) -> str:
@@ -18,10 +20,26 @@ def run_assistant(assistant_id: str, user_text: str, timeout: int = 30) -> str:
     
     Returns:
         The assistant's text response (concatenated from all text outputs)
+
+    Runs are guarded by the shared assistants circuit breaker: while it is open
+    this returns "Assistant unavailable." immediately instead of polling until timeout.
     """
     if not assistant_id or not os.getenv("OPENAI_API_KEY"):
         return "Assistant unavailable."
-    
+    if not ASSISTANTS_BREAKER.allow():
+        return "Assistant unavailable."
+
+    start = time.monotonic()
+    result = _run_assistant_polling(assistant_id, user_text, timeout)
+    ok = result not in _FAILURE_RESULTS and not result.startswith("Assistant run ")
+    ASSISTANTS_BREAKER.record(ok, time.monotonic() - start)
+    return result
+
+
+_FAILURE_RESULTS = ("Assistant timed out.", "Assistant unavailable.")
+
+
+def _run_assistant_polling(assistant_id: str, user_text: str, timeout: int) -> str:
     try:
         # Create thread
         thread = client.beta.threads.create()
@@ -5,6 +5,7 @@ from fastapi import FastAPI, APIRouter, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from openai import OpenAI
 from backend.assistants import run_assistant
+from app.services.scenario_parser import parse_scenario_question
 
 BASE_DIR = Path(__file__).resolve().parent
 OPENAI_API_KEY = os.environ["OPENAI_API_KEY"]
@@ -112,6 +113,12 @@ def create_simple_projection(baseline: dict, deltas: list, horizon_days: int) ->
         elif lever == "marketing":
             revenue_impact *= (1 + delta_pct * 1.5)
             margin_impact -= delta_pct * 0.3
+        elif lever in ["capex", "equipment"]:
+            # straight-line over 5 years
+            margin_impact -= (delta_abs / 60) / revenue_mtd
+        elif lever in ["loan", "debt"]:
+            monthly_interest = delta_abs * (delta.get("rate_pct") or 0) / 100 / 12
+            margin_impact -= monthly_interest / revenue_mtd
     
     # Calculate projections
     months = horizon_days / 30
@@ -138,6 +145,32 @@ def create_simple_projection(baseline: dict, deltas: list, horizon_days: int) ->
         ]
     }
 
+RESEARCH_KEYWORDS = ["market", "competitor", "competition", "demand", "industry", "trend",
+                     "customer", "consumer", "sector"]
+
+
+def fast_path_scenario_chat(question: str, baseline: dict) -> dict | None:
+    """
+    Answer common scenario questions ("raise prices 5%", "hire 2 techs",
+    "buy a $45k truck with a $36k loan at 7.5%") locally, without assistant runs.
+    Returns None when the question needs the assistants (unparsed or market research).
+    """
+    question_lower = question.lower()
+    if any(kw in question_lower for kw in RESEARCH_KEYWORDS):
+        return None
+    parsed = parse_scenario_question(question)
+    if not parsed:
+        return None
+    horizon_days = parsed.horizon_months * 30
+    simulation = create_simple_projection(baseline, parsed.to_deltas(), horizon_days)
+    return {
+        "message": f"{parsed.scenario_name}: {simulation['summary']}",
+        "simulation": simulation,
+        "assumptions_used": baseline,
+        "fast_path": True,
+    }
+
+
 def orchestrate_scenario_chat(question: str, baseline: dict) -> dict:
     """
     Orchestrate scenario chat using Finance, Research, and Orchestrator assistants.
@@ -159,9 +192,7 @@ def orchestrate_scenario_chat(question: str, baseline: dict) -> dict:
         needs_finance = any(kw in question_lower for kw in finance_keywords)
         
         # Research keywords
-        research_keywords = ["market", "competitor", "competition", "demand", "industry", "trend", 
-                           "customer", "consumer", "sector"]
-        needs_research = any(kw in question_lower for kw in research_keywords)
+        needs_research = any(kw in question_lower for kw in RESEARCH_KEYWORDS)
         
         # Call Finance Assistant if needed
         if needs_finance and ASSISTANT_ID_FINANCE:
@@ -260,7 +291,7 @@ def api_intent(payload: dict):
                 "assumptions_used": baseline
             }
         
-        return orchestrate_scenario_chat(question, baseline)
+        return fast_path_scenario_chat(question, baseline) or orchestrate_scenario_chat(question, baseline)
     
     # Handle other intents via ai_registry
     tab_spec = get_tab_spec(intent)
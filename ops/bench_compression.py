@@ -0,0 +1,59 @@
+# /ops/bench_compression.py
+"""
+Payload size vs CPU cost for each available content-coding and level.
+
+    python ops/bench_compression.py [--repeat 50] [--link-kbps 1600]
+
+Payloads: every demo seed plus a non-demo /api/ai/assets/full body. For each
+coding/level it prints the compressed size, ratio, compress time per call and
+the transfer time saved on a slow mobile link (default 1.6 Mbps, "slow 3G").
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO))
+
+from app import demo_seed  # noqa: E402
+from app.middleware.compression import CODECS  # noqa: E402
+from app.responses import dumps  # noqa: E402
+from app.services.assets_engine import full_overview  # noqa: E402
+
+LEVELS = {"gzip": (1, 5, 9), "br": (1, 4, 11), "zstd": (1, 3, 19)}
+
+
+def payloads():
+    out = {name: dumps(value) for name, value in vars(demo_seed).items() if name.startswith("DEMO_") and isinstance(value, dict)}
+    out["assets_full(acme)"] = dumps(full_overview({"company_id": "acme", "range": "30d", "include_registry": True}))
+    return out
+
+
+def bench(data: bytes, codec, level: int, repeat: int):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        compressed = codec.compress(data, level)
+    return len(compressed), (time.perf_counter() - start) / repeat
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=50)
+    ap.add_argument("--link-kbps", type=float, default=1600.0)
+    args = ap.parse_args()
+    bytes_per_ms = args.link_kbps * 1000 / 8 / 1000
+
+    print(f"codecs available: {', '.join(CODECS)}")
+    print(f"{'payload':<32}{'coding':<8}{'lvl':>4}{'bytes':>9}{'ratio':>7}{'cpu_us':>9}{'saved_ms':>10}")
+    for name, data in sorted(payloads().items(), key=lambda kv: -len(kv[1])):
+        print(f"{name:<32}{'identity':<8}{'':>4}{len(data):>9}{1.0:>7.2f}{0:>9}{0:>10.1f}")
+        for coding, codec in CODECS.items():
+            for level in LEVELS.get(coding, (codec.fast_level, codec.max_level)):
+                size, secs = bench(data, codec, level, args.repeat)
+                saved_ms = (len(data) - size) / bytes_per_ms - secs * 1000
+                print(f"{'':<32}{coding:<8}{level:>4}{size:>9}{len(data) / size:>7.2f}{secs * 1e6:>9.0f}{saved_ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
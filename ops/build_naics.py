@@ -0,0 +1,74 @@
+# /ops/build_naics.py
+"""
+Rebuild data/naics/naics_2022.csv (the NAICS typeahead table) from the Census export.
+
+    python ops/build_naics.py "2-6 digit_2022_Codes.xlsx" [--out data/naics/naics_2022.csv]
+
+Input is the Census "2-6 digit 2022 Codes" file (https://www.census.gov/naics/
+-> Downloadables), as .xlsx or saved as .csv. The code and title columns are
+found by header ("... Code", "... Title"); blank spacer rows are dropped, the
+"T" footnote marker some Census exports append to titles is stripped, and rows
+keep the file's order. Sector ranges such as "31-33" are kept as they are (see
+app.services.naics_index). The complete 2022 table has 2,125 rows; the script
+prints the count per level and flags any other total, so a truncated export
+shows up.
+"""
+import argparse
+import csv
+import re
+import sys
+from collections import Counter
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO))
+
+from app.services.asset_import import read_file  # noqa: E402
+from app.services.naics_index import NAICS_PATH  # noqa: E402
+
+_CODE = re.compile(r"\d{2}(-\d{2})?|\d{3,6}")
+_FOOTNOTE = re.compile(r"(?<=[a-z)])T$")
+EXPECTED_ROWS = 2125
+
+
+def _column(header, word: str) -> str:
+    for key in header:
+        if key.endswith(word):
+            return key
+    raise SystemExit(f"no '{word}' column in {sorted(header)}")
+
+
+def read_codes(path: Path):
+    fmt = "xlsx" if path.suffix.lower() == ".xlsx" else "csv"
+    code_col = title_col = None
+    for _, row in read_file(path, fmt):
+        if code_col is None:
+            code_col, title_col = _column(row, "code"), _column(row, "title")
+        code = str(row.get(code_col) or "").strip()
+        if code.endswith(".0"):
+            code = code[:-2]  # numeric cells
+        title = _FOOTNOTE.sub("", str(row.get(title_col) or "").strip())
+        if _CODE.fullmatch(code) and title:
+            yield code, title
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("source", type=Path)
+    parser.add_argument("--out", type=Path, default=NAICS_PATH)
+    args = parser.parse_args()
+
+    rows = list(read_codes(args.source))
+    levels = Counter(2 if "-" in code else len(code) for code, _ in rows)
+    with open(args.out, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["code", "title"])
+        w.writerows(rows)
+    flag = "" if len(rows) == EXPECTED_ROWS else f" (expected {EXPECTED_ROWS}: incomplete export?)"
+    print(f"wrote {len(rows)} codes to {args.out}{flag}")
+    for digits in sorted(levels):
+        print(f"  {digits}-digit: {levels[digits]}")
+
+
+if __name__ == "__main__":
+    main()
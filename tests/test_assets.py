@@ -1,4 +1,6 @@
 import json
+import time
+import pytest
 from fastapi.testclient import TestClient
 from app.main import app
 
@@ -98,3 +100,814 @@ def test_document_extract_dates():
     for doc in docs:
         assert "hints" in doc
         assert "confidence" in doc
+
+
+def test_asset_dataset_matches_scans_and_invalidates_per_asset():
+    from app.services import assets_engine
+
+    data = {
+        "assets": [{"asset_id": "A", "odometer": 10}, {"asset_id": "B"}],
+        "work_orders": [
+            {"wo_id": "1", "asset_id": "A", "status": "open"},
+            {"wo_id": "2", "asset_id": "A", "status": "closed"},
+            {"wo_id": "3", "asset_id": "B", "status": "closed"},
+        ],
+        "utilization": {"A": [{"active_hours": 100, "available_hours": 160}], "B": [{"active_hours": 150, "available_hours": 160}]},
+        "depreciation": {"A": {"cost": 1200, "salvage": 0, "useful_life_months": 12}},
+    }
+    ds = assets_engine.AssetDataset(data)
+    for a in data["assets"]:
+        assert ds.utilization_for(a["asset_id"]) == assets_engine.compute_utilization(a["asset_id"], data)
+    assert ds.valuation_for("A") == {"book_value_monthly": 100.0, "current_book": 0}
+    assert [w["wo_id"] for w in ds.work_orders_for("A", "open")] == ["1"]
+
+    health_b = ds.health_for("B")
+    before = ds.health_for("A")
+    ds.add_work_order({"wo_id": "4", "asset_id": "A", "status": "open"})
+    assert ds.utilization_for("A")["downtime_hours"] == 16
+    assert ds.health_for("A") < before
+    assert "health" in ds._metrics["B"] and ds.health_for("B") == health_b
+
+
+def test_telemetry_store_rollups_feed_utilization(tmp_path, monkeypatch):
+    from app.services import assets_engine
+    from app.services.telemetry_store import TelemetryStore
+
+    now = 1_760_000_000
+    store = TelemetryStore(tmp_path, segment_rows=500, clock=lambda: now)
+    start = (now // 86400 - 1) * 86400
+    samples = []
+    for minute in range(2 * 1440):
+        moving = 8 <= (minute // 60) % 24 < 14  # six hours a day
+        samples.append({"ts": start + minute * 60, "odometer": 1000 + minute * moving, "dtc": ["P0171"] if minute == 5 else None})
+    assert store.ingest("acme", "TRK-1", samples) == len(samples)
+
+    hours = store.rollups("acme", "TRK-1", "hour", start, start + 86400)
+    assert len(hours) == 24 and sum(h["samples"] for h in hours) == 1440
+    q = store.query("acme", "TRK-1", start + 3600, start + 7200, ["odometer"])
+    assert len(q["ts"]) == 60 and q["ts"] == sorted(q["ts"])
+    assert store.faults("acme", "TRK-1", start, now) == [{"ts": start + 300, "dtc": ["P0171"]}]
+    assert store.query("acme", "missing", 0, now)["ts"] == [] and not (tmp_path / "acme" / "missing").exists()
+
+    util = store.utilization("acme", "TRK-1", days=30)
+    assert util["available_hours"] == 48 and 11 < util["active_hours"] <= 12
+    store.close()
+
+    reopened = TelemetryStore(tmp_path, clock=lambda: now)
+    monkeypatch.setattr(assets_engine, "TELEMETRY", reopened)
+    metrics = assets_engine.compute_utilization("TRK-1", {"work_orders": []}, company_id="acme")
+    assert metrics["utilization_pct"] == round(util["active_hours"] / 48 * 100, 2)
+    reopened.close()
+
+
+def test_dataset_refreshes_only_assets_with_telemetry_from_another_worker(tmp_path, monkeypatch):
+    from app.services import assets_engine
+    from app.services.telemetry_store import TelemetryStore
+
+    now = int(time.time())
+    mine, other = TelemetryStore(tmp_path), TelemetryStore(tmp_path)
+    monkeypatch.setattr(assets_engine, "TELEMETRY", mine)
+    mine.ingest("tm-shared", "TRK-101", [{"ts": now - 3600 + i * 60, "odometer": 100} for i in range(30)])
+    ds = assets_engine.load_dataset("tm-shared")
+    idle = ds.utilization_for("TRK-101")
+    untouched = ds.health_for("CRANE-01")
+    ds.scheduler()
+    other.ingest("tm-shared", "TRK-101", [{"ts": now - 1800 + i * 60, "odometer": 100 + i} for i in range(30)])
+    again = assets_engine.load_dataset("tm-shared")
+    assert again is ds  # no rebuild
+    assert again.utilization_for("TRK-101") != idle
+    assert "health" in again._metrics["CRANE-01"] and again.health_for("CRANE-01") == untouched
+    assert again.scheduler()._meters["TRK-101"]["odometer"][0] == 129
+    mine.close()
+    other.close()
+
+
+def test_telemetry_change_log_reports_touched_assets_and_cut_back(tmp_path):
+    from app.services.telemetry_store import TelemetryStore
+
+    a, b = TelemetryStore(tmp_path, changes_max_bytes=200), TelemetryStore(tmp_path)
+    cursor, touched = a.changes("acme")
+    assert touched == set()
+    b.ingest("acme", "TRK-1", [{"ts": 1_760_000_000}])
+    b.ingest("acme", "TRK-2", [{"ts": 1_760_000_000}])
+    cursor, touched = a.changes("acme", cursor)
+    assert touched == {"TRK-1", "TRK-2"} and cursor[0] == a.version("acme") == 2
+    assert a.changes("acme", cursor) == (cursor, set())
+    for i in range(3):
+        a.ingest("acme", "TRK-3", [{"ts": 1_760_000_000 + i}])
+    cursor, touched = b.changes("acme", cursor)
+    assert touched == {"TRK-3"}
+    for i in range(20):  # the log is cut back to its newer half several times
+        a.ingest("acme", f"TRK-{i}", [{"ts": 1_760_000_000}])
+    assert (tmp_path / "acme" / ".changes").stat().st_size <= 200
+    assert b.changes("acme", cursor)[1] is None  # the cursor's entries are gone: everything may have changed
+    fresh, _ = b.changes("acme")
+    a.ingest("acme", "TRK-9", [{"ts": 1_760_000_000}])
+    assert b.changes("acme", fresh)[1] == {"TRK-9"}
+    a.close()
+    b.close()
+
+
+def test_telemetry_backfill_older_than_hourly_ring_reaches_daily_rollups(tmp_path):
+    from app.services.telemetry_store import DAY, TelemetryStore
+
+    now = 1_760_000_000
+    store = TelemetryStore(tmp_path, clock=lambda: now)
+    # 15 days of recent hourly samples fill every slot of the 14-day hourly ring
+    store.ingest("acme", "TRK-1", [{"ts": now - 15 * DAY + i * 3600, "odometer": 500 + i} for i in range(15 * 24)])
+    start = (now // DAY - 20) * DAY
+    store.ingest("acme", "TRK-1", [{"ts": start + 8 * 3600 + i * 60, "odometer": 100 + i} for i in range(120)])
+    days = store.rollups("acme", "TRK-1", "day", start, start + DAY)
+    assert len(days) == 1 and days[0]["samples"] == 120 and days[0]["odometer_max"] == 219
+    assert days[0]["active_s"] == 119 * 60
+    assert store.rollups("acme", "TRK-1", "hour", start, start + DAY) == []
+    store.close()
+
+
+def test_telemetry_store_shared_by_two_processes_and_faults_rotate(tmp_path):
+    from app.services.telemetry_store import DAY, TelemetryStore, parse_ts
+
+    now = [1_760_000_000]
+    # two stores on one directory stand in for two worker processes; max_open=1 exercises eviction/reopen
+    a = TelemetryStore(tmp_path, segment_rows=10, retention_days=2, max_open=1, clock=lambda: now[0])
+    b = TelemetryStore(tmp_path, segment_rows=10, retention_days=2, clock=lambda: now[0])
+    start = now[0] - DAY
+    for i in range(30):
+        store = a if i % 2 else b
+        store.ingest("acme", "TRK-1", [{"ts": start + i * 60, "odometer": i, "dtc": ["P0300"] if i % 10 == 0 else None}])
+        if i % 3 == 0:
+            a.ingest("acme", "TRK-2", [{"ts": start + i * 60}])  # evicts a's TRK-1 handle
+    for store in (a, b):
+        assert store.query("acme", "TRK-1", 0, now[0])["odometer"] == [float(i) for i in range(30)]
+        assert [e["ts"] for e in store.faults("acme", "TRK-1", 0, now[0])] == [start, start + 600, start + 1200]
+    assert len(list((tmp_path / "acme" / "TRK-1").glob("seg-*.col"))) == 3
+    assert b.rollups("acme", "TRK-1", "day", start, start + DAY)[0]["samples"] == 30
+
+    # a new segment expires the old ones, and their fault files go with them
+    now[0] += 3 * DAY
+    a.ingest("acme", "TRK-1", [{"ts": now[0] - i, "dtc": ["P0420"]} for i in range(11)])
+    assert [e["dtc"] for e in b.faults("acme", "TRK-1", 0, now[0] + 1)] == [["P0420"]] * 11
+    assert len(list((tmp_path / "acme" / "TRK-1").glob("*.faults.ndjson"))) == 2
+    a.close()
+    b.close()
+
+    assert parse_ts(1_760_000_000_123) == parse_ts(1_760_000_000) == parse_ts("2025-10-09T08:53:20Z")
+    assert parse_ts(5) is None and parse_ts(10 ** 18) is None and parse_ts("9999-01-01T00:00:00") is None
+    assert parse_ts(float("nan")) is None
+
+
+def test_telemetry_bulk_ndjson_gzip_acks(tmp_path, monkeypatch):
+    import gzip
+    from app.services import assets_engine, telemetry_ingest
+    from app.services.telemetry_store import TelemetryStore
+
+    now = 1_760_000_000
+    store = TelemetryStore(tmp_path, clock=lambda: now)
+    monkeypatch.setattr(assets_engine, "TELEMETRY", store)
+    monkeypatch.setattr(telemetry_ingest, "BATCH_LINES", 4)
+    lines = [json.dumps({"asset_id": f"TRK-{i % 2}", "ts": now - 600 + i * 60, "odometer": 100 + i}) for i in range(9)]
+    lines.insert(5, '{"asset_id": "TRK-0", "ts": "yesterday-ish"}')
+    lines.insert(2, "not json")
+    body = gzip.compress(("\n".join(lines) + "\n\n").encode())
+    try:
+        r = client.post(
+            "/api/ai/assets/telemetry/bulk?company_id=demo",
+            content=body,
+            headers={"content-type": "application/x-ndjson", "content-encoding": "gzip"},
+        )
+        assert r.status_code == 200
+        out = r.json()
+        assert (out["lines"], out["accepted"], out["rejected"]) == (11, 9, 2)
+        assert out["committed_through_line"] == 12  # trailing blank line included
+        assert [b["lines"] for b in out["batches"]] == [4, 4, 3] and all(b["committed"] for b in out["batches"])
+        assert out["batches"][0]["errors"] == [{"line": 3, "error": "invalid json"}]
+        assert out["batches"][1]["errors"] == [{"line": 7, "error": "missing or invalid ts"}]
+        assert len(store.query("demo", "TRK-0", 0, now)["ts"]) == 5
+
+        r = client.post("/api/ai/assets/telemetry/bulk?company_id=demo", content=b"x", headers={"content-encoding": "br"})
+        assert r.status_code == 415
+    finally:
+        store.close()
+
+
+def test_telemetry_gzip_inflates_in_bounded_pieces():
+    import asyncio
+    import gzip
+    from app.services import telemetry_ingest
+
+    # 32 MiB of a single line squeezed into a ~32 KiB request chunk
+    bomb = gzip.compress(b"x" * (32 << 20) + b"\n" + b'{"ok": 1}\n')
+
+    async def body():
+        yield bomb
+
+    async def run():
+        sizes = [len(piece) async for piece in telemetry_ingest._inflated(body(), gzip=True)]
+        lines = [line async for line in telemetry_ingest.iter_lines(body(), gzip=True)]
+        return sizes, lines
+
+    sizes, lines = asyncio.run(run())
+    assert max(sizes) <= telemetry_ingest.INFLATE_CHUNK_BYTES and sum(sizes) == (32 << 20) + 11
+    assert lines == [None, b'{"ok": 1}']
+
+
+def test_telemetry_ingest_slots_per_live_loop():
+    import asyncio
+    from app.services import telemetry_ingest
+
+    async def contend():
+        sem = telemetry_ingest._slots(1)
+
+        async def hold():
+            async with sem:
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(hold(), hold())  # a waiter binds the semaphore to this loop
+        return sem
+
+    first = asyncio.run(contend())
+    second = asyncio.run(contend())  # a new loop (TestClient makes one per request) gets its own
+    assert second is not first
+    assert len(telemetry_ingest._SLOTS) == 1  # the closed loop's entry was dropped
+
+
+def test_telemetry_bulk_gzip_multi_member_and_bad_trailer(tmp_path, monkeypatch):
+    import gzip
+    from app.services import assets_engine
+    from app.services.telemetry_store import TelemetryStore
+
+    now = 1_760_000_000
+    store = TelemetryStore(tmp_path, clock=lambda: now)
+    monkeypatch.setattr(assets_engine, "TELEMETRY", store)
+    lines = [json.dumps({"asset_id": "TRK-0", "ts": now - 1200 + i * 60, "odometer": 100 + i}) + "\n" for i in range(20)]
+    body = gzip.compress("".join(lines[:10]).encode()) + gzip.compress("".join(lines[10:]).encode())
+    headers = {"content-type": "application/x-ndjson", "content-encoding": "gzip"}
+    try:
+        r = client.post("/api/ai/assets/telemetry/bulk?company_id=demo", content=body, headers=headers)
+        assert r.status_code == 200
+        assert (r.json()["lines"], r.json()["accepted"]) == (20, 20)
+
+        for bad in (body + b"trailing junk", body[:-4]):
+            r = client.post("/api/ai/assets/telemetry/bulk?company_id=demo", content=bad, headers=headers)
+            assert r.status_code == 400
+    finally:
+        store.close()
+
+
+def test_asset_search_index_text_filters_and_cursor():
+    from app.services.asset_index import AssetSearchIndex
+
+    makes = ["Ford", "Freightliner", "Caterpillar", "Deere"]
+    assets = [
+        {"asset_id": f"TRK-{i:05d}", "name": f"{makes[i % 4]} Unit {i}", "category": "vehicle" if i % 4 < 2 else "equipment",
+         "make": makes[i % 4], "site": "Austin Yard" if i % 3 else "Dallas Yard", "status": "active", "cost": 1000 * (i % 100), "year": 2010 + i % 15}
+        for i in range(20000)
+    ]
+    idx = AssetSearchIndex(assets, lambda asset_id, asset: 50)
+
+    out = idx.search("freight", {"site": "dallas yard", "cost": {"min": 10000, "max": 20000}, "year": {"min": 2020}})
+    expected = [a for a in assets if a["make"] == "Freightliner" and a["site"] == "Dallas Yard" and 10000 <= a["cost"] <= 20000 and a["year"] >= 2020]
+    assert out["total"] == len(expected) > 0 and {a["asset_id"] for a in out["results"]} == {a["asset_id"] for a in expected}
+    assert idx.search("trk-0001")["total"] == 10
+    assert idx.search("", {"health": {"max": 49}})["total"] == 0
+
+    seen, cursor = [], None
+    while True:
+        page = idx.search("deere", {"status": "ACTIVE"}, limit=700, cursor=cursor)
+        seen += [a["asset_id"] for a in page["results"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert len(seen) == len(set(seen)) == 5000 and seen == sorted(seen)
+
+
+def test_asset_search_index_search_while_upserting():
+    import sys
+    import threading
+    from app.services.asset_index import AssetSearchIndex
+
+    idx = AssetSearchIndex([{"asset_id": f"EQ-{i}", "name": f"Loader {i}", "site": f"Yard {i}"} for i in range(2000)], lambda asset_id, asset: 50)
+    done = threading.Event()
+
+    def edit():
+        # an import on the threadpool: new sites and names come and go
+        for n in range(3000):
+            idx.upsert({"asset_id": f"EQ-{n % 2000}", "name": f"Loader {n} v{n % 7}", "site": f"Depot {n}"})
+        done.set()
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # switch threads often enough to land inside a search
+    try:
+        t = threading.Thread(target=edit)
+        t.start()
+        while not done.is_set():
+            assert idx.search("loader", {"site": None})["total"] == 2000
+        t.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+
+def test_assets_search_pagination_endpoint():
+    first = client.post("/api/ai/assets/search", json={"company_id": "demo", "limit": 1}).json()
+    assert len(first["results"]) == 1 and first["total"] >= 2 and first["next_cursor"]
+    second = client.post("/api/ai/assets/search", json={"company_id": "demo", "limit": 1, "cursor": first["next_cursor"]}).json()
+    assert second["results"][0]["asset_id"] != first["results"][0]["asset_id"]
+    bad = client.post("/api/ai/assets/search", json={"company_id": "demo", "cursor": "%%%"})
+    assert bad.status_code == 400
+
+
+def test_assets_import_file_streams_chunks_and_upserts(tmp_path, monkeypatch):
+    from app.services import assets_engine, uploads
+    from app.services.asset_store import AssetStore
+
+    monkeypatch.setattr(assets_engine, "ASSET_STORE", AssetStore(tmp_path / "assets", fsync=False))
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", tmp_path / "uploads")
+    lines = ["Unit #,Description,Type,Location,Purchase Price,Model Year,Warranty Expiration"]
+    lines += [f"IMP-{i:05d},Loader {i},Equipment,Dallas Yard,\"$1,{i % 1000:03d}.00\",2019,06/30/2027" for i in range(2500)]
+    lines += ["TRK-101,,,Houston Yard,,,", ",No id,,,,,", "IMP-99999,Bad,,,,abc,", "IMP-00001,Loader one again,,,,,"]
+    r = client.post("/api/ai/assets/import/file?company_id=demo", content="\n".join(lines).encode(), headers={"content-type": "text/csv"})
+    assert r.status_code == 200
+    events = [json.loads(line) for line in r.text.splitlines()]
+    assert [e["event"] for e in events] == ["progress", "progress", "progress", "done"]
+    done = events[-1]
+    assert (done["rows"], done["inserted"], done["updated"], done["skipped"], done["duplicates"]) == (2504, 2500, 2, 2, 1)
+    assert events[2]["errors"] == [{"row": 2503, "error": "missing asset_id"}, {"row": 2504, "error": "invalid year: abc"}]
+    assert not list((tmp_path / "uploads").rglob("import-*"))
+
+    by_id = assets_engine.load_dataset("demo").by_id
+    assert by_id["IMP-00042"]["cost"] == 1042.0 and by_id["IMP-00042"]["warranty_expires"] == "2027-06-30"
+    assert by_id["IMP-00001"]["name"] == "Loader one again" and by_id["IMP-00001"]["site"] == "Dallas Yard"
+    assert by_id["TRK-101"]["site"] == "Houston Yard" and by_id["TRK-101"]["name"] == "Ford F-150"
+    found = client.post("/api/ai/assets/search", json={"company_id": "demo", "query": "loader", "limit": 5}).json()
+    assert found["total"] == 2500
+
+    r = client.post("/api/ai/assets/import", json={"company_id": "demo", "rows": [{"Asset ID": "IMP-00002", "Mileage": "1,200"}, {"name": "x"}]})
+    body = r.json()
+    assert (body["imported"], body["updated"], body["skipped"]) == (1, 1, 1) and body["warnings"] == ["row 2: missing asset_id"]
+
+
+def test_read_xlsx_shared_and_inline_strings(tmp_path):
+    import zipfile
+    from app.services.asset_import import read_xlsx
+
+    ns = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+    sheet = (
+        f'<worksheet {ns}><sheetData>'
+        '<row r="1"><c r="A1" t="s"><v>0</v></c><c r="C1" t="s"><v>1</v></c></row>'
+        '<row r="2"><c r="A2" t="inlineStr"><is><t>EQ-1</t></is></c><c r="C2"><v>46000</v></c></row>'
+        '</sheetData></worksheet>'
+    )
+    strings = f'<sst {ns}><si><t>Asset ID</t></si><si><r><t>Warranty </t></r><r><t>Expires</t></r></si></sst>'
+    path = tmp_path / "fleet.xlsx"
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("xl/worksheets/sheet1.xml", sheet)
+        zf.writestr("xl/sharedStrings.xml", strings)
+    assert list(read_xlsx(path)) == [(2, {"asset_id": "EQ-1", "warranty_expires": "46000"})]
+
+
+def test_assets_import_file_reports_malformed_workbooks(tmp_path, monkeypatch):
+    import zipfile
+    from app.services import assets_engine, uploads
+    from app.services.asset_store import AssetStore
+
+    monkeypatch.setattr(assets_engine, "ASSET_STORE", AssetStore(tmp_path / "assets", fsync=False))
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", tmp_path / "uploads")
+    ns = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+    rows = "".join(f'<row r="{i}"><c r="A{i}" t="inlineStr"><is><t>BAD-{i}</t></is></c></row>' for i in range(2, 1502))
+    header = '<row r="1"><c r="A1" t="s"><v>0</v></c></row>'
+    workbooks = {
+        # past the first chunk, the stream has already started
+        "index": header + rows + '<row r="1502"><c r="A1502" t="s"><v>7</v></c></row></sheetData></worksheet>',
+        "truncated": header + rows + '<row r="1502"><c r="A1502" t="inl',
+    }
+    for kind, sheet_data in workbooks.items():
+        path = tmp_path / f"{kind}.xlsx"
+        with zipfile.ZipFile(path, "w") as zf:
+            zf.writestr("xl/worksheets/sheet1.xml", f"<worksheet {ns}><sheetData>" + sheet_data)
+            zf.writestr("xl/sharedStrings.xml", f"<sst {ns}><si><t>Asset ID</t></si></sst>")
+        r = client.post("/api/ai/assets/import/file?company_id=demo&format=xlsx", content=path.read_bytes())
+        assert r.status_code == 200
+        events = [json.loads(line) for line in r.text.splitlines()]
+        assert events[0]["event"] == "progress"
+        assert events[-1]["event"] == "error" and "malformed xlsx after row 1501" in events[-1]["error"]
+
+    # a field past csv's size limit
+    r = client.post("/api/ai/assets/import/file?company_id=demo", content=b"asset_id,name\nA-1," + b"z" * 200_000 + b"\n", headers={"content-type": "text/csv"})
+    assert r.json()["event"] == "error" and "malformed csv" in r.json()["error"]
+
+
+def test_document_date_extraction_single_pass_and_process_pool():
+    from app.services.doc_dates import extract_batch, extract_text
+
+    hints = extract_text("Policy #88 term ends 1st of June, 2027; warranty expires 5 Jan 2028. Issued 2024-01-01.")
+    assert [(h["field"], h["value"]) for h in hints] == [("insurance_expires", "2027-06-01"), ("warranty_expires", "2028-01-05")]
+    assert extract_text("Coverage valid until March 2026")[0]["value"] == "2026-03-31"
+    assert extract_text("Expires 02/30/2026") == []  # impossible date: no guess
+
+    docs = [{"doc_id": f"D-{i}", "text": f"Registration for unit {i} due {1 + i % 12}/15/2026"} for i in range(300)]
+    serial = extract_batch(docs, parallel=False)
+    assert extract_batch(docs, parallel=True) == serial
+    assert serial[13]["hints"] == [{"field": "registration_expires", "value": "2026-02-15", "original_text": "2/15/2026", "confidence": "high"}]
+
+
+def test_fleet_replace_vs_repair_matches_single_and_plans_under_budget():
+    import random
+
+    rng = random.Random(7)
+    n = 800
+    fleet = {
+        "company_id": "demo",
+        "asset_ids": [f"T-{i:03d}" for i in range(n)],
+        "repair_cost_year": [rng.uniform(1000, 15000) for _ in range(n)],
+        "downtime_cost_year": [rng.uniform(0, 6000) for _ in range(n)],
+        "replacement_cost": [rng.uniform(40000, 120000) for _ in range(n)],
+        "replacement_useful_life_months": [rng.choice([60, 84, 96, 120]) for _ in range(n)],
+        "expected_productivity_gain_pct": 5,
+        "discount_rate_pct": 8,
+        "capex_budget": 1_000_000,
+        "max_replacements": 20,
+    }
+    r = client.post("/api/ai/assets/replace-vs-repair/fleet", json=fleet)
+    assert r.status_code == 200
+    body = r.json()
+    assert len(body["assets"]) == n and body["summary"]["assets"] == n
+
+    i = 123
+    single = client.post("/api/ai/assets/replace-vs-repair", json={
+        "company_id": "demo", "asset_id": fleet["asset_ids"][i], "repair_cost_year": fleet["repair_cost_year"][i],
+        "downtime_cost_year": fleet["downtime_cost_year"][i], "replacement_cost": fleet["replacement_cost"][i],
+        "replacement_useful_life_months": fleet["replacement_useful_life_months"][i], "discount_rate_pct": 8,
+        "expected_productivity_gain_pct": 5,
+    }).json()
+    for key in ("tco_3yr_repair", "tco_3yr_replace", "npv_savings", "payback_months", "recommendation"):
+        assert body["assets"][i][key] == single[key]
+
+    plan = body["plan"]
+    assert 0 < len(plan["selected"]) <= 20 and plan["capex"] <= 1_000_000
+    picked = {s["asset_id"] for s in plan["selected"]}
+    assert all(body["assets"][int(a[2:])]["recommendation"] == "replace" for a in picked)
+    ratios = [s["npv_savings"] / s["replacement_cost"] for s in plan["selected"]]
+    assert ratios == sorted(ratios, reverse=True)
+
+    bad = client.post("/api/ai/assets/replace-vs-repair/fleet", json={**fleet, "downtime_cost_year": [1.0]})
+    assert bad.status_code == 422
+
+    unknown = client.post("/api/ai/assets/replace-vs-repair/fleet", json={"company_id": "demo", "asset_ids": ["TRK-101", "NOPE-1"], "repair_cost_year": [9000, 50000]})
+    assert unknown.status_code == 422 and "NOPE-1" in unknown.json()["detail"]
+    known = client.post("/api/ai/assets/replace-vs-repair/fleet", json={"company_id": "demo", "asset_ids": ["TRK-101"], "repair_cost_year": [50000]}).json()
+    assert known["plan"]["selected"][0]["replacement_cost"] == 45000
+
+
+def test_maintenance_scheduler_heap_due_window_and_incremental_alerts():
+    from app.services.maintenance import DAY, MaintenanceScheduler
+
+    now = [1_760_000_000.0]
+    sched = MaintenanceScheduler(clock=lambda: now[0])
+    for i in range(2000):
+        sched.add_expiry(f"A-{i}", "warranty", now[0] + (i + 1) * DAY)
+    sched.set_meter("TRK-1", "odometer", 61_250, rate_per_day=100)
+    sched.add_plan({"plan_id": "MP-1", "asset_id": "TRK-1", "type": "meter", "interval": 5000, "task": "Oil"})
+    sched.add_plan({"plan_id": "MP-2", "asset_id": "TRK-1", "type": "calendar", "interval": 30}, last_done_at=now[0] - 25 * DAY)
+    sched.add_work_order({"wo_id": "WO-1", "asset_id": "TRK-1", "priority": "high", "status": "open", "created_at": now[0] - 3600})
+
+    due = sched.due_within(3)
+    assert [(e["type"], e.get("plan_id") or e.get("wo_id") or e["asset_id"]) for e in due] == [
+        ("work_order", "WO-1"), ("warranty", "A-0"), ("warranty", "A-1"), ("warranty", "A-2")]
+    assert sched.plan("MP-1")["due_in_days"] == 37  # 3,750 miles to go at 100/day
+    assert len(sched.due_within(10, types=["plan"])) == 1
+
+    sched.set_meter("TRK-1", "odometer", 64_990)  # telemetry moved the meter: oil change now close
+    assert sched.plan("MP-1")["due_in_days"] == 0
+
+    first = sched.poll_alerts()
+    assert {e["type"] for e in first} == {"warranty", "plan"} and len([e for e in first if e["type"] == "warranty"]) == 60
+    assert sched.poll_alerts() == []
+    now[0] += DAY + 1
+    second = sched.poll_alerts()
+    assert [(e["type"], e["alert"]) for e in second] == [("work_order", "overdue"), ("warranty", "due_soon")]
+    sched.add_work_order({"wo_id": "WO-1", "status": "closed"})
+    assert all(e["type"] != "work_order" for e in sched.due_within(30))
+
+
+def test_maintenance_scheduler_overdue_meter_alerts_once_and_heaps_stay_bounded():
+    from app.services.maintenance import MaintenanceScheduler
+
+    now = [1_760_000_000.0]
+    sched = MaintenanceScheduler(clock=lambda: now[0])
+    sched.set_meter("TRK-1", "odometer", 64_000, rate_per_day=100)
+    sched.add_plan({"plan_id": "MP-1", "asset_id": "TRK-1", "type": "meter", "interval": 5000, "last_done_meter": 60_000})
+    sched.add_plan({"plan_id": "MP-2", "asset_id": "TRK-2", "type": "hours", "interval": 250})  # no usage: never due
+    sched.set_meter("TRK-1", "odometer", 65_100)
+    overdue_at = sched.plan("MP-1")["due_at"]
+    alerts = []
+    for i in range(10_000):
+        now[0] += 60
+        sched.set_meter("TRK-1", "odometer", 65_100 + i)
+        sched.set_meter("TRK-2", "engine_hours", 10.0, rate_per_day=0)
+        alerts += sched.poll_alerts()
+    assert [(a["plan_id"], a["alert"]) for a in alerts] == [("MP-1", "overdue")]
+    assert sched.plan("MP-1")["due_at"] == overdue_at
+    assert len(sched._due) <= 2 * len(sched) + 64 and len(sched._alerts) <= 2 * len(sched) + 64
+
+    sched.add_plan({"plan_id": "MP-1", "asset_id": "TRK-1", "type": "meter", "interval": 5000, "last_done_meter": 75_000})  # serviced
+    assert sched.plan("MP-1")["due_in_days"] > 0
+
+
+def test_maintenance_plans_and_alerts_shared_by_two_processes(tmp_path):
+    from app.services.maintenance import DAY, MaintenanceScheduler
+    from app.services.maintenance_store import MaintenanceStore
+
+    now = [1_760_000_000.0]
+    # two stores on one file stand in for two worker processes
+    a = MaintenanceStore(tmp_path / "wo.sqlite3")
+    b = MaintenanceStore(tmp_path / "wo.sqlite3")
+    plan = a.save_plan("acme", "GEN-01", {"type": "calendar", "interval": 3, "task": "Coolant check"})
+    assert plan["plan_id"] == "MP-GEN-01-1" and b.plans("acme") == [plan]
+    rev = b.revision("acme")
+    for interval in (2, 3):
+        b.save_plan("acme", "GEN-01", {**plan, "interval": interval})  # same plan_id: replaced, not appended
+    assert len(a.plans("acme")) == 1 and a.plans("acme")[0]["interval"] == 3 and a.revision("acme") == rev + 2
+    assert b.revision("other") == 0
+
+    def scheduler(store):
+        sched = MaintenanceScheduler(clock=lambda: now[0], claim_alert=lambda key, due: store.claim_alert("acme", key, due))
+        for p in store.plans("acme"):
+            sched.add_plan(p)
+        return sched
+
+    first, second = scheduler(a), scheduler(b)
+    assert [e["plan_id"] for e in first.poll_alerts()] == ["MP-GEN-01-1"]
+    assert second.poll_alerts() == []  # already emitted by the other worker
+    assert scheduler(a).poll_alerts() == []  # nor repeated after a rebuild
+    now[0] += 10 * DAY
+    first.add_plan({**plan, "last_done_at": now[0]})  # serviced: a new version alerts again
+    second.add_plan({**plan, "last_done_at": now[0]})
+    now[0] += DAY
+    assert len(second.poll_alerts() + first.poll_alerts()) == 1
+    a.close()
+    b.close()
+
+
+def test_overdue_meter_plan_alerts_once_across_scheduler_rebuilds(tmp_path):
+    from app.services.maintenance import DAY, MaintenanceScheduler
+    from app.services.maintenance_store import MaintenanceStore
+
+    now = [1_760_000_000.0]
+    store = MaintenanceStore(tmp_path / "wo.sqlite3")
+    plan = {"plan_id": "MP-1", "asset_id": "TRK-1", "type": "meter", "interval": 5000, "last_done_meter": 60_000}
+
+    def build(reading=66_000):
+        # a fresh scheduler (restart, plan save, other worker) sees the plan already overdue
+        sched = MaintenanceScheduler(clock=lambda: now[0], claim_alert=lambda key, version: store.claim_alert("acme", key, version))
+        sched.set_meter("TRK-1", "odometer", reading, rate_per_day=100)
+        sched.add_plan(plan)
+        return sched.poll_alerts()
+
+    assert [a["alert"] for a in build()] == ["overdue"]
+    now[0] += DAY
+    assert build() == []
+    plan["last_done_meter"] = 65_000  # serviced: the next interval alerts again
+    now[0] += 40 * DAY
+    assert [a["plan_id"] for a in build(70_100)] == ["MP-1"]
+    store.close()
+
+
+def test_schedule_maintenance_endpoint_returns_next_due():
+    r = client.post("/api/ai/assets/maintenance/schedule", json={"company_id": "demo", "asset_id": "GEN-01", "plan": {"type": "calendar", "interval": 14, "task": "Coolant check"}})
+    assert r.status_code == 200
+    plan = r.json()["plan"]
+    assert plan["asset_id"] == "GEN-01" and plan["basis"] == "calendar" and plan["due_at"]
+    due = client.post("/api/ai/assets/maintenance/due", json={"company_id": "demo", "days": 3650, "types": ["plan"]}).json()
+    assert plan["plan_id"] in {e["plan_id"] for e in due["events"]}
+    assert client.post("/api/ai/assets/maintenance/alerts", json={"company_id": "demo"}).status_code == 200
+
+
+def test_workorder_store_sequences_paging_and_sla_breaches(tmp_path):
+    from app.services.workorder_store import InvalidCursor, WorkOrderStore
+
+    now = [1_760_000_000.0]
+    seed = [{"wo_id": "WO-2201", "asset_id": "TRK-1", "priority": "low", "status": "closed", "created_at": "2025-01-01T00:00:00Z"}]
+    store = WorkOrderStore(tmp_path / "wo.sqlite3", seed=lambda tenant: seed, clock=lambda: now[0])
+    ids = [store.create("acme", f"TRK-{i % 3}", "high" if i % 2 else "low", f"job {i}")["wo_id"] for i in range(120)]
+    assert ids[0] == "WO-2202" and ids[-1] == "WO-2321" and len(set(ids)) == 120
+    assert store.create("other", "X", "low", "")["wo_id"] == "WO-2202"  # sequences are per tenant
+
+    page = store.list("acme", limit=50)
+    assert page["total"] == 121 and page["work_orders"][0]["wo_id"] == "WO-2321"
+    seen = [w["wo_id"] for w in page["work_orders"]]
+    while page["next_cursor"]:
+        page = store.list("acme", limit=50, cursor=page["next_cursor"])
+        seen += [w["wo_id"] for w in page["work_orders"]]
+    assert len(seen) == 121 and seen[-1] == "WO-2201"
+    filtered = store.list("acme", asset_id="TRK-1", status="open", priority="high")
+    assert filtered["total"] == 20 and all(w["asset_id"] == "TRK-1" and w["priority"] == "high" for w in filtered["work_orders"])
+    with pytest.raises(InvalidCursor):
+        store.list("acme", cursor="nope")
+
+    assert store.breaches("acme") == []
+    store.set_status("acme", "WO-2203", "closed")  # a high-priority order closed in time
+    now[0] += 25 * 3600
+    breached = store.breaches("acme")
+    assert len(breached) == 59 and all(w["priority"] == "high" and w["breached_at"] for w in breached)
+    assert store.breaches("acme") == []  # reported once
+    listed = store.open_breaches("acme")  # ...but every reader still sees them all
+    assert [w["wo_id"] for w in listed] == [w["wo_id"] for w in breached] and not any(w["new"] for w in listed)
+    assert store.get("acme", "WO-2203")["closed_at"] and store.get("acme", "WO-2203")["breached_at"] is None
+
+    store.close()
+    reopened = WorkOrderStore(tmp_path / "wo.sqlite3", seed=lambda tenant: seed, clock=lambda: now[0])
+    assert reopened.create("acme", "TRK-1", "low", "after restart")["wo_id"] == "WO-2322"
+
+
+def test_workorder_store_shared_by_two_processes(tmp_path):
+    from app.services.workorder_store import WorkOrderStore
+
+    now = [1_760_000_000.0]
+    seed = [{"wo_id": "WO-2201", "asset_id": "TRK-1", "priority": "low", "status": "closed", "created_at": "2025-01-01T00:00:00Z"}]
+    # two stores on one file stand in for two worker processes
+    b = WorkOrderStore(tmp_path / "wo.sqlite3", seed=lambda tenant: seed, clock=lambda: now[0])
+
+    def racing_seed(tenant):
+        b.get(tenant, "WO-2201")  # b seeds the tenant while a is between its check and its transaction
+        return seed
+
+    a = WorkOrderStore(tmp_path / "wo.sqlite3", seed=racing_seed, clock=lambda: now[0])
+    assert a.get("acme", "WO-2201")["status"] == "closed"
+    assert b.create("acme", "TRK-1", "high", "from b")["wo_id"] == "WO-2202"
+    assert a.create("acme", "TRK-2", "high", "from a")["wo_id"] == "WO-2203"
+    b.set_status("acme", "WO-2201", "open")  # reopened in b: new deadline a must see
+
+    now[0] += 25 * 3600
+    assert [w["wo_id"] for w in a.breaches("acme")] == ["WO-2202", "WO-2203"]
+    assert b.breaches("acme") == []  # already claimed by a
+    now[0] += 1000 * 3600
+    listed = b.open_breaches("acme")
+    assert [(w["wo_id"], w["new"]) for w in listed] == [("WO-2202", False), ("WO-2203", False), ("WO-2201", True)]
+    assert [(w["wo_id"], w["new"]) for w in a.open_breaches("acme")] == [(w["wo_id"], False) for w in listed]  # a retry or another dashboard
+    assert a.breaches("acme") == []
+    a.close()
+    b.close()
+
+
+def test_dataset_keeps_own_work_order_writes_and_rebuilds_for_another_worker(tmp_path, monkeypatch):
+    from app.services import assets_engine
+    from app.services.workorder_store import WorkOrderStore
+
+    seed = lambda tenant: []
+    now = [time.time()]
+    mine = WorkOrderStore(tmp_path / "wo.sqlite3", seed=seed, clock=lambda: now[0])
+    other = WorkOrderStore(tmp_path / "wo.sqlite3", seed=seed)
+    monkeypatch.setattr(assets_engine, "WORK_ORDERS", mine)
+    ds = assets_engine.load_dataset("wo-shared")
+    assert ds.work_orders_for("TRK-101", "open") == []
+
+    wo = assets_engine.create_work_order("wo-shared", "TRK-101", "high", "brakes")
+    assets_engine.update_work_order("wo-shared", wo["wo_id"], "closed")
+    assert assets_engine.load_dataset("wo-shared") is ds  # applied in place, no rebuild
+    assert [w["wo_id"] for w in ds.work_orders_for("TRK-101", "closed")] == [wo["wo_id"]]
+
+    assets_engine.create_work_order("wo-shared", "TRK-101", "high", "mirrors")
+    etag_version = mine.version("wo-shared")
+    now[0] += 48 * 3600
+    assert len(mine.breaches("wo-shared")) == 1
+    assert assets_engine.load_dataset("wo-shared") is ds  # breach stamps don't touch the dataset...
+    assert mine.version("wo-shared") != etag_version  # ...but do change what listings (and ETags) show
+
+    for summary in ("tyres", "lights"):
+        other.create("wo-shared", "TRK-101", "high", summary)
+    rebuilt = assets_engine.load_dataset("wo-shared")
+    assert rebuilt is not ds and len(rebuilt.work_orders_for("TRK-101", "open")) == 3
+    mine.close()
+    other.close()
+
+
+def test_workorder_endpoints_list_update_and_bad_cursor():
+    created = client.post("/api/ai/assets/workorders/create", json={"company_id": "demo", "asset_id": "TRK-101", "priority": "high", "summary": "tyres"}).json()
+    listed = client.post("/api/ai/assets/workorders/list", json={"company_id": "demo", "asset_id": "TRK-101", "status": "open", "limit": 1}).json()
+    assert listed["work_orders"][0]["wo_id"] == created["wo_id"] and listed["total"] >= 1
+
+    r = client.post("/api/ai/assets/workorders/update", json={"company_id": "demo", "wo_id": created["wo_id"], "status": "closed"})
+    assert r.status_code == 200 and r.json()["status"] == "closed"
+    from app.services import assets_engine
+    closed = assets_engine.load_dataset("demo").work_orders_for("TRK-101", "closed")
+    assert created["wo_id"] in {w["wo_id"] for w in closed}
+
+    assert client.post("/api/ai/assets/workorders/update", json={"company_id": "demo", "wo_id": "WO-0", "status": "closed"}).status_code == 404
+    assert client.post("/api/ai/assets/workorders/update", json={"company_id": "demo", "wo_id": created["wo_id"], "status": "done-ish"}).status_code == 422
+    assert client.post("/api/ai/assets/workorders/list", json={"company_id": "demo", "cursor": "x"}).status_code == 400
+    assert client.post("/api/ai/assets/workorders/breaches", json={"company_id": "demo"}).status_code == 200
+
+
+def test_valuation_curves_fleet_series_and_period_roll_forward():
+    from app.services import valuation
+
+    book, dep = valuation.straight_line(1200, 0, 12)
+    assert list(book[:3]) == [1200, 1100, 1000] and book[-1] == 0 and sum(dep) == 1200
+    db, _ = valuation.declining_balance(1000, 100, 10, factor=2.0)
+    assert db[1] == 800 and db[-1] == 100 and all(a >= b for a, b in zip(db, db[1:]))
+    used = valuation.projected_usage(age_now=4, used_now=40_000, rate_per_month=10_000, total_units=100_000)
+    assert used[:5] == [0, 10_000, 20_000, 30_000, 40_000] and used[-1] >= 100_000
+    uop, _ = valuation.units_of_production(10_000, 1_000, 100_000, used)
+    assert uop[4] == 10_000 - 9_000 * 0.4 and uop[-1] == 1_000
+
+    jan = valuation.month_index("2025-01")
+    entries = [
+        ("A", jan, valuation.straight_line(1200, 0, 12)),
+        ("B", jan + 6, valuation.straight_line(600, 0, 6)),  # placed in service mid-window
+    ]
+    out = valuation.fleet_series(entries, jan - 1, jan + 14, groups={"A": "vehicle", "B": "tool"})
+    assert out["months"][0] == "2024-12-31" and out["months"][2] == "2025-02-28"
+    assert out["book_value"][0] == 0 and out["book_value"][1] == 1200 and out["book_value"][7] == 600 + 600
+    assert out["book_value"][-1] == 0 and out["groups"]["tool"][7] == 600
+    p = valuation.period_summary(entries, jan + 1, jan + 12)
+    assert p["totals"] == {"opening_book": 1200, "additions": 600, "depreciation": 1800, "closing_book": 0}
+    with pytest.raises(ValueError):
+        valuation.fleet_series(entries, jan, jan + valuation.MAX_MONTHS)
+
+
+def test_fleet_valuation_endpoint_and_per_asset_curve_cache(tmp_path, monkeypatch):
+    from app.services import assets_engine
+    from app.services.asset_store import AssetStore
+    from app.services.valuation import month_index
+
+    # the demo fleet has no in-service dates: nothing to chart, every asset listed as undated
+    r = client.post("/api/ai/assets/valuation/fleet", json={"company_id": "demo", "start": "2025-01", "end": "2025-06"})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["book_value"] == [0.0] * 6
+    assert body["undated"] == sorted(a["asset_id"] for a in assets_engine.load_dataset("demo").assets)
+
+    monkeypatch.setattr(assets_engine, "ASSET_STORE", AssetStore(tmp_path / "assets", fsync=False))
+    base = assets_engine.load_dataset("demo").by_id
+    assets_engine.ASSET_STORE.upsert_many("demo", [
+        {**base["TRK-101"], "in_service_date": "2024-01-15"},
+        {**base["CRANE-01"], "in_service_date": "2025-03"},
+    ])
+    r = client.post("/api/ai/assets/valuation/fleet", json={"company_id": "demo", "start": "2025-01", "end": "2025-06", "group_by": "category", "include_assets": True})
+    body = r.json()
+    assert "TRK-101" not in body["undated"] and "CRANE-01" not in body["undated"]
+    assert body["book_value"][0] == pytest.approx(45000 - 40000 / 84 * 12, abs=0.05)  # TRK-101 only, 12 months in
+    assert body["book_value"][2] > body["book_value"][1] + 100000  # CRANE-01 enters service in March
+    assert body["book_value"][-1] == pytest.approx(sum(g[-1] for g in body["groups"].values()), abs=0.05)
+    assert body["period"]["totals"]["closing_book"] == pytest.approx(body["book_value"][-1], abs=0.05)
+    assert {a["asset_id"] for a in body["period"]["assets"]} == {"TRK-101", "CRANE-01"}
+    ds = assets_engine.load_dataset("demo")
+
+    curve, crane = ds.book_curve("TRK-101"), ds.book_curve("CRANE-01")
+    assert ds.book_curve("TRK-101") is curve
+    # an edit through the import path replaces only that asset's curve; the dataset itself is kept
+    assert assets_engine.import_rows("demo", [{"asset_id": "TRK-101", "in_service_date": "2024-06-15", "name": "Tow Truck"}])["updated"] == 1
+    assert assets_engine.load_dataset("demo") is ds
+    assert ds.book_curve("TRK-101") is not curve and ds.book_curve("TRK-101")[0] == month_index("2024-06")
+    assert ds.book_curve("CRANE-01") is crane
+    assert [a["asset_id"] for a in assets_engine.search_registry("demo", "tow", None)["results"]] == ["TRK-101"]
+
+    assert client.post("/api/ai/assets/valuation/fleet", json={"company_id": "demo", "start": "soon"}).status_code == 422
+    assert client.post("/api/ai/assets/valuation/fleet", json={"company_id": "demo", "group_by": "color"}).status_code == 422
+
+
+def test_asset_store_recovers_from_torn_journal_tail(tmp_path):
+    from app.services.asset_store import AssetStore
+
+    store = AssetStore(tmp_path, fsync=False)
+    store.upsert_many("acme", [{"asset_id": "A"}])
+    journal = tmp_path / "acme" / "journal.ndjson"
+    with journal.open("a") as f:
+        f.write('{"asset_id": "B", "na')  # crash mid-append
+    after_crash = AssetStore(tmp_path, fsync=False)
+    assert after_crash.upsert_many("acme", [{"asset_id": "C"}, {"asset_id": "D"}]) == (2, 0)
+    with journal.open("a") as f:
+        f.write("garbage\n")
+    after_crash.upsert_many("acme", [{"asset_id": "E"}])
+    assert sorted(r["asset_id"] for r in AssetStore(tmp_path, fsync=False).all("acme")) == ["A", "C", "D", "E"]
+
+
+def test_asset_store_shared_by_two_processes(tmp_path):
+    from app.services.asset_store import AssetStore
+
+    # two stores on one directory stand in for two worker processes
+    a = AssetStore(tmp_path, fsync=False)
+    b = AssetStore(tmp_path, fsync=False)
+    a.upsert_many("acme", [{"asset_id": "A"}])
+    assert [r["asset_id"] for r in b.all("acme")] == ["A"]
+    assert a.generation("acme") == b.generation("acme")
+
+    before = a.generation("acme")
+    for _ in range(2):
+        b.upsert_many("acme", [{"asset_id": f"B{i}"} for i in range(600)])  # b compacts on the second pass
+    assert not (tmp_path / "acme" / "journal.ndjson").read_bytes()
+    assert a.generation("acme") != before
+    assert a.upsert_many("acme", [{"asset_id": "A"}, {"asset_id": "C"}]) == (1, 1)  # must build on b's compaction
+    a.compact_all()
+    assert a.generation("acme") == b.generation("acme")
+    assert len(b.all("acme")) == 602
+
+    journal = tmp_path / "acme" / "journal.ndjson"
+    with journal.open("a") as f:
+        f.write('{"asset_id": "D", "na')  # another worker's append, not finished yet
+    fresh = AssetStore(tmp_path, fsync=False)
+    assert len(fresh.all("acme")) == 602
+    assert journal.read_bytes().endswith(b'"na')  # readers leave the partial line alone
+    with journal.open("a") as f:
+        f.write('me": "done"}\n')
+    assert fresh.all("acme")[-1] == {"asset_id": "D", "name": "done"}
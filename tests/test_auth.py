@@ -212,4 +212,233 @@ def test_different_content_types_bypass_meta_injection():
     r = client.get("/api/opportunities/export.csv?company_id=test_company", headers=headers)
     assert r.status_code == 200
     assert "text/csv" in r.headers.get("content-type", "")
-    # Should not have JSON _meta fields since it's CSV
\ No newline at end of file
+    # Should not have JSON _meta fields since it's CSV
+
+def test_tenant_headers_and_meta_on_plain_json_error():
+    """Errors rendered outside the handler still get _meta spliced in, plus tenant headers."""
+    r = client.post("/api/intent", json={"intent": "no_such_intent", "company_id": "demo"})
+    assert r.status_code == 400
+    body = r.json()
+    assert body["detail"].startswith("Unknown intent")
+    assert body["_meta"] == {"tenant": "demo", "demo": True}
+    assert r.headers["x-tenant"] == "demo"
+    assert r.headers["x-demo"] == "true"
+    assert int(r.headers["content-length"]) == len(r.content)
+
+
+def test_streaming_json_passes_through_untouched():
+    """Streaming responses are not buffered or rewritten by the middleware."""
+    from fastapi import FastAPI
+    from fastapi.responses import StreamingResponse
+    from app.middleware.auth import AuthMiddleware
+
+    mini = FastAPI()
+    mini.add_middleware(AuthMiddleware)
+
+    @mini.post("/api/stream")
+    async def stream(payload: dict):
+        async def gen():
+            yield b'{"rows": ['
+            yield b'1, 2'
+            yield b']}'
+        return StreamingResponse(gen(), media_type="application/json")
+
+    r = TestClient(mini).post("/api/stream", json={"company_id": "demo"})
+    assert r.status_code == 200
+    assert r.json() == {"rows": [1, 2]}
+    assert r.headers["x-tenant"] == "demo"
+
+
+def _rsa_jwks(kid):
+    """Local JWKS stand-in: a fresh RSA key pair and its public JWK set."""
+    import json as _json
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from jwt.algorithms import RSAAlgorithm
+
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = _json.loads(RSAAlgorithm.to_jwk(private_key.public_key()))
+    jwk.update({"kid": kid, "use": "sig", "alg": "RS256"})
+    return private_key, {"keys": [jwk]}
+
+
+class FakeJWKSEndpoint:
+    def __init__(self, jwks, delay=0.0):
+        self.jwks = jwks
+        self.delay = delay
+        self.calls = 0
+        self.fail = False
+
+    async def __call__(self, url):
+        import asyncio
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("jwks endpoint down")
+        return self.jwks
+
+
+def test_jwks_manager_single_flights_unknown_kid_and_keeps_last_good_keys():
+    import asyncio
+    from app.middleware.jwks import JWKSKeyManager
+
+    _, jwks = _rsa_jwks("k1")
+    endpoint = FakeJWKSEndpoint(jwks, delay=0.05)
+    mgr = JWKSKeyManager("https://issuer.example/jwks", min_refetch_interval_s=0, fetch=endpoint)
+
+    async def scenario():
+        await mgr.start()
+        assert endpoint.calls == 1  # preloaded
+        # a burst of lookups for an unknown kid shares one fetch
+        results = await asyncio.gather(*[mgr.get_key("rotated") for _ in range(20)])
+        assert results == [None] * 20
+        assert endpoint.calls == 2
+        # endpoint outage: the last good key set keeps serving
+        endpoint.fail = True
+        assert await mgr.refresh() is False
+        assert await mgr.get_key("k1") is not None
+        await mgr.stop()
+
+    asyncio.run(scenario())
+
+
+def test_jwks_refresh_loop_waits_retry_s_after_a_failed_fetch(monkeypatch):
+    import asyncio
+    from app.middleware.jwks import JWKSKeyManager
+
+    _, jwks = _rsa_jwks("k1")
+    endpoint = FakeJWKSEndpoint(jwks)
+    now = {"t": 1000.0}
+    mgr = JWKSKeyManager("https://issuer.example/jwks", ttl_s=300, retry_s=15, fetch=endpoint, clock=lambda: now["t"])
+    delays = []
+
+    class Done(Exception):
+        pass
+
+    async def fake_sleep(delay):
+        if not delay:  # the fake endpoint's own zero-length sleep
+            return
+        delays.append(delay)
+        if len(delays) == 4:
+            raise Done
+        now["t"] += delay
+
+    async def scenario():
+        assert await mgr.refresh() is True
+        endpoint.fail = True
+        now["t"] += 400  # key set is past its refresh time when the endpoint goes down
+        monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+        try:
+            await mgr._refresh_loop()
+        except Done:
+            pass
+
+    asyncio.run(scenario())
+    assert delays == [1.0, 15, 15, 15]  # stale: refresh now, then back off retry_s per failure
+    assert endpoint.calls == 4
+
+
+def test_rs256_token_verified_via_jwks_manager():
+    from fastapi import FastAPI
+    from app.middleware.auth import AuthMiddleware
+    from app.middleware.jwks import JWKSKeyManager
+
+    private_key, jwks = _rsa_jwks("k1")
+    endpoint = FakeJWKSEndpoint(jwks)
+    mini = FastAPI()
+    mini.add_middleware(AuthMiddleware, jwks_manager=JWKSKeyManager("https://issuer.example/jwks", fetch=endpoint))
+
+    @mini.post("/api/echo")
+    async def echo(payload: dict):
+        return {"ok": True}
+
+    token = jwt.encode({"company_id": "acme"}, private_key, algorithm="RS256", headers={"kid": "k1"})
+    with TestClient(mini) as c:
+        for _ in range(3):
+            r = c.post("/api/echo", json={"company_id": "acme"}, headers={"Authorization": f"Bearer {token}"})
+            assert r.status_code == 200
+            assert r.json()["_meta"]["tenant"] == "acme"
+    assert endpoint.calls == 1
+
+
+def test_verified_token_cache_skips_repeat_verification(monkeypatch):
+    """Repeated requests with the same token verify the signature once; rejections are cached too."""
+    from fastapi import FastAPI
+    from app.middleware.auth import AuthMiddleware
+
+    calls = {"n": 0}
+    real_decode = jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        calls["n"] += 1
+        return real_decode(*args, **kwargs)
+
+    monkeypatch.setattr(jwt, "decode", counting_decode)
+    clear_rate_limit_cache()
+
+    mini = FastAPI()
+    mini.add_middleware(AuthMiddleware)
+
+    @mini.post("/api/echo")
+    async def echo(payload: dict):
+        return {"ok": True}
+
+    c = TestClient(mini)
+    token = jwt.encode({"company_id": "acme", "exp": int(time.time()) + 600}, "dev-secret", algorithm="HS256")
+    for _ in range(5):
+        r = c.post("/api/echo", json={"company_id": "acme"}, headers={"Authorization": f"Bearer {token}"})
+        assert r.status_code == 200
+    assert calls["n"] == 1
+
+    for _ in range(3):
+        r = c.post("/api/echo", json={"company_id": "acme"}, headers={"Authorization": "Bearer bad.token.value"})
+        assert r.status_code == 401
+    assert calls["n"] == 2
+
+
+def test_token_cache_expires_at_exp():
+    from app.middleware.token_cache import VerifiedTokenCache
+
+    now = {"t": 1000.0}
+    cache = VerifiedTokenCache(max_entries=2, clock=lambda: now["t"])
+    cache.store("a", {"company_id": "x", "exp": 1010})
+    assert cache.lookup("a") == (True, {"company_id": "x", "exp": 1010})
+    now["t"] = 1010.0
+    assert cache.lookup("a") == (False, None)
+    # bounded: oldest entry is evicted
+    for tok in ("b", "c", "d"):
+        cache.store(tok, {"company_id": tok})
+    assert len(cache) == 2
+    assert cache.lookup("b") == (False, None)
+
+
+def test_tenant_bucket_charged_only_for_verified_tokens(monkeypatch):
+    """Anonymous callers naming a tenant must not drain that tenant's bucket."""
+    from app.middleware import auth
+    from app.middleware.rate_limit import MemoryBucketStore, RateLimiter
+
+    monkeypatch.setattr(auth, "IP_RATE_LIMITER", RateLimiter(1000, 60, MemoryBucketStore(), prefix="ip:"))
+    monkeypatch.setattr(auth, "TENANT_RATE_LIMITER", RateLimiter(3, 60, MemoryBucketStore(), prefix="tenant:"))
+    req = {"company_id": "test_company", "range": "30d", "include_peers": False, "include_breakdowns": True}
+    for i in range(10):
+        r = client.post("/api/ai/health/full", json=req, headers={"Authorization": f"Bearer forged-{i}"})
+        assert r.status_code == 401
+    token = jwt.encode({"company_id": "test_company"}, "dev-secret", algorithm="HS256")
+    codes = [client.post("/api/ai/health/full", json=req, headers={"Authorization": f"Bearer {token}"}).status_code for _ in range(4)]
+    assert codes == [200, 200, 200, 429]
+
+
+def test_body_company_id_matches_what_the_handler_decodes():
+    """The middleware's company_id scan must agree with json.loads, or a body could pose as demo."""
+    from app.middleware.auth import _body_company_id
+
+    assert _body_company_id(b'{"company_id": "acme", "rows": [1, 2]}') == "acme"
+    assert _body_company_id(b' { "a": {"b": [1, "}"]}, "company_id" : "acme" }') == "acme"
+    assert _body_company_id(b'{"company_id": "demo", "company_id": "acme"}') == "acme"
+    assert _body_company_id(b'{"company_id": "demo", "company\\u005fid": "acme"}') == "acme"
+    assert _body_company_id(b'{"note": "\\"company_id\\": \\"demo\\"", "company_id": "acme"}') == "acme"
+    assert _body_company_id(b'{"x": {"company_id": "acme"}}') is None
+    assert _body_company_id(b"[1]") is None and _body_company_id(b"\xff") is None
+
+    req = b'{"company_id": "demo", "range": "30d", "company_id": "test_company"}'
+    r = client.post("/api/ai/health/full", content=req, headers={"content-type": "application/json"})
+    assert r.status_code == 401
@@ -0,0 +1,180 @@
+import asyncio
+import time
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app import openai_client
+from app import intent as intent_module
+from app.circuit_breaker import CircuitBreaker, CircuitOpenError, ASSISTANTS_BREAKER, hedged_call
+
+client = TestClient(app)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeAssistant:
+    """Local stand-in for the assistants backend that injects slowness and failures."""
+
+    def __init__(self, delays, fail=False):
+        self.delays = list(delays)
+        self.fail = fail
+        self.calls = 0
+
+    async def __call__(self):
+        delay = self.delays[min(self.calls, len(self.delays) - 1)]
+        self.calls += 1
+        await asyncio.sleep(delay)
+        if self.fail:
+            raise RuntimeError("upstream 500")
+        return {"answer": "ok", "attempt": self.calls}
+
+
+def test_breaker_opens_on_error_rate_and_recovers_via_half_open():
+    clock = FakeClock()
+    cb = CircuitBreaker("t", window_s=60, min_calls=4, error_rate_threshold=0.5, open_s=10, clock=clock)
+    for ok in (True, False, False, True):
+        assert cb.allow()
+        cb.record(ok, 0.1)
+    assert cb.state == "open"
+    assert not cb.allow()
+
+    clock.now += 11
+    assert cb.state == "half_open"
+    assert cb.allow()
+    assert not cb.allow()  # only one trial call
+    cb.record(True, 0.1)
+    assert cb.state == "closed"
+
+
+def test_breaker_opens_on_slow_calls():
+    cb = CircuitBreaker("t", min_calls=3, slow_call_s=1.0, slow_rate_threshold=0.6, clock=FakeClock())
+    for _ in range(3):
+        cb.allow()
+        cb.record(True, 2.5)
+    assert cb.state == "open"
+
+
+def test_window_expires_old_failures():
+    clock = FakeClock()
+    cb = CircuitBreaker("t", window_s=30, min_calls=3, error_rate_threshold=0.5, clock=clock)
+    cb.record(False, 0.1)
+    cb.record(False, 0.1)
+    clock.now += 31
+    cb.record(True, 0.1)
+    assert cb.state == "closed"
+
+
+def test_acall_timeout_counts_as_failure():
+    cb = CircuitBreaker("t", min_calls=1, error_rate_threshold=1.0)
+    slow = FakeAssistant([0.5])
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(cb.acall(slow, timeout_s=0.05))
+    assert cb.state == "open"
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(cb.acall(slow))
+
+
+def test_hedged_call_fires_second_attempt_when_first_is_slow():
+    cb = CircuitBreaker("t", min_calls=3)
+    for _ in range(3):
+        cb.record(True, 0.02)
+    # first attempt hangs, the hedge returns quickly
+    fake = FakeAssistant([1.0, 0.01])
+    start = time.monotonic()
+    out = asyncio.run(hedged_call(cb, fake, hedge_percentile=95))
+    assert out["attempt"] == 2
+    assert time.monotonic() - start < 0.5
+
+
+def test_hedged_call_cancelled_before_hedge_cancels_first_attempt():
+    cb = CircuitBreaker("t", min_calls=3)
+    for _ in range(3):
+        cb.record(True, 0.5)
+    fake = FakeAssistant([0.2], fail=True)
+
+    async def run():
+        # the caller gives up while hedged_call is still in its initial wait
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(hedged_call(cb, fake, hedge_percentile=95), timeout=0.05)
+        await asyncio.sleep(0.3)
+
+    asyncio.run(run())
+    assert fake.calls == 1
+    assert len(cb._calls) == 3  # the abandoned attempt never reported its failure
+
+
+def test_intent_falls_back_to_seed_while_circuit_open(monkeypatch):
+    monkeypatch.setattr(intent_module, "ASST_RESEARCH_SCOUT_ID", "asst_test")
+    monkeypatch.setattr(openai_client, "ASST_RESEARCH_SCOUT_ID", "asst_test")
+    fake = FakeAssistant([0.0], fail=True)
+    monkeypatch.setattr(openai_client, "_run_assistant_once", lambda assistant_id, payload: fake())
+    ASSISTANTS_BREAKER.reset()
+    try:
+        body = {"intent": "research_digest", "company_id": "demo", "input": {"query": "hvac"}}
+        for _ in range(ASSISTANTS_BREAKER.min_calls):
+            r = client.post("/api/intent", json=body)
+            assert r.status_code == 500
+        assert ASSISTANTS_BREAKER.state == "open"
+
+        calls_before = fake.calls
+        r = client.post("/api/intent", json=body)
+        assert r.status_code == 200
+        assert r.json()["warning"] == "assistant_circuit_open"
+        assert fake.calls == calls_before  # upstream not contacted
+    finally:
+        ASSISTANTS_BREAKER.reset()
+
+
+def test_agent_endpoints_serve_the_seed_while_the_circuit_is_open(monkeypatch):
+    import jwt
+    from app.middleware.auth import _RATE_STORE
+    from app.routers import ai_agents
+
+    calls = []
+    monkeypatch.setattr(ai_agents, "OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(ai_agents, "RESEARCH_ASSISTANT_ID", "asst_test")
+    monkeypatch.setattr(ai_agents, "call_openai_assistant", lambda assistant_id, messages: calls.append(assistant_id))
+    token = jwt.encode({"company_id": "acme"}, "dev-secret", algorithm="HS256")
+    headers = {"Authorization": f"Bearer {token}"}
+    _RATE_STORE.clear()
+    ASSISTANTS_BREAKER.reset()
+    try:
+        for _ in range(ASSISTANTS_BREAKER.min_calls):
+            assert ASSISTANTS_BREAKER.allow()
+            ASSISTANTS_BREAKER.record(False, 0.1)  # openai_client's calls tripped the shared circuit
+        r = client.post("/api/ai/research", json={"company_id": "acme", "query": "hvac"}, headers=headers)
+        assert r.status_code == 200
+        assert r.json()["_meta"]["fallback"] == "circuit_open"
+        assert calls == []  # upstream not contacted
+    finally:
+        ASSISTANTS_BREAKER.reset()
+        _RATE_STORE.clear()
+
+
+def test_unimplemented_agent_call_does_not_trip_the_shared_breaker(monkeypatch):
+    import jwt
+    from app.middleware.auth import _RATE_STORE
+    from app.routers import ai_agents
+
+    monkeypatch.setattr(ai_agents, "OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(ai_agents, "RESEARCH_ASSISTANT_ID", "asst_test")
+    token = jwt.encode({"company_id": "acme"}, "dev-secret", algorithm="HS256")
+    headers = {"Authorization": f"Bearer {token}"}
+    _RATE_STORE.clear()
+    ASSISTANTS_BREAKER.reset()
+    try:
+        for _ in range(ASSISTANTS_BREAKER.min_calls * 2):
+            r = client.post("/api/ai/research", json={"company_id": "acme", "query": "hvac"}, headers=headers)
+            assert r.status_code == 500 and "not yet implemented" in r.json()["detail"]
+        assert ASSISTANTS_BREAKER.state == "closed"
+        assert ASSISTANTS_BREAKER.snapshot()["calls"] == 0
+    finally:
+        ASSISTANTS_BREAKER.reset()
+        _RATE_STORE.clear()
@@ -0,0 +1,57 @@
+import gzip
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.middleware.compression import CODECS, CompressionMiddleware, negotiate
+
+client = TestClient(app)
+
+
+def raw_request(c, method, url, **kwargs):
+    """(response, raw bytes on the wire) - httpx decodes .content transparently."""
+    with c.stream(method, url, **kwargs) as r:
+        return r, b"".join(r.iter_raw())
+
+
+def test_negotiate_respects_q_values_and_server_preference():
+    assert negotiate("gzip, deflate") == "gzip"
+    assert negotiate("identity") is None
+    assert negotiate("gzip;q=0") is None
+    assert negotiate("") is None
+    assert negotiate("*") == next(iter(CODECS))
+    assert negotiate("br;q=1.0, gzip;q=0.5", {"gzip": CODECS["gzip"]}) == "gzip"
+
+
+def test_large_json_is_compressed_small_is_not():
+    r, raw = raw_request(
+        client, "POST", "/api/ai/health/full", json={"company_id": "demo", "range": "30d"}, headers={"accept-encoding": "gzip"}
+    )
+    assert r.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in r.headers["vary"]
+    assert r.headers["etag"].endswith('-gzip"')
+    body = gzip.decompress(raw)
+    assert int(r.headers["content-length"]) == len(raw) < len(body)
+
+    r = client.get("/health", headers={"accept-encoding": "gzip"})
+    assert "content-encoding" not in r.headers
+    assert r.json()["ok"] is True
+
+
+def test_streaming_body_is_compressed_incrementally():
+    mini = FastAPI()
+
+    @mini.get("/stream")
+    async def stream():
+        async def rows():
+            for i in range(200):
+                yield f'{{"row": {i}, "status": "ok"}}\n'.encode()
+        return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+    mini.add_middleware(CompressionMiddleware, minimum_size=1024)
+    r, raw = raw_request(TestClient(mini), "GET", "/stream", headers={"accept-encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip"
+    assert "content-length" not in r.headers
+    lines = gzip.decompress(raw).decode().splitlines()
+    assert len(lines) == 200 and lines[-1] == '{"row": 199, "status": "ok"}'
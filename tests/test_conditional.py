@@ -0,0 +1,111 @@
+import jwt
+import time
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.middleware.auth import _RATE_STORE
+from app.services import assets_engine
+from app.routers import assets as assets_router
+
+client = TestClient(app)
+
+TOKEN = jwt.encode({"company_id": "acme", "exp": int(time.time()) + 3600}, "dev-secret", algorithm="HS256")
+HEADERS = {"Authorization": f"Bearer {TOKEN}"}
+
+
+@pytest.fixture(autouse=True)
+def fresh_rate_limits():
+    # all TestClient requests share one client IP
+    _RATE_STORE.clear()
+
+
+BODY = {"company_id": "acme", "range": "30d"}
+
+
+def test_if_none_match_returns_304_without_running_engine(monkeypatch):
+    calls = {"n": 0}
+    real = assets_engine.full_overview
+
+    def counting(req):
+        calls["n"] += 1
+        return real(req)
+
+    monkeypatch.setattr(assets_router, "full_overview", counting)
+
+    r = client.post("/api/ai/assets/full", json=BODY, headers=HEADERS)
+    assert r.status_code == 200
+    etag = r.headers["etag"]
+    assert r.headers["cache-control"] == "private, no-cache"
+
+    r = client.post("/api/ai/assets/full", json=BODY, headers={**HEADERS, "If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.content == b""
+    assert r.headers["etag"] == etag
+    assert calls["n"] == 1
+
+    # different parameters -> different representation
+    r = client.post("/api/ai/assets/full", json={**BODY, "range": "90d"}, headers={**HEADERS, "If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["etag"] != etag
+
+
+def test_write_bumps_data_version():
+    r = client.post("/api/ai/assets/full", json=BODY, headers=HEADERS)
+    etag = r.headers["etag"]
+    assets_engine.create_work_order("acme", "TRK-101", "high", "brake check")
+    r = client.post("/api/ai/assets/full", json=BODY, headers={**HEADERS, "If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["etag"] != etag
+
+
+def test_precomputed_demo_seed_revalidates():
+    r = client.post("/api/settings/full", json={"company_id": "demo"})
+    etag = r.headers["etag"]
+    r = client.post("/api/settings/full", json={"company_id": "demo"}, headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.headers["cache-control"] == "public, max-age=60"
+
+
+def test_etag_follows_writes_made_by_other_workers(tmp_path, monkeypatch):
+    from app.conditional import make_etag
+    from app.services import profile_engine
+    from app.services.asset_store import AssetStore
+    from app.services.profile_store import SectionJournalStore
+    from app.services.telemetry_store import TelemetryStore
+    from app.services.workorder_store import WorkOrderStore
+
+    # this worker's stores, and a second set on the same files standing in for another worker
+    seed = lambda tenant: []
+    mine = {
+        "ASSET_STORE": AssetStore(tmp_path / "assets", fsync=False),
+        "WORK_ORDERS": WorkOrderStore(tmp_path / "wo.sqlite3", seed=seed),
+        "TELEMETRY": TelemetryStore(tmp_path / "telemetry"),
+    }
+    for name, store in mine.items():
+        monkeypatch.setattr(assets_engine, name, store)
+    monkeypatch.setattr(profile_engine, "TENANTS", SectionJournalStore(tmp_path / "profiles", profile_engine._default_profile, fsync=False))
+    other_assets = AssetStore(tmp_path / "assets", fsync=False)
+    other_wos = WorkOrderStore(tmp_path / "wo.sqlite3", seed=seed)
+    other_telemetry = TelemetryStore(tmp_path / "telemetry")
+    other_profiles = SectionJournalStore(tmp_path / "profiles", profile_engine._default_profile, fsync=False)
+
+    def tag(domain):
+        return make_etag("acme", [domain], "route", BODY)
+
+    seen = {tag("assets")}
+    assert tag("assets") in seen  # no per-process nonce: the same data gives the same tag
+    other_assets.upsert_many("acme", [{"asset_id": "X-1"}])
+    seen.add(tag("assets"))
+    other_wos.create("acme", "X-1", "high", "belt")
+    seen.add(tag("assets"))
+    other_telemetry.ingest("acme", "X-1", [{"ts": 1_760_000_000, "odometer": 1}])
+    seen.add(tag("assets"))
+    assert len(seen) == 4
+
+    before = tag("profile")
+    other_profiles.save("acme", "general", {"name": "Acme"})
+    assert tag("profile") != before
+
+    for store in (mine["WORK_ORDERS"], mine["TELEMETRY"], other_wos, other_telemetry):
+        store.close()
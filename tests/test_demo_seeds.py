@@ -0,0 +1,49 @@
+import copy
+import json
+import httpx
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.demo_seed import DEMO_SCENARIOS_FULL, DEMO_SETTINGS_FULL
+from app.routers.ai_tabs import DEMO_SEEDS
+
+client = TestClient(app)
+
+
+def test_demo_tab_served_from_precomputed_bytes():
+    before = copy.deepcopy(DEMO_SCENARIOS_FULL)
+    r = client.post("/api/ai/scenarios/full", json={"company_id": "demo"}, headers={"accept-encoding": "gzip"})
+    assert r.status_code == 200
+    assert r.headers["content-encoding"] == "gzip"
+    assert r.headers["etag"] == DEMO_SEEDS["DEMO_SCENARIOS_FULL"].precomputed.encoded["gzip"][1]
+    body = r.json()
+    assert body["company_id"] == "demo"
+    assert body["_meta"]["demo"] is True and body["_meta"]["tenant"] == "demo"
+    assert r.headers["x-tenant"] == "demo"
+    # serving never mutates the shared seed
+    assert DEMO_SCENARIOS_FULL == before
+
+
+def test_identity_encoding_and_stable_etag():
+    raw = httpx.Client(transport=client._transport, base_url="http://testserver")
+    r1 = raw.post("/api/settings/full", json={"company_id": "demo"}, headers={"accept-encoding": "identity"})
+    r2 = raw.post("/api/settings/full", json={"company_id": "demo"}, headers={"accept-encoding": "identity"})
+    assert "content-encoding" not in r1.headers
+    assert r1.headers["etag"] == r2.headers["etag"]
+    assert r1.content == r2.content
+    body = json.loads(r1.content)
+    assert body["user"] == DEMO_SETTINGS_FULL["user"]
+
+
+def test_agent_seed_splices_per_request_fields():
+    r = client.post("/api/ai/orchestrate", json={"company_id": "demo", "query": "Can we afford a new truck?"})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["query"] == "Can we afford a new truck?"
+    assert body["company_id"] == "demo"
+    assert body["intent"] == "general_query"
+    assert body["_meta"] == {"demo": True, "tenant": "demo"}
+
+    r = client.post("/api/ai/finance", json={"company_id": "demo", "periods": 6})
+    assert r.json()["periods"] == 6
+    assert client.post("/api/ai/finance", json={"company_id": "demo"}).json()["periods"] == 12
@@ -1,3 +1,4 @@
+import json
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
@@ -151,3 +152,241 @@ def test_autosave_metadata_in_responses():
     meta2 = r2.json()["_meta"]
     notes2 = meta2["provenance"]["notes"]
     assert any("autosave_version:" in note for note in notes2)
+
+
+def test_profile_store_batches_writes_and_reloads_external_edits(tmp_path):
+    from app.services.profile_store import ProfileStore
+
+    path = tmp_path / "profile.json"
+    store = ProfileStore(path, lambda: {"general": {}}, flush_delay_s=60)
+    store.read()
+    base = store.flush_count
+    for i in range(20):
+        with store.edit() as data:
+            data["general"] = {"name": f"Acme {i}"}
+    assert store.dirty and store.flush_count == base
+    assert store.read()["general"]["name"] == "Acme 19"
+
+    store.flush()
+    assert store.flush_count == base + 1 and not store.dirty
+    assert json.loads(path.read_text())["general"]["name"] == "Acme 19"
+
+    # an edit made on disk while nothing is pending is picked up on the next read
+    path.write_text(json.dumps({"general": {"name": "Edited"}, "extra": True}))
+    assert store.read()["general"]["name"] == "Edited"
+
+
+def test_tenant_profiles_journal_sections_and_compact(tmp_path):
+    from app.services.profile_store import SectionJournalStore
+
+    store = SectionJournalStore(tmp_path, lambda: {"general": {}, "assets": []}, compact_after=3, fsync=False)
+    store.save("acme", "general", {"name": "Acme"})
+    store.update("acme", "assets", lambda cur: cur + [{"id": "a1"}])
+    journal = tmp_path / "acme" / "journal.ndjson"
+    assert len(journal.read_text().splitlines()) == 2
+    assert store.read("other", ["general"]) == {"general": {}}
+
+    # a fresh process replays the journal
+    reopened = SectionJournalStore(tmp_path, lambda: {"general": {}, "assets": []}, compact_after=3, fsync=False)
+    assert reopened.read("acme", ["general", "assets"]) == {"general": {"name": "Acme"}, "assets": [{"id": "a1"}]}
+
+    reopened.save("acme", "general", {"name": "Acme Co"})  # third record triggers compaction
+    assert reopened.compactions == 1 and journal.read_text() == ""
+    assert json.loads((tmp_path / "acme" / "general.json").read_text()) == {"name": "Acme Co"}
+    assert SectionJournalStore(tmp_path, dict).get("acme", "assets") == [{"id": "a1"}]
+
+
+def test_tenant_journal_shared_by_two_processes_and_torn_tail(tmp_path):
+    from app.services.profile_store import SectionJournalStore
+
+    defaults = lambda: {"general": {}, "assets": []}
+    # two stores on one directory stand in for two worker processes
+    a = SectionJournalStore(tmp_path, defaults, compact_after=3, fsync=False)
+    b = SectionJournalStore(tmp_path, defaults, compact_after=3, fsync=False)
+    a.save("acme", "general", {"name": "A"})
+    assert b.get("acme", "general") == {"name": "A"}
+    b.update("acme", "assets", lambda cur: cur + [{"id": "b1"}])
+    before = a.generation("acme")
+    assert a.get("acme", "assets") == [{"id": "b1"}]
+    b.save("acme", "general", {"name": "B"})  # third record: b compacts
+    assert b.compactions == 1
+    a.update("acme", "assets", lambda cur: cur + [{"id": "a2"}])  # must see b's write, not its stale copy
+    assert a.generation("acme") > before
+    assert b.read("acme", ["general", "assets"]) == {"general": {"name": "B"}, "assets": [{"id": "b1"}, {"id": "a2"}]}
+
+    journal = tmp_path / "acme" / "journal.ndjson"
+    with journal.open("a") as f:
+        f.write('{"section":"general","val')  # crash mid-write
+    a.save("acme", "general", {"name": "after crash"})
+    fresh = SectionJournalStore(tmp_path, defaults, fsync=False)
+    assert fresh.read("acme", ["general", "assets"]) == {"general": {"name": "after crash"}, "assets": [{"id": "b1"}, {"id": "a2"}]}
+    with journal.open("a") as f:
+        f.write("not json\n")
+    a.save("acme", "general", {"name": "later"})
+    assert SectionJournalStore(tmp_path, defaults, fsync=False).get("acme", "general") == {"name": "later"}
+
+
+def test_profile_full_is_scoped_per_tenant(monkeypatch, tmp_path):
+    from app.services.profile_store import SectionJournalStore
+
+    monkeypatch.setattr(profile_engine, "TENANTS", SectionJournalStore(tmp_path, profile_engine._default_profile, fsync=False))
+    profile_engine.save_general("acme", {"name": "Acme", "ein": "12-3456789", "locations": []})
+    profile_engine.upsert_asset("acme", {"id": "a1", "name": "Truck"})
+
+    full = profile_engine.get_full("acme", include_assets=True)
+    assert full["general"]["name"] == "Acme" and full["general"]["ein"] == "**-***6789"
+    assert [a["id"] for a in full["assets"]] == ["a1"]
+    assert profile_engine.get_full("acme")["assets"] == []
+    assert profile_engine.get_full("globex")["general"] == {}
+
+
+def test_naics_index_prefix_fuzzy_and_ranking():
+    from app.services.naics_index import NAICSIndex
+
+    idx = NAICSIndex([
+        ("23", "Construction"),
+        ("238", "Specialty Trade Contractors"),
+        ("238220", "Plumbing, Heating, and Air-Conditioning Contractors"),
+        ("31-33", "Manufacturing"),
+        ("311811", "Retail Bakeries"),
+        ("722511", "Full-Service Restaurants"),
+        ("722513", "Limited-Service Restaurants"),
+    ])
+    assert [r["code"] for r in idx.search("23")] == ["23", "238", "238220"]
+    assert idx.search("32")[0]["code"] == "31-33"
+    assert idx.search("plumb")[0]["code"] == "238220"       # typeahead prefix
+    assert idx.search("plumbng")[0]["code"] == "238220"     # misspelling
+    assert idx.search("bakery")[0]["code"] == "311811"      # plural folding
+    assert [r["code"] for r in idx.search("full serv")] == ["722511"]
+    assert idx.search("xyzzy") == []
+
+
+def test_naics_trade_aliases_and_finished_last_word():
+    from app.services import naics_index
+    from app.services.naics_index import NAICSIndex
+
+    idx = NAICSIndex(
+        [
+            ("238220", "Plumbing, Heating, and Air-Conditioning Contractors"),
+            ("237210", "Land Subdivision"),
+            ("561730", "Landscaping Services"),
+        ],
+        [("238220", "HVAC"), ("999999", "not in the table")],
+    )
+    assert [r["code"] for r in idx.search("hvac")] == ["238220"]
+    assert idx.search("table") == []
+    assert {r["code"] for r in idx.search("land")} == {"237210", "561730"}
+    assert [r["code"] for r in idx.search("land ")] == ["237210"]  # finished word: no prefix matches
+
+    assert naics_index.search("hvac")[0]["code"] == "238220"
+    assert naics_index.search("roofer")[0]["code"] == "238160"
+    assert len(naics_index.search("land ")) < len(naics_index.search("land"))
+
+
+def test_shipped_naics_table_is_the_full_2022_list():
+    from app.services import naics_index
+
+    pairs = list(naics_index._read_pairs(naics_index.NAICS_PATH))
+    codes = {code for code, _ in pairs}
+    assert len(pairs) == len(codes) == 2125
+    assert sum(1 for c in codes if len(c) == 6) == 1012
+    assert {"111110", "455110", "513210", "928120"} <= codes  # first and last industries, 2022 renumberings
+    assert naics_index.search("513210")[0]["title"] == "Software Publishers"
+
+
+def test_completeness_is_incremental_and_returned_on_save(monkeypatch, tmp_path):
+    from app.services.profile_store import SectionJournalStore
+
+    monkeypatch.setattr(profile_engine, "TENANTS", SectionJournalStore(tmp_path, profile_engine._default_profile, fsync=False))
+    assert profile_engine.completeness("acme")["percent"] == 0.0
+
+    reads = []
+    real_read = profile_engine._read
+    monkeypatch.setattr(profile_engine, "_read", lambda cid, sections: reads.append(sections) or real_read(cid, sections))
+    profile_engine.save_general("acme", {"name": "Acme", "ein": "12-3456789", "locations": ["HQ"]})
+    profile_engine.upsert_asset("acme", {"id": "a1"})
+    comp = profile_engine.completeness("acme")
+    assert reads == []  # folded in from the saved sections, no re-read of the profile
+    assert comp["percent"] == 0.25
+    assert {m["section"] for m in comp["missing"]} >= {"Industry", "Uploads"}
+    assert "General" not in {m["section"] for m in comp["missing"]}
+    assert profile_engine.recalc_completeness("acme") == comp
+
+    # a write the cache didn't see forces a rebuild
+    profile_engine.TENANTS.save("acme", "industry", {"naics": {"code": "238220"}})
+    assert profile_engine.completeness("acme")["percent"] == 0.4
+
+
+def test_save_response_includes_completeness():
+    payload = {"company_id": "demo", "operations": {"employees": 12}}
+    j = client.post("/api/ai/profile/operations/save", json=payload).json()
+    assert j["ok"] is True
+    assert j["completeness"]["percent"] == profile_engine.completeness("demo")["percent"]
+
+
+def test_upload_content_streams_to_disk_and_extracts_in_background(monkeypatch, tmp_path):
+    from app.services import uploads
+    from app.services.profile_store import ProfileStore, SectionJournalStore
+
+    # keep the upload record out of the tracked demo profile
+    monkeypatch.setattr(profile_engine, "STORE", ProfileStore(tmp_path / "profile" / "profile.json", profile_engine._default_profile, flush_delay_s=0))
+    monkeypatch.setattr(profile_engine, "TENANTS", SectionJournalStore(tmp_path / "profiles", profile_engine._default_profile, fsync=False))
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", tmp_path)
+    events = []
+    monkeypatch.setattr(uploads, "publish", lambda cid, event: events.append(event["status"]))
+    r = client.post("/api/ai/profile/uploads/upload", json={"company_id": "demo", "file_name": "license.txt", "category": "License", "upload_id": "doc-stream"})
+    assert r.status_code == 200
+
+    body = b"Issued by the Secretary of State\nEffective: 2024-01-15\nExpires: 01/31/2026\n" + b"x" * 200_000
+    r = client.put("/api/ai/profile/uploads/doc-stream/content?company_id=demo", content=body)
+    assert r.status_code == 200
+    assert r.json()["upload"]["status"] == "queued"
+    assert (tmp_path / "demo" / "doc-stream").read_bytes() == body
+
+    profile_engine.EXTRACTION_POOL.join()
+    item = next(u for u in profile_engine.list_uploads("demo") if u["id"] == "doc-stream")
+    assert item["status"] == "verified" and item["size"] == len(body)
+    assert (item["issuer"], item["effective"], item["expiration"]) == ("Secretary of State", "2024-01-15", "2026-01-31")
+    assert events == ["uploaded", "queued", "extracting", "verified"]
+
+    assert client.put("/api/ai/profile/uploads/nope/content?company_id=demo", content=b"x").status_code == 404
+
+
+def test_upload_events_reach_subscribers_in_other_workers(monkeypatch, tmp_path):
+    import asyncio
+    from app.services import uploads
+
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", tmp_path)
+    monkeypatch.setattr(uploads, "EVENTS_MAX_BYTES", 2048)
+
+    async def scenario():
+        stream = uploads.subscribe("acme", poll_s=0.05)
+        assert await stream.__anext__() == ": connected\n\n"
+        # another worker appends to the shared log without waking this process
+        await asyncio.to_thread(uploads._append_event, "acme", {"id": "doc-1", "status": "verified"})
+        frame = await asyncio.wait_for(stream.__anext__(), 5)
+        assert json.loads(frame.split("data: ", 1)[1]) == {"id": "doc-1", "status": "verified"}
+        await stream.aclose()
+
+    asyncio.run(scenario())
+    assert uploads._SUBSCRIBERS == {}
+
+    # the log is cut back as it grows; a cursor still gets every event once
+    cursor, _ = uploads.read_events("acme")
+    seen = []
+    for i in range(100):
+        uploads.publish("acme", {"id": f"doc-{i}", "status": "queued"})
+        cursor, events = uploads.read_events("acme", cursor)
+        seen += [e["id"] for e in events]
+    assert seen == [f"doc-{i}" for i in range(100)]
+    assert (tmp_path / "acme" / ".events").stat().st_size <= 2048
+
+
+def test_pdf_text_inflates_streams_within_budget():
+    import zlib
+    from app.services import uploads
+
+    bomb = zlib.compress(b"(Internal Revenue Service)" + b" " * (64 << 20), 9)
+    pdf = b"%PDF-1.4\nstream\n" + bomb + b"\nendstream\nstream\n" + bomb + b"\nendstream\n"
+    text = uploads._pdf_text(pdf, budget=1 << 20)
+    assert text == "Internal Revenue Service"  # second stream skipped once the budget is spent
@@ -0,0 +1,44 @@
+from app.middleware.rate_limit import MemoryBucketStore, RateLimiter, SQLiteBucketStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_refills_over_time():
+    clock = FakeClock()
+    limiter = RateLimiter(3, 60, MemoryBucketStore(), clock=clock)
+    assert all(limiter.allow("1.2.3.4") for _ in range(3))
+    assert not limiter.allow("1.2.3.4")
+    assert limiter.allow("5.6.7.8")  # keys are independent
+    clock.now += 20  # one token back
+    assert limiter.allow("1.2.3.4")
+    assert not limiter.allow("1.2.3.4")
+
+
+def test_memory_store_evicts_idle_and_is_bounded():
+    clock = FakeClock()
+    store = MemoryBucketStore(max_keys=100)
+    limiter = RateLimiter(5, 60, store, clock=clock)
+    for i in range(250):
+        limiter.allow(f"scanner-{i}")
+    assert len(store) == 100
+    clock.now += 61  # every bucket has fully refilled
+    limiter.allow("fresh")
+    assert len(store) == 1
+
+
+def test_sqlite_store_shares_limits_between_workers(tmp_path):
+    path = str(tmp_path / "rl.db")
+    clock = FakeClock()
+    # two stores on the same file stand in for two worker processes
+    worker_a = RateLimiter(4, 60, SQLiteBucketStore(path), prefix="ip:", clock=clock)
+    worker_b = RateLimiter(4, 60, SQLiteBucketStore(path), prefix="ip:", clock=clock)
+    assert worker_a.allow("9.9.9.9") and worker_a.allow("9.9.9.9")
+    assert worker_b.allow("9.9.9.9") and worker_b.allow("9.9.9.9")
+    assert not worker_a.allow("9.9.9.9")
+    assert not worker_b.allow("9.9.9.9")
@@ -0,0 +1,48 @@
+import jwt
+import time
+import pytest
+from fastapi.testclient import TestClient
+
+from app import responses
+from app.main import app
+from app.middleware.auth import _RATE_STORE
+from app.schemas import AssetsFullResponse, BusinessHealthResponse, BusinessInsightsResponse, TaxFullResponse
+
+client = TestClient(app)
+
+TOKEN = jwt.encode({"company_id": "acme", "exp": int(time.time()) + 3600}, "dev-secret", algorithm="HS256")
+HEADERS = {"Authorization": f"Bearer {TOKEN}"}
+
+
+@pytest.fixture(autouse=True)
+def fresh_rate_limits():
+    # all TestClient requests share one client IP
+    _RATE_STORE.clear()
+
+CASES = [
+    ("/api/ai/assets/full", {"company_id": "acme", "range": "30d"}, AssetsFullResponse),
+    ("/api/ai/tax/full", {"company_id": "acme", "year": 2025}, TaxFullResponse),
+    ("/api/ai/health/full", {"company_id": "acme", "range": "30d"}, BusinessHealthResponse),
+    ("/api/ai/insights/full", {"company_id": "acme", "range": "30d", "horizon": "90d"}, BusinessInsightsResponse),
+]
+
+
+def test_dumps_matches_stdlib_shape():
+    from datetime import date
+    body = responses.dumps({"a": 1.5, "b": "é", "d": date(2025, 1, 2), 3: None})
+    assert body == '{"a":1.5,"b":"é","d":"2025-01-02","3":null}'.encode("utf-8")
+
+
+@pytest.mark.parametrize("path,body,model", CASES)
+def test_trusted_engine_output_conforms_to_schema(monkeypatch, path, body, model):
+    """Trusted mode skips response_model validation at runtime, so the schema is checked here."""
+    monkeypatch.setattr(responses, "TRUSTED_ENGINE_OUTPUT", True)
+    r = client.post(path, json=body, headers=HEADERS)
+    assert r.status_code == 200
+    trusted = r.json()
+    model.model_validate(trusted)
+    assert trusted["_meta"]["tenant"] == "acme"
+
+    monkeypatch.setattr(responses, "TRUSTED_ENGINE_OUTPUT", False)
+    validated = client.post(path, json=body, headers=HEADERS).json()
+    assert set(validated) <= set(trusted)
@@ -92,3 +92,71 @@ def test_scenario_chat_no_question(mock_assistant):
     data = response.json()
     assert "message" in data
     assert "Please ask" in data["message"]
+
+
+@patch("main.run_assistant")
+def test_scenario_chat_fast_path_skips_assistants(mock_assistant):
+    """Common scenario phrasing is answered locally without assistant runs"""
+    response = client.post(
+        "/api/intent",
+        json={
+            "intent": "scenario_chat",
+            "input": {"question": "Buy a $45k truck with a $36k loan at 7.5%"},
+            "company_id": "demo"
+        }
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["fast_path"] is True
+    assert "summary" in data["simulation"]
+    mock_assistant.assert_not_called()
+
+
+def test_scenario_parser_common_forms():
+    """Parser extracts levers from the common question forms"""
+    from app.services.scenario_parser import parse_scenario_question
+
+    assert parse_scenario_question("raise prices 5%").price_change_pct == 5
+    assert parse_scenario_question("Can we hire 2 techs?").headcount_delta == 2
+    truck = parse_scenario_question("buy a $45k truck with a $36k loan at 7.5%")
+    assert (truck.capex_amount, truck.loan_amount, truck.interest_rate) == (45000, 36000, 7.5)
+    for question in ("finance $36k at 7.5% to buy a $45k truck", "buy a $45k truck at 7.5% with a $36k loan"):
+        truck = parse_scenario_question(question)
+        assert (truck.capex_amount, truck.loan_amount, truck.interest_rate) == (45000, 36000, 7.5)
+    assert parse_scenario_question("How are competitors doing?") is None
+
+
+def test_scenario_parser_leaves_unused_figures_to_the_assistant():
+    """A question with an amount or percentage no lever took is not half-parsed"""
+    from app.services.scenario_parser import parse_scenario_question
+
+    assert parse_scenario_question("buy a $45k truck at 7.5%") is None
+    assert parse_scenario_question("hire 2 techs at $60k each") is None
+    assert parse_scenario_question("raise prices 5% and buy a $45k truck").capex_amount == 45000
+
+
+def test_scenario_parser_leaves_bare_numbers_to_the_assistant():
+    """Counts are not dollars, and implausible head counts are not parsed"""
+    from app.services.scenario_parser import parse_scenario_question
+
+    assert parse_scenario_question("buy 2 trucks") is None
+    assert parse_scenario_question("should we get 3 new vans?") is None
+    assert parse_scenario_question("hire 2026 techs") is None
+    assert parse_scenario_question("purchase 120 thousand of equipment").capex_amount == 120000
+    assert parse_scenario_question("buy 45000 dollars of tools").capex_amount == 45000
+    assert parse_scenario_question("purchase $120,000 of equipment").capex_amount == 120000
+    both = parse_scenario_question("hire 2 techs and buy 3 vans")
+    assert both.headcount_delta == 2 and both.capex_amount == 0
+
+
+def test_quick_scenario_runs_local_analysis():
+    """/api/scenario-lab/quick analyzes parsed questions directly"""
+    from app.main import app as api_app
+
+    r = TestClient(api_app).post("/api/scenario-lab/quick", json={"company_id": "demo", "question": "hire 2 techs"})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["parsed"] is True
+    assert body["template"]["inputs"]["headcount_delta"] == 2
+    assert "kpis" in body["analysis"]